@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark
+
+Imports each entry point in a fresh interpreter under `python -X importtime`
+and reports the median cumulative import time, the heaviest modules it pulls
+in, and whether any module that should load lazily was imported anyway:
+
+    chat_app         the Streamlit app (rcsb_pdb_chatbot)
+    chat_api         the headless chat API
+    session_manager  UserSessionManager alone (batch tools, benchmarks)
+    feedback_export  weekly feedback export cron job
+    drive_sync       Google Drive knowledge base sync cron job
+    test_framework   the CrewAI-backed response test framework
+
+Each target has a budget in milliseconds. The script exits with status 1 if a
+median exceeds its budget (scaled by --budget-scale, for slower machines) or a
+deferred module (ragflow_sdk, crewai, langchain_openai, the Google clients) was
+imported. Targets whose own dependencies (streamlit, fastapi, rich) are not
+installed are reported as skipped.
+
+Usage:
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --runs 10 --output cold_start.json
+    python benchmarks/bench_cold_start.py --targets chat_app --top 20
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = PROJECT_ROOT / "src"
+
+# Imported on first use only; any of these at startup is a budget failure
+DEFERRED_MODULES = ("ragflow_sdk", "crewai", "langchain_openai", "googleapiclient", "google.auth",
+                    "google_auth_oauthlib")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+@dataclass
+class Target:
+    """One entry point: the module imported, where from, and its budget"""
+    module: str
+    cwd: Path
+    budget_ms: float
+    description: str
+
+
+# Budgets are about twice a typical laptop measurement; streamlit and fastapi
+# account for most of the app and API time and cannot be deferred
+TARGETS: Dict[str, Target] = {
+    "chat_app": Target("rcsb_pdb_chatbot", SRC_DIR, 900, "Streamlit app"),
+    "chat_api": Target("chat_api", SRC_DIR, 1200, "Headless chat API"),
+    "session_manager": Target("user_session_manager", SRC_DIR, 150, "UserSessionManager"),
+    "feedback_export": Target("src.feedback_export.export_manager", PROJECT_ROOT, 100, "Feedback export cron job"),
+    "drive_sync": Target("src.google_drive_sync.sync_manager", PROJECT_ROOT, 120, "Google Drive sync cron job"),
+    "test_framework": Target("testing.test_framework", PROJECT_ROOT, 600, "Response test framework"),
+}
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def measure(target: Target) -> Dict:
+    """Import the target once in a fresh interpreter"""
+    code = (f"import sys, json; import {target.module}; "
+            "sys.stdout.write(json.dumps(sorted(sys.modules)))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=target.cwd,
+                            capture_output=True, text=True, timeout=120)
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        # Some entry points print an install hint and exit instead of raising
+        output = [line for line in (result.stdout + "\n" + result.stderr).splitlines()
+                  if line.strip() and not line.startswith("import time:")]
+        missing = re.search(r"No module named '([^']+)'", "\n".join(output))
+        return {"error": f"missing dependency {missing.group(1)}" if missing else (output or ["failed"])[-1]}
+
+    # Children are listed before their parent: the target's subtree runs from the
+    # previous top-level line (e.g. site and its .pth imports) to the target's own line
+    end = max(i for i, (name, _, _, depth) in enumerate(rows) if name == target.module and depth == 0)
+    start = max((i for i in range(end) if rows[i][3] == 0), default=-1) + 1
+    modules = json.loads(result.stdout.splitlines()[-1])
+    return {
+        "total_ms": rows[end][2] / 1000,
+        "rows": rows[start:end + 1],
+        "deferred_imported": sorted(m for m in modules
+                                    if any(m == d or m.startswith(d + ".") for d in DEFERRED_MODULES)),
+    }
+
+
+def heaviest(rows: List[Tuple[str, int, int, int]], top: int) -> List[Tuple[str, float]]:
+    """Direct dependencies of the target (depth 1) by cumulative time"""
+    direct = [(name, cum / 1000) for name, _, cum, depth in rows if depth == 1]
+    return sorted(direct, key=lambda item: item[1], reverse=True)[:top]
+
+
+def run_target(name: str, target: Target, runs: int, top: int, budget_scale: float) -> Dict:
+    samples = []
+    last = None
+    for _ in range(runs):
+        last = measure(target)
+        if "error" in last:
+            return {"target": name, "module": target.module, "skipped": last["error"]}
+        samples.append(last["total_ms"])
+
+    median_ms = statistics.median(samples)
+    budget_ms = target.budget_ms * budget_scale
+    return {
+        "target": name,
+        "module": target.module,
+        "runs": runs,
+        "median_ms": median_ms,
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+        "budget_ms": budget_ms,
+        "over_budget": median_ms > budget_ms,
+        "deferred_imported": last["deferred_imported"],
+        "heaviest": heaviest(last["rows"], top),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=PROJECT_ROOT, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app entry points")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), help="Entry points (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest direct imports listed per target")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Multiply every budget (slow CI machines)")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.targets or TARGETS:
+        target = TARGETS[name]
+        print(f"⏱️  {name}: import {target.module}")
+        results.append(run_target(name, target, args.runs, args.top, args.budget_scale))
+
+    failures = 0
+    print(f"\n{'target':17}{'median ms':>11}{'min ms':>9}{'budget ms':>11}  status")
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['target']:17}{'-':>11}{'-':>9}{'-':>11}  skipped ({r['skipped']})")
+            continue
+        status = "ok"
+        if r["over_budget"]:
+            status = "⚠️  OVER BUDGET"
+        if r["deferred_imported"]:
+            status = f"⚠️  EAGER {', '.join(r['deferred_imported'][:3])}"
+        failures += status != "ok"
+        print(f"{r['target']:17}{r['median_ms']:>11.1f}{r['min_ms']:>9.1f}{r['budget_ms']:>11.0f}  {status}")
+
+    for r in results:
+        if r.get("heaviest"):
+            print(f"\n{r['target']}: heaviest direct imports")
+            for module, ms in r["heaviest"]:
+                print(f"   {ms:8.1f} ms  {module}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "meta": {
+                "created_at": datetime.now().isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "runs": args.runs,
+            },
+            "results": results,
+        }, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: markdown fence stripping for streamed and stored answers
+
+Compares the original DOTALL regex run on every chunk and every rerun against
+the incremental StreamingMarkdownProcessor and the per-message_id render memo,
+over a synthetic corpus of stored messages.
+
+Usage:
+    python benchmarks/bench_markdown.py --messages 10000 --reruns 5
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from markdown_processing import StreamingMarkdownProcessor, clear_render_memo, render_stored_answer
+
+
+def regex_process_markdown_response(content: str) -> str:
+    """Original implementation (regex over the full text)"""
+    if not content:
+        return content
+    match = re.match(r'^```markdown\s*\n(.*?)\n```$', content.strip(), re.DOTALL)
+    return match.group(1) if match else content
+
+
+def make_corpus(count: int, seed: int = 7):
+    """Answers of 500-4000 characters, about half wrapped in ```markdown"""
+    rng = random.Random(seed)
+    sentence = "Deposit the PDBx/mmCIF file and review the validation report before submission. "
+    corpus = []
+    for _ in range(count):
+        body = "## Answer\n\n" + sentence * rng.randint(6, 50)
+        content = f"```markdown\n{body}\n```" if rng.random() < 0.5 else body
+        corpus.append((str(uuid.uuid4()), content))
+    return corpus
+
+
+def chunk_prefixes(content: str, chunk_chars: int):
+    """Cumulative contents as RAGFlow streams them"""
+    return [content[:end] for end in range(chunk_chars, len(content) + chunk_chars, chunk_chars)]
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown fence stripping")
+    parser.add_argument("--messages", type=int, default=10000, help="Stored messages in the corpus")
+    parser.add_argument("--reruns", type=int, default=5, help="History re-renders to simulate")
+    parser.add_argument("--streamed", type=int, default=200, help="Messages to replay as streams")
+    parser.add_argument("--chunk-chars", type=int, default=20, help="Characters per streamed chunk")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages)
+
+    # History rendering: every rerun processes every stored message
+    def history_regex():
+        for _ in range(args.reruns):
+            for _, content in corpus:
+                regex_process_markdown_response(content)
+
+    def history_memo():
+        for _ in range(args.reruns):
+            for message_id, content in corpus:
+                render_stored_answer(message_id, content)
+
+    clear_render_memo()
+    regex_history = timed(history_regex)
+    memo_history = timed(history_memo)
+
+    # Streaming: one processing call per chunk
+    streams = [chunk_prefixes(content, args.chunk_chars) for _, content in corpus[:args.streamed]]
+    chunk_total = sum(len(s) for s in streams)
+
+    def stream_regex():
+        for prefixes in streams:
+            for prefix in prefixes:
+                regex_process_markdown_response(prefix)
+
+    def stream_incremental():
+        for prefixes in streams:
+            processor = StreamingMarkdownProcessor()
+            for prefix in prefixes:
+                processor.feed(prefix)
+            processor.finish(prefixes[-1])
+
+    regex_stream = timed(stream_regex)
+    incremental_stream = timed(stream_incremental)
+
+    print(f"History: {args.messages} messages x {args.reruns} reruns")
+    print(f"  regex every rerun   {regex_history * 1000:10.1f} ms")
+    print(f"  memo by message_id  {memo_history * 1000:10.1f} ms  ({regex_history / memo_history:.1f}x)")
+    print(f"Streaming: {args.streamed} answers, {chunk_total} chunks of {args.chunk_chars} chars")
+    print(f"  regex every chunk   {regex_stream * 1000:10.1f} ms")
+    print(f"  incremental         {incremental_stream * 1000:10.1f} ms  ({regex_stream / incremental_stream:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Reference payload benchmark for a multi-turn chat
+
+Estimates the reference text sent over the Streamlit websocket on every rerun,
+and the time to prepare it, for the old always-rendered expanders versus lazy
+toggles with truncated previews and a per-message byte cap. Element text
+dominates the protobuf payload, so bytes of element text are used as the
+payload estimate.
+
+Usage:
+    python benchmarks/bench_reference_payload.py --turns 20 --refs 8
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from reference_view import build_reference_view
+
+
+def make_chat(turns: int, refs_per_answer: int, seed: int = 11):
+    """References with realistic 512-token chunks (~1.5-3 KB of text)"""
+    rng = random.Random(seed)
+    sentence = "The wwPDB validation report summarises geometry, fit to data and clashscore. "
+    chat = []
+    for turn in range(turns):
+        chat.append([
+            {
+                "document_name": f"wwPDB-A-2025Mar-V5.5.pdf#{turn}-{i}",
+                "similarity": rng.random(),
+                "content": sentence * rng.randint(20, 40),
+            }
+            for i in range(refs_per_answer)
+        ])
+    return chat
+
+
+def old_elements(references):
+    """Element text the old expander sent for one message, opened or not"""
+    elements = []
+    for i, ref in enumerate(references, 1):
+        elements.append(f"**Reference {i}: {ref.get('document_name', 'Unknown')}**")
+        elements.append(f"Similarity Score: {ref.get('similarity', 0):.2f}")
+        elements.append("**Content:**")
+        elements.append(ref.get("content", ""))
+    return elements
+
+
+def new_elements(references, opened: bool, full_indexes=()):
+    """Element text the lazy view sends for one message"""
+    elements = [f"References ({len(references)})"]
+    if not opened:
+        return elements
+    for item in build_reference_view(references, full_indexes):
+        elements.append(f"**Reference {item.index}: {item.document_name}**")
+        elements.append(f"Similarity Score: {item.similarity:.2f}")
+        elements.append(item.text)
+        if item.can_expand:
+            elements.append("Show full chunk")
+    return elements
+
+
+def measure(chat, render):
+    started = time.perf_counter()
+    payload = sum(len(text.encode("utf-8")) for refs in chat for text in render(refs))
+    return payload, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate reference payload per rerun")
+    parser.add_argument("--turns", type=int, default=20, help="Assistant answers in the chat")
+    parser.add_argument("--refs", type=int, default=8, help="References per answer")
+    args = parser.parse_args()
+
+    chat = make_chat(args.turns, args.refs)
+
+    scenarios = [
+        ("old: expanders (always sent)", old_elements),
+        ("new: all collapsed", lambda refs: new_elements(refs, opened=False)),
+        ("new: one message opened", None),
+        ("new: every message opened", lambda refs: new_elements(refs, opened=True)),
+    ]
+
+    print(f"{args.turns}-turn chat, {args.refs} references per answer")
+    print(f"{'scenario':34}{'payload KB':>12}{'prepare ms':>12}")
+    for name, render in scenarios:
+        if render is None:
+            opened_id = id(chat[-1])
+            render = lambda refs: new_elements(refs, opened=id(refs) == opened_id)  # noqa: E731
+        payload, seconds = measure(chat, render)
+        print(f"{name:34}{payload / 1024:>12.1f}{seconds * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
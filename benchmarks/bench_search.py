@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Conversation search benchmark
+
+Fills a search index with N synthetic questions and answers: a quarter of
+the words come from a PDB vocabulary, the rest from a 50k-word lexicon, both
+Zipf-distributed like natural text, so common words match many messages and
+rare ones few. It then times queries of PDB terms of one to three words, across all users and for
+one user. Prints bulk indexing rate, per-message incremental indexing latency,
+index size and query latency percentiles; with --output, writes them as JSON.
+
+Usage:
+    python benchmarks/bench_search.py --messages 100000
+    python benchmarks/bench_search.py --messages 2000000 --index /data/bench_search.sqlite3
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from search_index import SEARCH_MAX_CANDIDATES, SearchIndex
+
+VOCABULARY = (
+    "structure validation report model deposition entry ligand density map resolution chain residue "
+    "sequence protein assembly refinement crystal diffraction cryo-EM NMR geometry outlier clash "
+    "ramachandran rotamer B-factor occupancy PDBx/mmCIF format file download upload search identifier "
+    "DOI citation release hold embargo annotation biocurator metadata author coordinates symmetry "
+    "unit cell space group twinning restraint dictionary CCD component polymer branched carbohydrate "
+    "nucleic DNA RNA helix sheet domain alignment similarity taxonomy organism expression wwPDB OneDep"
+).split()
+LEXICON = [f"w{rank}" for rank in range(50000)]
+DOMAIN_SHARE = 0.25
+USERS = 10000
+BATCH = 10000
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def zipf_weights(size: int) -> List[float]:
+    """Cumulative weights for rng.choices (1/rank)"""
+    total, weights = 0.0, []
+    for rank in range(size):
+        total += 1 / (rank + 1)
+        weights.append(total)
+    return weights
+
+
+DOMAIN_WEIGHTS = zipf_weights(len(VOCABULARY))
+LEXICON_WEIGHTS = zipf_weights(len(LEXICON))
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    domain = sum(rng.random() < DOMAIN_SHARE for _ in range(words))
+    chosen = (rng.choices(VOCABULARY, cum_weights=DOMAIN_WEIGHTS, k=domain)
+              + rng.choices(LEXICON, cum_weights=LEXICON_WEIGHTS, k=words - domain))
+    rng.shuffle(chosen)
+    return " ".join(chosen)
+
+
+def domain_query(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=DOMAIN_WEIGHTS, k=words))
+
+
+def fill(index: SearchIndex, messages: int, rng: random.Random) -> float:
+    """Bulk-load the index in batches of one transaction each; returns seconds"""
+    started = time.perf_counter()
+    conn = index._conn
+    for start in range(0, messages, BATCH):
+        conn.execute("BEGIN")
+        for i in range(start, min(messages, start + BATCH)):
+            question = i % 2 == 0
+            index._upsert(f"user-{i % USERS}", f"chat-{i // 20}", str(uuid.UUID(int=rng.getrandbits(128))),
+                          "user" if question else "assistant",
+                          synthetic_text(rng, 12 if question else 120), None)
+        conn.execute("COMMIT")
+    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+    return time.perf_counter() - started
+
+
+def time_queries(index: SearchIndex, queries: List[str], limit: int, **filters) -> Dict[str, float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, limit=limit, **filters)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(statistics.median(timings), 2), "p95_ms": round(percentile(timings, 95), 2),
+            "max_ms": round(max(timings), 2)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the conversation search index")
+    parser.add_argument("--messages", type=int, default=100000, help="Messages to index")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--limit", type=int, default=20, help="Results per query")
+    parser.add_argument("--max-candidates", type=int, default=SEARCH_MAX_CANDIDATES,
+                        help="Newest matches ranked per query (0 = rank all)")
+    parser.add_argument("--index", type=Path, help="Index file (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = args.index or Path(temp_dir) / "search.sqlite3"
+        if path.exists():
+            path.unlink()
+        index = SearchIndex(path, max_candidates=args.max_candidates)
+
+        print(f"📥 Indexing {args.messages} messages...")
+        bulk_seconds = fill(index, args.messages, rng)
+
+        incremental = []
+        for _ in range(200):
+            started = time.perf_counter()
+            index.index_message("user-0", "chat-new", str(uuid.uuid4()), "assistant", synthetic_text(rng, 120))
+            incremental.append((time.perf_counter() - started) * 1000)
+
+        queries = [domain_query(rng, rng.randint(1, 3)) for _ in range(args.queries)]
+        results = {
+            "messages": args.messages,
+            "max_candidates": args.max_candidates,
+            "bulk_messages_per_second": round(args.messages / bulk_seconds),
+            "index_message_p50_ms": round(statistics.median(incremental), 2),
+            "index_mb": round(path.stat().st_size / 2 ** 20, 1),
+            "search_all": time_queries(index, queries, args.limit),
+            "search_user": time_queries(index, queries, args.limit, user_id="user-7"),
+            "search_answers": time_queries(index, queries, args.limit, role="assistant"),
+        }
+        index.close()
+
+    print(f"   {results['bulk_messages_per_second']} messages/s bulk, "
+          f"{results['index_message_p50_ms']} ms per incremental message, {results['index_mb']} MB")
+    for name in ("search_all", "search_user", "search_answers"):
+        stats = results[name]
+        print(f"🔎 {name:15} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   "
+              f"max {stats['max_ms']:8.2f} ms")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"💾 Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Storage micro-benchmarks for UserSessionManager
+
+Builds synthetic user_data stores in the on-disk format (written by the
+manager's own serializer) and times the operations production data stresses:
+
+    load            read and parse one user's file (cold cache)
+    save            serialize and write one user's file
+    append_message  store a question and answer placeholder (start_turn)
+    add_feedback    rate one answer (add_message_feedback)
+    list_all_users  list every user file in the store
+    get_user_stats  stats for one user (cold cache)
+    all_user_stats  get_user_stats for every user, as a dashboard would
+
+Each scenario is a store of N users with M messages each; answers carry 3-6
+reference chunks of ~2 KB, like RAGFlow's. Results are written as JSON, so a
+later run can be compared with --compare. Any operation whose median got
+slower than --threshold times the baseline is flagged as a regression, and the
+script exits with status 1.
+
+Usage:
+    python benchmarks/bench_storage.py --preset quick --output storage.json
+    python benchmarks/bench_storage.py --preset quick --compare storage.json
+    python benchmarks/bench_storage.py --users 100000 --messages 10 --store-dir /data/bench_store
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from user_session_manager import StoredMessage, UserChat, UserSession, UserSessionManager
+
+# (users, messages per user) scenarios
+PRESETS: Dict[str, List[Tuple[int, int]]] = {
+    "quick": [(10, 10), (10, 100), (10, 1000), (1000, 10)],
+    "full": [(10, 10), (10, 100), (10, 1000), (10, 10000), (1000, 10), (10000, 10), (100000, 10)],
+}
+
+# Chats are started over after this many messages, as users do
+MESSAGES_PER_CHAT = 40
+
+REFERENCE_TEXT = (
+    "The validation report summarises the quality of the model and its fit to the "
+    "experimental data. Percentile sliders compare clashscore, Ramachandran outliers, "
+    "side-chain outliers and RSRZ outliers with all entries in the archive. "
+)
+
+
+class NullAssistantManager:
+    """No RAGFlow: storage operations only"""
+
+    def get_or_create_assistant(self, config):
+        return "bench-assistant"
+
+    def create_session(self, assistant_id, session_name="New Session"):
+        return f"bench-session-{uuid.uuid4()}"
+
+    def bind_session(self, session_id, base_url):
+        pass
+
+    def backend_for_session(self, session_id):
+        return None
+
+
+def make_manager(data_dir: Path) -> UserSessionManager:
+    with patch("user_session_manager.create_backend_manager", return_value=NullAssistantManager()):
+        return UserSessionManager("bench", data_dir=str(data_dir))
+
+
+def make_references(rng: random.Random) -> List[Dict]:
+    chunk = (REFERENCE_TEXT * 12)[:2000]
+    return [{"document_name": f"wwPDB-guide-{rng.randint(1, 40)}.pdf", "document_id": uuid.uuid4().hex,
+             "similarity": round(rng.uniform(0.4, 0.95), 4), "content": chunk}
+            for _ in range(rng.randint(3, 6))]
+
+
+def make_user(user_id: str, messages: int, rng: random.Random) -> UserSession:
+    """A user with `messages` messages spread over chats of MESSAGES_PER_CHAT"""
+    started = datetime.now() - timedelta(days=30)
+    chats = []
+    remaining = messages
+    while remaining > 0:
+        count = min(remaining, MESSAGES_PER_CHAT)
+        remaining -= count
+        stored = []
+        for i in range(count):
+            timestamp = started + timedelta(minutes=len(chats) * 60 + i)
+            if i % 2 == 0:
+                stored.append(StoredMessage("user", f"Question {i // 2}: how do I fix validation errors "
+                                            "in my PDBx/mmCIF deposition?", timestamp, str(uuid.uuid4())))
+            else:
+                stored.append(StoredMessage(
+                    "assistant", "## Answer\n\n" + REFERENCE_TEXT * rng.randint(3, 10), timestamp,
+                    str(uuid.uuid4()), references=make_references(rng),
+                    feedback={"star_rating": rng.randint(1, 5), "feedback_timestamp": timestamp.isoformat()}
+                    if rng.random() < 0.2 else None))
+        chats.append(UserChat(
+            chat_id=str(uuid.uuid4()), title=f"Help Session {len(chats)}", created_at=started,
+            updated_at=started + timedelta(minutes=len(chats) * 60 + count), message_count=count,
+            ragflow_session_id=uuid.uuid4().hex, messages=stored, ragflow_turns=count // 2,
+        ))
+    return UserSession(user_id=user_id, session_name=f"{user_id}_main_session", created_at=started,
+                       chats=chats, total_chats=len(chats))
+
+
+def build_store(store_dir: Path, users: int, messages: int, seed: int) -> Path:
+    """Write (or reuse) a synthetic store; returns its directory"""
+    path = store_dir / f"store_{users}u_{messages}m"
+    marker = path / ".complete"
+    if marker.exists():
+        return path
+    path.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        manager = make_manager(path)
+    started = time.perf_counter()
+    for i in range(users):
+        manager._write_user_sessions(make_user(f"bench{i:06d}", messages, rng))
+    marker.write_text(datetime.now().isoformat())
+    print(f"   built {users} users x {messages} messages in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def time_op(op: Callable[[], None], repeats: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """Run op `repeats` times, timing each run (setup is not timed)"""
+    durations = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        op()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def run_scenario(path: Path, users: int, messages: int, repeats: int, seed: int) -> List[Dict]:
+    manager = make_manager(path)
+    rng = random.Random(seed)
+    user_ids = [f"bench{i:06d}" for i in rng.sample(range(users), min(users, repeats))]
+    file_kb = manager._get_user_data_file(user_ids[0]).stat().st_size / 1024
+    picks = iter(user_ids * repeats)
+
+    def pick_user() -> str:
+        return next(picks)
+
+    def cold(user_id: str):
+        manager.user_sessions.pop(user_id, None)
+
+    results = {}
+
+    def load():
+        manager._read_user_sessions(pick_user())
+    results["load"] = time_op(load, repeats)
+
+    warm = manager.get_user_session(user_ids[0])
+    results["save"] = time_op(lambda: manager._write_user_sessions(warm), repeats)
+
+    chat = warm.chats[-1]
+    results["append_message"] = time_op(
+        lambda: manager.start_turn(warm.user_id, chat.chat_id, "Follow-up: what about ligands?"), repeats)
+
+    answers = [m.message_id for m in chat.messages if m.role == "assistant"]
+    results["add_feedback"] = time_op(
+        lambda: manager.add_message_feedback(warm.user_id, chat.chat_id, rng.choice(answers),
+                                             {"star_rating": rng.randint(1, 5)}), repeats)
+
+    results["list_all_users"] = time_op(manager.list_all_users, max(1, min(repeats, 3)))
+
+    stats_user = iter(user_ids * repeats)
+    current = {}
+
+    def stats_setup():
+        current["user"] = next(stats_user)
+        cold(current["user"])
+    results["get_user_stats"] = time_op(lambda: manager.get_user_stats(current["user"]), repeats, stats_setup)
+
+    def all_user_stats():
+        for user_id in manager.list_all_users():
+            manager.get_user_stats(user_id)
+            cold(user_id)
+    results["all_user_stats"] = time_op(all_user_stats, 1, setup=manager.user_sessions.clear)
+
+    return [{
+        "op": op,
+        "users": users,
+        "messages": messages,
+        "file_kb": round(file_kb, 1),
+        "repeats": len(durations),
+        "median_ms": statistics.median(durations) * 1000,
+        "p95_ms": sorted(durations)[int(0.95 * (len(durations) - 1))] * 1000,
+        "min_ms": min(durations) * 1000,
+    } for op, durations in results.items()]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(results: List[Dict], baseline_path: Path, threshold: float) -> int:
+    """Print median ratios against a baseline run; returns the number of regressions"""
+    baseline = {(r["op"], r["users"], r["messages"]): r
+                for r in json.loads(baseline_path.read_text())["results"]}
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression threshold {threshold:.2f}x)")
+    print(f"{'operation':16}{'users':>8}{'msgs':>7}{'base ms':>11}{'now ms':>11}{'ratio':>8}")
+    for result in results:
+        base = baseline.get((result["op"], result["users"], result["messages"]))
+        if base is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  ⚠️  REGRESSION"
+        elif ratio < 1 / threshold:
+            flag = "  ✅ faster"
+        print(f"{result['op']:16}{result['users']:>8}{result['messages']:>7}{base['median_ms']:>11.2f}"
+              f"{result['median_ms']:>11.2f}{ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark UserSessionManager storage operations")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="Scenario set")
+    parser.add_argument("--users", type=int, nargs="+", help="User counts (with --messages, replaces the preset)")
+    parser.add_argument("--messages", type=int, nargs="+", help="Messages per user (with --users)")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per operation")
+    parser.add_argument("--store-dir", type=Path, help="Keep synthetic stores here and reuse them (default: temporary)")
+    parser.add_argument("--seed", type=int, default=11, help="Seed for synthetic data")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Median slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    if args.users or args.messages:
+        scenarios = [(u, m) for u in (args.users or [10]) for m in (args.messages or [10])]
+    else:
+        scenarios = PRESETS[args.preset]
+
+    store_dir = args.store_dir or Path(tempfile.mkdtemp(prefix="bench_storage_"))
+    results = []
+    try:
+        for users, messages in scenarios:
+            print(f"📦 {users} users x {messages} messages")
+            path = build_store(store_dir, users, messages, args.seed)
+            with contextlib.redirect_stdout(open(os.devnull, "w")):  # Per-operation log lines
+                scenario_results = run_scenario(path, users, messages, args.repeats, args.seed)
+            results.extend(scenario_results)
+            if not args.store_dir:
+                shutil.rmtree(path)
+    finally:
+        if not args.store_dir:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+    print(f"\n{'operation':16}{'users':>8}{'msgs':>7}{'file KB':>10}{'median ms':>11}{'p95 ms':>10}{'min ms':>10}")
+    for r in results:
+        print(f"{r['op']:16}{r['users']:>8}{r['messages']:>7}{r['file_kb']:>10.1f}"
+              f"{r['median_ms']:>11.2f}{r['p95_ms']:>10.2f}{r['min_ms']:>10.2f}")
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "meta": {
+                "created_at": datetime.now().isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeats": args.repeats,
+            },
+            "results": results,
+        }, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        if compare(results, args.compare, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
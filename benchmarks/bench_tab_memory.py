@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Per-tab memory benchmark for chat history held in Streamlit session state
+
+Builds a session manager cache of N users with one chat each (one browser tab
+per user), then measures the session-state memory every tab holds on top of
+that cache: the old per-tab copy of the history (message dicts in
+st.session_state.messages plus the rendered_blocks cache) versus the read-only
+ChatHistoryView the UI now renders from. Sizes come from tracemalloc; process
+RSS is read from /proc where available.
+
+Usage:
+    python benchmarks/bench_tab_memory.py --tabs 500 --turns 20
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import markdown_processing
+from markdown_processing import clear_render_memo, render_stored_answer
+from user_session_manager import ChatHistoryView, StoredMessage
+
+
+def make_history(turns: int, rng: random.Random):
+    """One chat as the manager caches it: Q&A pairs with five references per answer"""
+    sentence = "Validation reports summarise geometry, fit to data and clashscore. "
+    messages = []
+    for i in range(turns):
+        messages.append(StoredMessage("user", f"Question {i}: how do I deposit?", datetime.now(),
+                                      str(uuid.uuid4())))
+        messages.append(StoredMessage(
+            "assistant", "```markdown\n## Answer\n\n" + sentence * rng.randint(10, 40) + "\n```",
+            datetime.now(), str(uuid.uuid4()),
+            references=[{"document_name": f"doc-{i}-{r}.pdf", "similarity": rng.random(),
+                         "content": sentence * rng.randint(20, 40)} for r in range(5)],
+        ))
+    return messages
+
+
+def old_tab_state(messages):
+    """Session state of a tab before: load_chat_messages copy plus rendered_blocks"""
+    copied = []
+    for stored_msg in messages:
+        message_dict = {
+            "role": stored_msg.role,
+            "content": stored_msg.content,
+            "timestamp": stored_msg.timestamp.isoformat(),
+            "message_id": stored_msg.message_id,
+            "truncated": stored_msg.truncated,
+        }
+        if stored_msg.references:
+            message_dict["references"] = stored_msg.references
+        copied.append(message_dict)
+
+    rendered_blocks = {}
+    for message in copied:
+        rendered_blocks[message["message_id"]] = {
+            "content": render_stored_answer(message["message_id"], message["content"]),
+            "references": message.get("references") if message["role"] == "assistant" else None,
+        }
+    return {"messages": copied, "rendered_blocks": rendered_blocks, "full_reference_chunks": {}}
+
+
+def new_tab_state(messages):
+    """Session state of a tab now: no history, one transient view per render"""
+    for message in ChatHistoryView(messages):
+        render_stored_answer(message.message_id, message.content)
+    return {"full_reference_chunks": {}}
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (0 if /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def measure(histories, build_tab):
+    """Memory held by one tab state per history, kept alive together"""
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    tabs = [build_tab(messages) for messages in histories]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+    del tabs
+    return held, rss_after - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-tab session-state memory")
+    parser.add_argument("--tabs", type=int, default=500, help="Concurrent browser tabs")
+    parser.add_argument("--turns", type=int, default=20, help="Q&A turns per chat")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    histories = [make_history(args.turns, rng) for _ in range(args.tabs)]
+
+    # Warm the process-wide render memo so both sides share processed answers; size it
+    # to the corpus so evictions don't show up as per-tab allocations
+    markdown_processing.MEMO_MAX_ENTRIES = max(markdown_processing.MEMO_MAX_ENTRIES,
+                                               args.tabs * args.turns * 2)
+    clear_render_memo()
+    for messages in histories:
+        for message in messages:
+            render_stored_answer(message.message_id, message.content)
+
+    cache_bytes = sum(len(m.content) + sum(len(r["content"]) for r in m.references or [])
+                      for messages in histories for m in messages)
+
+    print(f"{args.tabs} tabs, {args.turns}-turn chats "
+          f"(manager cache text: {cache_bytes / 1024 / 1024:.1f} MB, shared by both)")
+    print(f"{'':32}{'per tab KB':>12}{'total MB':>12}{'RSS delta MB':>14}")
+    for name, build_tab in (("before: session_state copy", old_tab_state),
+                            ("after: ChatHistoryView", new_tab_state)):
+        held, rss_delta = measure(histories, build_tab)
+        print(f"{name:32}{held / args.tabs / 1024:>12.1f}{held / 1024 / 1024:>12.2f}"
+              f"{rss_delta / 1024 / 1024:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent SSE answer streams through the headless chat API
+
+Starts chat_api under uvicorn on a local port in a separate process, backed by a UserSessionManager
+whose RAGFlow client is an in-process mock with a configurable time to first
+token and token rate. N concurrent clients each create a chat and stream
+answers; TTFT and end-to-end latency percentiles, throughput and peak
+concurrent streams are reported. No RAGFlow server or network is needed.
+
+Usage:
+    python benchmarks/load_chat_api.py --clients 200 --turns 2 --ttft 0.5 --tokens-per-second 40
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import httpx
+import uvicorn
+
+from chat_api import create_app
+from ragflow_assistant_manager import StreamingResponse
+from user_session_manager import UserSessionManager
+
+
+class MockRAGFlowManager:
+    """Stands in for RAGFlowAssistantManager with simulated generation latency"""
+
+    def __init__(self, ttft: float, tokens_per_second: float, answer_tokens: int, peak):
+        self.ttft = ttft
+        self.token_interval = 1.0 / tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.active = 0
+        self.peak = peak  # Shared with the load generator process
+        self._lock = threading.Lock()
+
+    def get_or_create_assistant(self, config):
+        return "mock-assistant"
+
+    def create_session(self, assistant_id, session_name="New Session"):
+        return f"mock-session-{time.monotonic_ns()}"
+
+    def bind_session(self, session_id, base_url):
+        pass
+
+    def backend_for_session(self, session_id):
+        return "mock://ragflow"
+
+    def health_check(self):
+        return {"ragflow_connection": True, "dataset_access": True, "assistant_access": True}
+
+    def send_message(self, session_id, message, stream=True):
+        with self._lock:
+            self.active += 1
+            self.peak.value = max(self.peak.value, self.active)
+        try:
+            time.sleep(self.ttft)
+            content = ""
+            for i in range(self.answer_tokens):
+                content += f"token{i} "
+                yield StreamingResponse(content=content, is_complete=i == self.answer_tokens - 1)
+                time.sleep(self.token_interval)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def serve(port: int, args, peak):
+    """Server process: chat_api on uvicorn with the mock RAGFlow client"""
+    mock = MockRAGFlowManager(args.ttft, args.tokens_per_second, args.answer_tokens, peak)
+    data_dir = tempfile.mkdtemp(prefix="chat_api_load_")
+    with patch("user_session_manager.create_backend_manager", return_value=mock):
+        manager = UserSessionManager("load-test", data_dir=data_dir)
+    sys.stdout = open(os.devnull, "w")  # Keep per-chat log lines out of the report
+    uvicorn.run(create_app(manager), host="127.0.0.1", port=port, log_level="warning",
+                timeout_keep_alive=60)
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Chat API did not start on port {port}")
+
+
+def wait_until_ready(port: int, timeout: float = 30.0):
+    """The API turns new chats away with 503 until its health monitor reports the assistant warm"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if httpx.get(f"http://127.0.0.1:{port}/health/ready").status_code == 200:
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f"Chat API on port {port} did not become ready")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_client(client: httpx.AsyncClient, user_id: str, turns: int, results: list):
+    response = await client.post(f"/users/{user_id}/chats", json={"title": "load"})
+    if not response.is_success:
+        raise RuntimeError(f"Creating a chat for {user_id} failed: {response.status_code} {response.text}")
+    chat_id = response.json()["chat_id"]
+    for turn in range(turns):
+        started = time.perf_counter()
+        ttft = None
+        async with client.stream("POST", f"/users/{user_id}/chats/{chat_id}/messages",
+                                 json={"message": f"Question {turn}"}) as stream:
+            if not stream.is_success:
+                await stream.aread()
+                raise RuntimeError(f"Question from {user_id} failed: {stream.status_code} {stream.text}")
+            async for line in stream.aiter_lines():
+                if ttft is None and line.startswith("event: delta"):
+                    ttft = time.perf_counter() - started
+        results.append((ttft or 0.0, time.perf_counter() - started))
+
+
+async def drive(port: int, clients: int, turns: int):
+    results = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                 timeout=httpx.Timeout(120.0)) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_client(client, f"load-{i}", turns, results) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat API with concurrent SSE streams")
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=2, help="Questions per user")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Mock time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Mock token rate")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="Tokens per mock answer")
+    args = parser.parse_args()
+
+    # The server runs in its own process so the load generator doesn't share its GIL
+    port = free_port()
+    peak = multiprocessing.Value("i", 0)
+    server = multiprocessing.Process(target=serve, args=(port, args, peak), daemon=True)
+    server.start()
+    wait_for_port(port)
+
+    try:
+        wait_until_ready(port)
+        results, elapsed = asyncio.run(drive(port, args.clients, args.turns))
+    finally:
+        server.terminate()
+        server.join(timeout=10)
+
+    ttfts = [r[0] for r in results]
+    totals = [r[1] for r in results]
+    ideal = args.ttft + args.answer_tokens / args.tokens_per_second
+    print(f"{args.clients} clients x {args.turns} turns = {len(results)} streams in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.1f} answers/s), peak concurrent RAGFlow streams {peak.value}")
+    print(f"{'':12}{'p50':>8}{'p95':>8}{'p99':>8}{'mean':>8}   (s)")
+    for name, values in (("TTFT", ttfts), ("end-to-end", totals)):
+        print(f"{name:12}{percentile(values, 50):>8.2f}{percentile(values, 95):>8.2f}"
+              f"{percentile(values, 99):>8.2f}{statistics.mean(values):>8.2f}")
+    print(f"Unloaded answer time {ideal:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Load test: N concurrent anonymous users on the full chat stack
+
+Each simulated user behaves like a visitor without a sid: it gets a fresh user
+id, creates a chat, asks a few questions with think time in between and rates
+some answers. Questions come from testing/test_cases.py, so users follow its
+multi-turn context scenarios. They can instead come from exported real
+questions: a JSONL file with a "question" per line, or a feedback export CSV
+with a "User Question" column.
+
+Two targets:
+    manager  UserSessionManager in this process, as the Streamlit app uses it
+             (default; RAGFlow is the mock server unless --ragflow-url is given)
+    http     a running headless chat API (--api-url)
+
+Reported: throughput, p50/p95/p99 time to first token and end-to-end latency,
+storage write latency (manager target) and resident memory over time. Use
+--output for the full results as JSON.
+
+Usage:
+    python benchmarks/load_users.py --users 50 --turns 3 --think-time 2
+    python benchmarks/load_users.py --users 50 --mock-profile slow --output load.json
+    python benchmarks/load_users.py --users 20 --ragflow-url http://ragflow:9380 --api-key KEY
+    python benchmarks/load_users.py --users 100 --api-url http://localhost:8000 --server-pid 1234
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from batch_answer import read_questions
+from testing.test_cases import UserFeedbackTestSuite
+
+# Answers starting with these are failures reported in-band
+ERROR_PREFIXES = ("Error: ", "**ERROR**")
+
+
+@dataclass
+class TurnResult:
+    """One question asked by one simulated user"""
+    user: int
+    turn: int
+    started: float  # Seconds since the run started
+    ttft: Optional[float]
+    latency: float
+    ok: bool
+    error: str = ""
+
+
+@dataclass
+class MemorySample:
+    """Resident memory at one point of the run"""
+    elapsed: float
+    rss_mb: float
+    active_users: int
+    answers: int
+
+
+# === Questions ===
+
+def builtin_conversations() -> List[List[str]]:
+    """Multi-turn scenarios and single questions from testing/test_cases.py"""
+    suite = UserFeedbackTestSuite()
+    conversations = [list(case.questions) for case in suite.context_test_cases]
+    conversations += [[case.question] for case in suite.test_cases]
+    return conversations
+
+
+def file_conversations(path: Path) -> List[List[str]]:
+    """Exported questions (JSONL or feedback export CSV), one per conversation"""
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return [[row["User Question"].strip()] for row in csv.DictReader(f)
+                    if (row.get("User Question") or "").strip()]
+    return [[item.question] for item in read_questions(path)]
+
+
+def user_script(conversations: List[List[str]], turns: int, rng: random.Random) -> List[str]:
+    """Questions for one user: a random scenario, topped up with random questions"""
+    script = list(rng.choice(conversations))
+    while len(script) < turns:
+        script += rng.choice(conversations)
+    return script[:turns]
+
+
+# === Targets ===
+
+class ManagerTarget:
+    """Drives a UserSessionManager in this process and times its storage writes"""
+
+    def __init__(self, session_manager):
+        self.manager = session_manager
+        self.write_seconds: List[float] = []
+        write = session_manager._write_user_sessions
+
+        def timed_write(user_session):
+            started = time.perf_counter()
+            try:
+                write(user_session)
+            finally:
+                self.write_seconds.append(time.perf_counter() - started)
+
+        session_manager._write_user_sessions = timed_write
+
+    def create_chat(self, user_id: str) -> str:
+        # Same calls as a first visit to the app
+        self.manager.list_user_chats(user_id)
+        title = f"Help Session {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        return self.manager.create_user_chat(user_id, title).chat_id
+
+    def ask(self, user_id: str, chat_id: str, question: str) -> Iterator[Tuple[str, str]]:
+        """Yield (message_id, cumulative content) as the answer streams"""
+        for chunk in self.manager.send_message_to_chat(user_id, chat_id, question):
+            yield chunk.message_id, chunk.content or ""
+
+    def rate(self, user_id: str, chat_id: str, message_id: str, stars: int):
+        self.manager.add_message_feedback(user_id, chat_id, message_id, {
+            "star_rating": stars, "feedback_timestamp": datetime.now().isoformat()})
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """Drives the headless chat API over HTTP"""
+
+    def __init__(self, api_url: str, users: int):
+        import httpx
+
+        self.write_seconds: List[float] = []  # Server-side; see its save_sessions metric
+        limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users)
+        self.client = httpx.Client(base_url=api_url.rstrip("/"), limits=limits, timeout=httpx.Timeout(300.0))
+
+    def create_chat(self, user_id: str) -> str:
+        self.client.get(f"/users/{user_id}/chats").raise_for_status()
+        response = self.client.post(f"/users/{user_id}/chats", json={})
+        response.raise_for_status()
+        return response.json()["chat_id"]
+
+    def ask(self, user_id: str, chat_id: str, question: str) -> Iterator[Tuple[str, str]]:
+        message_id, content, event = "", "", None
+        with self.client.stream("POST", f"/users/{user_id}/chats/{chat_id}/messages",
+                                json={"message": question}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "start":
+                        message_id = data["message_id"]
+                    elif event == "delta":
+                        content += data["text"]
+                    elif event == "replace":
+                        content = data["text"]
+                    elif event == "error":
+                        content = f"Error: {data['detail']}"
+                    yield message_id, content
+
+    def rate(self, user_id: str, chat_id: str, message_id: str, stars: int):
+        self.client.post(f"/users/{user_id}/chats/{chat_id}/messages/{message_id}/feedback",
+                         json={"star_rating": stars}).raise_for_status()
+
+    def close(self):
+        self.client.close()
+
+
+# === Mock RAGFlow ===
+
+def serve_mock(port: int, profile_name: str):
+    """Mock RAGFlow process, kept out of this process's GIL and memory"""
+    from testing.mock_ragflow_server import MockRAGFlowServer, PROFILES
+
+    server = MockRAGFlowServer(PROFILES[profile_name], port=port)
+    server.httpd.serve_forever()
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Mock RAGFlow did not start on port {port}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# === Measurement ===
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of a process (0 if /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class LoadRun:
+    """Simulated users sharing one target"""
+
+    def __init__(self, target, conversations: List[List[str]], args):
+        self.target = target
+        self.conversations = conversations
+        self.args = args
+        self.results: List[TurnResult] = []
+        self.samples: List[MemorySample] = []
+        self.active_users = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self.started = 0.0
+
+    def simulate_user(self, index: int):
+        args = self.args
+        rng = random.Random(args.seed * 100003 + index)
+        time.sleep(args.ramp_up * index / max(args.users, 1))
+        with self._lock:
+            self.active_users += 1
+        try:
+            user_id = str(uuid.uuid4())
+            try:
+                chat_id = self.target.create_chat(user_id)
+            except Exception as e:
+                self.results.append(TurnResult(index, 0, time.perf_counter() - self.started,
+                                               None, 0.0, False, f"create chat: {e}"))
+                return
+
+            for turn, question in enumerate(user_script(self.conversations, args.turns, rng)):
+                if turn and args.think_time > 0:
+                    time.sleep(rng.expovariate(1.0 / args.think_time))
+                result, message_id = self.ask(index, turn, user_id, chat_id, question)
+                self.results.append(result)
+                if result.ok and message_id and rng.random() < args.rate_fraction:
+                    try:
+                        self.target.rate(user_id, chat_id, message_id, rng.randint(1, 5))
+                    except Exception as e:
+                        print(f"⚠️  Rating failed for user {index}: {e}", file=sys.__stdout__)
+        finally:
+            with self._lock:
+                self.active_users -= 1
+
+    def ask(self, index: int, turn: int, user_id: str, chat_id: str, question: str):
+        started = time.perf_counter()
+        ttft = None
+        message_id, content = "", ""
+        try:
+            for message_id, content in self.target.ask(user_id, chat_id, question):
+                if ttft is None and content:
+                    ttft = time.perf_counter() - started
+        except Exception as e:
+            return TurnResult(index, turn, started - self.started, ttft,
+                              time.perf_counter() - started, False, str(e)), message_id
+        latency = time.perf_counter() - started
+        failed = content.startswith(ERROR_PREFIXES) or not content
+        return TurnResult(index, turn, started - self.started, ttft, latency, not failed,
+                          content[:200] if failed else ""), message_id
+
+    def sample_memory(self):
+        while True:
+            self.samples.append(MemorySample(
+                elapsed=round(time.perf_counter() - self.started, 2),
+                rss_mb=round(rss_bytes(self.args.server_pid) / 1024 / 1024, 1),
+                active_users=self.active_users,
+                answers=len(self.results),
+            ))
+            if self._finished.wait(self.args.sample_interval):
+                return
+
+    def run(self) -> float:
+        self.started = time.perf_counter()
+        sampler = threading.Thread(target=self.sample_memory, name="rss-sampler", daemon=True)
+        sampler.start()
+        users = [threading.Thread(target=self.simulate_user, args=(i,), name=f"user-{i}")
+                 for i in range(self.args.users)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - self.started
+        self._finished.set()
+        sampler.join()
+        return elapsed
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": statistics.mean(values) if values else 0.0,
+        "max": max(values) if values else 0.0,
+    }
+
+
+def report(run: LoadRun, elapsed: float, write_seconds: List[float]) -> dict:
+    ok = [r for r in run.results if r.ok]
+    failed = [r for r in run.results if not r.ok]
+    summary = {
+        "users": run.args.users,
+        "turns_per_user": run.args.turns,
+        "target": run.args.target_name,
+        "elapsed_seconds": elapsed,
+        "answers": len(ok),
+        "failures": len(failed),
+        "answers_per_second": len(ok) / elapsed if elapsed else 0.0,
+        "ttft_seconds": summarize([r.ttft for r in ok if r.ttft is not None]),
+        "latency_seconds": summarize([r.latency for r in ok]),
+        "storage_write_seconds": summarize(write_seconds),
+        "peak_rss_mb": max((s.rss_mb for s in run.samples), default=0.0),
+    }
+
+    print(f"{summary['users']} users x {summary['turns_per_user']} turns via {summary['target']}: "
+          f"{summary['answers']} answers, {summary['failures']} failures in {elapsed:.1f}s "
+          f"({summary['answers_per_second']:.2f} answers/s)")
+    print(f"{'':16}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}{'max':>9}   (ms)")
+    rows = [("TTFT", summary["ttft_seconds"]), ("end-to-end", summary["latency_seconds"])]
+    if write_seconds:
+        rows.append(("storage write", summary["storage_write_seconds"]))
+    for name, stats in rows:
+        print(f"{name:16}" + "".join(f"{stats[key] * 1000:>9.1f}" for key in ("p50", "p95", "p99", "mean", "max")))
+    if not write_seconds:
+        print("storage write    n/a (measured server-side: save_sessions stage in /metrics)")
+
+    # About ten evenly spaced samples, plus the peak
+    step = max(1, len(run.samples) // 10)
+    shown = run.samples[::step]
+    peak = max(run.samples, key=lambda s: s.rss_mb, default=None)
+    if peak is not None and peak not in shown:
+        shown = sorted(shown + [peak], key=lambda s: s.elapsed)
+    print(f"\n{'t (s)':>8}{'RSS MB':>10}{'users':>8}{'answers':>9}")
+    for sample in shown:
+        print(f"{sample.elapsed:>8.1f}{sample.rss_mb:>10.1f}{sample.active_users:>8}{sample.answers:>9}")
+
+    for result in failed[:5]:
+        print(f"❌ user {result.user} turn {result.turn}: {result.error}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent anonymous users on the chat stack")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per user")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between a user's questions")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which users arrive")
+    parser.add_argument("--rate-fraction", type=float, default=0.5, help="Fraction of answers rated")
+    parser.add_argument("--questions", type=Path, help="Exported questions (.jsonl or feedback export .csv)")
+    parser.add_argument("--api-url", help="Drive a running chat API instead of an in-process UserSessionManager")
+    parser.add_argument("--ragflow-url", help="RAGFlow server for the manager target (default: mock server)")
+    parser.add_argument("--api-key", default=os.getenv("RAGFLOW_API_KEY", "mock-key"), help="RAGFlow API key")
+    parser.add_argument("--mock-profile", default="typical", help="Mock RAGFlow latency profile")
+    parser.add_argument("--data-dir", help="User data directory for the manager target (default: temporary)")
+    parser.add_argument("--server-pid", type=int, help="Sample this process's RSS instead of our own")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for question choice, think time and ratings")
+    parser.add_argument("--output", type=Path, help="Write summary, per-turn results and RSS samples as JSON")
+    args = parser.parse_args()
+
+    conversations = file_conversations(args.questions) if args.questions else builtin_conversations()
+    if not conversations:
+        print(f"❌ No questions found in {args.questions}")
+        sys.exit(1)
+
+    mock = None
+    devnull = open(os.devnull, "w")  # Per-chat log lines stay out of the report
+    if args.api_url:
+        args.target_name = f"http {args.api_url}"
+        target = HttpTarget(args.api_url, args.users)
+    else:
+        from user_session_manager import UserSessionManager
+
+        ragflow_url = args.ragflow_url
+        if not ragflow_url:
+            port = free_port()
+            mock = multiprocessing.Process(target=serve_mock, args=(port, args.mock_profile), daemon=True)
+            mock.start()
+            wait_for_port(port)
+            ragflow_url = f"http://127.0.0.1:{port}"
+        args.target_name = f"manager ({'mock ' + args.mock_profile if mock else ragflow_url})"
+        data_dir = args.data_dir or tempfile.mkdtemp(prefix="load_users_")
+        with contextlib.redirect_stdout(devnull):
+            target = ManagerTarget(UserSessionManager(args.api_key, base_url=ragflow_url, data_dir=data_dir))
+        if target.manager.assistant_id is None:
+            print(f"❌ Could not resolve the RAGFlow assistant on {ragflow_url}")
+            sys.exit(1)
+
+    run = LoadRun(target, conversations, args)
+    try:
+        with contextlib.redirect_stdout(devnull):
+            elapsed = run.run()
+    finally:
+        target.close()
+        if mock is not None:
+            mock.terminate()
+            mock.join(timeout=10)
+
+    summary = report(run, elapsed, target.write_seconds)
+    if args.output:
+        args.output.write_text(json.dumps({
+            "summary": summary,
+            "results": [asdict(r) for r in run.results],
+            "rss_samples": [asdict(s) for s in run.samples],
+        }, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
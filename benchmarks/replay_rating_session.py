@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Scripted session replay: server work per star-rating click
+
+Replays a chat of N stored turns followed by a series of rating clicks and
+reports, per click, the cost of a full script run (what every click cost before
+ratings were fragments) against a rating-fragment rerun. Work is counted as
+session manager calls and wall time, using Streamlit's AppTest harness and an
+in-memory session manager so no RAGFlow server is needed.
+
+Usage:
+    python benchmarks/replay_rating_session.py --turns 20 --clicks 10
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from streamlit.testing.v1 import AppTest
+
+from user_session_manager import ChatHistoryView, StoredMessage, UserChat
+
+
+class CountingSessionManager:
+    """In-memory stand-in for UserSessionManager that counts every call"""
+
+    def __init__(self, turns: int):
+        self.calls = Counter()
+        self.chat = UserChat(
+            chat_id="replay-chat",
+            title="Replay",
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+            message_count=0,
+            ragflow_session_id="replay-session",
+            messages=[],
+        )
+        reference = {
+            "document_name": "wwPDB-A-2025Mar-V5.5.pdf",
+            "similarity": 0.82,
+            "content": "Deposition of PDBx/mmCIF files with validation reports. " * 20,
+        }
+        for i in range(turns):
+            self.chat.messages.append(StoredMessage("user", f"Question {i}", datetime.now(), str(uuid.uuid4())))
+            self.chat.messages.append(StoredMessage(
+                "assistant", f"**Answer {i}**\n\n" + "Details about deposition. " * 40,
+                datetime.now(), str(uuid.uuid4()), references=[reference] * 3
+            ))
+        self.chat.message_count = len(self.chat.messages)
+
+    def reset(self):
+        self.calls.clear()
+
+    def list_user_chats(self, user_id):
+        self.calls["list_user_chats"] += 1
+        return [self.chat]
+
+    def get_user_chat(self, user_id, chat_id):
+        self.calls["get_user_chat"] += 1
+        return self.chat
+
+    def get_chat_messages(self, user_id, chat_id):
+        self.calls["get_chat_messages"] += 1
+        return self.chat.messages
+
+    def get_chat_history(self, user_id, chat_id):
+        self.calls["get_chat_history"] += 1
+        return ChatHistoryView(self.chat.messages)
+
+    def get_message_feedback(self, user_id, chat_id, message_id):
+        self.calls["get_message_feedback"] += 1
+        for message in self.chat.messages:
+            if message.message_id == message_id:
+                return message.feedback
+        return None
+
+    def add_message_feedback(self, user_id, chat_id, message_id, feedback_data):
+        self.calls["add_message_feedback"] += 1
+        for message in self.chat.messages:
+            if message.message_id == message_id:
+                message.feedback = feedback_data
+                return True
+        return False
+
+
+def rating_fragment_script(message_id: str, src_dir: str):
+    """Exactly the work of one rating-fragment rerun (runs from AppTest's copy of its source)"""
+    import sys
+    from datetime import datetime
+    sys.path.insert(0, src_dir)
+    from rcsb_pdb_chatbot import display_star_rating
+    from user_session_manager import StoredMessage
+    display_star_rating(StoredMessage("assistant", "", datetime.now(), message_id))
+
+
+def replay(turns: int, clicks: int):
+    manager = CountingSessionManager(turns)
+    assistant_ids = [m.message_id for m in manager.chat.messages if m.role == "assistant"]
+
+    # Full app run (every click before fragments)
+    app = AppTest.from_file(str(SRC_DIR / "rcsb_pdb_chatbot.py"), default_timeout=30)
+    app.query_params["sid"] = "replay-user"
+    app.session_state["session_manager"] = manager
+    app.run()
+
+    manager.reset()
+    started = time.perf_counter()
+    for i in range(clicks):
+        app.session_state[f"stars_{assistant_ids[i % len(assistant_ids)]}"] = i % 5
+        app.run()
+    full_seconds = (time.perf_counter() - started) / clicks
+    full_calls = dict(manager.calls)
+
+    # Rating fragment rerun (every click after fragments)
+    manager.reset()
+    fragment_seconds = 0.0
+    for i in range(clicks):
+        message_id = assistant_ids[i % len(assistant_ids)]
+        fragment = AppTest.from_function(rating_fragment_script, args=(message_id, str(SRC_DIR)), default_timeout=30)
+        fragment.session_state["session_manager"] = manager
+        fragment.session_state["browser_session_id"] = "replay-user"
+        fragment.session_state["current_chat_id"] = manager.chat.chat_id
+        fragment.session_state[f"stars_{message_id}"] = (i + 1) % 5
+        started = time.perf_counter()
+        fragment.run()
+        fragment_seconds += time.perf_counter() - started
+    fragment_seconds /= clicks
+    fragment_calls = dict(manager.calls)
+
+    print(f"Replayed {turns} turns, {clicks} rating clicks")
+    print(f"{'':24}{'full rerun':>14}{'fragment':>14}")
+    print(f"{'seconds per click':24}{full_seconds:>14.4f}{fragment_seconds:>14.4f}")
+    for name in sorted(set(full_calls) | set(fragment_calls)):
+        print(f"{name + ' / click':24}{full_calls.get(name, 0) / clicks:>14.1f}{fragment_calls.get(name, 0) / clicks:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay rating clicks and compare full vs fragment reruns")
+    parser.add_argument("--turns", type=int, default=20, help="Stored Q&A turns in the replayed chat")
+    parser.add_argument("--clicks", type=int, default=10, help="Rating clicks to replay")
+    args = parser.parse_args()
+    replay(args.turns, args.clicks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Batch Answer
+Answers a JSONL file of questions concurrently through the same RAGFlow client as
+the app (one server, or a pool over RAGFLOW_BASE_URLS, with the persisted id
+cache) and streams the results to a JSONL file, one line per question as it
+completes. Progress and failures are reported as event_log events.
+
+The output file doubles as the checkpoint: re-running with the same output skips
+questions that already have an answer, so an interrupted run resumes where it
+stopped. Failed questions are written with an "error" field and retried on the
+next run; when a question appears more than once, its last line wins.
+
+Input lines need a "question" field; "id" is optional (derived from the question
+otherwise) and any other fields are copied to the output.
+
+Usage:
+    python batch_answer.py faq_questions.jsonl -o faq_answers.jsonl --concurrency 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Union
+
+try:
+    from .ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from .ragflow_backend_pool import RAGFlowBackendPool, create_backend_manager
+    from .ragflow_id_cache import create_id_cache
+    from .circuit_breaker import retry_with_jitter
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    from ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from ragflow_backend_pool import RAGFlowBackendPool, create_backend_manager
+    from ragflow_id_cache import create_id_cache
+    from circuit_breaker import retry_with_jitter
+    import event_log
+
+log = event_log.get_logger("batch_answer")
+
+# send_message reports failures as an answer with this prefix
+ERROR_PREFIX = "Error: "
+
+
+class BatchItemError(Exception):
+    """RAGFlow could not answer a question"""
+
+
+@dataclass
+class BatchItem:
+    """One question from the input file"""
+    item_id: str
+    question: str
+    extra: Dict[str, Any]
+
+
+@dataclass
+class BatchSummary:
+    """Outcome counts of a batch run"""
+    answered: int = 0
+    failed: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+
+def item_id_for(question: str) -> str:
+    """Stable id for a question without one"""
+    return hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def read_questions(path: Path) -> Iterator[BatchItem]:
+    """Yield questions from a JSONL file, skipping blank and invalid lines"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                log.warning("batch_line_skipped", path=str(path), line=line_number, reason=f"invalid JSON ({e})")
+                continue
+            question = (record.pop("question", "") or "").strip()
+            if not question:
+                log.warning("batch_line_skipped", path=str(path), line=line_number, reason="no question")
+                continue
+            item_id = str(record.pop("id", "") or item_id_for(question))
+            yield BatchItem(item_id=item_id, question=question, extra=record)
+
+
+def read_checkpoint(path: Path) -> Set[str]:
+    """Ids already answered in an existing output file (last line per id wins)"""
+    if not path.exists():
+        return set()
+    status: Dict[str, bool] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial last line from an interrupted run
+            if "id" in record:
+                status[record["id"]] = "error" not in record
+    return {item_id for item_id, answered in status.items() if answered}
+
+
+class BatchAnswerer:
+    """Answers questions with a bounded pool of worker threads"""
+
+    def __init__(self, manager: Union[RAGFlowAssistantManager, RAGFlowBackendPool], assistant_id: str,
+                 concurrency: int = 4, retries: int = 2, keep_sessions: bool = False):
+        """
+        Args:
+            manager: RAGFlow client (a single-server manager or a backend pool)
+            assistant_id: Assistant answering the questions
+            concurrency: Questions in flight at once
+            retries: Extra attempts per question after a failure
+            keep_sessions: Keep the per-question RAGFlow sessions instead of deleting them
+        """
+        self.manager = manager
+        self.assistant_id = assistant_id
+        self.concurrency = concurrency
+        self.retries = retries
+        self.keep_sessions = keep_sessions
+
+    def _ask_once(self, item: BatchItem) -> Dict[str, Any]:
+        """One attempt: a fresh session so answers don't depend on earlier questions"""
+        session_id = self.manager.create_session(self.assistant_id, f"batch_{item.item_id}_{int(time.time())}")
+        try:
+            started = time.perf_counter()
+            ttft = None
+            content = ""
+            references = None
+            for response in self.manager.send_message(session_id, item.question, stream=True):
+                if ttft is None and response.content and not response.is_complete:
+                    ttft = time.perf_counter() - started
+                content = response.content
+                references = response.references or references
+            latency = time.perf_counter() - started
+
+            if content.startswith(ERROR_PREFIX):
+                raise BatchItemError(content[len(ERROR_PREFIX):])
+            return {
+                "answer": content,
+                "references": references or [],
+                "ttft_seconds": round(ttft if ttft is not None else latency, 3),
+                "latency_seconds": round(latency, 3),
+            }
+        finally:
+            if not self.keep_sessions:
+                try:
+                    self.manager.delete_sessions(self.assistant_id, [session_id])
+                except Exception as e:
+                    log.warning("batch_session_delete_failed", item_id=item.item_id, ragflow_session_id=session_id,
+                                error=str(e))
+
+    def answer(self, item: BatchItem) -> Dict[str, Any]:
+        """Answer one question with retries; failures are returned, not raised"""
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            return self._ask_once(item)
+
+        record = {"id": item.item_id, "question": item.question, **item.extra}
+        try:
+            record.update(retry_with_jitter(attempt, attempts=self.retries + 1,
+                                            base_delay=1.0, max_delay=10.0))
+        except Exception as e:
+            record["error"] = str(e)
+        record["attempts"] = attempts
+        record["completed_at"] = datetime.now().isoformat()
+        return record
+
+    def run(self, items: Iterator[BatchItem], output: Path, done_ids: Set[str] = frozenset()) -> BatchSummary:
+        """
+        Answer all items not in done_ids, appending each result to output as it completes
+
+        At most `concurrency` questions are in flight, so memory stays flat for any
+        input size.
+        """
+        summary = BatchSummary()
+        started = time.perf_counter()
+        latencies: List[float] = []
+
+        with open(output, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+
+            def write(record: Dict[str, Any]):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in record:
+                    summary.failed += 1
+                    log.warning("batch_question_failed", item_id=record["id"], attempts=record["attempts"],
+                                error=record["error"])
+                else:
+                    summary.answered += 1
+                    latencies.append(record["latency_seconds"])
+                done = summary.answered + summary.failed
+                if done % 25 == 0:
+                    log.info("batch_progress", done=done, failed=summary.failed,
+                             questions_per_second=round(done / (time.perf_counter() - started), 2))
+
+            in_flight = set()
+            for item in items:
+                if item.item_id in done_ids:
+                    summary.skipped += 1
+                    continue
+                if len(in_flight) >= self.concurrency:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(future.result())
+                in_flight.add(pool.submit(self.answer, item))
+
+            for future in wait(in_flight).done:
+                write(future.result())
+
+        summary.seconds = time.perf_counter() - started
+        ordered = sorted(latencies)
+        log.info("batch_completed", output=str(output), answered=summary.answered, failed=summary.failed,
+                 skipped=summary.skipped, duration_ms=round(summary.seconds * 1000, 2),
+                 p50_seconds=round(statistics.median(ordered), 3) if ordered else None,
+                 p95_seconds=ordered[int(0.95 * (len(ordered) - 1))] if ordered else None)
+        return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions concurrently")
+    parser.add_argument("input", type=Path, help="JSONL file with a 'question' per line")
+    parser.add_argument("-o", "--output", type=Path, required=True,
+                        help="JSONL output (also the checkpoint for resuming)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered in parallel")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per failed question")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing output and answer everything again")
+    parser.add_argument("--keep-sessions", action="store_true", help="Don't delete per-question RAGFlow sessions")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.getenv("USER_DATA_DIR", "user_data")),
+                        help="Directory with the app's RAGFlow id cache")
+    args = parser.parse_args(argv)
+
+    if not args.input.exists():
+        print(f"❌ Input file not found: {args.input}")
+        return 1
+    api_key = os.getenv("RAGFLOW_API_KEY")
+    if not api_key:
+        print("❌ RAGFLOW_API_KEY environment variable is required")
+        return 1
+    if args.restart and args.output.exists():
+        args.output.unlink()
+
+    done_ids = read_checkpoint(args.output)
+
+    # RAGFLOW_BASE_URLS (comma-separated) spreads the questions over several servers
+    base_url = os.getenv("RAGFLOW_BASE_URLS") or os.getenv("RAGFLOW_BASE_URL", "http://127.0.0.1:9380")
+    manager = create_backend_manager(api_key, base_url, id_cache=create_id_cache(args.data_dir))
+    assistant_id = manager.get_or_create_assistant(create_default_assistant_config())
+    log.info("batch_started", input=str(args.input), output=str(args.output), concurrency=args.concurrency,
+             already_answered=len(done_ids), assistant_id=assistant_id)
+
+    answerer = BatchAnswerer(manager, assistant_id, concurrency=args.concurrency,
+                             retries=args.retries, keep_sessions=args.keep_sessions)
+    summary = answerer.run(read_questions(args.input), args.output, done_ids)
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
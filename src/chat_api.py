@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Headless Chat API
+ASGI service exposing the chatbot over HTTP, backed by the same UserSessionManager
+as the Streamlit app. Answers stream as server-sent events so rcsb.org pages can
+embed the bot without the Streamlit rerun model.
+
+Run with:
+    python chat_api.py            # uvicorn on CHAT_API_HOST:CHAT_API_PORT
+    uvicorn chat_api:app --port 8000
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+try:
+    from .user_session_manager import StoredMessage, UserChat, UserSessionManager, create_manager
+    from .generation_worker import GenerationJob, GenerationQueueFull, get_generation_worker
+    from . import event_log
+    from . import metrics
+    from . import tracing
+except ImportError:
+    # For direct execution when not imported as a package
+    from user_session_manager import StoredMessage, UserChat, UserSessionManager, create_manager
+    from generation_worker import GenerationJob, GenerationQueueFull, get_generation_worker
+    import event_log
+    import metrics
+    import tracing
+
+log = event_log.get_logger("chat_api")
+
+# Seconds a client is asked to wait when every generation worker is busy and the queue is full
+QUEUE_FULL_RETRY_AFTER_SECONDS = 5
+# Largest page of messages returned by the messages endpoint
+MAX_PAGE_SIZE = 200
+
+# Largest number of search matches returned
+MAX_SEARCH_RESULTS = 100
+# Bearer token for GET /search across every user's conversations (unset: endpoint disabled)
+CHAT_API_ADMIN_TOKEN = os.getenv("CHAT_API_ADMIN_TOKEN", "")
+
+# User ids become file names under USER_DATA_DIR
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class CreateChatRequest(BaseModel):
+    title: Optional[str] = None
+
+
+class SendMessageRequest(BaseModel):
+    message: str = Field(..., min_length=1, max_length=8000)
+
+
+class FeedbackRequest(BaseModel):
+    star_rating: Optional[int] = Field(None, ge=1, le=5)
+    comment: Optional[str] = Field(None, max_length=4000)
+    categories: Optional[List[str]] = None
+
+
+def chat_summary(chat: UserChat) -> Dict[str, Any]:
+    """Chat metadata without its messages"""
+    return {
+        "chat_id": chat.chat_id,
+        "title": chat.title,
+        "created_at": chat.created_at.isoformat(),
+        "updated_at": chat.updated_at.isoformat(),
+        "message_count": chat.message_count,
+    }
+
+
+def message_payload(message: StoredMessage) -> Dict[str, Any]:
+    """JSON form of a stored message"""
+    payload = asdict(message)
+    payload["timestamp"] = message.timestamp.isoformat()
+    return payload
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AnswerPump:
+    """
+    Follows one answer generated on the shared GenerationWorker from the event loop
+
+    RAGFlow yields the cumulative answer, so only the latest state matters. The
+    generating thread wakes the event loop at most once until the consumer catches
+    up, so a busy server sends fewer, larger deltas, and no thread waits per stream.
+    """
+
+    def __init__(self, job: GenerationJob):
+        self.job = job
+        self._ready = asyncio.Event()
+        self._notified = False
+        self._loop = asyncio.get_running_loop()
+
+    def _wake(self):
+        if not self._notified:
+            self._notified = True
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def updates(self):
+        """Yield finished each time the job has news; read the answer from job.answer"""
+        self.job.add_listener(self._wake)
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                self._notified = False
+                finished = self.job.done
+                yield finished
+                if finished:
+                    return
+        finally:
+            self.job.remove_listener(self._wake)
+
+
+async def stream_answer(job: GenerationJob):
+    """
+    Server-sent events for one chat turn generated by the GenerationWorker
+
+    RAGFlow yields the cumulative answer, so each update is sent as the newly
+    added text ("delta"), or in full ("replace") if earlier text changed. Events:
+    start (message_id), delta/replace (text), done (references) and error (detail).
+
+    If the client disconnects, generation is cancelled and the worker stores the
+    partial answer as truncated.
+    """
+    answer = job.answer
+    sent = ""
+    yield sse_event("start", {"message_id": job.message_id})
+
+    try:
+        async for finished in AnswerPump(job).updates():
+            content = answer.content or ""
+            if content.startswith(sent):
+                if len(content) > len(sent):
+                    yield sse_event("delta", {"text": content[len(sent):]})
+            else:
+                yield sse_event("replace", {"text": content})
+            sent = content
+
+        if job.error is not None:
+            log.error("chat_api_stream_failed", user_id=job.user_id, chat_id=job.chat_id,
+                      message_id=job.message_id, error=str(job.error))
+            yield sse_event("error", {"detail": str(job.error)})
+        else:
+            yield sse_event("done", {"message_id": job.message_id, "references": answer.references or []})
+    finally:
+        # Runs on disconnect too; a finished job ignores it
+        job.cancel()
+
+
+def create_app(session_manager: Optional[UserSessionManager] = None) -> FastAPI:
+    """
+    Build the API application
+
+    Args:
+        session_manager: Manager to serve (created from the environment on startup if None)
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        metrics.start_metrics_server()
+        if app.state.session_manager is None:
+            app.state.session_manager = create_manager()
+        # First probe runs here; new chats and questions get 503 until the assistant is warm
+        app.state.session_manager.health_monitor.start()
+        yield
+        app.state.session_manager.health_monitor.stop()
+
+    app = FastAPI(title="RCSB PDB ChatBot API", lifespan=lifespan)
+    app.state.session_manager = session_manager
+
+    origins = [o.strip() for o in os.getenv("CHAT_API_CORS_ORIGINS", "").split(",") if o.strip()]
+    if origins:
+        app.add_middleware(CORSMiddleware, allow_origins=origins,
+                           allow_methods=["GET", "POST"], allow_headers=["*"])
+
+    def get_manager(request: Request) -> UserSessionManager:
+        return request.app.state.session_manager
+
+    def valid_user_id(user_id: str) -> str:
+        if not USER_ID_PATTERN.match(user_id):
+            raise HTTPException(status_code=400, detail="Invalid user id")
+        return user_id
+
+    def require_chat(manager: UserSessionManager, user_id: str, chat_id: str) -> UserChat:
+        chat = manager.get_user_chat(user_id, chat_id)
+        if chat is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        return chat
+
+    def require_warm(manager: UserSessionManager):
+        if not manager.health_monitor.warm:
+            raise HTTPException(status_code=503, detail="Assistant is starting up",
+                                headers={"Retry-After": str(max(1, int(manager.health_monitor.interval)))})
+
+    def require_admin(request: Request):
+        if not CHAT_API_ADMIN_TOKEN:
+            raise HTTPException(status_code=403, detail="Search across users is disabled")
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied.encode(), CHAT_API_ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Invalid admin token",
+                                headers={"WWW-Authenticate": "Bearer"})
+
+    def search_response(manager: UserSessionManager, q: str, limit: int, user_id: Optional[str] = None,
+                        role: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            hits = manager.search_conversations(q, limit=limit, user_id=user_id, role=role)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return {
+            "query": q,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+            # Only the newest SEARCH_MAX_CANDIDATES matches were ranked: the results may be partial
+            "truncated": hits.truncated,
+            "results": [asdict(hit) for hit in hits],
+        }
+
+    def probe_response(result) -> JSONResponse:
+        ok, details = result
+        return JSONResponse(details, status_code=200 if ok else 503)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/health/live")
+    def health_live(manager: UserSessionManager = Depends(get_manager)):
+        return probe_response(manager.health_monitor.liveness())
+
+    @app.get("/health/ready")
+    def health_ready(manager: UserSessionManager = Depends(get_manager)):
+        # Cached by the background monitor: no RAGFlow call per probe
+        return probe_response(manager.health_monitor.readiness())
+
+    @app.post("/users/{user_id}/chats", status_code=201)
+    def create_chat(body: CreateChatRequest, user_id: str = Depends(valid_user_id),
+                    manager: UserSessionManager = Depends(get_manager)):
+        require_warm(manager)
+        title = body.title or f"Help Session {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        try:
+            chat = manager.create_user_chat(user_id, title)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Could not create chat: {e}")
+        return chat_summary(chat)
+
+    @app.get("/users/{user_id}/chats")
+    def list_chats(user_id: str = Depends(valid_user_id),
+                   manager: UserSessionManager = Depends(get_manager)):
+        return {"chats": [chat_summary(chat) for chat in manager.list_user_chats(user_id)]}
+
+    @app.get("/users/{user_id}/chats/{chat_id}/messages")
+    def get_messages(chat_id: str, offset: int = Query(0, ge=0),
+                     limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                     user_id: str = Depends(valid_user_id),
+                     manager: UserSessionManager = Depends(get_manager)):
+        require_chat(manager, user_id, chat_id)
+        history = manager.get_chat_history(user_id, chat_id)
+        return {
+            "total": len(history),
+            "offset": offset,
+            "limit": limit,
+            "messages": [message_payload(m) for m in history[offset:offset + limit]],
+        }
+
+    @app.post("/users/{user_id}/chats/{chat_id}/messages")
+    def send_message(chat_id: str, body: SendMessageRequest, request: Request,
+                     user_id: str = Depends(valid_user_id),
+                     manager: UserSessionManager = Depends(get_manager)):
+        require_chat(manager, user_id, chat_id)
+        require_warm(manager)
+        # A W3C traceparent from the caller (e.g. rcsb.org's proxy) continues its trace here
+        trace_parent = tracing.extract(request.headers.get("traceparent"))
+        with tracing.span("api.send_message", parent=trace_parent, user_id=user_id, chat_id=chat_id):
+            try:
+                # Answers share the app's generation pool, so a burst of questions queues there
+                job = get_generation_worker(manager).submit(user_id, chat_id, body.message)
+            except GenerationQueueFull as e:
+                raise HTTPException(status_code=503, detail=f"Too many questions in progress: {e}",
+                                    headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_SECONDS)})
+        return StreamingResponse(
+            stream_answer(job),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.get("/users/{user_id}/search")
+    def search_user(q: str = Query(..., min_length=1, max_length=500),
+                    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+                    user_id: str = Depends(valid_user_id),
+                    manager: UserSessionManager = Depends(get_manager)):
+        return search_response(manager, q, limit, user_id=user_id)
+
+    @app.get("/search", dependencies=[Depends(require_admin)])
+    def search_all(q: str = Query(..., min_length=1, max_length=500),
+                   limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+                   role: Optional[str] = Query(None, pattern="^(user|assistant)$"),
+                   manager: UserSessionManager = Depends(get_manager)):
+        return search_response(manager, q, limit, role=role)
+
+    @app.post("/users/{user_id}/chats/{chat_id}/messages/{message_id}/feedback")
+    def add_feedback(chat_id: str, message_id: str, body: FeedbackRequest,
+                     user_id: str = Depends(valid_user_id),
+                     manager: UserSessionManager = Depends(get_manager)):
+        require_chat(manager, user_id, chat_id)
+        feedback_data = body.model_dump(exclude_none=True)
+        if not feedback_data:
+            raise HTTPException(status_code=422, detail="Feedback is empty")
+        if not manager.add_message_feedback(user_id, chat_id, message_id, feedback_data):
+            raise HTTPException(status_code=404, detail="Message not found")
+        return {"message_id": message_id, "feedback": feedback_data}
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # One process: async streams scale within it and the session cache stays consistent
+    uvicorn.run(app, host=os.getenv("CHAT_API_HOST", "0.0.0.0"),
+                port=int(os.getenv("CHAT_API_PORT", "8000")))
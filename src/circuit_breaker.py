@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker for RAGFlow calls
+Fails fast while RAGFlow is degraded and retries idempotent calls with jittered backoff.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker with a sliding failure-rate window
+
+    States:
+        closed:    calls pass through; outcomes are recorded in the window
+        open:      calls are rejected immediately until reset_timeout elapses
+        half_open: a limited number of trial calls are let through; one success
+                   closes the circuit, one failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self,
+                 name: str = "ragflow",
+                 failure_rate_threshold: float = 0.5,
+                 window_seconds: float = 30.0,
+                 minimum_calls: int = 5,
+                 reset_timeout: float = 15.0,
+                 half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            name: Name used in error messages
+            failure_rate_threshold: Failure ratio (0.0-1.0) in the window that opens the circuit
+            window_seconds: Length of the sliding window of recorded outcomes
+            minimum_calls: Minimum outcomes in the window before the rate is evaluated
+            reset_timeout: Seconds to stay open before allowing trial calls
+            half_open_max_calls: Concurrent trial calls allowed while half-open
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_seconds = window_seconds
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        # (timestamp, succeeded) outcomes inside the window
+        self._outcomes = deque()
+
+    @property
+    def state(self) -> str:
+        """Current state, promoting open -> half_open once the reset timeout has passed"""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def _trim_window(self, now: float):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._half_open_in_flight = 0
+        self._outcomes.clear()
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will allow a trial call (0 if not open)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may proceed
+
+        Every allowed call must be followed by record_success() or record_failure().
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            now = self._clock()
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._half_open_in_flight = 0
+                self._outcomes.clear()
+                return
+            self._outcomes.append((now, True))
+            self._trim_window(now)
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if the failure rate is exceeded"""
+        with self._lock:
+            now = self._clock()
+            if self._state == self.HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == self.OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._trim_window(now)
+
+            total = len(self._outcomes)
+            if total < self.minimum_calls:
+                return
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            if failures / total >= self.failure_rate_threshold:
+                self._open(now)
+
+    def release(self):
+        """Release a call slot without recording an outcome (e.g. the caller abandoned it)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_in_flight > 0:
+                self._half_open_in_flight -= 1
+
+    def call(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run func through the breaker
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+def retry_with_jitter(func: Callable[[], T],
+                      attempts: int = 3,
+                      base_delay: float = 0.2,
+                      max_delay: float = 2.0,
+                      retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+                      give_up_on: Tuple[Type[BaseException], ...] = (CircuitOpenError,),
+                      sleep: Optional[Callable[[float], None]] = None) -> T:
+    """
+    Call func, retrying failures with "full jitter" exponential backoff
+
+    Only use for idempotent calls. CircuitOpenError is never retried so an open
+    circuit still fails fast.
+
+    Args:
+        func: Zero-argument callable
+        attempts: Total attempts including the first
+        base_delay: Backoff base in seconds
+        max_delay: Upper bound for a single backoff sleep
+        retry_on: Exception types that trigger a retry
+        give_up_on: Exception types re-raised immediately
+        sleep: Sleep function (defaults to time.sleep; injectable for tests)
+    """
+    sleep = sleep or time.sleep
+    last_error: Optional[BaseException] = None
+    for attempt in range(attempts):
+        try:
+            return func()
+        except give_up_on:
+            raise
+        except retry_on as e:
+            last_error = e
+            if attempt == attempts - 1:
+                break
+            sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+    raise last_error
+
+
+def create_circuit_breaker_from_env(name: str = "ragflow") -> CircuitBreaker:
+    """Create a circuit breaker configured from environment variables"""
+    return CircuitBreaker(
+        name=name,
+        failure_rate_threshold=float(os.getenv("RAGFLOW_CIRCUIT_FAILURE_RATE", "0.5")),
+        window_seconds=float(os.getenv("RAGFLOW_CIRCUIT_WINDOW_SECONDS", "30")),
+        minimum_calls=int(os.getenv("RAGFLOW_CIRCUIT_MIN_CALLS", "5")),
+        reset_timeout=float(os.getenv("RAGFLOW_CIRCUIT_RESET_SECONDS", "15")),
+    )
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Structured Event Logging for the RCSB PDB ChatBot
+One line per event (JSON by default) with a stable event name, the component
+that emitted it, and flat fields such as user_id, chat_id and duration_ms.
+
+Events are handed to a queue and written by a background thread, so the
+request path never blocks on stdout. INFO and DEBUG events can be sampled per
+event name; warnings and errors are always written. When an event is below
+LOG_LEVEL or not sampled, the helpers return after a level check and one
+random draw.
+
+Configuration (environment):
+    LOG_LEVEL         DEBUG, INFO, WARNING or ERROR (default INFO)
+    LOG_FORMAT        json or text (default json)
+    LOG_SAMPLE_RATES  per-event rates overriding the defaults, e.g.
+                      "sessions_saved=0.01,chat_turn_completed=1"
+    LOG_ASYNC         write from a background thread (default true)
+    LOG_QUEUE_SIZE    events buffered before new ones are dropped (default 10000)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, TextIO
+
+# Stable event names. Dashboards and alerts key on these, so rename with care.
+EVENTS: Dict[str, str] = {
+    # user_session_manager
+    "assistant_ready": "Assistant resolved (or created) at startup",
+    "assistant_init_failed": "No assistant could be resolved at startup",
+    "sessions_loaded": "A user's session file was read",
+    "sessions_load_failed": "A user's session file could not be parsed (set aside as .corrupt-*) or read",
+    "sessions_saved": "A user's session file was written",
+    "sessions_save_failed": "A user's session file could not be written",
+    "chat_created": "A chat and its RAGFlow session were created",
+    "chat_create_failed": "Creating a chat failed",
+    "chat_cleared": "A chat's messages were cleared",
+    "chat_clear_failed": "Clearing a chat's messages failed",
+    "chat_rolled_over": "A long chat moved to a fresh RAGFlow session",
+    "chat_turn_completed": "An answer finished streaming and was stored",
+    "chat_turn_failed": "A chat turn raised before its answer finished",
+    "generation_cancelled": "An answer was stopped or abandoned mid-stream",
+    "chat_deleted": "A chat was removed from local storage",
+    "chat_delete_failed": "Removing a chat failed",
+    "chat_not_found": "A chat id did not match any of the user's chats",
+    "message_not_found": "A message id did not match any message in the chat",
+    "user_data_deleted": "All of a user's local data was deleted",
+    "user_revived": "A user removed by garbage collection while cached was saved again; counted and indexed again",
+    "user_data_delete_failed": "Deleting a user's local data failed",
+    "feedback_saved": "A rating was stored on an answer",
+    "feedback_failed": "Reading or storing feedback failed",
+    # ragflow_assistant_manager
+    "dataset_found": "Existing dataset resolved by name",
+    "dataset_created": "Dataset created",
+    "dataset_lookup_failed": "Listing datasets by name failed",
+    "dataset_create_failed": "Creating the dataset failed",
+    "assistant_found": "Existing assistant resolved by name",
+    "assistant_created": "Assistant created",
+    "assistant_lookup_failed": "Listing assistants by name failed",
+    "assistant_create_failed": "Creating the assistant failed",
+    "assistant_config_updated": "Assistant settings pushed to RAGFlow",
+    "assistant_config_update_failed": "Pushing assistant settings failed",
+    "assistant_deleted": "Assistant deleted",
+    "assistant_delete_failed": "Deleting an assistant failed",
+    "assistant_list_failed": "Listing assistants failed",
+    "assistant_prompt_updated": "Assistant system prompt replaced",
+    "assistant_prompt_update_failed": "Replacing the system prompt failed",
+    "assistant_cached": "Assistant id taken from the id cache (no discovery calls)",
+    "dataset_cached": "Dataset id taken from the id cache (no discovery calls)",
+    "ragflow_id_invalidated": "A cached assistant or dataset id was reported missing and dropped",
+    "ragflow_id_cache_write_failed": "The RAGFlow id cache file could not be written",
+    "ragflow_session_created": "RAGFlow session created",
+    "ragflow_session_create_failed": "Creating a RAGFlow session failed",
+    "ragflow_circuit_open": "A request was refused because the circuit around RAGFlow is open",
+    "ragflow_stream_completed": "A RAGFlow answer stream finished",
+    "ragflow_request_failed": "A RAGFlow ask failed; an error answer was returned",
+    "ragflow_health_check_failed": "The RAGFlow health check failed",
+    # ragflow_backend_pool
+    "backend_assistant_failed": "A backend could not resolve the assistant; it gets no chats until a health probe resolves it",
+    "backend_probe_failed": "A backend's health probe raised; it is marked unhealthy until the next probe",
+    # chat_api
+    "chat_api_stream_failed": "An answer streamed over the chat API failed; an error event was sent",
+    # metrics, tracing and profiling
+    "metrics_unavailable": "METRICS_ENABLED is set but prometheus-client is missing; metrics are off",
+    "metrics_server_started": "The Prometheus /metrics endpoint is listening",
+    "metrics_server_failed": "The Prometheus /metrics endpoint could not be started",
+    "trace_file_failed": "The trace file could not be opened; tracing is off",
+    "profile_written": "A request profile was saved",
+    "profile_write_failed": "A request profile could not be saved",
+    "profile_skipped": "A sampled request was not profiled (another profiler is active)",
+    # health_monitor
+    "health_warm": "The assistant is resolved and RAGFlow passed a probe; traffic is admitted",
+    "health_warm_up_failed": "Resolving the assistant during warm-up failed; retried on the next probe",
+    "health_degraded": "A RAGFlow probe failed after passing (or on the first probe)",
+    "health_recovered": "A RAGFlow probe passed again after failures",
+    "health_server_started": "The /livez and /readyz endpoint is listening",
+    "health_server_failed": "The /livez and /readyz endpoint could not be started",
+    "traffic_rejected_warming_up": "A new chat or question was turned away before the assistant was warm",
+    # batch_answer
+    "batch_started": "A batch run resolved the assistant and started answering its input file",
+    "batch_line_skipped": "An input line had invalid JSON or no question and was skipped",
+    "batch_question_failed": "A question failed after all retries; it is retried on the next run",
+    "batch_session_delete_failed": "A per-question RAGFlow session could not be deleted (session_reaper removes it later)",
+    "batch_progress": "Every 25 questions: answered and failed so far, and throughput",
+    "batch_completed": "A batch run finished; counts and latency percentiles",
+    # session_reaper
+    "sessions_reaped": "A reaper run listed a server's sessions and deleted (or, dry run, counted) orphans",
+    "session_reap_batch_failed": "Deleting a batch of orphaned sessions failed; retried on the next run",
+    # user_gc
+    "user_gc_slice": "A garbage collection slice finished; counts and bytes of removed user files",
+    "user_gc_file_failed": "A user file could not be examined by garbage collection (kept)",
+    "user_gc_state_write_failed": "The garbage collection cursor could not be saved; the next slice starts over",
+    # usage_stats
+    "usage_rebuilt": "Usage counters were recomputed from the stored messages",
+    "usage_rebuild_file_failed": "A user file could not be read while rebuilding usage counters (skipped)",
+    "usage_totals_write_failed": "The global usage counters could not be written (retried at the next flush)",
+    "usage_counted_on_load": "A user file's uncounted messages were added to the global usage counters",
+    # search_index
+    "search_index_failed": "Indexing or un-indexing messages failed; the chat itself was saved",
+    "search_index_rebuilt": "The search index was rebuilt from the stored messages",
+    "search_index_file_failed": "A user file could not be read while rebuilding the search index (skipped)",
+    "search_index_unavailable": "The search index database could not be opened; search is off",
+    # rcsb_pdb_chatbot and generation_worker
+    "ui_script_run": "One Streamlit script run finished",
+    "ui_chat_resumed": "A returning browser session resumed its latest chat",
+    "ui_chat_started": "A chat was started from the UI",
+    "ui_history_load_failed": "The current chat's history could not be loaded",
+    "ui_answer_failed": "An answer failed while the UI was following it",
+    "generation_failed": "A background generation job raised",
+    "generation_queue_full": "A question was refused: every generation worker is busy and the queue is full",
+    "generation_abandoned": "An answer was cancelled: its browser session is gone and nobody reattached",
+}
+
+# INFO events fired several times per turn are sampled unless LOG_SAMPLE_RATES says otherwise
+DEFAULT_SAMPLE_RATES: Dict[str, float] = {
+    "sessions_loaded": 0.1,
+    "sessions_saved": 0.01,
+    "ragflow_stream_completed": 0.1,
+    "ui_script_run": 0.01,
+}
+
+LOGGER_NAME = "chatbot"
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'event=rate,event=rate' into a dict, ignoring malformed entries"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+_level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+if not isinstance(_level, int):
+    _level = logging.INFO
+_format = os.getenv("LOG_FORMAT", "json").lower()
+_async = os.getenv("LOG_ASYNC", "true").lower() == "true"
+_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+_sample_rates: Dict[str, float] = {**DEFAULT_SAMPLE_RATES,
+                                   **_parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))}
+
+_logger = logging.getLogger(LOGGER_NAME)
+_logger.setLevel(_level)  # Level checks must work before the handler is attached
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue: Optional[queue.Queue] = None
+_configured = False
+_dropped = 0
+_lock = threading.Lock()
+_NULL_TIMER = nullcontext()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, component, event, then the event's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "component": getattr(record, "component", record.name),
+            "event": getattr(record, "event", record.getMessage()),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable 'time LEVEL component event key=value ...' lines for local runs"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in getattr(record, "fields", {}).items())
+        line = (f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} "
+                f"{getattr(record, 'component', record.name)} {getattr(record, 'event', record.getMessage())}"
+                f"{' ' + fields if fields else ''}")
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time (so redirect_stdout and test capture apply)"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops (and counts) events instead of blocking when the queue is full"""
+
+    def enqueue(self, record: logging.LogRecord):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the writer thread; only the traceback must be captured here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure(stream: Optional[TextIO] = None):
+    """
+    Attach the event handler (called lazily on the first event)
+
+    Calling it again replaces the handler, e.g. to write to another stream.
+
+    Args:
+        stream: Where events are written (defaults to stdout)
+    """
+    global _listener, _queue, _configured
+    with _lock:
+        _shutdown()
+        _logger.handlers.clear()
+        _logger.setLevel(_level)
+        # Events are complete lines; keep them out of any root handlers set up by other tools
+        _logger.propagate = False
+
+        handler = logging.StreamHandler(stream) if stream is not None else _StdoutHandler()
+        handler.setFormatter(TextFormatter() if _format == "text" else JsonFormatter())
+        if _async:
+            _queue = queue.Queue(maxsize=_queue_size)
+            _listener = logging.handlers.QueueListener(_queue, handler)
+            _listener.start()
+            _logger.addHandler(_DroppingQueueHandler(_queue))
+        else:
+            _logger.addHandler(handler)
+        _configured = True
+
+
+def _shutdown():
+    global _listener, _queue
+    if _listener is not None:
+        _listener.stop()  # Writes whatever is still queued
+        _listener = None
+        _queue = None
+
+
+def flush():
+    """Block until every queued event has been written"""
+    if _queue is not None:
+        _queue.join()
+
+
+def dropped_events() -> int:
+    """Events dropped because the queue was full"""
+    return _dropped
+
+
+atexit.register(_shutdown)
+
+
+def _sampled(event: str) -> bool:
+    rate = _sample_rates.get(event, 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+class EventLogger:
+    """
+    Emits named events for one component
+
+    Usage:
+        log = event_log.get_logger("user_session_manager")
+        log.info("chat_created", user_id=user_id, chat_id=chat_id)
+        with log.timed("sessions_saved", user_id=user_id):
+            ...
+    """
+
+    __slots__ = ("component",)
+
+    def __init__(self, component: str):
+        self.component = component
+
+    def enabled_for(self, event: str, level: int = logging.INFO) -> bool:
+        """Whether an event at this level would be written (applies sampling below WARNING)"""
+        if not _logger.isEnabledFor(level):
+            return False
+        return level >= logging.WARNING or _sampled(event)
+
+    def log(self, level: int, event: str, exc_info: bool = False, **fields: Any):
+        if self.enabled_for(event, level):
+            self._emit(level, event, fields, exc_info)
+
+    def _emit(self, level: int, event: str, fields: Dict[str, Any], exc_info: bool = False):
+        if not _configured:
+            configure()
+        rate = _sample_rates.get(event, 1.0)
+        if level < logging.WARNING and rate < 1.0:
+            fields["sample_rate"] = rate
+        _logger.log(level, event, exc_info=exc_info,
+                    extra={"component": self.component, "event": event, "fields": fields})
+
+    def debug(self, event: str, **fields: Any):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, exc_info: bool = False, **fields: Any):
+        self.log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+    @contextmanager
+    def _timer(self, level: int, event: str, fields: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            fields["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._emit(level, event, fields)
+
+    def timed(self, event: str, level: int = logging.INFO, **fields: Any):
+        """
+        Context manager emitting the event with duration_ms when the block exits
+
+        Returns a shared no-op context when the event is filtered or not sampled.
+        """
+        if not self.enabled_for(event, level):
+            return _NULL_TIMER
+        return self._timer(level, event, fields)
+
+
+def get_logger(component: str) -> EventLogger:
+    """Event logger for a component (module name)"""
+    return EventLogger(component)
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading, rounded for log fields"""
+    return round((time.perf_counter() - started) * 1000, 2)
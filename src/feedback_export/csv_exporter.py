@@ -12,14 +12,30 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
-
 from .config import QAPair, SPREADSHEET_HEADERS
 
+# The Google client stack takes hundreds of ms to import; _load_google_clients()
+# binds these when the exporter first uploads
+Request = build = MediaFileUpload = None
+
+
+class _ClientsNotLoaded(Exception):
+    """Stands in for HttpError until the clients are loaded, so `except HttpError` is always valid"""
+
+
+HttpError = _ClientsNotLoaded
+
+
+def _load_google_clients() -> None:
+    """Import the Google auth and Drive API clients on first use"""
+    global Request, build, MediaFileUpload, HttpError
+    if build is not None:
+        return
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaFileUpload
+    from googleapiclient.errors import HttpError
+
 
 class AuthenticationError(Exception):
     """Raised when authentication fails"""
@@ -41,18 +57,16 @@ class CSVExporter:
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.exports_dir = exports_dir
-        self.creds: Credentials = None
+        self.creds = None  # google.oauth2.credentials.Credentials once authenticated
         self.drive_service = None
         self.logger = logging.getLogger("feedback_export.csv_exporter")
 
         # Ensure exports directory exists
         self.exports_dir.mkdir(parents=True, exist_ok=True)
 
-        # Authenticate
-        self._authenticate()
-
     def _authenticate(self) -> None:
-        """Authenticate with Google Drive API"""
+        """Authenticate with Google Drive API (on first upload, so runs with nothing to export skip it)"""
+        _load_google_clients()
         # Try to load existing token
         if self.token_path.exists():
             try:
@@ -154,6 +168,10 @@ class CSVExporter:
         Returns:
             Dict with 'id' and 'url' of uploaded file
         """
+        _load_google_clients()
+        if self.drive_service is None:
+            self._authenticate()
+
         try:
             # Prepare file metadata
             file_metadata = {
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Generation Worker
+Runs answer generation on a background thread pool, decoupled from the Streamlit
+script run that asked the question. Answers are written into the session
+manager's chat as they stream, so a rerun or reload can reattach to an answer in
+progress by message_id instead of losing it or asking again.
+
+A job stops early when it is cancelled (Stop generating, New Chat) or when it
+is abandoned: its should_cancel callback (e.g. "the browser session that
+asked is gone") has held for GENERATION_ABANDON_SECONDS with nobody following
+the answer, which leaves a reloaded page time to reattach.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    from .user_session_manager import StoredMessage, UserSessionManager
+    from . import event_log
+    from . import profiling
+    from . import tracing
+except ImportError:
+    # For direct execution when not imported as a package
+    from user_session_manager import StoredMessage, UserSessionManager
+    import event_log
+    import profiling
+    import tracing
+
+log = event_log.get_logger("generation_worker")
+
+# Answers generated concurrently per process (further questions queue)
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "16"))
+# Seconds an answer whose requester is gone keeps generating unfollowed before it is cancelled
+GENERATION_ABANDON_SECONDS = float(os.getenv("GENERATION_ABANDON_SECONDS", "10"))
+# Questions waiting for a free worker before new ones are refused (0 = no limit)
+GENERATION_QUEUE_LIMIT = int(os.getenv("GENERATION_QUEUE_LIMIT", "64"))
+
+
+class GenerationQueueFull(Exception):
+    """Every worker is busy and GENERATION_QUEUE_LIMIT questions are already waiting"""
+
+
+class GenerationJob:
+    """An answer being generated; any number of readers can follow it"""
+
+    def __init__(self, user_id: str, chat_id: str, message: str, answer: StoredMessage,
+                 previous: Optional["GenerationJob"] = None, profile: bool = False,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 abandon_seconds: float = GENERATION_ABANDON_SECONDS):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.message = message
+        self.answer = answer  # Stored assistant message, filled in place
+        self.previous = previous  # Earlier job in the same chat that must finish first
+        self.profile = profile  # Always profile this turn (?profile=<secret>)
+        self.trace_parent = tracing.current_context()  # Span of the request that submitted the turn
+        self.should_cancel = should_cancel  # True once the requester is gone
+        self.abandon_seconds = abandon_seconds
+        self.error: Optional[Exception] = None
+        self._followers = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._unattended_since: Optional[float] = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._changed = threading.Condition()
+        self._version = 0
+
+    @property
+    def message_id(self) -> str:
+        return self.answer.message_id
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def cancel(self):
+        """Stop generation at the next chunk; the partial answer is kept as truncated"""
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        """Checked by the generator at every chunk; also decides whether the job is abandoned"""
+        if self._cancelled.is_set():
+            return True
+        if self.should_cancel is None or self._followers or not self.should_cancel():
+            self._unattended_since = None
+            return False
+        now = time.monotonic()
+        if self._unattended_since is None:
+            self._unattended_since = now
+        if now - self._unattended_since < self.abandon_seconds:
+            return False
+        log.info("generation_abandoned", user_id=self.user_id, chat_id=self.chat_id, message_id=self.message_id)
+        self._cancelled.set()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the answer is finished"""
+        return self._done.wait(timeout)
+
+    def _publish(self, done: bool = False):
+        with self._changed:
+            self._version += 1
+            if done:
+                self._done.set()
+            self._changed.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """
+        Call listener() on the generating thread each time the answer changes or finishes
+
+        For readers that cannot block a thread in follow(), e.g. an event loop. The
+        listener is called once right away, and counts as a follower until removed.
+        """
+        with self._changed:
+            self._listeners.append(listener)
+            self._followers += 1
+        listener()
+
+    def remove_listener(self, listener: Callable[[], None]):
+        with self._changed:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+                self._followers -= 1
+
+    def follow(self, poll_seconds: float = 1.0) -> Iterator[str]:
+        """
+        Yield the cumulative answer each time it changes, ending once it is finished
+
+        Safe to abandon at any point: generation carries on without the reader.
+        """
+        seen = -1
+        with self._changed:
+            self._followers += 1
+        try:
+            while True:
+                with self._changed:
+                    if self._version == seen and not self.done:
+                        self._changed.wait(poll_seconds)
+                    version, done = self._version, self.done
+                    content = self.answer.content
+                if version != seen:
+                    seen = version
+                    yield content
+                if done:
+                    return
+        finally:
+            with self._changed:
+                self._followers -= 1
+
+
+class GenerationWorker:
+    """Thread pool running chat turns for one UserSessionManager"""
+
+    def __init__(self, session_manager: UserSessionManager, max_workers: int = GENERATION_WORKERS,
+                 queue_limit: int = GENERATION_QUEUE_LIMIT):
+        """
+        Args:
+            session_manager: Manager whose chats the answers are stored in
+            max_workers: Answers generated at once
+            queue_limit: Answers waiting for a worker before submit() refuses more (0 = no limit)
+        """
+        self.session_manager = session_manager
+        self.capacity = max_workers + queue_limit if queue_limit > 0 else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._reserved = 0  # Submissions between the capacity check and their job being added
+        self._lock = threading.Lock()
+
+    def submit(self, user_id: str, chat_id: str, message: str, profile: bool = False,
+               should_cancel: Optional[Callable[[], bool]] = None) -> GenerationJob:
+        """
+        Store the question and start generating its answer in the background
+
+        Turns in the same chat run one after another, in submission order, so the
+        RAGFlow session sees them in sequence.
+
+        Args:
+            profile: Profile this turn even if it is not sampled
+            should_cancel: True once the requester is gone; the answer is then
+                cancelled unless someone follows it within GENERATION_ABANDON_SECONDS
+
+        Returns:
+            The job; its message_id identifies the stored answer
+
+        Raises:
+            GenerationQueueFull: The worker is at capacity; nothing was stored
+        """
+        with self._lock:
+            if self.capacity is not None and len(self._jobs) + self._reserved >= self.capacity:
+                log.warning("generation_queue_full", user_id=user_id, chat_id=chat_id, jobs=len(self._jobs))
+                raise GenerationQueueFull(f"{len(self._jobs)} answers are already running or queued")
+            self._reserved += 1
+        try:
+            answer = self.session_manager.start_turn(user_id, chat_id, message)
+        except Exception:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        with self._lock:
+            self._reserved -= 1
+            previous = next((job for job in reversed(list(self._jobs.values()))
+                             if job.chat_id == chat_id), None)
+            job = GenerationJob(user_id, chat_id, message, answer, previous, profile, should_cancel)
+            self._jobs[job.message_id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get_job(self, message_id: str) -> Optional[GenerationJob]:
+        """The in-progress job for an answer, or None once it has finished"""
+        with self._lock:
+            return self._jobs.get(message_id)
+
+    def cancel(self, message_id: str) -> bool:
+        """Cancel an in-progress answer; False if it is not running"""
+        job = self.get_job(message_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_chat(self, user_id: str, chat_id: str) -> int:
+        """Cancel every running or queued answer in a chat (the user left it); returns how many"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.user_id == user_id and job.chat_id == chat_id]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def _run(self, job: GenerationJob):
+        job_span = tracing.span("generation.job", parent=job.trace_parent, user_id=job.user_id,
+                                chat_id=job.chat_id, message_id=job.message_id)
+        with job_span:
+            try:
+                if job.previous is not None:
+                    job.previous.wait()
+                    job.previous = None
+                    job_span.add_event("previous_turn_finished")
+                with profiling.profile_request("chat_turn", force=job.profile):
+                    stream = self.session_manager.stream_turn(job.user_id, job.chat_id, job.message,
+                                                              job.answer, should_cancel=job.is_cancelled)
+                    for _ in stream:
+                        job._publish()
+            except Exception as e:
+                job.error = e
+                job_span.record_exception(e)
+                log.error("generation_failed", user_id=job.user_id, chat_id=job.chat_id,
+                          message_id=job.message_id, error=str(e))
+            finally:
+                with self._lock:
+                    self._jobs.pop(job.message_id, None)
+                job._publish(done=True)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; optionally wait for running answers to finish"""
+        self._executor.shutdown(wait=wait)
+
+
+_workers: Dict[int, GenerationWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_generation_worker(session_manager: UserSessionManager) -> GenerationWorker:
+    """Process-wide worker for a session manager, created on first use"""
+    with _workers_lock:
+        worker = _workers.get(id(session_manager))
+        if worker is None or worker.session_manager is not session_manager:
+            worker = GenerationWorker(session_manager)
+            _workers[id(session_manager)] = worker
+        return worker
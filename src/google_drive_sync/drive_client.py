@@ -12,15 +12,32 @@ import logging
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Any
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from googleapiclient.errors import HttpError
-
 from .config import AuthenticationError, FolderNotFoundError
 
+# The Google client stack takes hundreds of ms to import; _load_google_clients()
+# binds these when the first client is created
+Request = Credentials = InstalledAppFlow = build = MediaIoBaseDownload = None
+
+
+class _ClientsNotLoaded(Exception):
+    """Stands in for HttpError until the clients are loaded, so `except HttpError` is always valid"""
+
+
+HttpError = _ClientsNotLoaded
+
+
+def _load_google_clients() -> None:
+    """Import the Google auth and Drive API clients on first use"""
+    global Request, Credentials, InstalledAppFlow, build, MediaIoBaseDownload, HttpError
+    if build is not None:
+        return
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaIoBaseDownload
+    from googleapiclient.errors import HttpError
+
 
 # OAuth scopes required for readonly access
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
@@ -63,6 +80,7 @@ class GoogleDriveClient:
             credentials_path: Path to OAuth client secrets JSON
             token_path: Path to store/load OAuth token
         """
+        _load_google_clients()
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.creds: Optional[Credentials] = None
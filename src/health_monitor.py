@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Health Monitor
+Probes RAGFlow on a background thread and keeps the result, so liveness and
+readiness checks read a cached snapshot instead of calling RAGFlow themselves.
+
+    live    the process answers and the monitor thread is running
+    ready   the assistant is resolved and warm, and the last probe passed recently
+
+"Warm" is reached once the assistant has been resolved and one probe has
+passed; until then the monitor retries resolving the assistant on every tick
+and the app turns new chats and questions away. Once warm, a failing RAGFlow
+only makes the instance unready (so load balancers route around it); requests
+already admitted are handled by the circuit breaker.
+
+With several RAGFlow servers, the backend pool already probes each of them on
+its own loop (RAGFLOW_HEALTH_INTERVAL); the monitor then follows the pool's
+probe rounds instead of running a second loop, so every server is probed once
+per interval and routing and readiness see the same results.
+
+The Streamlit app cannot add routes, so the probes are also served on a side
+port (HEALTH_PORT, default 8502) as /livez and /readyz; the chat API serves
+them as /health/live and /health/ready.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("health_monitor")
+
+# Seconds between probes
+HEALTH_MONITOR_INTERVAL = float(os.getenv("HEALTH_MONITOR_INTERVAL", "15"))
+# Probe results kept for the latency history
+HEALTH_HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", "60"))
+
+
+@dataclass
+class HealthSnapshot:
+    """Result of the latest probe"""
+    checked_at: float  # Unix time the probe finished
+    healthy: bool
+    latency_ms: float
+    checks: Dict[str, bool] = field(default_factory=dict)
+    error: Optional[str] = None
+    consecutive_failures: int = 0
+
+
+class HealthMonitor:
+    """
+    Background RAGFlow prober with a cached snapshot and latency history
+
+    Args:
+        probe: Returns named checks (e.g. RAGFlowAssistantManager.health_check); raising counts as failed
+        warm_up: Resolves the assistant; returns True once it is ready to serve
+        interval: Seconds between probes
+        history_size: Probe results kept for latency statistics
+        stale_after: Seconds after which an old snapshot no longer counts as ready (default 3 intervals)
+        source: A RAGFlowBackendPool whose health loop drives the monitor (interval is then the pool's)
+    """
+
+    def __init__(self, probe: Callable[[], Dict[str, bool]], warm_up: Callable[[], bool],
+                 interval: float = HEALTH_MONITOR_INTERVAL, history_size: int = HEALTH_HISTORY_SIZE,
+                 stale_after: Optional[float] = None, source=None):
+        self.probe = probe
+        self.warm_up = warm_up
+        self.source = source
+        if source is not None:
+            interval = source.health_interval
+        self.interval = interval
+        self.stale_after = stale_after if stale_after is not None else max(3 * interval, 30.0)
+        self.started_at = time.time()
+
+        self._lock = threading.Lock()
+        self._snapshot: Optional[HealthSnapshot] = None
+        self._history: Deque[Tuple[float, float, bool]] = deque(maxlen=history_size)
+        self._assistant_resolved = False
+        self._warm = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------- probing
+
+    def check(self) -> HealthSnapshot:
+        """Warm up if needed, probe RAGFlow once and cache the result"""
+        started = time.perf_counter()
+        checks: Dict[str, bool] = {}
+        error = None
+        try:
+            checks = dict(self.probe())
+        except Exception as e:
+            error = str(e)
+        return self.record(checks, event_log.elapsed_ms(started), error)
+
+    def record(self, checks: Dict[str, bool], latency_ms: float, error: Optional[str] = None) -> HealthSnapshot:
+        """Warm up if needed and cache a probe result (from check() or the backend pool's loop)"""
+        if not self._assistant_resolved:
+            try:
+                self._assistant_resolved = bool(self.warm_up())
+            except Exception as e:
+                log.warning("health_warm_up_failed", error=str(e))
+
+        # A pool's round can carry the error of one failed backend while the others pass every check
+        healthy = bool(checks) and all(checks.values())
+
+        with self._lock:
+            previous = self._snapshot
+            failures = 0 if healthy else (previous.consecutive_failures if previous else 0) + 1
+            snapshot = HealthSnapshot(checked_at=time.time(), healthy=healthy, latency_ms=latency_ms,
+                                      checks=checks, error=error, consecutive_failures=failures)
+            self._snapshot = snapshot
+            self._history.append((snapshot.checked_at, latency_ms, healthy))
+            became_warm = healthy and self._assistant_resolved and not self._warm
+            self._warm = self._warm or became_warm
+
+        if became_warm:
+            log.info("health_warm", latency_ms=latency_ms, warm_up_s=round(time.time() - self.started_at, 1))
+        if healthy and previous is not None and not previous.healthy:
+            log.info("health_recovered", latency_ms=latency_ms, failures=previous.consecutive_failures)
+        elif not healthy and (previous is None or previous.healthy):
+            log.warning("health_degraded", checks=checks, error=error, latency_ms=latency_ms)
+        return snapshot
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def start(self):
+        """
+        Probe once, then keep probing in the background (idempotent)
+
+        The first probe runs on the calling thread so an app that starts the
+        monitor at startup knows right away whether it can take traffic. With
+        a source pool, later probes are the pool's rounds.
+        """
+        if self.source is not None:
+            if self._snapshot is None:
+                self.check()
+            self.source.remove_health_listener(self.record)
+            self.source.add_health_listener(self.record)
+            self.source.start_health_monitor()
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.check()
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background loop (or stop following the pool's)"""
+        if self.source is not None:
+            self.source.remove_health_listener(self.record)
+        self._stop_event.set()
+
+    # ------------------------------------------------------------- state
+
+    @property
+    def running(self) -> bool:
+        if self.source is not None:
+            return self.source.health_loop_running
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def warm(self) -> bool:
+        """Whether the assistant has been resolved and passed a probe (stays True once reached)"""
+        return self._warm
+
+    def snapshot(self) -> Optional[HealthSnapshot]:
+        """Latest probe result, or None before the first probe"""
+        return self._snapshot
+
+    def latency_history(self) -> List[Dict[str, Any]]:
+        """Recent probes, oldest first"""
+        with self._lock:
+            history = list(self._history)
+        return [{"checked_at": t, "latency_ms": ms, "healthy": ok} for t, ms, ok in history]
+
+    def latency_summary(self) -> Dict[str, Any]:
+        """Probe count, failures and latency percentiles over the history"""
+        with self._lock:
+            history = list(self._history)
+        latencies = sorted(ms for _, ms, _ in history)
+        if not latencies:
+            return {"probes": 0}
+        return {
+            "probes": len(history),
+            "failures": sum(1 for _, _, ok in history if not ok),
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max_ms": latencies[-1],
+        }
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        """The process is up; if the monitor was started, its (or the pool's) loop must still be running"""
+        started = self._thread is not None or (self.source is not None and self._snapshot is not None)
+        alive = not started or self.running
+        return alive, {"status": "ok" if alive else "monitor_stopped",
+                       "uptime_s": round(time.time() - self.started_at, 1)}
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Warm, and the latest probe passed within stale_after seconds"""
+        snapshot = self._snapshot
+        age = time.time() - snapshot.checked_at if snapshot else None
+        if not self._warm:
+            reason = "warming_up"
+        elif not snapshot.healthy:
+            reason = "ragflow_unhealthy"
+        elif age > self.stale_after:
+            reason = "health_stale"
+        else:
+            reason = None
+        details: Dict[str, Any] = {
+            "status": "ready" if reason is None else reason,
+            "assistant_resolved": self._assistant_resolved,
+            "warm": self._warm,
+            "last_check": asdict(snapshot) if snapshot else None,
+            "last_check_age_s": round(age, 1) if age is not None else None,
+            "latency": self.latency_summary(),
+        }
+        return reason is None, details
+
+
+# --------------------------------------------------------- probe endpoints
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def create_health_server(monitor: HealthMonitor, port: int, host: str = "0.0.0.0"):
+    """HTTP server answering /livez and /readyz for a monitor (not started; port 0 picks a free one)"""
+    # http.server pulls in http.client, email and ssl; only processes serving probes pay for it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ProbeHandler(BaseHTTPRequestHandler):
+        """/livez and /readyz from the cached snapshot (200 or 503, JSON body)"""
+
+        def log_message(self, format, *args):
+            pass  # Probes arrive every few seconds; keep them out of the app log
+
+        def do_GET(self):
+            if self.path.split("?")[0] == "/livez":
+                ok, details = monitor.liveness()
+            elif self.path.split("?")[0] == "/readyz":
+                ok, details = monitor.readiness()
+            else:
+                self.send_error(404)
+                return
+            body = json.dumps(details, default=str).encode()
+            self.send_response(200 if ok else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return ThreadingHTTPServer((host, port), ProbeHandler)
+
+
+def start_health_server(monitor: HealthMonitor, port: Optional[int] = None) -> bool:
+    """
+    Serve /livez and /readyz on a side port once per process
+
+    Args:
+        monitor: Monitor whose cached state the endpoints report
+        port: Port to listen on (defaults to HEALTH_PORT, 8502; 0 disables the endpoint)
+
+    Returns:
+        True if the endpoint is (already) running
+    """
+    global _server
+    port = int(os.getenv("HEALTH_PORT", "8502")) if port is None else port
+    if port <= 0:
+        return False
+
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = create_health_server(monitor, port)
+        except OSError as e:
+            log.warning("health_server_failed", port=port, error=str(e))
+            return False
+        threading.Thread(target=_server.serve_forever, name="health-server", daemon=True).start()
+        log.info("health_server_started", port=port)
+        return True
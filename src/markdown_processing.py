@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Markdown Processing for Assistant Answers
+Strips the ```markdown wrapper some models put around answers, incrementally while
+an answer streams and memoised per message_id for stored history.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+MARKDOWN_FENCE = "```markdown"
+CLOSING_FENCE = "\n```"
+
+# Stored answers kept in the process-wide memo
+MEMO_MAX_ENTRIES = 10000
+
+
+def _unwrap(text: str) -> Optional[str]:
+    """
+    Body of a stripped answer wrapped as ```markdown <ws>\\n ... \\n```, or None
+
+    Equivalent to matching r'^```markdown\\s*\\n(.*?)\\n```$' with re.DOTALL, but
+    only inspects the ends of the text.
+    """
+    if not text.startswith(MARKDOWN_FENCE) or not text.endswith(CLOSING_FENCE):
+        return None
+
+    rest = text[len(MARKDOWN_FENCE):]
+    body_end = len(rest) - len(CLOSING_FENCE)
+    if body_end < 0:
+        return None
+
+    # \s*\n: the longest whitespace prefix ending in a newline that leaves room for the closing fence
+    leading = len(rest) - len(rest.lstrip())
+    newline = rest.rfind("\n", 0, min(leading, body_end))
+    if newline < 0:
+        return None
+    return rest[newline + 1:body_end]
+
+
+def process_markdown_response(content: str) -> str:
+    """
+    Extract markdown content from code blocks if wrapped in ```markdown blocks
+
+    Args:
+        content: The response content, potentially wrapped in ```markdown blocks
+
+    Returns:
+        Extracted markdown content ready for st.markdown() display
+    """
+    if not content:
+        return content
+
+    body = _unwrap(content.strip())
+    # If not wrapped in code blocks, return as-is
+    return content if body is None else body
+
+
+class StreamingMarkdownProcessor:
+    """
+    Incremental ```markdown wrapper stripping for a streamed answer
+
+    RAGFlow yields the cumulative answer on every chunk. The wrapper decision is
+    made once from the first characters; afterwards each chunk costs a slice and
+    a look at the last few characters instead of a regex over the whole text.
+    """
+
+    PENDING = "pending"
+    WRAPPED = "wrapped"
+    PLAIN = "plain"
+
+    def __init__(self):
+        self.state = self.PENDING
+        self._body_start = 0
+
+    def _detect(self, content: str):
+        """Decide whether the stream is wrapped once enough of it has arrived"""
+        offset = len(content) - len(content.lstrip())
+        head = content[offset:offset + len(MARKDOWN_FENCE)]
+
+        if len(head) < len(MARKDOWN_FENCE):
+            if not MARKDOWN_FENCE.startswith(head):
+                self.state = self.PLAIN
+            return
+
+        if head != MARKDOWN_FENCE:
+            self.state = self.PLAIN
+            return
+
+        after = offset + len(MARKDOWN_FENCE)
+        rest = content[after:]
+        stripped = rest.lstrip()
+        if not stripped:
+            return  # Only whitespace after the fence so far
+
+        leading = rest[:len(rest) - len(stripped)]
+        newline = leading.rfind("\n")
+        if newline < 0:
+            self.state = self.PLAIN  # Text on the fence line: not a wrapper
+            return
+
+        self.state = self.WRAPPED
+        self._body_start = after + newline + 1
+
+    def feed(self, content: str) -> str:
+        """
+        Display text for the cumulative content received so far
+
+        Args:
+            content: Full answer text received so far
+
+        Returns:
+            Text to render now (the wrapper and any half-received fence are hidden)
+        """
+        if self.state == self.PENDING:
+            self._detect(content)
+            if self.state == self.PENDING:
+                return ""
+
+        if self.state == self.PLAIN:
+            return content
+
+        body = content[self._body_start:].rstrip()
+        # Hide a closing fence that has fully or partly arrived
+        for fence in ("\n```", "\n``", "\n`"):
+            if body.endswith(fence):
+                return body[:-len(fence)]
+        return body
+
+    def finish(self, content: str) -> str:
+        """Final display text once the stream is complete (identical to stored rendering)"""
+        return process_markdown_response(content)
+
+
+_memo: "OrderedDict[str, str]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def render_stored_answer(message_id: Optional[str], content: str) -> str:
+    """
+    Processed markdown for a stored message, memoised by message_id
+
+    Stored messages are immutable, so their processed form is computed once per
+    process and shared by every browser session and rerun.
+    """
+    if not message_id:
+        return process_markdown_response(content)
+
+    with _memo_lock:
+        cached = _memo.get(message_id)
+        if cached is not None:
+            _memo.move_to_end(message_id)
+            return cached
+
+    processed = process_markdown_response(content)
+    with _memo_lock:
+        _memo[message_id] = processed
+        if len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+    return processed
+
+
+def clear_render_memo():
+    """Drop all memoised renders"""
+    with _memo_lock:
+        _memo.clear()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics for the RCSB PDB ChatBot
+Hot-path latency histograms and stream counters exported on a side HTTP port.
+
+Metrics are disabled unless METRICS_ENABLED=true. When disabled every helper
+returns after a single flag check, so instrumented code pays no measurable cost.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("metrics")
+
+# Latency buckets (seconds) covering fast file I/O up to long LLM generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+
+# name -> (type, documentation, label names, buckets)
+METRIC_DEFINITIONS: Dict[str, tuple] = {
+    "chatbot_stage_duration_seconds": (
+        "histogram",
+        "Duration of one stage of a chat turn",
+        ("stage",),
+        LATENCY_BUCKETS,
+    ),
+    "chatbot_stream_chunks_total": (
+        "counter",
+        "Streamed response chunks received from RAGFlow",
+        (),
+        None,
+    ),
+    "chatbot_stream_characters_total": (
+        "counter",
+        "Characters of assistant answers streamed to users",
+        (),
+        None,
+    ),
+    "chatbot_generation_cancelled_total": (
+        "counter",
+        "Answers whose generation was stopped before completion",
+        ("reason",),
+        None,
+    ),
+    "chatbot_generation_wasted_seconds": (
+        "histogram",
+        "Generation time spent on answers that were cancelled or abandoned",
+        ("reason",),
+        LATENCY_BUCKETS,
+    ),
+    "chatbot_turn_latency_seconds": (
+        "histogram",
+        "End-to-end chat turn latency by turn index within the RAGFlow session",
+        ("turn_index",),
+        LATENCY_BUCKETS,
+    ),
+    "chatbot_chat_rollovers_total": (
+        "counter",
+        "Chats moved to a fresh RAGFlow session by the rollover policy",
+        (),
+        None,
+    ),
+    "chatbot_stream_chars_per_second": (
+        "histogram",
+        "Answer generation speed in characters per second",
+        (),
+        RATE_BUCKETS,
+    ),
+}
+
+_enabled = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+_metrics: Dict[str, Any] = {}
+_server_started = False
+_lock = threading.Lock()
+_NULL_TIMER = nullcontext()
+
+
+def metrics_enabled() -> bool:
+    """Whether metrics collection is active"""
+    return _enabled
+
+
+def _build_metrics():
+    """Create prometheus_client collectors for every definition (idempotent)"""
+    global _enabled
+    if _metrics:
+        return
+
+    try:
+        from prometheus_client import Counter, Histogram
+    except ImportError:
+        log.warning("metrics_unavailable", error="prometheus-client is not installed (pip install prometheus-client)")
+        _enabled = False
+        return
+
+    for name, (metric_type, documentation, labels, buckets) in METRIC_DEFINITIONS.items():
+        if metric_type == "histogram":
+            _metrics[name] = Histogram(name, documentation, labels, buckets=buckets)
+        else:
+            _metrics[name] = Counter(name, documentation, labels)
+
+
+def _get(name: str):
+    if not _metrics:
+        with _lock:
+            _build_metrics()
+    return _metrics.get(name)
+
+
+def observe(name: str, value: float, **labels):
+    """Record a histogram observation"""
+    if not _enabled:
+        return
+    metric = _get(name)
+    if metric is None:
+        return
+    (metric.labels(**labels) if labels else metric).observe(value)
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Increment a counter"""
+    if not _enabled:
+        return
+    metric = _get(name)
+    if metric is None:
+        return
+    (metric.labels(**labels) if labels else metric).inc(amount)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of a chat-turn stage"""
+    observe("chatbot_stage_duration_seconds", seconds, stage=stage)
+
+
+@contextmanager
+def _stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """
+    Context manager timing a chat-turn stage
+
+    Returns a shared no-op context when metrics are disabled.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _stage_timer(stage)
+
+
+def observe_stream(chunks: int, characters: int, seconds: float):
+    """Record chunk count, answer size and generation speed for one streamed answer"""
+    if not _enabled:
+        return
+    increment("chatbot_stream_chunks_total", chunks)
+    increment("chatbot_stream_characters_total", characters)
+    if seconds > 0 and characters > 0:
+        observe("chatbot_stream_chars_per_second", characters / seconds)
+
+
+def start_metrics_server(port: Optional[int] = None) -> bool:
+    """
+    Start the Prometheus scrape endpoint once per process
+
+    Args:
+        port: Port to listen on (defaults to METRICS_PORT, 9108)
+
+    Returns:
+        True if the endpoint is (already) running
+    """
+    global _server_started, _enabled
+    if not _enabled:
+        return False
+
+    with _lock:
+        if _server_started:
+            return True
+        _build_metrics()
+        if not _enabled:
+            return False
+
+        from prometheus_client import start_http_server
+
+        port = port or int(os.getenv("METRICS_PORT", "9108"))
+        try:
+            start_http_server(port)
+        except OSError as e:
+            log.warning("metrics_server_failed", port=port, error=str(e))
+            return False
+
+        _server_started = True
+        log.info("metrics_server_started", port=port)
+        return True
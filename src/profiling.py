@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+On-demand Profiling for the RCSB PDB ChatBot
+Wraps one Streamlit script run or one chat turn in a profiler and writes the
+result under PROFILING_DIR, so a slow pod can be inspected without a debugger.
+
+Profiling is off unless PROFILING_ENABLED=true (every PROFILING_SAMPLE_RATE-th
+request is profiled) or PROFILING_QUERY_SECRET is set and a page is opened with
+?profile=<secret> (that script run and the turns it submits are profiled).
+
+Modes:
+    sampling       stack samples every PROFILING_INTERVAL_MS from a side thread, written
+                   as collapsed stacks (.folded) for flamegraph.pl, speedscope or inferno.
+                   Low overhead; safe to leave on in production with a sample rate.
+    deterministic  cProfile of every call, written as pstats (.prof) for snakeviz or
+                   flameprof. Exact call counts, but slows the profiled request down.
+
+When nothing is profiled, profile_request returns a shared null context after a
+counter check, so instrumented code pays no measurable cost.
+"""
+
+import cProfile
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("profiling")
+
+_enabled = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Profile one request in N per request name (1 = every request)
+_sample_rate = max(int(os.getenv("PROFILING_SAMPLE_RATE", "100")), 1)
+_mode = os.getenv("PROFILING_MODE", "sampling").lower()
+_interval = float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000
+_output_dir = Path(os.getenv("PROFILING_DIR", "./profiles"))
+# Oldest profiles are deleted beyond this many files
+_max_files = int(os.getenv("PROFILING_MAX_FILES", "200"))
+_query_secret = os.getenv("PROFILING_QUERY_SECRET", "")
+
+_counters: Dict[str, "itertools.count"] = {}
+_sequence = itertools.count(1)
+_lock = threading.Lock()
+_NULL_PROFILE = nullcontext()
+
+
+def profiling_enabled() -> bool:
+    """Whether sampled profiling is active"""
+    return _enabled
+
+
+def query_requests_profile(value: Optional[str]) -> bool:
+    """Whether a ?profile= query value matches PROFILING_QUERY_SECRET"""
+    if not _query_secret or not value:
+        return False
+    return hmac.compare_digest(str(value), _query_secret)
+
+
+def _should_profile(name: str) -> bool:
+    counter = _counters.get(name)
+    if counter is None:
+        with _lock:
+            counter = _counters.setdefault(name, itertools.count())
+    return next(counter) % _sample_rate == 0
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a side thread into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path):
+        """Collapsed stacks: one 'root;...;leaf count' line per distinct stack"""
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _output_path(name: str, suffix: str) -> Path:
+    _output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return _output_dir / f"{name}-{stamp}-{os.getpid()}-{next(_sequence)}{suffix}"
+
+
+def _prune():
+    """Keep at most PROFILING_MAX_FILES profiles, deleting the oldest"""
+    if _max_files <= 0:
+        return
+    files = sorted((p for p in _output_dir.iterdir() if p.suffix in (".folded", ".prof")),
+                   key=lambda p: p.stat().st_mtime)
+    for path in files[:max(len(files) - _max_files, 0)]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+@contextmanager
+def _profile(name: str):
+    started = time.perf_counter()
+    if _mode == "deterministic":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one cProfile at a time per process
+            log.warning("profile_skipped", name=name, error=str(e))
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _write(name, ".prof", lambda path: profiler.dump_stats(str(path)), started)
+    else:
+        sampler = StackSampler(threading.get_ident(), _interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            _write(name, ".folded", sampler.write, started)
+
+
+def _write(name: str, suffix: str, dump, started: float):
+    """Save a finished profile; failures are reported, never raised into the request"""
+    try:
+        path = _output_path(name, suffix)
+        dump(path)
+        with _lock:
+            _prune()
+    except OSError as e:
+        log.warning("profile_write_failed", name=name, error=str(e))
+        return
+    log.info("profile_written", name=name, path=str(path), duration_ms=event_log.elapsed_ms(started))
+
+
+def profile_request(name: str, force: bool = False):
+    """
+    Context manager profiling one request if it is sampled (or forced)
+
+    Args:
+        name: Request kind, used for the sample counter and the file name
+        force: Profile this request regardless of PROFILING_ENABLED and the sample rate
+    """
+    if force or (_enabled and _should_profile(name)):
+        return _profile(name)
+    return _NULL_PROFILE
@@ -4,6 +4,7 @@ RAGFlow Assistant Manager
 Intelligent management of RAGFlow chat assistants with automated creation, configuration, and session management.
 """
 
+import importlib.util
 import os
 import time
 from typing import Dict, List, Optional, Any, Generator, TypeVar
@@ -29,10 +30,66 @@ try:
 except ImportError:
     pass
 
+# The SDK (and requests/beartype behind it) takes ~300 ms to import; check it is
+# installed here, import it when the first client is created
+if importlib.util.find_spec("ragflow_sdk") is None:
+    raise ImportError("RAGFlow SDK not installed. Run: pip install ragflow-sdk")
+
 try:
-    from ragflow_sdk import RAGFlow
+    from .circuit_breaker import CircuitOpenError, create_circuit_breaker_from_env, retry_with_jitter
+    from .ragflow_id_cache import RAGFlowIdCache, config_fingerprint
+    from . import event_log
+    from . import metrics
+    from . import tracing
 except ImportError:
-    raise ImportError("RAGFlow SDK not installed. Run: pip install ragflow-sdk")
+    # For direct execution when not imported as a package
+    from circuit_breaker import CircuitOpenError, create_circuit_breaker_from_env, retry_with_jitter
+    from ragflow_id_cache import RAGFlowIdCache, config_fingerprint
+    import event_log
+    import metrics
+    import tracing
+
+log = event_log.get_logger("ragflow_assistant_manager")
+
+# Answer shown immediately while the circuit around RAGFlow is open
+RAGFLOW_UNAVAILABLE_MESSAGE = (
+    "The assistant is temporarily unavailable. Please try again in a few moments."
+)
+
+# Phrases RAGFlow uses when an id does not exist (or belongs to someone else)
+NOT_FOUND_MARKERS = ("not found", "doesn't exist", "does not exist", "don't own", "do not own", "doesn't own")
+
+
+class RAGFlowNotFoundError(Exception):
+    """RAGFlow reported the assistant, dataset or session id as missing"""
+
+
+def is_not_found_error(error: BaseException) -> bool:
+    """Whether a RAGFlow SDK error means the referenced id no longer exists"""
+    message = str(error).lower()
+    return any(marker in message for marker in NOT_FOUND_MARKERS)
+
+
+def _raise_not_found(func):
+    """Wrap a RAGFlow call so "not found" answers raise RAGFlowNotFoundError"""
+    def call():
+        try:
+            return func()
+        except Exception as e:
+            if is_not_found_error(e):
+                raise RAGFlowNotFoundError(str(e)) from e
+            raise
+    return call
+
+
+def _return_not_found(func):
+    """Wrap a RAGFlow call so a "not found" answer is returned as a RAGFlowNotFoundError instead of raised"""
+    def call():
+        try:
+            return func()
+        except RAGFlowNotFoundError as e:
+            return e
+    return call
 
 
 @dataclass
@@ -65,24 +122,63 @@ class StreamingResponse:
 class RAGFlowAssistantManager:
     """Smart manager for RAGFlow chat assistants with automated lifecycle management"""
 
-    def __init__(self, api_key: str, base_url: str):
+    def __init__(self, api_key: str, base_url: str, id_cache: Optional[RAGFlowIdCache] = None):
         """
         Initialize the RAGFlow assistant manager
 
         Args:
             api_key: RAGFlow API key
             base_url: RAGFlow server base URL
+            id_cache: Persisted assistant/dataset ids; skips discovery calls at startup
         """
         self.api_key = api_key
         self.base_url = base_url
         self._ragflow_client = None
         self._current_assistant = None
         self._dataset_cache = {}
+        self._circuit = create_circuit_breaker_from_env()
+        self._id_cache = id_cache
+        self._cache_scope = RAGFlowIdCache.scope(base_url, api_key)
+        self._config: Optional[AssistantConfig] = None  # Last config resolved, for rediscovery
+        self._replaced_assistant_ids: Dict[str, str] = {}  # Cached id found missing -> rediscovered id
+
+    @property
+    def circuit_state(self) -> str:
+        """State of the circuit breaker around RAGFlow calls (closed/open/half_open)"""
+        return self._circuit.state
+
+    def bind_session(self, session_id: str, base_url: Optional[str]):
+        """Pin a session to a backend (single-backend manager: nothing to do)"""
+
+    def unbind_session(self, session_id: str):
+        """Forget a session's backend (single-backend manager: nothing to do)"""
+
+    def backend_for_session(self, session_id: str) -> Optional[str]:
+        """Base URL of the backend holding a session"""
+        return self.base_url
+
+    def _call_with_retry(self, func):
+        """
+        Run an idempotent RAGFlow call through the circuit breaker with jittered retries
+
+        "Not found" answers are raised as RAGFlowNotFoundError right away; retrying cannot help.
+        They are a healthy reply from RAGFlow, so the breaker records them as successes:
+        a few stale ids must not open the circuit for every user.
+        """
+        def attempt():
+            result = self._circuit.call(_return_not_found(_raise_not_found(func)))
+            if isinstance(result, RAGFlowNotFoundError):
+                raise result
+            return result
+
+        return retry_with_jitter(attempt, give_up_on=(CircuitOpenError, RAGFlowNotFoundError))
 
     @property
     def ragflow_client(self):
         """Lazy initialization of RAGFlow client"""
         if self._ragflow_client is None:
+            from ragflow_sdk import RAGFlow
+
             self._ragflow_client = RAGFlow(api_key=self.api_key, base_url=self.base_url)
         return self._ragflow_client
 
@@ -100,6 +196,12 @@ class RAGFlowAssistantManager:
         if dataset_name in self._dataset_cache:
             return self._dataset_cache[dataset_name]
 
+        cached = self._id_cache.get(self._cache_scope, "dataset", dataset_name) if self._id_cache else None
+        if cached:
+            self._dataset_cache[dataset_name] = cached["id"]
+            log.info("dataset_cached", dataset=dataset_name, dataset_id=cached["id"])
+            return cached["id"]
+
         try:
             # Try to find existing dataset
             datasets = self.ragflow_client.list_datasets(name=dataset_name)
@@ -107,11 +209,11 @@ class RAGFlowAssistantManager:
             datasets = safe_list(datasets)
             if len(datasets) > 0:
                 dataset_id = datasets[0].id
-                self._dataset_cache[dataset_name] = dataset_id
-                print(f"✅ Found existing dataset: {dataset_name} (ID: {dataset_id})")
+                self._remember_dataset(dataset_name, dataset_id)
+                log.info("dataset_found", dataset=dataset_name, dataset_id=dataset_id)
                 return dataset_id
         except Exception as e:
-            print(f"⚠️  Error searching for dataset {dataset_name}: {e}")
+            log.warning("dataset_lookup_failed", dataset=dataset_name, error=str(e))
 
         # Create new dataset if not found
         try:
@@ -137,24 +239,85 @@ class RAGFlowAssistantManager:
             )
 
             dataset_id = dataset.id
-            self._dataset_cache[dataset_name] = dataset_id
-            print(f"🆕 Created new dataset: {dataset_name} (ID: {dataset_id})")
+            self._remember_dataset(dataset_name, dataset_id)
+            log.info("dataset_created", dataset=dataset_name, dataset_id=dataset_id)
             return dataset_id
 
         except Exception as e:
-            print(f"❌ Error creating dataset {dataset_name}: {e}")
+            log.error("dataset_create_failed", dataset=dataset_name, error=str(e))
             raise
 
+    def _remember_dataset(self, dataset_name: str, dataset_id: str):
+        self._dataset_cache[dataset_name] = dataset_id
+        if self._id_cache:
+            self._id_cache.put(self._cache_scope, "dataset", dataset_name, id=dataset_id)
+
+    def _remember_assistant(self, config: AssistantConfig, assistant_id: str, config_pushed: bool):
+        """Cache an assistant id; the fingerprint is only stored once its settings reached RAGFlow"""
+        if self._id_cache:
+            self._id_cache.put(self._cache_scope, "assistant", config.name, id=assistant_id,
+                               fingerprint=config_fingerprint(config) if config_pushed else None)
+
+    def _forget_ids(self, config: AssistantConfig, error: Exception):
+        """Drop cached ids RAGFlow no longer knows, so the next resolution rediscovers them"""
+        log.warning("ragflow_id_invalidated", assistant=config.name, dataset=config.dataset_name, error=str(error))
+        self._current_assistant = None
+        self._dataset_cache.pop(config.dataset_name, None)
+        if self._id_cache:
+            self._id_cache.invalidate(self._cache_scope, "assistant", config.name)
+            self._id_cache.invalidate(self._cache_scope, "dataset", config.dataset_name)
+
+    def _assistant_from_cache(self, config: AssistantConfig) -> Optional[str]:
+        """
+        Use a cached assistant id without listing chats
+
+        Settings are pushed again only if they changed since the id was cached.
+        Returns None (after dropping the entry) if RAGFlow says the id is gone.
+        """
+        cached = self._id_cache.get(self._cache_scope, "assistant", config.name) if self._id_cache else None
+        if not cached:
+            return None
+
+        from ragflow_sdk.modules.chat import Chat
+
+        # A handle needs only the id: create_session/list_sessions address /chats/<id>
+        assistant = Chat(self.ragflow_client, {"id": cached["id"], "name": config.name})
+        if cached.get("fingerprint") != config_fingerprint(config):
+            try:
+                self._push_assistant_config(assistant, config)
+            except Exception as e:
+                if is_not_found_error(e):
+                    self._forget_ids(config, e)
+                    return None
+                # Keep the cached id; the stale fingerprint makes the next start push again
+                log.warning("assistant_config_update_failed", assistant=config.name, error=str(e))
+            else:
+                self._remember_assistant(config, assistant.id, config_pushed=True)
+                log.info("assistant_config_updated", assistant=config.name, assistant_id=assistant.id)
+
+        self._current_assistant = assistant
+        log.info("assistant_cached", assistant=config.name, assistant_id=assistant.id)
+        return assistant.id
+
     def get_or_create_assistant(self, config: AssistantConfig) -> str:
         """
         Get existing chat assistant or create if it doesn't exist
 
+        With an id cache, a previously resolved assistant is used without any
+        discovery call; it is looked up by name again only after RAGFlow reports
+        the cached id as missing.
+
         Args:
             config: Assistant configuration
 
         Returns:
             Chat assistant ID
         """
+        self._config = config
+        assistant_id = self._assistant_from_cache(config)
+        if assistant_id:
+            return assistant_id
+
         try:
             # Try to find existing assistant
             assistants = self.ragflow_client.list_chats(name=config.name)
@@ -164,14 +327,15 @@ class RAGFlowAssistantManager:
                 assistant = assistants[0]
 
                 # Update configuration if needed
-                self._update_assistant_config(assistant, config)
+                pushed = self._update_assistant_config(assistant, config)
 
                 self._current_assistant = assistant
-                print(f"✅ Using existing assistant: {config.name} (ID: {assistant.id})")
+                self._remember_assistant(config, assistant.id, pushed)
+                log.info("assistant_found", assistant=config.name, assistant_id=assistant.id)
                 return assistant.id
 
         except Exception as e:
-            print(f"⚠️  Error searching for assistant {config.name}: {e}")
+            log.warning("assistant_lookup_failed", assistant=config.name, error=str(e))
 
         # Create new assistant
         try:
@@ -187,57 +351,71 @@ class RAGFlowAssistantManager:
             )
 
             # Update assistant with custom configuration
-            self._update_assistant_config(assistant, config)
+            pushed = self._update_assistant_config(assistant, config)
 
             self._current_assistant = assistant
-            print(f"🆕 Created new assistant: {config.name} (ID: {assistant.id})")
+            self._remember_assistant(config, assistant.id, pushed)
+            log.info("assistant_created", assistant=config.name, assistant_id=assistant.id)
             return assistant.id
 
         except Exception as e:
-            print(f"❌ Error creating assistant {config.name}: {e}")
+            log.error("assistant_create_failed", assistant=config.name, error=str(e))
             raise
 
-    def _update_assistant_config(self, assistant, config: AssistantConfig):
+    def _push_assistant_config(self, assistant, config: AssistantConfig):
+        """Send the assistant's dataset and prompt settings to RAGFlow (raises on failure)"""
+        # Get dataset ID
+        dataset_id = self.get_or_create_dataset(config.dataset_name)
+
+        # Prepare update payload with proper structure
+        # Note: LLM settings removed due to RAGFlow API bug (KeyError: 'model_type')
+        # LLM must be configured via RAGFlow UI instead
+        update_data = {
+            "name": config.name,
+            "dataset_ids": [dataset_id],
+            "prompt": {
+                "similarity_threshold": config.similarity_threshold,
+                "keywords_similarity_weight": config.keywords_similarity_weight,
+                "top_n": config.top_n,
+                "top_k": config.top_k,
+                "variables": [{"key": "knowledge", "optional": True}],
+                "opener": config.opener,
+                "show_quote": config.show_quote,
+                "prompt": config.system_prompt
+            }
+        }
+
+        # Update assistant
+        assistant.update(update_data)
+
+    def _update_assistant_config(self, assistant, config: AssistantConfig) -> bool:
         """
         Update assistant configuration if needed
 
         Args:
             assistant: RAGFlow Chat object
             config: New configuration
+
+        Returns:
+            True if RAGFlow accepted the settings
         """
         try:
-            # Get dataset ID
-            dataset_id = self.get_or_create_dataset(config.dataset_name)
-
-            # Prepare update payload with proper structure
-            # Note: LLM settings removed due to RAGFlow API bug (KeyError: 'model_type')
-            # LLM must be configured via RAGFlow UI instead
-            update_data = {
-                "name": config.name,
-                "dataset_ids": [dataset_id],
-                "prompt": {
-                    "similarity_threshold": config.similarity_threshold,
-                    "keywords_similarity_weight": config.keywords_similarity_weight,
-                    "top_n": config.top_n,
-                    "top_k": config.top_k,
-                    "variables": [{"key": "knowledge", "optional": True}],
-                    "opener": config.opener,
-                    "show_quote": config.show_quote,
-                    "prompt": config.system_prompt
-                }
-            }
-
-            # Update assistant
-            assistant.update(update_data)
-            print(f"🔄 Updated assistant configuration: {config.name}")
+            self._push_assistant_config(assistant, config)
+            log.info("assistant_config_updated", assistant=config.name, assistant_id=assistant.id)
+            return True
 
         except Exception as e:
-            print(f"⚠️  Error updating assistant config: {e}")
+            log.warning("assistant_config_update_failed", assistant=config.name, error=str(e))
+            return False
 
     def create_session(self, assistant_id: str, session_name: str = "New Session") -> str:
         """
         Create a new chat session
 
+        If RAGFlow no longer knows the assistant (e.g. a cached id whose assistant
+        was deleted and recreated), the assistant is rediscovered by name and the
+        session created on it.
+
         Args:
             assistant_id: ID of the chat assistant
             session_name: Name for the session
@@ -245,25 +423,93 @@ class RAGFlowAssistantManager:
         Returns:
             Session ID
         """
+        assistant_id = self._replaced_assistant_ids.get(assistant_id, assistant_id)
+        try:
+            return self._create_session(assistant_id, session_name)
+        except RAGFlowNotFoundError as e:
+            if self._config is None:
+                raise
+            self._forget_ids(self._config, e)
+            new_assistant_id = self.get_or_create_assistant(self._config)
+            if new_assistant_id == assistant_id:
+                raise
+            self._replaced_assistant_ids[assistant_id] = new_assistant_id
+            return self._create_session(new_assistant_id, session_name)
+
+    def _create_session(self, assistant_id: str, session_name: str) -> str:
+        started = time.perf_counter()
         try:
             # Get assistant if not cached
             if not self._current_assistant or self._current_assistant.id != assistant_id:
-                assistants = self.ragflow_client.list_chats(id=assistant_id)
+                assistants = self._call_with_retry(
+                    lambda: self.ragflow_client.list_chats(id=assistant_id)
+                )
                 # Defensive: ensure we have a list and check length before indexing
                 assistants = safe_list(assistants)
                 if len(assistants) == 0:
-                    raise ValueError(f"Assistant {assistant_id} not found")
+                    raise RAGFlowNotFoundError(f"Assistant {assistant_id} not found")
                 self._current_assistant = assistants[0]
 
             # Create session
-            session = self._current_assistant.create_session(name=session_name)
-            print(f"🆕 Created session: {session_name} (ID: {session.id})")
+            assistant = self._current_assistant
+            session = self._call_with_retry(lambda: assistant.create_session(name=session_name))
+            log.info("ragflow_session_created", assistant_id=assistant_id, ragflow_session_id=session.id,
+                     duration_ms=event_log.elapsed_ms(started))
             return session.id
 
         except Exception as e:
-            print(f"❌ Error creating session: {e}")
+            log.error("ragflow_session_create_failed", assistant_id=assistant_id, error=str(e),
+                      duration_ms=event_log.elapsed_ms(started))
             raise
 
+    def delete_sessions(self, assistant_id: str, session_ids: List[str]):
+        """
+        Delete chat sessions of an assistant
+
+        Args:
+            assistant_id: ID of the chat assistant owning the sessions
+            session_ids: Session IDs to delete
+        """
+        if not session_ids:
+            return
+        assistant = self._assistant_by_id(assistant_id)
+        self._call_with_retry(lambda: assistant.delete_sessions(ids=list(session_ids)))
+
+    def list_sessions(self, assistant_id: str, page: int = 1, page_size: int = 100) -> List[Dict[str, Any]]:
+        """
+        One page of an assistant's sessions, oldest first
+
+        Ascending creation order keeps earlier pages stable while new sessions
+        are being created.
+
+        Args:
+            assistant_id: ID of the chat assistant owning the sessions
+            page: 1-based page number
+            page_size: Sessions per page
+
+        Returns:
+            Dicts with id, name and create_time (ms since the epoch, None if not reported)
+        """
+        assistant = self._assistant_by_id(assistant_id)
+        sessions = safe_list(self._call_with_retry(
+            lambda: assistant.list_sessions(page=page, page_size=page_size, orderby="create_time", desc=False)
+        ))
+        return [
+            {"id": s.id, "name": getattr(s, "name", None), "create_time": getattr(s, "create_time", None)}
+            for s in sessions
+        ]
+
+    def _assistant_by_id(self, assistant_id: str):
+        """SDK handle of an assistant, looked up unless it is the current one"""
+        if not self._current_assistant or self._current_assistant.id != assistant_id:
+            assistants = safe_list(self._call_with_retry(
+                lambda: self.ragflow_client.list_chats(id=assistant_id)
+            ))
+            if len(assistants) == 0:
+                raise ValueError(f"Assistant {assistant_id} not found")
+            self._current_assistant = assistants[0]
+        return self._current_assistant
+
     def send_message(self, session_id: str, message: str, stream: bool = True) -> Generator[StreamingResponse, None, None]:
         """
         Send message to chat session and get streaming response
@@ -276,12 +522,33 @@ class RAGFlowAssistantManager:
         Yields:
             StreamingResponse objects
         """
+        # Fail fast instead of waiting for an HTTP timeout while RAGFlow is degraded
+        if not self._circuit.allow_request():
+            log.warning("ragflow_circuit_open", ragflow_session_id=session_id, base_url=self.base_url,
+                        retry_after_s=round(self._circuit.retry_after(), 1))
+            yield StreamingResponse(
+                content=f"Error: {RAGFLOW_UNAVAILABLE_MESSAGE}",
+                references=None,
+                is_complete=True
+            )
+            return
+
+        outcome_recorded = False
+        upstream = None
+        # Not made current: this generator yields to its caller between chunks
+        stream_span = tracing.start_span("ragflow.stream", ragflow_session_id=session_id,
+                                         base_url=self.base_url, stream=stream)
         try:
             # Find session
             if not self._current_assistant:
                 raise ValueError("No current assistant available")
 
-            sessions = self._current_assistant.list_sessions(id=session_id)
+            assistant = self._current_assistant
+            with metrics.timed("ragflow_session_lookup"), \
+                    tracing.span("ragflow.session_lookup", parent=stream_span.context):
+                # A missing session fails fast; the breaker outcome is recorded once, below
+                sessions = retry_with_jitter(_raise_not_found(lambda: assistant.list_sessions(id=session_id)),
+                                             give_up_on=(CircuitOpenError, RAGFlowNotFoundError))
             # Defensive: ensure we have a list and check length before indexing
             sessions = safe_list(sessions)
             if len(sessions) == 0:
@@ -293,10 +560,19 @@ class RAGFlowAssistantManager:
                 # Stream response
                 full_content = ""
                 references = []
+                ask_started = time.perf_counter()
+                first_token_seen = False
+                ttft_ms = None
 
-                for response in session.ask(message, stream=True):
+                upstream = session.ask(message, stream=True)
+                for response in upstream:
                     if response.content:
                         full_content = response.content
+                        if not first_token_seen:
+                            first_token_seen = True
+                            ttft_ms = event_log.elapsed_ms(ask_started)
+                            stream_span.add_event("first_token", ttft_ms=ttft_ms)
+                            metrics.observe_stage("ragflow_ttft", time.perf_counter() - ask_started)
 
                         yield StreamingResponse(
                             content=full_content,
@@ -304,6 +580,13 @@ class RAGFlowAssistantManager:
                             is_complete=False
                         )
 
+                self._circuit.record_success()
+                outcome_recorded = True
+                metrics.observe_stage("ragflow_stream", time.perf_counter() - ask_started)
+                log.info("ragflow_stream_completed", ragflow_session_id=session_id, chars=len(full_content),
+                         ttft_ms=ttft_ms, duration_ms=event_log.elapsed_ms(ask_started))
+                stream_span.set_attribute("chars", len(full_content))
+
                 # Final response
                 yield StreamingResponse(
                     content=full_content,
@@ -313,7 +596,10 @@ class RAGFlowAssistantManager:
 
             else:
                 # Non-streaming response
-                response = session.ask(message, stream=False)
+                with metrics.timed("ragflow_stream"):
+                    response = session.ask(message, stream=False)
+                self._circuit.record_success()
+                outcome_recorded = True
                 yield StreamingResponse(
                     content=response.content,
                     references=getattr(response, 'reference', None),
@@ -321,13 +607,37 @@ class RAGFlowAssistantManager:
                 )
 
         except Exception as e:
-            print(f"❌ Error sending message: {e}")
+            log.error("ragflow_request_failed", ragflow_session_id=session_id, base_url=self.base_url,
+                      error=str(e))
+            stream_span.record_exception(e)
+            if not outcome_recorded:
+                # Our own lookup errors mean RAGFlow answered; only transport/server errors trip the circuit
+                if isinstance(e, ValueError):
+                    self._circuit.record_success()
+                elif is_not_found_error(e):
+                    # The assistant itself is gone; rediscover it on the next create_session
+                    self._circuit.record_success()
+                    if self._config is not None:
+                        self._forget_ids(self._config, e)
+                else:
+                    self._circuit.record_failure()
+                outcome_recorded = True
             yield StreamingResponse(
                 content=f"Error: {str(e)}",
                 references=None,
                 is_complete=True
             )
 
+        finally:
+            if upstream is not None and hasattr(upstream, "close"):
+                # Drop the RAGFlow HTTP stream now rather than when it is garbage collected
+                upstream.close()
+            if not outcome_recorded:
+                # Consumer abandoned the stream before it finished
+                self._circuit.release()
+                stream_span.set_attribute("abandoned", True)
+            stream_span.end()
+
     def list_assistants(self) -> List[Dict]:
         """List all available chat assistants"""
         try:
@@ -343,16 +653,16 @@ class RAGFlowAssistantManager:
                 for assistant in assistants
             ]
         except Exception as e:
-            print(f"❌ Error listing assistants: {e}")
+            log.error("assistant_list_failed", error=str(e))
             return []
 
     def delete_assistant(self, assistant_id: str):
         """Delete a chat assistant"""
         try:
             self.ragflow_client.delete_chats(ids=[assistant_id])
-            print(f"🗑️ Deleted assistant: {assistant_id}")
+            log.info("assistant_deleted", assistant_id=assistant_id)
         except Exception as e:
-            print(f"❌ Error deleting assistant: {e}")
+            log.error("assistant_delete_failed", assistant_id=assistant_id, error=str(e))
             raise
 
     def health_check(self) -> Dict[str, bool]:
@@ -374,7 +684,7 @@ class RAGFlowAssistantManager:
             health_status["assistant_access"] = True
 
         except Exception as e:
-            print(f"⚠️  Health check failed: {e}")
+            log.warning("ragflow_health_check_failed", base_url=self.base_url, error=str(e))
 
         return health_status
 
@@ -389,7 +699,7 @@ class RAGFlowAssistantManager:
             True if successful, False otherwise
         """
         if not self._current_assistant:
-            print("❌ No current assistant available for prompt update")
+            log.error("assistant_prompt_update_failed", error="No current assistant available")
             return False
 
         try:
@@ -412,11 +722,12 @@ class RAGFlowAssistantManager:
 
             # Update assistant prompt
             self._current_assistant.update(update_data)
-            print(f"✅ Updated assistant prompt successfully")
+            log.info("assistant_prompt_updated", assistant_id=self._current_assistant.id,
+                     prompt_chars=len(new_prompt))
             return True
 
         except Exception as e:
-            print(f"❌ Error updating assistant prompt: {e}")
+            log.error("assistant_prompt_update_failed", assistant_id=self._current_assistant.id, error=str(e))
             return False
 
 
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+RAGFlow Backend Pool
+Health-weighted, least-outstanding-requests routing across several RAGFlow servers
+that serve the same dataset and assistant. Conversations stick to the backend that
+holds their RAGFlow session.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
+
+try:
+    from .ragflow_assistant_manager import RAGFlowAssistantManager, AssistantConfig, StreamingResponse
+    from .ragflow_id_cache import RAGFlowIdCache
+    from .circuit_breaker import CircuitBreaker
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    from ragflow_assistant_manager import RAGFlowAssistantManager, AssistantConfig, StreamingResponse
+    from ragflow_id_cache import RAGFlowIdCache
+    from circuit_breaker import CircuitBreaker
+    import event_log
+
+log = event_log.get_logger("ragflow_backend_pool")
+
+# Assumed latency for a backend before anything has been observed
+DEFAULT_LATENCY_SECONDS = 1.0
+# Smoothing factor for the exponentially weighted latency average
+LATENCY_EWMA_ALPHA = 0.3
+
+
+def parse_base_urls(base_url: str) -> List[str]:
+    """Split a comma-separated RAGFlow URL setting into a list of URLs"""
+    return [url.strip().rstrip("/") for url in base_url.split(",") if url.strip()]
+
+
+@dataclass
+class BackendState:
+    """Routing state for one RAGFlow backend"""
+    base_url: str
+    manager: RAGFlowAssistantManager
+    assistant_id: Optional[str] = None
+    outstanding: int = 0
+    healthy: bool = True
+    latency_ewma: Optional[float] = None
+    last_health_check: Optional[float] = None
+
+    def record_latency(self, seconds: float):
+        """Fold an observed latency into the moving average"""
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma = LATENCY_EWMA_ALPHA * seconds + (1 - LATENCY_EWMA_ALPHA) * self.latency_ewma
+
+    @property
+    def available(self) -> bool:
+        """Assistant resolved, healthy and not fast-failing behind an open circuit"""
+        return (self.assistant_id is not None and self.healthy
+                and self.manager.circuit_state != CircuitBreaker.OPEN)
+
+    @property
+    def weight(self) -> float:
+        """Routing weight: faster backends get proportionally more traffic"""
+        if not self.available:
+            return 0.0
+        return 1.0 / max(self.latency_ewma or DEFAULT_LATENCY_SECONDS, 1e-3)
+
+    def load_score(self) -> float:
+        """Weighted least-outstanding score (lower is better)"""
+        return (self.outstanding + 1) / self.weight
+
+
+class RAGFlowBackendPool:
+    """Drop-in replacement for RAGFlowAssistantManager that spreads chats over several backends"""
+
+    def __init__(self, api_key: str, base_urls: List[str], health_interval: float = 30.0,
+                 id_cache: Optional[RAGFlowIdCache] = None):
+        """
+        Initialize the backend pool
+
+        Args:
+            api_key: RAGFlow API key (shared by all backends)
+            base_urls: RAGFlow server base URLs serving the same dataset and assistant
+            health_interval: Seconds between background health probes (0 disables the loop)
+            id_cache: Persisted assistant/dataset ids, shared by all backends (entries are per URL)
+        """
+        if not base_urls:
+            raise ValueError("At least one RAGFlow base URL is required")
+
+        self.api_key = api_key
+        self.base_urls = list(base_urls)
+        self.base_url = self.base_urls[0]
+        self.health_interval = health_interval
+        self.backends: Dict[str, BackendState] = {
+            url: BackendState(base_url=url, manager=RAGFlowAssistantManager(api_key=api_key, base_url=url,
+                                                                           id_cache=id_cache))
+            for url in self.base_urls
+        }
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, str] = {}  # ragflow session ID -> base URL
+        self._assistant_config: Optional[AssistantConfig] = None  # For retrying backends that failed to resolve
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self._health_listeners: List[Callable[[Dict[str, bool], float, Optional[str]], None]] = []
+
+        if health_interval > 0:
+            self.start_health_monitor()
+
+    # ----------------------------------------------------------------- routing
+
+    def _pick_backend(self) -> BackendState:
+        """Choose the backend with the lowest weighted outstanding load"""
+        with self._lock:
+            candidates = [b for b in self.backends.values() if b.available]
+            if not candidates:
+                # Nothing looks healthy; spread load anyway rather than refusing outright
+                return min(self.backends.values(), key=lambda b: b.outstanding)
+            return min(candidates, key=lambda b: b.load_score())
+
+    def bind_session(self, session_id: str, base_url: Optional[str]):
+        """
+        Pin a RAGFlow session to the backend that created it
+
+        Sessions recorded without a backend (chats saved before the pool
+        existed) live on the server the app used then: the first URL in
+        RAGFLOW_BASE_URLS, which should be the former RAGFLOW_BASE_URL.
+        """
+        if not session_id:
+            return
+        if base_url not in self.backends:
+            base_url = self.base_url
+        with self._lock:
+            self._sessions[session_id] = base_url
+
+    def unbind_session(self, session_id: str):
+        """Forget a session's backend (its chat was deleted, rolled over or evicted)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def backend_for_session(self, session_id: str) -> Optional[str]:
+        """Base URL of the backend holding a RAGFlow session"""
+        return self._sessions.get(session_id)
+
+    # ------------------------------------------------------ manager interface
+
+    @property
+    def circuit_state(self) -> str:
+        """Closed if any backend accepts traffic, otherwise open"""
+        if any(b.manager.circuit_state != CircuitBreaker.OPEN for b in self.backends.values()):
+            return CircuitBreaker.CLOSED
+        return CircuitBreaker.OPEN
+
+    def get_or_create_assistant(self, config: AssistantConfig) -> str:
+        """
+        Resolve the assistant on every backend
+
+        Backends that fail are left out of routing; the health loop retries them.
+
+        Returns:
+            Assistant ID on the first backend that resolved it
+        """
+        self._assistant_config = config
+        assistant_id = None
+        for backend in self.backends.values():
+            if self._resolve_assistant(backend):
+                assistant_id = assistant_id or backend.assistant_id
+
+        if assistant_id is None:
+            raise ValueError(f"Assistant {config.name} unavailable on all RAGFlow backends")
+        return assistant_id
+
+    def _resolve_assistant(self, backend: BackendState) -> bool:
+        """Resolve the assistant on one backend; False (and the backend unhealthy) if that fails"""
+        try:
+            backend.assistant_id = backend.manager.get_or_create_assistant(self._assistant_config)
+            return True
+        except Exception as e:
+            backend.healthy = False
+            log.warning("backend_assistant_failed", base_url=backend.base_url, error=str(e))
+            return False
+
+    def create_session(self, assistant_id: str, session_name: str = "New Session") -> str:
+        """
+        Create a session on the least-loaded backend and pin it there
+
+        assistant_id is the id on the first backend; each backend uses the id
+        it resolved itself, since ids differ between servers.
+        """
+        backend = self._pick_backend()
+        if backend.assistant_id is None and not (self._assistant_config and self._resolve_assistant(backend)):
+            raise ValueError(f"Assistant not resolved on RAGFlow backend {backend.base_url}")
+        session_id = backend.manager.create_session(backend.assistant_id, session_name)
+        self.bind_session(session_id, backend.base_url)
+        return session_id
+
+    def delete_sessions(self, assistant_id: str, session_ids: List[str]):
+        """Delete sessions on the backends holding them, each with that backend's assistant id"""
+        by_backend: Dict[str, List[str]] = {}
+        for session_id in session_ids:
+            by_backend.setdefault(self._sessions.get(session_id, self.base_url), []).append(session_id)
+        for base_url, ids in by_backend.items():
+            backend = self.backends[base_url]
+            if backend.assistant_id is None:
+                raise ValueError(f"Assistant not resolved on RAGFlow backend {base_url}")
+            backend.manager.delete_sessions(backend.assistant_id, ids)
+            for session_id in ids:
+                self.unbind_session(session_id)
+
+    def send_message(self, session_id: str, message: str, stream: bool = True) -> Generator[StreamingResponse, None, None]:
+        """Send a message on the backend holding the session"""
+        base_url = self._sessions.get(session_id)
+        if base_url is None:
+            # Never bound: a session from before the pool, which only the original server has
+            self.bind_session(session_id, None)
+            base_url = self.base_url
+        backend = self.backends[base_url]
+
+        with self._lock:
+            backend.outstanding += 1
+        started = time.perf_counter()
+        first_chunk = True
+        try:
+            for response in backend.manager.send_message(session_id, message, stream=stream):
+                if first_chunk:
+                    first_chunk = False
+                    with self._lock:
+                        backend.record_latency(time.perf_counter() - started)
+                yield response
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def list_assistants(self) -> List[Dict]:
+        """List assistants from the first available backend"""
+        return self._pick_backend().manager.list_assistants()
+
+    def update_prompt(self, new_prompt: str) -> bool:
+        """Update the system prompt on every backend"""
+        results = [b.manager.update_prompt(new_prompt) for b in self.backends.values()]
+        return all(results)
+
+    def health_check(self) -> Dict[str, bool]:
+        """Aggregate health: True for a check if any backend passes it"""
+        combined, error = self.probe_all()
+        if not combined and error:
+            raise ConnectionError(error)
+        return combined
+
+    # ------------------------------------------------------- health monitoring
+
+    def _probe(self, backend: BackendState) -> Dict[str, bool]:
+        if backend.assistant_id is None and self._assistant_config is not None:
+            # Retry a backend that was down when the assistant was first resolved
+            self._resolve_assistant(backend)
+        started = time.perf_counter()
+        status = backend.manager.health_check()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            backend.healthy = all(status.values())
+            backend.last_health_check = time.time()
+            if backend.healthy:
+                backend.record_latency(elapsed)
+        return status
+
+    def probe_all(self) -> Tuple[Dict[str, bool], Optional[str]]:
+        """
+        Probe every backend once
+
+        Returns:
+            (checks, error): each check True if any backend passed it, and the
+            last probe error (None if every backend answered)
+        """
+        combined: Dict[str, bool] = {}
+        error = None
+        for backend in list(self.backends.values()):
+            try:
+                status = self._probe(backend)
+            except Exception as e:
+                backend.healthy = False
+                error = f"{backend.base_url}: {e}"
+                log.warning("backend_probe_failed", base_url=backend.base_url, error=str(e))
+                continue
+            for key, ok in status.items():
+                combined[key] = combined.get(key, False) or ok
+        return combined, error
+
+    def add_health_listener(self, listener: Callable[[Dict[str, bool], float, Optional[str]], None]):
+        """
+        Call listener(checks, latency_ms, error) after every round of the health loop
+
+        Lets the app's health monitor follow the pool's probes instead of
+        probing every backend again on its own timer.
+        """
+        with self._lock:
+            self._health_listeners.append(listener)
+
+    def remove_health_listener(self, listener: Callable[[Dict[str, bool], float, Optional[str]], None]):
+        with self._lock:
+            if listener in self._health_listeners:
+                self._health_listeners.remove(listener)
+
+    def _health_round(self):
+        started = time.perf_counter()
+        checks, error = self.probe_all()
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            listeners = list(self._health_listeners)
+        for listener in listeners:
+            listener(checks, latency_ms, error)
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.health_interval):
+            self._health_round()
+
+    @property
+    def health_loop_running(self) -> bool:
+        return self._health_thread is not None and self._health_thread.is_alive()
+
+    def start_health_monitor(self):
+        """Start the background health loop (idempotent)"""
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, name="ragflow-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_monitor(self):
+        """Stop the background health loop"""
+        self._stop_event.set()
+
+    def backend_status(self) -> List[Dict]:
+        """Snapshot of routing state for diagnostics"""
+        with self._lock:
+            return [
+                {
+                    "base_url": b.base_url,
+                    "healthy": b.healthy,
+                    "assistant_id": b.assistant_id,
+                    "circuit": b.manager.circuit_state,
+                    "outstanding": b.outstanding,
+                    "latency_ewma": b.latency_ewma,
+                    "weight": b.weight,
+                }
+                for b in self.backends.values()
+            ]
+
+
+_pools: Dict[tuple, RAGFlowBackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def create_backend_manager(api_key: str, base_url: str, health_interval: float = 30.0,
+                           id_cache: Optional[RAGFlowIdCache] = None
+                           ) -> Union[RAGFlowAssistantManager, RAGFlowBackendPool]:
+    """
+    Create the RAGFlow client for one or more backends
+
+    A single URL returns a plain RAGFlowAssistantManager. A comma-separated list
+    returns a process-wide shared RAGFlowBackendPool so outstanding-request counts
+    and session pinning are shared by every browser session.
+    """
+    base_urls = parse_base_urls(base_url)
+    if len(base_urls) <= 1:
+        return RAGFlowAssistantManager(api_key=api_key, base_url=base_urls[0] if base_urls else base_url,
+                                       id_cache=id_cache)
+
+    key = (api_key, tuple(base_urls))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = RAGFlowBackendPool(api_key, base_urls, health_interval=health_interval,
+                                             id_cache=id_cache)
+        return _pools[key]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+RAGFlow ID Cache
+Remembers the assistant and dataset ids resolved on each RAGFlow server, plus a
+fingerprint of the assistant settings last pushed there, in a small JSON file.
+A restarted process with unchanged settings uses the ids directly instead of
+listing chats and datasets by name and pushing the configuration again.
+
+Entries are trusted until RAGFlow reports the id as missing; the manager then
+drops the entry and rediscovers by name.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("ragflow_id_cache")
+
+# Bump when the file layout changes; older files are ignored
+CACHE_VERSION = 1
+
+
+def config_fingerprint(config) -> str:
+    """Stable hash of an AssistantConfig; changes whenever any setting does"""
+    payload = json.dumps(asdict(config), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class RAGFlowIdCache:
+    """
+    Assistant and dataset ids per RAGFlow server, persisted as JSON
+
+    Entries are scoped by server URL and a hash of the API key, so several
+    backends or tenants can share one file. Writes replace the file atomically;
+    a missing or unreadable file simply means an empty cache.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @staticmethod
+    def scope(base_url: str, api_key: str) -> str:
+        return f"{base_url.rstrip('/')}#{hashlib.sha256(api_key.encode()).hexdigest()[:8]}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                data = json.loads(self.path.read_text())
+                self._entries = data.get("entries", {}) if data.get("version") == CACHE_VERSION else {}
+            except (OSError, ValueError, AttributeError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps({"version": CACHE_VERSION, "entries": self._entries}, indent=2))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("ragflow_id_cache_write_failed", path=str(self.path), error=str(e))
+
+    def get(self, scope: str, kind: str, name: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for an assistant or dataset name, or None"""
+        with self._lock:
+            return self._load().get(scope, {}).get(f"{kind}:{name}")
+
+    def put(self, scope: str, kind: str, name: str, **entry: Any):
+        """Store the resolved id (and anything else worth keeping) for a name"""
+        entry["resolved_at"] = datetime.now().isoformat()
+        with self._lock:
+            self._load().setdefault(scope, {})[f"{kind}:{name}"] = entry
+            self._save()
+
+    def invalidate(self, scope: str, kind: str, name: str):
+        """Forget a name, e.g. after RAGFlow reported its id missing"""
+        with self._lock:
+            if self._load().get(scope, {}).pop(f"{kind}:{name}", None) is not None:
+                self._save()
+
+
+def create_id_cache(data_dir: Path) -> Optional[RAGFlowIdCache]:
+    """
+    The id cache for a data directory, unless disabled
+
+    RAGFLOW_ID_CACHE_FILE overrides the location (default: <data_dir>/ragflow_ids.json);
+    RAGFLOW_ID_CACHE_ENABLED=false turns caching off.
+    """
+    if os.getenv("RAGFLOW_ID_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return RAGFlowIdCache(Path(os.getenv("RAGFLOW_ID_CACHE_FILE") or Path(data_dir) / "ragflow_ids.json"))
@@ -7,43 +7,77 @@ A minimal, user-friendly Streamlit interface for protein structure queries
 import streamlit as st
 import time
 import os
-import re
 import uuid
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-from user_session_manager import UserSessionManager, UserChat, create_manager
+from user_session_manager import ChatHistoryView, StoredMessage, UserSessionManager, UserChat, create_manager
+from generation_worker import GenerationJob, get_generation_worker
+from markdown_processing import StreamingMarkdownProcessor, render_stored_answer
+from reference_view import REFERENCE_MAX_BYTES_PER_MESSAGE, build_reference_view
+import event_log
+import health_monitor
+import metrics
+import profiling
+import tracing
 
+log = event_log.get_logger("rcsb_pdb_chatbot")
 
-def process_markdown_response(content: str) -> str:
+
+@st.cache_resource(show_spinner=False)
+def get_session_manager() -> UserSessionManager:
     """
-    Extract markdown content from code blocks if wrapped in ```markdown blocks
+    Process-wide session manager shared by every browser session
 
-    Args:
-        content: The response content, potentially wrapped in ```markdown blocks
+    One cache of user chats per process, so a reloaded page sees the answer
+    another run is still generating. Its health monitor starts here, with the
+    /livez and /readyz probe endpoint on HEALTH_PORT.
+    """
+    manager = create_manager()
+    manager.health_monitor.start()
+    health_monitor.start_health_server(manager.health_monitor)
+    return manager
 
-    Returns:
-        Extracted markdown content ready for st.markdown() display
+
+def make_cancel_check():
+    """
+    Build a should_cancel callback for an answer asked from this browser session
+
+    True once the session is gone (tab closed or reloaded); the worker then
+    gives a reloaded page GENERATION_ABANDON_SECONDS to reattach before it
+    cancels. Must be called on the script thread.
     """
-    if not content:
-        return content
+    try:
+        from streamlit import runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+    if ctx is None:
+        return None
 
-    # Check if content is wrapped in markdown code blocks
-    markdown_pattern = r'^```markdown\s*\n(.*?)\n```$'
-    match = re.match(markdown_pattern, content.strip(), re.DOTALL)
+    def should_cancel() -> bool:
+        return runtime.exists() and not runtime.get_instance().is_active_session(ctx.session_id)
 
-    if match:
-        # Extract and return the markdown content
-        return match.group(1)
+    return should_cancel
 
-    # If not wrapped in code blocks, return as-is
-    return content
+
+def assistant_warming_up() -> bool:
+    """Turn new traffic away (with a notice) until the assistant is resolved and warm"""
+    if st.session_state.session_manager.health_monitor.warm:
+        return False
+    log.warning("traffic_rejected_warming_up", user_id=st.session_state.browser_session_id)
+    st.info("The assistant is starting up. Please try again in a few moments.")
+    return True
 
 
 def init_session_state():
     """Initialize Streamlit session state variables"""
+    # Prometheus scrape endpoint (no-op unless METRICS_ENABLED=true; started once per process)
+    metrics.start_metrics_server()
+
     if "session_manager" not in st.session_state:
-        st.session_state.session_manager = create_manager()
+        st.session_state.session_manager = get_session_manager()
 
     if "browser_session_id" not in st.session_state:
         st.session_state.browser_session_id = None
@@ -51,12 +85,12 @@ def init_session_state():
     if "current_chat_id" not in st.session_state:
         st.session_state.current_chat_id = None
 
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-
     if "show_references" not in st.session_state:
         st.session_state.show_references = True
 
+    if "full_reference_chunks" not in st.session_state:
+        st.session_state.full_reference_chunks = {}
+
 
 def init_anonymous_session():
     """Initialize anonymous session with auto-generated UUID"""
@@ -78,7 +112,11 @@ def init_anonymous_session():
         if existing_chats:
             # Resume most recent chat
             st.session_state.current_chat_id = existing_chats[-1].chat_id
+            log.info("ui_chat_resumed", user_id=browser_session_id, chat_id=existing_chats[-1].chat_id,
+                     chats=len(existing_chats))
         else:
+            if assistant_warming_up():
+                st.stop()
             # Create first chat
             chat_title = f"Help Session {datetime.now().strftime('%Y-%m-%d %H:%M')}"
             new_chat = st.session_state.session_manager.create_user_chat(
@@ -86,44 +124,37 @@ def init_anonymous_session():
                 chat_title
             )
             st.session_state.current_chat_id = new_chat.chat_id
+            log.info("ui_chat_started", user_id=browser_session_id, chat_id=new_chat.chat_id, reason="first_visit")
 
-        load_chat_messages()
 
+def current_chat_history() -> ChatHistoryView:
+    """
+    Read-only view of the current chat's messages
 
-def load_chat_messages():
-    """Load stored messages for the current chat"""
+    The session manager's cached chat is the single copy of the history; tabs
+    render straight from it instead of holding their own copy in session state.
+    """
     if not st.session_state.browser_session_id or not st.session_state.current_chat_id:
-        st.session_state.messages = []
-        return
+        return ChatHistoryView([])
 
     try:
-        # Get stored messages from the session manager
-        stored_messages = st.session_state.session_manager.get_chat_messages(
+        return st.session_state.session_manager.get_chat_history(
             st.session_state.browser_session_id,
             st.session_state.current_chat_id
         )
+    except Exception as e:
+        log.error("ui_history_load_failed", user_id=st.session_state.browser_session_id,
+                  chat_id=st.session_state.current_chat_id, error=str(e))
+        return ChatHistoryView([])
 
-        # Convert StoredMessage objects to Streamlit message format
-        st.session_state.messages = []
-        for stored_msg in stored_messages:
-            message_dict = {
-                "role": stored_msg.role,
-                "content": stored_msg.content,
-                "timestamp": stored_msg.timestamp.isoformat(),
-                "message_id": stored_msg.message_id
-            }
-
-            # Add references if available
-            if stored_msg.references:
-                message_dict["references"] = stored_msg.references
-
-            st.session_state.messages.append(message_dict)
-
-        print(f"Loaded {len(st.session_state.messages)} messages for chat {st.session_state.current_chat_id}")
 
-    except Exception as e:
-        print(f"Error loading chat messages: {e}")
-        st.session_state.messages = []
+def switch_chat(chat_id: str):
+    """Make another chat current, cancelling answers still generating in the one being left"""
+    previous_chat_id = st.session_state.current_chat_id
+    if previous_chat_id and previous_chat_id != chat_id:
+        get_generation_worker(st.session_state.session_manager).cancel_chat(
+            st.session_state.browser_session_id, previous_chat_id)
+    st.session_state.current_chat_id = chat_id
 
 
 def start_new_chat():
@@ -133,8 +164,9 @@ def start_new_chat():
         st.session_state.browser_session_id,
         chat_title
     )
-    st.session_state.current_chat_id = new_chat.chat_id
-    st.session_state.messages = []
+    switch_chat(new_chat.chat_id)
+    log.info("ui_chat_started", user_id=st.session_state.browser_session_id, chat_id=new_chat.chat_id,
+             reason="new_chat_button")
 
 
 def display_header():
@@ -166,17 +198,55 @@ def display_header():
     st.divider()
 
 
-def display_star_rating(message: Dict[str, Any]):
+@st.fragment
+def display_references(message_id: Optional[str], references: List[Dict[str, Any]]):
+    """
+    Render the reference chunks of an assistant message on demand
+
+    Nothing but the toggle is sent to the browser until the user opens the
+    references. Opened chunks show a short preview with a "Show full chunk"
+    action, and total reference text per message is capped
+    (REFERENCE_MAX_BYTES_PER_MESSAGE). Runs as a fragment so toggling only
+    rerenders this message's references.
+    """
+    if not st.toggle(f"References ({len(references)})", key=f"refs_{message_id}"):
+        return
+
+    full_chunks = st.session_state.full_reference_chunks.setdefault(message_id, set())
+    items = build_reference_view(references, full_chunks)
+
+    with st.container(border=True):
+        for item in items:
+            st.markdown(f"**Reference {item.index}: {item.document_name}**")
+            st.caption(f"Similarity Score: {item.similarity:.2f}")
+
+            if item.text:
+                st.markdown(item.text + (" …" if item.is_truncated else ""), unsafe_allow_html=False)
+            if item.can_expand:
+                st.button("Show full chunk", key=f"ref_full_{message_id}_{item.index}",
+                          on_click=full_chunks.add, args=(item.index,))
+
+            if item.index < len(items):
+                st.divider()
+
+        if any(item.is_truncated and not item.can_expand for item in items):
+            st.caption(f"Reference text is limited to {REFERENCE_MAX_BYTES_PER_MESSAGE // 1024} KB per answer.")
+
+
+@st.fragment
+def display_star_rating(message: StoredMessage):
     """
     Display inline 1-5 star rating under assistant message
 
+    Runs as a fragment: clicking a star reruns only this widget, not the app.
+
     Args:
-        message: Message dictionary containing role, content, message_id, etc.
+        message: Stored message (role, content, message_id, etc.)
     """
-    if message["role"] != "assistant":
+    if message.role != "assistant":
         return
 
-    message_id = message.get("message_id")
+    message_id = message.message_id
     if not message_id:
         return
 
@@ -215,31 +285,119 @@ def display_star_rating(message: Dict[str, Any]):
                     "star_rating": new_rating,
                     "feedback_timestamp": datetime.now().isoformat()
                 }
-                st.session_state.session_manager.add_message_feedback(
+                if st.session_state.session_manager.add_message_feedback(
                     st.session_state.browser_session_id,
                     st.session_state.current_chat_id,
                     message_id,
                     feedback_data
-                )
+                ):
+                    existing_rating = new_rating
 
     with col2:
         if existing_rating:
             st.caption(f"Rated: {existing_rating}/5")
 
 
+def follow_answer(job: GenerationJob) -> bool:
+    """
+    Stream an answer that is being generated in the background into the page
+
+    The answer keeps generating if this run is interrupted by a rerun or reload;
+    the next run reattaches to it by message_id. New Chat cancels it, and so
+    does closing the tab (see make_cancel_check).
+
+    Returns:
+        True if the answer finished without an error
+    """
+    st.button("Stop generating", key=f"stop_{job.message_id}", on_click=job.cancel)
+    message_placeholder = st.empty()
+    markdown_stream = StreamingMarkdownProcessor()
+
+    content = ""
+    for content in job.follow():
+        message_placeholder.markdown(markdown_stream.feed(content))
+    message_placeholder.markdown(markdown_stream.finish(content))
+
+    if job.error is not None:
+        log.error("ui_answer_failed", user_id=job.user_id, chat_id=job.chat_id, message_id=job.message_id,
+                  error=str(job.error))
+        st.error(f"Error getting response: {job.error}")
+        return False
+    return True
+
+
+@st.fragment
+def display_message_history():
+    """Render stored messages; runs as a fragment so it can refresh independently"""
+    for message in current_chat_history():
+        with st.chat_message(message.role):
+            if message.generating:
+                # Answer still streaming (e.g. the page was reloaded mid-answer): reattach
+                job = get_generation_worker(st.session_state.session_manager).get_job(message.message_id)
+                if job is not None and follow_answer(job):
+                    st.rerun()
+
+            # Processed markdown is memoised per message_id (once finished), shared by every tab
+            st.markdown(render_stored_answer(None if message.generating else message.message_id,
+                                             message.content))
+            if message.truncated:
+                st.caption("Answer interrupted before it finished.")
+
+            if message.role == "assistant":
+                # Show references if available
+                if st.session_state.show_references and message.references:
+                    display_references(message.message_id, message.references)
+
+                # Add star rating for assistant messages
+                display_star_rating(message)
+
+
+@st.fragment
+def display_chat_input():
+    """
+    Chat input and streaming answer
+
+    Runs as a fragment while the answer streams, then triggers one full rerun so the
+    finished turn joins the message history. Generation itself runs on the
+    background worker, so it survives this run being interrupted.
+    """
+    prompt = st.chat_input("Ask about RCSB PDB, protein structures, or anything related...")
+    if not prompt or assistant_warming_up():
+        return
+
+    # Display user message (the session manager stores it with the turn)
+    with st.chat_message("user"):
+        st.write(prompt)
+
+    # Generate in the background and follow the answer as it streams
+    with st.chat_message("assistant"), tracing.span("ui.chat_input", user_id=st.session_state.browser_session_id,
+                                                    chat_id=st.session_state.current_chat_id):
+        try:
+            job = get_generation_worker(st.session_state.session_manager).submit(
+                st.session_state.browser_session_id,
+                st.session_state.current_chat_id,
+                prompt,
+                profile=profiling.query_requests_profile(st.query_params.get("profile")),
+                should_cancel=make_cancel_check()
+            )
+        except Exception as e:
+            log.error("ui_answer_failed", user_id=st.session_state.browser_session_id,
+                      chat_id=st.session_state.current_chat_id, error=str(e))
+            st.error(f"Error getting response: {e}")
+            return
+
+        if not follow_answer(job):
+            return
+
+    # Fold the stored turn into the history (renders its references and rating)
+    st.rerun()
+
+
 def display_chat_interface():
     """Display the main chat interface"""
 
-    # Get current chat info for context
-    current_chat = None
-    if st.session_state.current_chat_id:
-        current_chat = st.session_state.session_manager.get_user_chat(
-            st.session_state.browser_session_id,
-            st.session_state.current_chat_id
-        )
-
     # Display welcome message if no messages yet
-    if not st.session_state.messages:
+    if not current_chat_history():
         st.markdown("""
         ### Welcome to RCSB PDB
 
@@ -254,119 +412,10 @@ def display_chat_interface():
         """)
 
     # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            # Process and render markdown content
-            processed_content = process_markdown_response(message["content"])
-            st.markdown(processed_content)
-
-            # Show references if available
-            if (message["role"] == "assistant" and
-                st.session_state.show_references and
-                message.get("references")):
-
-                with st.expander("References"):
-                    for i, ref in enumerate(message["references"], 1):
-                        st.markdown(f"**Reference {i}: {ref.get('document_name', 'Unknown')}**")
-                        st.caption(f"Similarity Score: {ref.get('similarity', 0):.2f}")
-
-                        ref_content = ref.get('content', '')
-                        if ref_content:
-                            with st.container():
-                                st.markdown("**Content:**")
-                                st.markdown(ref_content, unsafe_allow_html=False)
-
-                        if i < len(message["references"]):
-                            st.divider()
-
-            # Add star rating for assistant messages
-            if message["role"] == "assistant":
-                display_star_rating(message)
+    display_message_history()
 
     # Chat input
-    if prompt := st.chat_input("Ask about RCSB PDB, protein structures, or anything related..."):
-        # Add user message to chat history
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "message_id": str(uuid.uuid4()),
-            "timestamp": datetime.now().isoformat()
-        })
-
-        # Display user message
-        with st.chat_message("user"):
-            st.write(prompt)
-
-        # Get AI response
-        with st.chat_message("assistant"):
-            message_placeholder = st.empty()
-            full_response = ""
-            references = []
-
-            try:
-                # Stream response from RAGFlow
-                assistant_message_id = None
-                for response_chunk in st.session_state.session_manager.send_message_to_chat(
-                    st.session_state.browser_session_id,
-                    st.session_state.current_chat_id,
-                    prompt
-                ):
-                    # Update the message as it streams
-                    if response_chunk.content != full_response:
-                        full_response = response_chunk.content
-                        processed_content = process_markdown_response(full_response)
-                        message_placeholder.markdown(processed_content)
-
-                    # Capture references and message ID from the final response
-                    if response_chunk.references:
-                        references = response_chunk.references
-                    if response_chunk.message_id:
-                        assistant_message_id = response_chunk.message_id
-
-                # Add assistant message to chat history
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": full_response,
-                    "references": references,
-                    "message_id": assistant_message_id,
-                    "timestamp": datetime.now().isoformat()
-                })
-
-                # Show references if available
-                if st.session_state.show_references and references:
-                    with st.expander("References"):
-                        for i, ref in enumerate(references, 1):
-                            st.markdown(f"**Reference {i}: {ref.get('document_name', 'Unknown')}**")
-                            st.caption(f"Similarity Score: {ref.get('similarity', 0):.2f}")
-
-                            ref_content = ref.get('content', '')
-                            if ref_content:
-                                with st.container():
-                                    st.markdown("**Content:**")
-                                    st.markdown(ref_content, unsafe_allow_html=False)
-
-                            if i < len(references):
-                                st.divider()
-
-                # Add star rating for the new response
-                if full_response:
-                    new_message = {
-                        "role": "assistant",
-                        "content": full_response,
-                        "references": references,
-                        "message_id": assistant_message_id,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    display_star_rating(new_message)
-
-            except Exception as e:
-                st.error(f"Error getting response: {e}")
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": f"Sorry, I encountered an error: {e}",
-                    "message_id": str(uuid.uuid4()),
-                    "timestamp": datetime.now().isoformat()
-                })
+    display_chat_input()
 
 
 def main():
@@ -403,17 +452,21 @@ def main():
     </style>
     """, unsafe_allow_html=True)
 
-    # Initialize session state
-    init_session_state()
+    # Profile this run if sampled, or if opened with ?profile=<PROFILING_QUERY_SECRET>
+    force_profile = profiling.query_requests_profile(st.query_params.get("profile"))
+    with profiling.profile_request("script_run", force=force_profile), log.timed("ui_script_run"), \
+            tracing.span("ui.script_run"):
+        # Initialize session state
+        init_session_state()
 
-    # Initialize anonymous session (auto UUID + auto chat)
-    init_anonymous_session()
+        # Initialize anonymous session (auto UUID + auto chat)
+        init_anonymous_session()
 
-    # Display header with New Chat button
-    display_header()
+        # Display header with New Chat button
+        display_header()
 
-    # Display chat interface
-    display_chat_interface()
+        # Display chat interface
+        display_chat_interface()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Reference View
+Prepares the reference chunks of an assistant message for display: short previews
+by default, full chunks on request, and a byte budget per message.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+# Characters of each chunk shown before "Show full chunk"
+REFERENCE_PREVIEW_CHARS = int(os.getenv("REFERENCE_PREVIEW_CHARS", "300"))
+# Upper bound on reference text sent to the browser for one message
+REFERENCE_MAX_BYTES_PER_MESSAGE = int(os.getenv("REFERENCE_MAX_BYTES_PER_MESSAGE", "16384"))
+
+
+@dataclass
+class ReferenceItem:
+    """One reference as it will be rendered"""
+    index: int
+    document_name: str
+    similarity: float
+    text: str
+    is_truncated: bool  # Less than the full chunk is shown
+    can_expand: bool  # A "show full chunk" action makes sense
+
+
+def _clip_bytes(text: str, max_bytes: int) -> str:
+    """Clip text to at most max_bytes of UTF-8 without splitting a character"""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore")
+
+
+def _preview(text: str, limit: int) -> str:
+    """Cut text at a word boundary near limit characters"""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    return cut[:space] if space > limit // 2 else cut
+
+
+def build_reference_view(references: Optional[List[Dict[str, Any]]],
+                         full_indexes: Iterable[int] = (),
+                         preview_chars: int = REFERENCE_PREVIEW_CHARS,
+                         max_bytes: int = REFERENCE_MAX_BYTES_PER_MESSAGE) -> List[ReferenceItem]:
+    """
+    Decide what text to show for each reference of a message
+
+    Args:
+        references: Reference chunks as stored with the message
+        full_indexes: 1-based indexes of chunks the user asked to see in full
+        preview_chars: Preview length for collapsed chunks
+        max_bytes: Total reference text budget for the message
+
+    Returns:
+        ReferenceItem list in display order
+    """
+    full_indexes = set(full_indexes)
+    remaining = max_bytes
+    items = []
+
+    for i, ref in enumerate(references or [], 1):
+        content = ref.get("content", "") or ""
+        wanted = content if i in full_indexes else _preview(content, preview_chars)
+        text = _clip_bytes(wanted, max(remaining, 0))
+        remaining -= len(text.encode("utf-8"))
+
+        items.append(ReferenceItem(
+            index=i,
+            document_name=ref.get("document_name", "Unknown"),
+            similarity=ref.get("similarity", 0) or 0,
+            text=text,
+            is_truncated=len(text) < len(content),
+            can_expand=i not in full_indexes and len(text) < len(content) and remaining > 0,
+        ))
+
+    return items
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Conversation Search Index
+SQLite FTS5 index over stored questions and answers, so support staff can find
+past conversations without reading every user file.
+
+The index lives next to the user files (search_index.sqlite3) and is updated
+as questions and finished answers are stored; deleting chats or users removes
+their rows. `--rebuild` indexes an existing data directory from scratch. Queries
+are plain words (all must match, with stemming, e.g. "validation reports"
+finds "validation report"); results are ranked by BM25 with a snippet of the
+matching text. Only the SEARCH_MAX_CANDIDATES most recently indexed matches
+of a query are ranked, which keeps queries fast however large the index grows;
+results are marked truncated when older matches were left out.
+
+Usage:
+    python search_index.py "PDBx/mmCIF validation report"
+    python search_index.py "ligand restraints" --user <user id> --limit 5 --json
+    python search_index.py --rebuild
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("search_index")
+
+# Newest matches ranked per query; bounds query time for very common words (0 = rank all)
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "20000"))
+
+INDEX_FILE = "search_index.sqlite3"
+WORD = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    message_id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_chat ON messages (chat_id);
+CREATE INDEX IF NOT EXISTS messages_user ON messages (user_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, user_id, tokenize = 'porter unicode61');
+"""
+
+
+@dataclass
+class SearchHit:
+    """One matching message"""
+    user_id: str
+    chat_id: str
+    message_id: str
+    role: str
+    timestamp: Optional[str]
+    snippet: str
+    score: float  # BM25; lower is a better match
+
+
+class SearchResults(list):
+    """SearchHits in rank order; truncated is True if older matches were not ranked"""
+
+    def __init__(self, hits: Iterable[SearchHit] = (), truncated: bool = False):
+        super().__init__(hits)
+        self.truncated = truncated
+
+
+def to_fts_query(text: str) -> str:
+    """Free text to an FTS5 query: every word must match (punctuation such as / and - is ignored)"""
+    return " ".join(f'"{word}"' for word in WORD.findall(text))
+
+
+class SearchIndex:
+    """
+    Full-text index of messages, one SQLite database per data directory
+
+    A single connection is shared by the process's threads behind a lock; WAL
+    mode lets other processes (the chat API, the CLI) read while it writes.
+    """
+
+    def __init__(self, path: Path, max_candidates: int = SEARCH_MAX_CANDIDATES):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            max_candidates: Newest matches ranked per query (0 = rank every match)
+        """
+        self.path = Path(path)
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _upsert(self, user_id: str, chat_id: str, message_id: str, role: str, content: str,
+                timestamp: Optional[str]):
+        row = self._conn.execute("SELECT rowid FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM messages_fts WHERE rowid = ?", row)
+            self._conn.execute("UPDATE messages SET timestamp = ? WHERE rowid = ?", (timestamp, row[0]))
+            rowid = row[0]
+        else:
+            rowid = self._conn.execute(
+                "INSERT INTO messages (message_id, user_id, chat_id, role, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (message_id, user_id, chat_id, role, timestamp)).lastrowid
+        self._conn.execute("INSERT INTO messages_fts (rowid, content, user_id) VALUES (?, ?, ?)",
+                           (rowid, content, user_id))
+
+    def index_message(self, user_id: str, chat_id: str, message_id: str, role: str, content: str,
+                      timestamp: Optional[str] = None):
+        """Add a message, or replace its text if it is already indexed"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._upsert(user_id, chat_id, message_id, role, content, timestamp)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete_where(self, column: str, value: str) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(f"DELETE FROM messages_fts WHERE rowid IN "
+                                   f"(SELECT rowid FROM messages WHERE {column} = ?)", (value,))
+                deleted = self._conn.execute(f"DELETE FROM messages WHERE {column} = ?", (value,)).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def delete_chat(self, chat_id: str) -> int:
+        """Remove a chat's messages; returns how many were indexed"""
+        return self._delete_where("chat_id", chat_id)
+
+    def delete_user(self, user_id: str) -> int:
+        """Remove all of a user's messages; returns how many were indexed"""
+        return self._delete_where("user_id", user_id)
+
+    def search(self, query: str, limit: int = 20, user_id: Optional[str] = None, role: Optional[str] = None,
+               raw: bool = False) -> SearchResults:
+        """
+        Best-ranked messages matching a query
+
+        BM25 ranking costs time for every match, so a word that occurs in most
+        messages would make a query slow on a large index; only the newest
+        max_candidates matches are ranked (all of them when filtering by user,
+        whose messages are few), and the results say whether any were left out.
+
+        Args:
+            query: Words that must all occur (or FTS5 query syntax when raw)
+            limit: Maximum number of hits
+            user_id: Only this user's messages
+            role: Only "user" (questions) or "assistant" (answers)
+            raw: Pass the query to FTS5 unchanged (phrases, OR, NEAR, prefix*)
+        """
+        match = query if raw else to_fts_query(query)
+        if not match:
+            return SearchResults()
+        match = f"{{content}} : ({match})"
+        if user_id:
+            # Matching the user's id tokens in FTS5 skips other users' postings; the join keeps it exact
+            match = 'user_id : "{}" AND {}'.format(user_id.replace('"', '""'), match)
+        where = "messages_fts MATCH ?"
+        filters: list = [match]
+        if user_id:
+            where += " AND m.user_id = ?"
+            filters.append(user_id)
+        if role:
+            where += " AND m.role = ?"
+            filters.append(role)
+        joined = "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid WHERE " + where
+
+        sql = ("SELECT m.user_id, m.chat_id, m.message_id, m.role, m.timestamp, "
+               "snippet(messages_fts, 0, '[', ']', '…', 16), bm25(messages_fts, 1.0, 0.0) AS score " + joined)
+        params = list(filters)
+        truncated = False
+        with self._lock:
+            if self.max_candidates > 0 and not user_id:
+                # Oldest rowid among the newest max_candidates matches, and the next older match if any
+                edge = self._conn.execute(f"SELECT messages_fts.rowid {joined} ORDER BY messages_fts.rowid DESC "
+                                          "LIMIT 2 OFFSET ?", filters + [self.max_candidates - 1]).fetchall()
+                if edge:
+                    sql += " AND messages_fts.rowid >= ?"
+                    params.append(edge[0][0])
+                    truncated = len(edge) > 1
+            sql += " ORDER BY score LIMIT ?"
+            params.append(limit)
+            rows = self._conn.execute(sql, params).fetchall()
+        return SearchResults((SearchHit(*row) for row in rows), truncated)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def rebuild(self, data_dir: Path) -> Tuple[int, int]:
+        """
+        Replace the index with every message in a data directory
+
+        Returns:
+            (messages indexed, unreadable user files skipped)
+        """
+        indexed = errors = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM messages")
+                self._conn.execute("DELETE FROM messages_fts")
+                for user_id, chat_id, msg in _stored_messages(Path(data_dir)):
+                    if msg is None:
+                        errors += 1
+                        continue
+                    if msg.get("message_id") and msg.get("content"):
+                        self._upsert(user_id, chat_id, msg["message_id"], msg.get("role", ""), msg["content"],
+                                     msg.get("timestamp"))
+                        indexed += 1
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+        log.info("search_index_rebuilt", messages=indexed, errors=errors)
+        return indexed, errors
+
+
+def _stored_messages(data_dir: Path) -> Iterable[Tuple[str, str, Optional[dict]]]:
+    """(user id, chat id, message dict) for every stored message; message None for an unreadable file"""
+    for path in sorted(data_dir.glob("user_*_sessions.json")):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            chats = [(chat["chat_id"], chat.get("messages") or []) for chat in data["chats"]]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("search_index_file_failed", file=path.name, error=str(e))
+            yield "", "", None
+            continue
+        for chat_id, messages in chats:
+            for msg in messages:
+                yield data["user_id"], chat_id, msg
+
+
+def create_search_index(data_dir: Path) -> Optional[SearchIndex]:
+    """
+    The search index for a data directory, unless disabled
+
+    SEARCH_INDEX_FILE overrides the location (default: <data_dir>/search_index.sqlite3);
+    SEARCH_INDEX_ENABLED=false turns indexing off.
+    """
+    if os.getenv("SEARCH_INDEX_ENABLED", "true").lower() != "true":
+        return None
+    path = Path(os.getenv("SEARCH_INDEX_FILE") or Path(data_dir) / INDEX_FILE)
+    try:
+        return SearchIndex(path)
+    except sqlite3.Error as e:
+        log.warning("search_index_unavailable", path=str(path), error=str(e))
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Search stored conversations")
+    parser.add_argument("query", nargs="?", help="Words to find (all must match)")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.getenv("USER_DATA_DIR", "user_data")),
+                        help="Directory with the user_*_sessions.json files")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of matches")
+    parser.add_argument("--user", help="Only this user's conversations")
+    parser.add_argument("--role", choices=["user", "assistant"], help="Only questions or only answers")
+    parser.add_argument("--raw", action="store_true", help="Use FTS5 query syntax (\"phrase\", OR, NEAR, prefix*)")
+    parser.add_argument("--json", action="store_true", help="Print matches as JSON lines")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every stored message first")
+    args = parser.parse_args(argv)
+
+    if not args.query and not args.rebuild:
+        parser.error("a query or --rebuild is required")
+    index = create_search_index(args.data_dir)
+    if index is None:
+        print("❌ Search index disabled or unavailable (SEARCH_INDEX_ENABLED / SEARCH_INDEX_FILE)")
+        return 1
+
+    if args.rebuild:
+        started = time.perf_counter()
+        indexed, errors = index.rebuild(args.data_dir)
+        print(f"🔁 Indexed {indexed} messages in {time.perf_counter() - started:.1f}s"
+              + (f" ({errors} unreadable files skipped)" if errors else ""))
+    if not args.query:
+        return 0
+
+    started = time.perf_counter()
+    try:
+        hits = index.search(args.query, limit=args.limit, user_id=args.user, role=args.role, raw=args.raw)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Invalid query: {e}")
+        return 1
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for hit in hits:
+        if args.json:
+            print(json.dumps(asdict(hit), ensure_ascii=False))
+        else:
+            print(f"{hit.score:7.2f}  {hit.timestamp or '':19.19}  user {hit.user_id}  chat {hit.chat_id}  "
+                  f"[{hit.role}]\n         {' '.join(hit.snippet.split())}")
+    if not args.json:
+        print(f"🔎 {len(hits)} matches in {elapsed_ms:.1f} ms")
+    if hits.truncated:
+        print(f"⚠️  Only the newest {index.max_candidates} matches were ranked; add words to narrow the query",
+              file=sys.stderr if args.json else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Session Reaper
+Deletes RAGFlow sessions of the chat assistant that no local chat uses any more.
+
+Deleting a chat or a user only removes local data, and chat rollover retires
+sessions, so sessions accumulate on the server and slow down its list and
+lookup calls. The reaper reads every user file for the session ids still in
+use, lists the assistant's sessions page by page, and deletes the rest in
+batches, pacing its calls so RAGFlow keeps serving chats.
+
+Sessions younger than --min-age are never deleted: a chat's session is created
+a moment before its user file is saved. If any user file cannot be read the run
+stops, since its sessions would otherwise look orphaned.
+
+Usage:
+    python session_reaper.py --dry-run --report orphans.json
+    python session_reaper.py --batch-size 100 --calls-per-second 2
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from .ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from .ragflow_backend_pool import parse_base_urls
+    from .ragflow_id_cache import create_id_cache
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    from ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from ragflow_backend_pool import parse_base_urls
+    from ragflow_id_cache import create_id_cache
+    import event_log
+
+log = event_log.get_logger("session_reaper")
+
+
+def referenced_session_ids(data_dir: Path) -> Tuple[Set[str], Set[str]]:
+    """
+    Session ids referenced by the user files in a data directory
+
+    Returns:
+        (in use, retired): sessions chats currently talk to, and sessions
+        chat rollover moved away from (never used again)
+
+    Raises:
+        ValueError: A user file could not be read
+    """
+    in_use: Set[str] = set()
+    retired: Set[str] = set()
+    for path in Path(data_dir).glob("user_*_sessions.json"):
+        try:
+            with open(path, "r") as f:
+                chats = json.load(f)["chats"]
+            for chat in chats:
+                in_use.add(chat["ragflow_session_id"])
+                retired.update(chat.get("previous_ragflow_session_ids") or [])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Cannot read {path}: {e}") from e
+    return in_use, retired - in_use
+
+
+class RateLimiter:
+    """Spaces calls at least 1/calls_per_second apart (0 = no limit)"""
+
+    def __init__(self, calls_per_second: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.interval = 1.0 / calls_per_second if calls_per_second > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+
+    def wait(self):
+        now = self._clock()
+        if now < self._next:
+            self._sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+@dataclass
+class ReapReport:
+    """Outcome of reaping one backend"""
+    backend: str
+    assistant_id: str
+    dry_run: bool
+    server_sessions: int = 0
+    in_use: int = 0
+    too_recent: int = 0  # Unreferenced but younger than min_age (or without a creation time)
+    orphaned: int = 0
+    retired: int = 0  # Orphans that chat rollover retired
+    deleted: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    orphan_ids: List[str] = field(default_factory=list)
+
+
+class SessionReaper:
+    """Finds and deletes one assistant's unreferenced sessions on one RAGFlow server"""
+
+    def __init__(self, manager: RAGFlowAssistantManager, assistant_id: str, page_size: int = 100,
+                 batch_size: int = 100, calls_per_second: float = 2.0, min_age: float = 3600.0,
+                 clock: Callable[[], float] = time.time, limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            manager: Assistant manager for the server
+            assistant_id: Assistant whose sessions are reaped
+            page_size: Sessions listed per call
+            batch_size: Sessions deleted per call
+            calls_per_second: Upper bound on list and delete calls
+            min_age: Seconds a session must exist before it can be deleted
+            clock: Wall-clock time source (injectable for tests)
+            limiter: Pacing for RAGFlow calls (default: from calls_per_second)
+        """
+        self.manager = manager
+        self.assistant_id = assistant_id
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self._clock = clock
+        self._limiter = limiter or RateLimiter(calls_per_second)
+
+    def server_sessions(self) -> Iterator[dict]:
+        """All of the assistant's sessions, one list call per page"""
+        page = 1
+        while True:
+            self._limiter.wait()
+            sessions = self.manager.list_sessions(self.assistant_id, page=page, page_size=self.page_size)
+            yield from sessions
+            if len(sessions) < self.page_size:
+                return
+            page += 1
+
+    def find_orphans(self, in_use: Set[str], retired: Set[str], report: ReapReport):
+        """Fill in the report's counts and orphan ids without deleting anything"""
+        cutoff_ms = (self._clock() - self.min_age) * 1000
+        for session in self.server_sessions():
+            report.server_sessions += 1
+            if session["id"] in in_use:
+                report.in_use += 1
+            elif session.get("create_time") is None or session["create_time"] > cutoff_ms:
+                report.too_recent += 1
+            else:
+                report.orphaned += 1
+                report.retired += session["id"] in retired
+                report.orphan_ids.append(session["id"])
+
+    def delete(self, report: ReapReport):
+        """Delete the report's orphans in batches; a failed batch is counted and skipped"""
+        for start in range(0, len(report.orphan_ids), self.batch_size):
+            batch = report.orphan_ids[start:start + self.batch_size]
+            self._limiter.wait()
+            try:
+                self.manager.delete_sessions(self.assistant_id, batch)
+                report.deleted += len(batch)
+            except Exception as e:
+                report.failed += len(batch)
+                log.warning("session_reap_batch_failed", backend=report.backend, assistant_id=self.assistant_id,
+                            sessions=len(batch), error=str(e))
+
+    def run(self, in_use: Set[str], retired: Set[str], dry_run: bool = False) -> ReapReport:
+        """List the server's sessions and delete the orphans (only report them when dry_run)"""
+        started = time.perf_counter()
+        report = ReapReport(backend=self.manager.base_url, assistant_id=self.assistant_id, dry_run=dry_run)
+        self.find_orphans(in_use, retired, report)
+        if not dry_run:
+            self.delete(report)
+        report.seconds = round(time.perf_counter() - started, 2)
+        log.info("sessions_reaped", backend=report.backend, assistant_id=report.assistant_id, dry_run=dry_run,
+                 server_sessions=report.server_sessions, orphaned=report.orphaned, deleted=report.deleted,
+                 failed=report.failed, duration_ms=report.seconds * 1000)
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Delete RAGFlow sessions no local chat refers to")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.getenv("USER_DATA_DIR", "user_data")),
+                        help="Directory with the user_*_sessions.json files")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them")
+    parser.add_argument("--report", type=Path, help="Write the per-server report (with orphan ids) as JSON")
+    parser.add_argument("--assistant-id", help="Assistant to reap (default: resolve RAGFLOW_ASSISTANT_NAME)")
+    parser.add_argument("--page-size", type=int, default=100, help="Sessions listed per call")
+    parser.add_argument("--batch-size", type=int, default=100, help="Sessions deleted per call")
+    parser.add_argument("--calls-per-second", type=float, default=2.0, help="RAGFlow calls per second (0 = no limit)")
+    parser.add_argument("--min-age", type=float, default=3600.0,
+                        help="Seconds a session must exist before it can be deleted")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("RAGFLOW_API_KEY")
+    if not api_key:
+        print("❌ RAGFLOW_API_KEY environment variable is required")
+        return 1
+    base_urls = parse_base_urls(os.getenv("RAGFLOW_BASE_URLS") or os.getenv("RAGFLOW_BASE_URL", "http://127.0.0.1:9380"))
+
+    try:
+        in_use, retired = referenced_session_ids(args.data_dir)
+    except ValueError as e:
+        print(f"❌ {e}; not reaping (its sessions would look orphaned)")
+        return 1
+    print(f"📂 {len(in_use)} sessions in use, {len(retired)} retired by rollover in {args.data_dir}")
+
+    reports = []
+    failed = False
+    for base_url in base_urls:
+        manager = RAGFlowAssistantManager(api_key=api_key, base_url=base_url, id_cache=create_id_cache(args.data_dir))
+        try:
+            assistant_id = args.assistant_id or manager.get_or_create_assistant(create_default_assistant_config())
+            reaper = SessionReaper(manager, assistant_id, page_size=args.page_size, batch_size=args.batch_size,
+                                   calls_per_second=args.calls_per_second, min_age=args.min_age)
+            report = reaper.run(in_use, retired, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"❌ {base_url}: {e}")
+            failed = True
+            continue
+        reports.append(report)
+        verb = "would delete" if args.dry_run else "deleted"
+        print(f"🧹 {base_url}: {report.server_sessions} sessions, {report.in_use} in use, "
+              f"{report.too_recent} too recent, {report.orphaned} orphaned ({report.retired} retired); "
+              f"{verb} {report.orphaned if args.dry_run else report.deleted}"
+              + (f", {report.failed} failed" if report.failed else "") + f" in {report.seconds:.1f}s")
+        failed = failed or report.failed > 0
+
+    if args.report:
+        args.report.write_text(json.dumps([asdict(r) for r in reports], indent=2))
+        print(f"💾 Report written to {args.report}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
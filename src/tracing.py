@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Request Tracing for the RCSB PDB ChatBot
+OpenTelemetry-style spans for one chat turn: the Streamlit handler, the
+background generation job, send_message_to_chat, session lookup, the RAGFlow
+stream (with a first_token event carrying the TTFT) and storage reads/writes.
+
+Spans carry W3C trace and span ids, so a turn can be followed from the UI to the
+worker thread, and across replicas through the chat API's traceparent header.
+Finished spans are written as JSON lines by an exporter that needs no network:
+
+    file     append to TRACING_FILE (default ./traces/spans.jsonl)
+    console  write to stderr
+
+Tracing is disabled unless TRACING_ENABLED=true. When disabled, span() returns
+a shared no-op span after a single flag check, so instrumented code pays no
+measurable cost. TRACING_SAMPLE_RATE (0-1) samples whole traces at the root.
+"""
+
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("tracing")
+
+_enabled = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+_exporter_name = os.getenv("TRACING_EXPORTER", "file").lower()
+_file = Path(os.getenv("TRACING_FILE", "./traces/spans.jsonl"))
+_sample_rate = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+_resource = {
+    "service.name": os.getenv("TRACING_SERVICE_NAME", "rcsb-pdb-chatbot"),
+    "host.name": socket.gethostname(),
+    "process.pid": os.getpid(),
+}
+
+_exporter = None
+_lock = threading.Lock()
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identifies a span so children (in any thread or process) can attach to it"""
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    def traceparent(self) -> str:
+        """W3C traceparent header value"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+_current: ContextVar[Optional[SpanContext]] = ContextVar("current_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    """Whether spans are recorded"""
+    return _enabled
+
+
+class _NullSpan:
+    """Shared do-nothing span returned while tracing is disabled"""
+
+    context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, **attributes: Any):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span(_NullSpan):
+    """
+    One timed operation
+
+    Used as a context manager it becomes the current span, so spans opened inside
+    it (including in generators it drives) become its children. start_span()
+    returns one that is not made current, for work that yields to its caller.
+    """
+
+    def __init__(self, name: str, parent: Optional[SpanContext], attributes: Dict[str, Any]):
+        if parent is None:
+            sampled = random.random() < _sample_rate
+            trace_id = f"{random.getrandbits(128):032x}"
+        else:
+            sampled = parent.sampled
+            trace_id = parent.trace_id
+        self.name = name
+        self.context = SpanContext(trace_id, f"{random.getrandbits(64):016x}", sampled)
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = "ok"
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self._token = None
+        self._ended = False
+
+    def __enter__(self):
+        self._token = _current.set(self.context)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Only errors: GeneratorExit and Streamlit's rerun/stop signals are BaseExceptions
+        if isinstance(exc, Exception):
+            self.record_exception(exc)
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Finished from another context (e.g. a generator closed by the garbage collector)
+            pass
+        self.end()
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any):
+        """Record a point in time within the span (offset_ms from its start)"""
+        self.events.append({"name": name, "offset_ms": round((time.perf_counter() - self._start_perf) * 1000, 2),
+                            "attributes": attributes})
+
+    def record_exception(self, exc: BaseException):
+        self.status = "error"
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self._ended:
+            return
+        self._ended = True
+        if self.context.sampled:
+            _export(self.to_dict(time.perf_counter() - self._start_perf))
+
+    def to_dict(self, duration: float) -> Dict[str, Any]:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "duration_ms": round(duration * 1000, 3),
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+            "events": self.events,
+            "resource": _resource,
+        }
+
+
+class FileSpanExporter:
+    """Appends one JSON line per finished span"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span: Dict[str, Any]):
+        line = json.dumps(span, default=str)
+        with _lock:
+            self._file.write(line + "\n")
+
+
+class ConsoleSpanExporter:
+    """Writes one JSON line per finished span to stderr"""
+
+    def export(self, span: Dict[str, Any]):
+        line = json.dumps(span, default=str)
+        with _lock:
+            sys.stderr.write(line + "\n")
+
+
+def _create_exporter():
+    global _enabled
+    if _exporter_name == "console":
+        return ConsoleSpanExporter()
+    try:
+        return FileSpanExporter(_file)
+    except OSError as e:
+        log.warning("trace_file_failed", path=str(_file), error=str(e))
+        _enabled = False
+        return None
+
+
+def _export(span: Dict[str, Any]):
+    global _exporter
+    if _exporter is None:
+        with _lock:
+            if _exporter is None:
+                _exporter = _create_exporter()
+    if _exporter is not None:
+        _exporter.export(span)
+
+
+def set_exporter(exporter):
+    """Replace the span exporter (anything with an export(dict) method)"""
+    global _exporter
+    _exporter = exporter
+
+
+def span(name: str, parent: Optional[SpanContext] = None, **attributes: Any):
+    """
+    Context manager recording a span that is current while the block runs
+
+    Args:
+        name: Span name (e.g. "session_lookup")
+        parent: Explicit parent, e.g. captured in another thread; defaults to the current span
+        **attributes: Span attributes (user_id, chat_id, ...)
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, parent or _current.get(), attributes)
+
+
+def start_span(name: str, parent: Optional[SpanContext] = None, **attributes: Any):
+    """
+    Start a span that is not made current; call end() to finish it
+
+    For work that yields to its caller (a streaming generator), where a current
+    span would wrongly parent whatever the caller does between chunks.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, parent or _current.get(), attributes)
+
+
+def current_context() -> Optional[SpanContext]:
+    """Context of the current span, to hand to work running in another thread"""
+    if not _enabled:
+        return None
+    return _current.get()
+
+
+def extract(traceparent: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header; None if absent or malformed"""
+    if not _enabled or not traceparent:
+        return None
+    match = TRACEPARENT_PATTERN.match(traceparent.strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
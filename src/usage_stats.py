@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Usage Statistics
+Feedback and usage counters kept up to date as questions, answers and ratings
+are stored, so summaries and dashboards never rescan messages:
+
+    per chat   UserChat.usage, saved in the user's file
+    per user   UserSession.usage, saved in the user's file
+    global     usage_totals.json in the data directory
+
+The global totals are shared by every process writing to the data directory.
+Each process accumulates its changes in memory and merges them into the file
+under a file lock every USAGE_FLUSH_SECONDS and at exit, so storing a message
+never waits on that lock. User files from older versions, and answers cut off
+when a process died, are added to the totals the first time they are loaded.
+`python usage_stats.py --rebuild` recomputes all three levels from the stored
+messages whenever the totals are in doubt.
+
+Usage:
+    python usage_stats.py                 # print the global totals
+    python usage_stats.py --rebuild
+"""
+
+import argparse
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: the global totals are only guarded within one process
+
+try:
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    import event_log
+
+log = event_log.get_logger("usage_stats")
+
+TOTALS_FILE = "usage_totals.json"
+# Seconds between merges of a process's accumulated changes into the global totals (0 = merge on every change)
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "10"))
+
+
+def rating_key(feedback: Dict[str, Any]) -> Optional[str]:
+    """Star histogram bucket of a feedback entry ("1"-"5"), None without a star rating"""
+    if feedback.get("star_rating") is not None:
+        return str(feedback["star_rating"])
+    return None
+
+
+@dataclass
+class UsageCounters:
+    """Message, feedback and reference counts for a chat, a user or everything"""
+    questions: int = 0
+    answers: int = 0
+    truncated_answers: int = 0
+    feedback: int = 0  # Messages with feedback
+    thumbs_up: int = 0  # Messages rated "thumbs-up" (also counted when they have a star rating)
+    thumbs_down: int = 0
+    ratings: Dict[str, int] = field(default_factory=dict)  # Star rating ("1"-"5") -> messages
+    categories: Dict[str, int] = field(default_factory=dict)  # Feedback category -> messages
+    references: Dict[str, int] = field(default_factory=dict)  # Document name -> times referenced in answers
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "UsageCounters":
+        return cls(**data) if data else cls()
+
+    @staticmethod
+    def _bump(counts: Dict[str, int], key: str, sign: int):
+        value = counts.get(key, 0) + sign
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    def count_feedback(self, feedback: Optional[Dict[str, Any]], sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) one message's feedback"""
+        if not feedback:
+            return
+        self.feedback += sign
+        if feedback.get("rating") == "thumbs-up":
+            self.thumbs_up += sign
+        elif feedback.get("rating") == "thumbs-down":
+            self.thumbs_down += sign
+        key = rating_key(feedback)
+        if key is not None:
+            self._bump(self.ratings, key, sign)
+        for category in feedback.get("categories") or []:
+            self._bump(self.categories, category, sign)
+
+    def count_message(self, role: str, content: str, references: Optional[List[Dict]] = None,
+                      feedback: Optional[Dict[str, Any]] = None, truncated: bool = False, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) one stored message; empty answers are not stored, so not counted"""
+        if role == "user":
+            self.questions += sign
+        elif content:
+            self.answers += sign
+            self.truncated_answers += sign if truncated else 0
+            for reference in references or []:
+                self._bump(self.references, reference.get("document_name") or "Unknown", sign)
+        self.count_feedback(feedback, sign)
+
+    def add(self, other: "UsageCounters", sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) another set of counters"""
+        self.questions += sign * other.questions
+        self.answers += sign * other.answers
+        self.truncated_answers += sign * other.truncated_answers
+        self.feedback += sign * other.feedback
+        self.thumbs_up += sign * other.thumbs_up
+        self.thumbs_down += sign * other.thumbs_down
+        for mine, theirs in ((self.ratings, other.ratings), (self.categories, other.categories),
+                             (self.references, other.references)):
+            for key, value in theirs.items():
+                self._bump(mine, key, sign * value)
+
+    def copy(self) -> "UsageCounters":
+        return UsageCounters.from_dict(json.loads(json.dumps(asdict(self))))
+
+    def is_empty(self) -> bool:
+        return self == UsageCounters()
+
+    def clamp(self):
+        """Raise negative counts to zero"""
+        for name in ("questions", "answers", "truncated_answers", "feedback", "thumbs_up", "thumbs_down"):
+            setattr(self, name, max(getattr(self, name), 0))
+        for counts in (self.ratings, self.categories, self.references):
+            for key in [key for key, value in counts.items() if value < 0]:
+                del counts[key]
+
+
+def counters_for_messages(messages: Iterable[Any]) -> UsageCounters:
+    """Counters for StoredMessage objects (one pass; used for chats saved without counters)"""
+    counters = UsageCounters()
+    for msg in messages:
+        counters.count_message(msg.role, msg.content, msg.references, msg.feedback, msg.truncated)
+    return counters
+
+
+def counters_for_raw_messages(messages: Iterable[Dict[str, Any]]) -> UsageCounters:
+    """Counters for messages as stored in a user file"""
+    counters = UsageCounters()
+    for msg in messages:
+        counters.count_message(msg.get("role"), msg.get("content"), msg.get("references"),
+                               msg.get("feedback"), msg.get("truncated", False))
+    return counters
+
+
+class UsageTotals:
+    """Global counters in one small JSON file; changes are accumulated in memory and merged periodically"""
+
+    def __init__(self, data_dir: Path, buffered: bool = USAGE_FLUSH_SECONDS > 0):
+        self.path = Path(data_dir) / TOTALS_FILE
+        self.buffered = buffered  # False: every change is merged into the file before add() returns
+        self._lock = threading.Lock()
+        self._pending = UsageCounters()
+        self._pending_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_name(f".{self.path.name}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_file(self) -> UsageCounters:
+        try:
+            return UsageCounters.from_dict(json.loads(self.path.read_text()).get("totals"))
+        except (OSError, ValueError, AttributeError, TypeError):
+            return UsageCounters()
+
+    def read(self) -> UsageCounters:
+        """Current global counters (zero if never written), including this process's unmerged changes"""
+        totals = self._read_file()
+        with self._pending_lock:
+            totals.add(self._pending)
+        # The file can be briefly below zero while another process's additions are unmerged
+        totals.clamp()
+        return totals
+
+    def _write(self, totals: UsageCounters, **extra: Any):
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"totals": asdict(totals), "updated_at": datetime.now().isoformat(),
+                                        **extra}))
+        os.replace(tmp_path, self.path)
+
+    def add(self, delta: UsageCounters, sign: int = 1):
+        """Apply a change to the global counters (merged into the file by the next flush)"""
+        with self._pending_lock:
+            self._pending.add(delta, sign)
+        if self.buffered:
+            _start_flusher(self)
+        else:
+            self.flush()
+
+    def flush(self):
+        """Merge the accumulated changes into the file; kept for the next flush if the write fails"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, UsageCounters()
+        if pending.is_empty():
+            return
+        try:
+            with self._locked():
+                totals = self._read_file()
+                totals.add(pending)
+                self._write(totals)
+        except OSError as e:
+            if not self.path.parent.is_dir():
+                return  # Data directory removed: nothing left to count into
+            with self._pending_lock:
+                self._pending.add(pending)
+            log.warning("usage_totals_write_failed", path=str(self.path), error=str(e))
+
+    def replace(self, totals: UsageCounters, **extra: Any):
+        """Overwrite the global counters (after a rebuild), dropping unmerged changes"""
+        with self._pending_lock:
+            self._pending = UsageCounters()
+        try:
+            with self._locked():
+                self._write(totals, **extra)
+        except OSError as e:
+            log.warning("usage_totals_write_failed", path=str(self.path), error=str(e))
+
+
+# One background thread merges every UsageTotals in the process; whatever is left is merged at exit
+_flushed = weakref.WeakSet()
+_flusher_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+
+
+def _start_flusher(totals: UsageTotals):
+    global _flusher
+    with _flusher_lock:
+        _flushed.add(totals)
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="usage-totals", daemon=True)
+            _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(USAGE_FLUSH_SECONDS)
+        flush_all()
+
+
+def flush_all():
+    """Merge the pending changes of every UsageTotals in this process"""
+    with _flusher_lock:
+        pending = list(_flushed)
+    for totals in pending:
+        totals.flush()
+
+
+atexit.register(flush_all)
+
+
+def rebuild(data_dir: Path) -> Dict[str, Any]:
+    """
+    Recompute per-chat, per-user and global counters from the stored messages
+
+    Each user file is rewritten with fresh counters, then the global totals
+    are replaced by their sum. Unreadable files are skipped and counted.
+    """
+    data_dir = Path(data_dir)
+    totals = UsageCounters()
+    users = errors = 0
+    for path in sorted(data_dir.glob("user_*_sessions.json")):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            user_usage = UsageCounters()
+            for chat in data["chats"]:
+                chat_usage = counters_for_raw_messages(chat.get("messages") or [])
+                chat["usage"] = asdict(chat_usage)
+                user_usage.add(chat_usage)
+            data["usage"] = asdict(user_usage)
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            errors += 1
+            log.warning("usage_rebuild_file_failed", file=path.name, error=str(e))
+            continue
+        totals.add(user_usage)
+        users += 1
+
+    UsageTotals(data_dir).replace(totals, rebuilt_at=datetime.now().isoformat())
+    log.info("usage_rebuilt", users=users, errors=errors, questions=totals.questions, answers=totals.answers,
+             feedback=totals.feedback)
+    return {"users": users, "errors": errors, "totals": asdict(totals)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Show or rebuild the usage and feedback counters")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.getenv("USER_DATA_DIR", "user_data")),
+                        help="Directory with the user_*_sessions.json files")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every counter from the stored messages")
+    args = parser.parse_args(argv)
+
+    if not args.data_dir.is_dir():
+        print(f"❌ Data directory not found: {args.data_dir}")
+        return 1
+
+    if args.rebuild:
+        result = rebuild(args.data_dir)
+        print(f"🔁 Rebuilt counters for {result['users']} users ({result['errors']} unreadable files skipped)")
+        if result["errors"]:
+            return 1
+    print(json.dumps(asdict(UsageTotals(args.data_dir).read()), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+User Data Garbage Collection
+Removes user files of anonymous visitors that will never be used again:
+
+    empty   no chat has a message, and the user was created more than
+            USER_GC_EMPTY_GRACE_HOURS ago (every visit without a sid creates one)
+    idle    no activity for USER_GC_RETENTION_DAYS (0 keeps idle users forever)
+
+Anonymous users are the UUID ids the Streamlit app generates; other ids (API
+clients, test users) are only collected with --include-named.
+
+Each run is a bounded slice: files are visited in name order from a cursor
+saved in the data directory, and the slice stops after --time-budget seconds,
+so a cron job can work through a large data directory a little at a time.
+Files modified within the grace period are skipped without being parsed, and a
+file that changes while it is being examined is left alone. Removed users'
+counters are taken off the global usage totals and their messages out of the
+search index; their RAGFlow sessions are left to session_reaper.
+
+Collection can run while apps are serving users. A file is removed under the
+RemovalLock, which app saves hold shared, so no save lands between the check
+and the removal; an app that still has a removed user in memory and saves it
+again revives the user (see UserSessionManager._write_user_sessions).
+
+Usage:
+    python user_gc.py --dry-run
+    python user_gc.py --time-budget 5
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: removals are only ordered against saves of the same process
+
+try:
+    from .usage_stats import UsageCounters, UsageTotals
+    from .search_index import create_search_index
+    from . import event_log
+except ImportError:
+    # For direct execution when not imported as a package
+    from usage_stats import UsageCounters, UsageTotals
+    from search_index import create_search_index
+    import event_log
+
+log = event_log.get_logger("user_gc")
+
+# Hours an empty user is kept after it was created
+USER_GC_EMPTY_GRACE_HOURS = float(os.getenv("USER_GC_EMPTY_GRACE_HOURS", "24"))
+# Days without activity after which an anonymous user is removed (0 = never)
+USER_GC_RETENTION_DAYS = float(os.getenv("USER_GC_RETENTION_DAYS", "180"))
+# Seconds one collection slice may run
+USER_GC_SLICE_SECONDS = float(os.getenv("USER_GC_SLICE_SECONDS", "5"))
+
+STATE_FILE = "user_gc_state.json"
+REMOVAL_LOCK_FILE = ".user_gc.lock"
+USER_FILE = re.compile(r"^user_(.+)_sessions\.json$")
+ANONYMOUS_ID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+@dataclass
+class GCReport:
+    """Outcome of one collection slice"""
+    dry_run: bool
+    scanned: int = 0
+    recent: int = 0  # Modified within the grace period; not parsed
+    named: int = 0  # Not an anonymous id
+    kept: int = 0
+    empty_removed: int = 0
+    idle_removed: int = 0
+    changed: int = 0  # Written to while being examined; left for the next pass
+    errors: int = 0
+    bytes_reclaimed: int = 0
+    seconds: float = 0.0
+    pass_complete: bool = False  # The slice reached the end of the directory
+
+
+def last_activity(data: dict) -> float:
+    """Unix time of the user's creation or latest chat update"""
+    stamps = [data["created_at"]] + [chat["updated_at"] for chat in data.get("chats", [])]
+    return max(datetime.fromisoformat(stamp).timestamp() for stamp in stamps)
+
+
+def is_empty(data: dict) -> bool:
+    """True if none of the user's chats has a message"""
+    return not any(chat.get("messages") or chat.get("message_count") for chat in data.get("chats", []))
+
+
+class RemovalLock:
+    """
+    Orders user file removal against app saves, across processes
+
+    Saves hold the lock shared while they write; the collector holds it
+    exclusively while it checks and removes one file.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.path = Path(data_dir) / REMOVAL_LOCK_FILE
+
+    @contextlib.contextmanager
+    def _held(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        # A descriptor per holder: flock locks belong to the open file, not to the thread
+        with open(self.path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def shared(self):
+        """Held by a save while it checks for and writes the user's file"""
+        return self._held(exclusive=False)
+
+    def exclusive(self):
+        """Held by the collector while it checks and removes one user's file"""
+        return self._held(exclusive=True)
+
+
+class UserGarbageCollector:
+    """Incremental, time-sliced removal of empty and idle user files"""
+
+    def __init__(self, data_dir: Path, empty_grace_hours: float = USER_GC_EMPTY_GRACE_HOURS,
+                 retention_days: float = USER_GC_RETENTION_DAYS, include_named: bool = False,
+                 on_remove: Optional[Callable[[str], None]] = None, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            data_dir: Directory with the user_*_sessions.json files
+            empty_grace_hours: Age after which a user without messages is removed
+            retention_days: Idle time after which any user is removed (0 = never)
+            include_named: Also collect users whose id is not an anonymous UUID
+            on_remove: Called with each removed user id (e.g. to drop in-memory caches)
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.data_dir = Path(data_dir)
+        self.empty_grace = empty_grace_hours * 3600
+        self.retention = retention_days * 86400
+        self.include_named = include_named
+        self.on_remove = on_remove
+        self._clock = clock
+        self.removal_lock = RemovalLock(self.data_dir)
+        self.state_path = self.data_dir / STATE_FILE
+        self.usage_totals = UsageTotals(self.data_dir)
+        self.search_index = create_search_index(self.data_dir)
+
+    def _load_cursor(self) -> str:
+        try:
+            return json.loads(self.state_path.read_text()).get("cursor", "")
+        except (OSError, ValueError, AttributeError):
+            return ""
+
+    def _save_cursor(self, cursor: str):
+        try:
+            self.state_path.write_text(json.dumps({"cursor": cursor, "updated_at": datetime.now().isoformat()}))
+        except OSError as e:
+            log.warning("user_gc_state_write_failed", path=str(self.state_path), error=str(e))
+
+    def _user_files(self, after: str) -> Iterable[str]:
+        """User file names after the cursor, in name order"""
+        names = (entry.name for entry in os.scandir(self.data_dir) if USER_FILE.match(entry.name))
+        return sorted(name for name in names if name > after)
+
+    def _collect(self, name: str, report: GCReport, dry_run: bool):
+        """Examine one user file and remove it if it is garbage"""
+        user_id = USER_FILE.match(name).group(1)
+        if not self.include_named and not ANONYMOUS_ID.match(user_id):
+            report.named += 1
+            return
+
+        path = self.data_dir / name
+        now = self._clock()
+        stat = path.stat()
+        if now - stat.st_mtime < self.empty_grace:
+            report.recent += 1
+            return
+
+        with open(path, "r") as f:
+            data = json.load(f)
+        idle = now - last_activity(data)
+        if is_empty(data) and idle >= self.empty_grace:
+            reason = "empty"
+        elif self.retention > 0 and idle >= self.retention:
+            reason = "idle"
+        else:
+            report.kept += 1
+            return
+
+        if not dry_run:
+            with self.removal_lock.exclusive():
+                # The app may have written the file since it was read (a save replaces the inode)
+                current = path.stat()
+                if (current.st_mtime_ns, current.st_ino) != (stat.st_mtime_ns, stat.st_ino):
+                    report.changed += 1
+                    return
+                path.unlink()
+                if data.get("usage"):
+                    self.usage_totals.add(UsageCounters.from_dict(data["usage"]), sign=-1)
+                # Before a revived user's messages are indexed again
+                if self.search_index is not None:
+                    self.search_index.delete_user(user_id)
+            # Outside the lock: eviction takes the app's per-user lock, which a waiting save holds
+            if self.on_remove:
+                self.on_remove(user_id)
+        report.bytes_reclaimed += stat.st_size
+        if reason == "empty":
+            report.empty_removed += 1
+        else:
+            report.idle_removed += 1
+
+    def run_slice(self, time_budget: float = USER_GC_SLICE_SECONDS, dry_run: bool = False) -> GCReport:
+        """
+        Continue the current pass for up to time_budget seconds
+
+        The cursor is saved after the slice (also in a dry run, so repeated dry
+        runs walk the whole directory); a finished pass starts over next time.
+        """
+        started = time.perf_counter()
+        report = GCReport(dry_run=dry_run)
+        cursor = self._load_cursor()
+
+        report.pass_complete = True
+        for name in self._user_files(cursor):
+            if time.perf_counter() - started >= time_budget:
+                report.pass_complete = False
+                break
+            report.scanned += 1
+            try:
+                self._collect(name, report, dry_run)
+            except FileNotFoundError:
+                pass  # Removed by someone else since the directory was listed
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                report.errors += 1
+                log.warning("user_gc_file_failed", file=name, error=str(e))
+            cursor = name
+
+        self.usage_totals.flush()
+        self._save_cursor("" if report.pass_complete else cursor)
+        report.seconds = round(time.perf_counter() - started, 3)
+        log.info("user_gc_slice", **asdict(report))
+        return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Remove empty and idle anonymous user files")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.getenv("USER_DATA_DIR", "user_data")),
+                        help="Directory with the user_*_sessions.json files")
+    parser.add_argument("--time-budget", type=float, default=USER_GC_SLICE_SECONDS,
+                        help="Seconds this run may spend before saving its cursor")
+    parser.add_argument("--empty-grace-hours", type=float, default=USER_GC_EMPTY_GRACE_HOURS,
+                        help="Age after which a user without messages is removed")
+    parser.add_argument("--retention-days", type=float, default=USER_GC_RETENTION_DAYS,
+                        help="Idle days after which a user is removed (0 = never)")
+    parser.add_argument("--include-named", action="store_true", help="Also collect non-UUID user ids")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed")
+    args = parser.parse_args(argv)
+
+    if not args.data_dir.is_dir():
+        print(f"❌ Data directory not found: {args.data_dir}")
+        return 1
+
+    collector = UserGarbageCollector(args.data_dir, args.empty_grace_hours, args.retention_days,
+                                     include_named=args.include_named)
+    report = collector.run_slice(args.time_budget, dry_run=args.dry_run)
+    verb = "would remove" if args.dry_run else "removed"
+    print(f"🧹 {report.scanned} users scanned in {report.seconds:.1f}s: {verb} "
+          f"{report.empty_removed} empty and {report.idle_removed} idle "
+          f"({report.bytes_reclaimed / 1024:.1f} KiB); {report.kept} kept, {report.recent} recent, "
+          f"{report.named} named, {report.changed} changed, {report.errors} errors")
+    print("✅ Pass complete" if report.pass_complete else "⏸️  Time budget reached; the next run continues")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
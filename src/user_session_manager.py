@@ -6,11 +6,13 @@ Provides user-specific session management with multiple chats per user
 
 import json
 import os
+import threading
 import time
 import uuid
-from typing import Dict, List, Optional, Any
+from collections.abc import Sequence
+from typing import Callable, Dict, List, Optional, Any
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 
 try:
@@ -26,6 +28,16 @@ try:
         create_default_assistant_config,
         StreamingResponse
     )
+    from .ragflow_backend_pool import RAGFlowBackendPool, create_backend_manager
+    from .ragflow_id_cache import create_id_cache
+    from .health_monitor import HealthMonitor
+    from .user_gc import GCReport, RemovalLock, UserGarbageCollector, USER_GC_SLICE_SECONDS
+    from .usage_stats import UsageCounters, UsageTotals, counters_for_messages
+    from .search_index import SearchResults, create_search_index
+    from . import event_log
+    from . import metrics
+    from . import profiling
+    from . import tracing
 except ImportError:
     # For direct execution when not imported as a package
     from ragflow_assistant_manager import (
@@ -34,6 +46,18 @@ except ImportError:
         create_default_assistant_config,
         StreamingResponse
     )
+    from ragflow_backend_pool import RAGFlowBackendPool, create_backend_manager
+    from ragflow_id_cache import create_id_cache
+    from health_monitor import HealthMonitor
+    from user_gc import GCReport, RemovalLock, UserGarbageCollector, USER_GC_SLICE_SECONDS
+    from usage_stats import UsageCounters, UsageTotals, counters_for_messages
+    from search_index import SearchResults, create_search_index
+    import event_log
+    import metrics
+    import profiling
+    import tracing
+
+log = event_log.get_logger("user_session_manager")
 
 
 @dataclass
@@ -55,6 +79,8 @@ class StoredMessage:
     message_id: str = None  # Unique UUID for message identification
     references: Optional[List[Dict]] = None
     feedback: Optional[Dict[str, Any]] = None  # User feedback for this message
+    truncated: bool = False  # True if generation was cancelled before the answer finished
+    generating: bool = False  # True while the answer is still being generated
 
 
 @dataclass
@@ -67,6 +93,91 @@ class UserChat:
     message_count: int
     ragflow_session_id: str  # The actual RAGFlow session ID
     messages: List[StoredMessage]  # Store all messages in this chat
+    ragflow_backend: Optional[str] = None  # Base URL of the RAGFlow server holding the session
+    ragflow_turns: int = 0  # Turns sent to the current RAGFlow session
+    ragflow_tokens: int = 0  # Estimated tokens of history held by the current RAGFlow session
+    previous_ragflow_session_ids: List[str] = field(default_factory=list)  # Sessions retired by rollover
+    usage: UsageCounters = field(default_factory=UsageCounters)  # Kept current as messages and feedback are stored
+
+
+@dataclass
+class ChatRolloverPolicy:
+    """
+    When to move a long chat onto a fresh RAGFlow session
+
+    Every session.ask carries the whole server-side history, so long chats get
+    slower and more expensive per turn. Past either limit the next question is
+    sent to a new RAGFlow session seeded with a compact summary of the chat.
+    A limit of 0 disables that trigger.
+    """
+    max_turns: int = 20
+    max_tokens: int = 16000
+    summary_turns: int = 4  # Most recent Q&A pairs carried into the summary
+    summary_chars: int = 300  # Per-answer character budget in the summary
+
+    @classmethod
+    def from_env(cls) -> "ChatRolloverPolicy":
+        """Load the policy from environment variables"""
+        return cls(
+            max_turns=int(os.getenv("CHAT_ROLLOVER_MAX_TURNS", "20")),
+            max_tokens=int(os.getenv("CHAT_ROLLOVER_MAX_TOKENS", "16000")),
+            summary_turns=int(os.getenv("CHAT_ROLLOVER_SUMMARY_TURNS", "4")),
+        )
+
+    def should_roll_over(self, chat: "UserChat") -> bool:
+        """Whether the chat's current RAGFlow session has reached a limit"""
+        if self.max_turns and chat.ragflow_turns >= self.max_turns:
+            return True
+        if self.max_tokens and chat.ragflow_tokens >= self.max_tokens:
+            return True
+        return False
+
+
+class ChatHistoryView(Sequence):
+    """
+    Read-only view over a chat's stored messages
+
+    Wraps the manager's cached message list without copying it, so any number of
+    browser tabs can render the same history. Turns appended by the manager show
+    up immediately; the view itself offers no way to add or remove messages.
+    """
+
+    __slots__ = ("_messages",)
+
+    def __init__(self, messages: List[StoredMessage]):
+        self._messages = messages
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._messages[index])
+        return self._messages[index]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __repr__(self) -> str:
+        return f"ChatHistoryView({len(self._messages)} messages)"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1 if text else 0
+
+
+def turn_index_bucket(turn: int) -> str:
+    """Label bucket for a turn index within a RAGFlow session"""
+    if turn <= 1:
+        return "1"
+    if turn <= 5:
+        return "2-5"
+    if turn <= 10:
+        return "6-10"
+    if turn <= 20:
+        return "11-20"
+    return "21+"
 
 
 @dataclass
@@ -77,6 +188,7 @@ class UserSession:
     created_at: datetime
     chats: List[UserChat]
     total_chats: int
+    usage: UsageCounters = field(default_factory=UsageCounters)  # Sum of the chats' counters
     
     
 class UserSessionManager:
@@ -88,7 +200,7 @@ class UserSessionManager:
         
         Args:
             api_key: RAGFlow API key
-            base_url: RAGFlow server URL
+            base_url: RAGFlow server URL, or a comma-separated list of servers to load-balance across
             data_dir: Directory to store user data files
         """
         self.api_key = api_key
@@ -96,27 +208,91 @@ class UserSessionManager:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
-        # Create RAGFlow assistant manager
-        self.assistant_manager = RAGFlowAssistantManager(api_key=api_key, base_url=base_url)
+        # Create RAGFlow assistant manager (a shared backend pool when several URLs are given)
+        self.assistant_manager = create_backend_manager(
+            api_key=api_key,
+            base_url=base_url,
+            health_interval=float(os.getenv("RAGFLOW_HEALTH_INTERVAL", "30")),
+            id_cache=create_id_cache(self.data_dir)
+        )
         self.assistant_config = create_default_assistant_config()
+        self.rollover_policy = ChatRolloverPolicy.from_env()
+        # Seconds between disk checkpoints of an answer that is still streaming
+        self.checkpoint_interval = float(os.getenv("GENERATION_CHECKPOINT_SECONDS", "2"))
         
         # Initialize or get assistant
-        try:
-            self.assistant_id = self.assistant_manager.get_or_create_assistant(self.assistant_config)
-            print(f"✅ Assistant ready: {self.assistant_config.name} (ID: {self.assistant_id})")
-        except Exception as e:
-            print(f"❌ Failed to initialize assistant: {e}")
-            self.assistant_id = None
+        self.assistant_id = None
+        self.resolve_assistant()
+        # Probes RAGFlow in the background once started (by the app, not here); a backend
+        # pool's own health loop drives it, so each server is probed on one timer
+        pool = self.assistant_manager if isinstance(self.assistant_manager, RAGFlowBackendPool) else None
+        self.health_monitor = HealthMonitor(probe=lambda: self.assistant_manager.health_check(),
+                                            warm_up=self.resolve_assistant,
+                                            source=pool if pool and pool.health_interval > 0 else None)
+        
+        # Garbage collection (possibly in another process) removes user files under this lock;
+        # saves hold it shared, so a removal never lands between a save's check and its write
+        self.removal_lock = RemovalLock(self.data_dir)
+        
+        # Global usage counters, shared with other processes using the data directory
+        self.usage_totals = UsageTotals(self.data_dir)
+        # User id -> counts found by _read_user_sessions that were never added to the totals
+        self._uncounted_usage: Dict[str, UsageCounters] = {}
+        # User id -> counters as last read from or written to the user's file (users whose file
+        # exists); a save that finds the file removed counts the user again with them
+        self._disk_usage: Dict[str, UsageCounters] = {}
+        # Full-text index of questions and answers (None when SEARCH_INDEX_ENABLED=false)
+        self.search_index = create_search_index(self.data_dir)
         
         # In-memory cache of user sessions
         self.user_sessions: Dict[str, UserSession] = {}
+        # API requests and generation workers change and save the same user's session from
+        # several threads; every mutate-and-save (and the cache fill) holds that user's lock
+        self._user_locks: Dict[str, threading.RLock] = {}
+        self._user_locks_guard = threading.Lock()
+        # chat_id -> (messages list, length, message_id -> StoredMessage) for O(1) lookups
+        self._message_index: Dict[str, tuple] = {}
     
+    def resolve_assistant(self) -> bool:
+        """
+        Resolve the RAGFlow assistant if that has not succeeded yet
+
+        Called at startup and by the health monitor until it succeeds, so a
+        RAGFlow outage at startup does not leave the manager without an assistant.
+
+        Returns:
+            True if an assistant is available
+        """
+        if self.assistant_id:
+            return True
+        try:
+            self.assistant_id = self.assistant_manager.get_or_create_assistant(self.assistant_config)
+            log.info("assistant_ready", assistant=self.assistant_config.name, assistant_id=self.assistant_id)
+        except Exception as e:
+            log.error("assistant_init_failed", assistant=self.assistant_config.name, error=str(e))
+            self.assistant_id = None
+        return self.assistant_id is not None
+
+    def _user_lock(self, user_id: str) -> threading.RLock:
+        """The lock guarding one user's cached session and file (re-entrant)"""
+        with self._user_locks_guard:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.RLock()
+            return lock
+
     def _get_user_data_file(self, user_id: str) -> Path:
         """Get the data file path for a specific user"""
         return self.data_dir / f"user_{user_id}_sessions.json"
     
     def _load_user_sessions(self, user_id: str) -> UserSession:
         """Load user sessions from file"""
+        with metrics.timed("load_sessions"), log.timed("sessions_loaded", user_id=user_id), \
+                tracing.span("storage.load", user_id=user_id):
+            return self._read_user_sessions(user_id)
+
+    def _read_user_sessions(self, user_id: str) -> UserSession:
+        """Read and deserialize a user's session file"""
         data_file = self._get_user_data_file(user_id)
         
         if not data_file.exists():
@@ -136,34 +312,80 @@ class UserSessionManager:
             # Convert datetime strings back to datetime objects
             data['created_at'] = datetime.fromisoformat(data['created_at'])
             
+            # Counts in this file that the global totals have never seen
+            uncounted = UsageCounters()
             for chat in data['chats']:
                 chat['created_at'] = datetime.fromisoformat(chat['created_at'])
                 chat['updated_at'] = datetime.fromisoformat(chat['updated_at'])
+                interrupted = UsageCounters()
                 
                 # Convert messages back to StoredMessage objects
                 if 'messages' in chat:
                     chat_messages = []
                     for msg in chat['messages']:
                         msg['timestamp'] = datetime.fromisoformat(msg['timestamp'])
+                        if msg.get('generating'):
+                            # Checkpointed mid-answer by a process that is gone: keep it as interrupted
+                            msg['generating'] = False
+                            msg['truncated'] = True
+                            interrupted.count_message(msg['role'], msg['content'], msg.get('references'),
+                                                      msg.get('feedback'), truncated=True)
                         chat_messages.append(StoredMessage(**msg))
                     chat['messages'] = chat_messages
                 else:
                     chat['messages'] = []  # For backward compatibility
+
+                # Chats saved before rollover tracking: all history is on the current session
+                if 'ragflow_turns' not in chat:
+                    chat['ragflow_turns'] = sum(1 for msg in chat['messages'] if msg.role == "user")
+                    chat['ragflow_tokens'] = sum(estimate_tokens(msg.content) for msg in chat['messages'])
+
+                # Chats saved before usage counters: count once from the messages
+                if 'usage' in chat:
+                    chat['usage'] = UsageCounters.from_dict(chat['usage'])
+                    # The answer was never finished, so never counted
+                    chat['usage'].add(interrupted)
+                    uncounted.add(interrupted)
+                else:
+                    chat['usage'] = counters_for_messages(chat['messages'])
             
+            chats = [UserChat(**chat) for chat in data['chats']]
+            if 'usage' in data:
+                usage = UsageCounters.from_dict(data['usage'])
+                usage.add(uncounted)
+            else:
+                usage = UsageCounters()
+                for chat in chats:
+                    usage.add(chat.usage)
+                uncounted = usage.copy()
+            if not uncounted.is_empty():
+                self._uncounted_usage[user_id] = uncounted
+
             # Convert to UserSession object
             user_session = UserSession(
                 user_id=data['user_id'],
                 session_name=data['session_name'],
                 created_at=data['created_at'],
-                chats=[UserChat(**chat) for chat in data['chats']],
-                total_chats=data['total_chats']
+                chats=chats,
+                total_chats=data['total_chats'],
+                usage=usage
             )
             
             return user_session
             
+        except OSError as e:
+            # Possibly transient; failing here keeps the empty session out of the cache and off disk
+            log.error("sessions_load_failed", user_id=user_id, error=str(e))
+            raise
         except Exception as e:
-            print(f"Error loading user sessions for {user_id}: {e}")
-            # Return empty session if loading fails
+            # Set the unreadable file aside so the next save cannot overwrite the user's history with nothing
+            moved_to = data_file.with_name(f"{data_file.name}.corrupt-{int(time.time())}")
+            try:
+                os.replace(data_file, moved_to)
+            except OSError:
+                moved_to = None
+            log.error("sessions_load_failed", user_id=user_id, error=str(e),
+                      moved_to=str(moved_to) if moved_to else None)
             return UserSession(
                 user_id=user_id,
                 session_name=f"{user_id}_main_session",
@@ -174,34 +396,88 @@ class UserSessionManager:
     
     def _save_user_sessions(self, user_session: UserSession):
         """Save user sessions to file"""
+        with metrics.timed("save_sessions"), log.timed("sessions_saved", user_id=user_session.user_id), \
+                tracing.span("storage.save", user_id=user_session.user_id):
+            self._write_user_sessions(user_session)
+
+    def _write_user_sessions(self, user_session: UserSession):
+        """Serialize and write a user's session file"""
         data_file = self._get_user_data_file(user_session.user_id)
+        tmp_file = data_file.with_name(f".{data_file.name}.{os.getpid()}.tmp")
         
         try:
-            # Convert to dictionary for JSON serialization
-            data = asdict(user_session)
-            
-            # Convert datetime objects to strings
-            data['created_at'] = data['created_at'].isoformat()
-            for chat in data['chats']:
-                chat['created_at'] = chat['created_at'].isoformat()
-                chat['updated_at'] = chat['updated_at'].isoformat()
+            with self._user_lock(user_session.user_id):
+                # Convert to dictionary for JSON serialization
+                data = asdict(user_session)
                 
-                # Convert message timestamps to strings
-                for message in chat['messages']:
-                    message['timestamp'] = message['timestamp'].isoformat()
-            
-            with open(data_file, 'w') as f:
-                json.dump(data, f, indent=2)
+                # Convert datetime objects to strings
+                data['created_at'] = data['created_at'].isoformat()
+                for chat in data['chats']:
+                    chat['created_at'] = chat['created_at'].isoformat()
+                    chat['updated_at'] = chat['updated_at'].isoformat()
+                    
+                    # Convert message timestamps to strings
+                    for message in chat['messages']:
+                        message['timestamp'] = message['timestamp'].isoformat()
+                
+                with self.removal_lock.shared():
+                    if user_session.user_id in self._disk_usage and not data_file.exists():
+                        self._revive_user(user_session)
+                    # Readers (and a crash) see the old file or the new one, never a partial write
+                    with open(tmp_file, 'w') as f:
+                        json.dump(data, f, indent=2)
+                    os.replace(tmp_file, data_file)
+                self._disk_usage[user_session.user_id] = user_session.usage.copy()
                 
         except Exception as e:
-            print(f"Error saving user sessions for {user_session.user_id}: {e}")
+            log.error("sessions_save_failed", user_id=user_session.user_id, error=str(e))
     
+    def _revive_user(self, user_session: UserSession):
+        """
+        Count and index a user again whose file was removed while it was cached here
+
+        Garbage collection took the file's counters off the totals and the
+        user's messages out of the index; the user is active again, so both
+        are restored before the file is written back.
+        """
+        user_id = user_session.user_id
+        self.usage_totals.add(self._disk_usage.pop(user_id))
+        for chat in user_session.chats:
+            for message in chat.messages:
+                if message.content and not message.generating:
+                    self._index_message(user_id, chat.chat_id, message)
+        log.warning("user_revived", user_id=user_id, chats=len(user_session.chats))
+
     def get_user_session(self, user_id: str) -> UserSession:
         """Get or create a user session"""
-        if user_id not in self.user_sessions:
-            self.user_sessions[user_id] = self._load_user_sessions(user_id)
+        user_session = self.user_sessions.get(user_id)
+        if user_session is not None:
+            return user_session
         
-        return self.user_sessions[user_id]
+        with self._user_lock(user_id):
+            # Another thread may have loaded it while this one waited
+            if user_id not in self.user_sessions:
+                user_session = self._load_user_sessions(user_id)
+                # Keep each conversation on the backend that holds its RAGFlow session; chats saved
+                # before backends were recorded are bound to the original server and saved with it
+                for chat in user_session.chats:
+                    self.assistant_manager.bind_session(chat.ragflow_session_id, chat.ragflow_backend)
+                    if chat.ragflow_backend is None:
+                        chat.ragflow_backend = self.assistant_manager.backend_for_session(chat.ragflow_session_id)
+                self.user_sessions[user_id] = user_session
+                # Files from before the counters, and answers cut off by a crash, are counted once:
+                # saving right away stores their counters so the next load does not count them again
+                uncounted = self._uncounted_usage.pop(user_id, None)
+                if self._get_user_data_file(user_id).exists():
+                    self._disk_usage[user_id] = user_session.usage.copy()
+                    if uncounted is not None:
+                        self._disk_usage[user_id].add(uncounted, sign=-1)
+                if uncounted is not None:
+                    self.usage_totals.add(uncounted)
+                    self._save_user_sessions(user_session)
+                    log.info("usage_counted_on_load", user_id=user_id, questions=uncounted.questions,
+                             answers=uncounted.answers)
+            return self.user_sessions[user_id]
     
     def create_user_chat(self, user_id: str, chat_title: str) -> UserChat:
         """
@@ -214,6 +490,7 @@ class UserSessionManager:
         Returns:
             UserChat object
         """
+        started = time.perf_counter()
         try:
             # Check if assistant is available
             if not self.assistant_id:
@@ -232,22 +509,25 @@ class UserSessionManager:
                 updated_at=datetime.now(),
                 message_count=0,
                 ragflow_session_id=ragflow_session_id,
-                messages=[]  # Initialize with empty message list
+                messages=[],  # Initialize with empty message list
+                ragflow_backend=self.assistant_manager.backend_for_session(ragflow_session_id)
             )
             
             # Add to user session
-            user_session = self.get_user_session(user_id)
-            user_session.chats.append(user_chat)
-            user_session.total_chats += 1
+            with self._user_lock(user_id):
+                user_session = self.get_user_session(user_id)
+                user_session.chats.append(user_chat)
+                user_session.total_chats += 1
             
-            # Save to file
-            self._save_user_sessions(user_session)
+                # Save to file
+                self._save_user_sessions(user_session)
             
-            print(f"✅ Created chat '{chat_title}' for user {user_id}")
+            log.info("chat_created", user_id=user_id, chat_id=chat_id, ragflow_session_id=ragflow_session_id,
+                     duration_ms=event_log.elapsed_ms(started))
             return user_chat
             
         except Exception as e:
-            print(f"❌ Failed to create chat for user {user_id}: {e}")
+            log.error("chat_create_failed", user_id=user_id, error=str(e), duration_ms=event_log.elapsed_ms(started))
             raise
     
     def list_user_chats(self, user_id: str) -> List[UserChat]:
@@ -272,6 +552,11 @@ class UserSessionManager:
             return []
         
         return user_chat.messages
+
+    def get_chat_history(self, user_id: str, chat_id: str) -> ChatHistoryView:
+        """Read-only view of a chat's messages for rendering (no copy is made)"""
+        user_chat = self.get_user_chat(user_id, chat_id)
+        return ChatHistoryView(user_chat.messages if user_chat else [])
     
     def clear_chat_messages(self, user_id: str, chat_id: str) -> bool:
         """Clear all messages from a chat (keeping the chat itself)"""
@@ -280,96 +565,330 @@ class UserSessionManager:
             return False
         
         try:
-            user_chat.messages = []
-            user_chat.message_count = 0
-            user_chat.updated_at = datetime.now()
+            with self._user_lock(user_id):
+                user_chat.messages = []
+                user_chat.message_count = 0
+                user_chat.updated_at = datetime.now()
             
-            # Save updated user session
-            user_session = self.get_user_session(user_id)
-            self._save_user_sessions(user_session)
+                # Save updated user session
+                user_session = self.get_user_session(user_id)
+                self._record_usage(user_session, user_chat, user_chat.usage.copy(), sign=-1)
+                self._save_user_sessions(user_session)
+            self._unindex(user_id, chat_id)
             
+            log.info("chat_cleared", user_id=user_id, chat_id=chat_id)
             return True
             
         except Exception as e:
-            print(f"❌ Failed to clear chat messages for {chat_id}: {e}")
+            log.error("chat_clear_failed", user_id=user_id, chat_id=chat_id, error=str(e))
             return False
     
-    def send_message_to_chat(self, user_id: str, chat_id: str, message: str):
+    def _build_rollover_summary(self, user_chat: UserChat) -> str:
+        """Compact extractive summary of the most recent Q&A pairs in a chat"""
+        policy = self.rollover_policy
+        pairs = []
+        question = None
+        for msg in user_chat.messages:
+            if msg.role == "user":
+                question = msg.content
+            elif msg.role == "assistant" and question is not None and not msg.generating:
+                pairs.append((question, msg.content))
+                question = None
+
+        lines = []
+        for question, answer in pairs[-policy.summary_turns:]:
+            answer = " ".join(answer.split())
+            if len(answer) > policy.summary_chars:
+                answer = answer[:policy.summary_chars].rsplit(" ", 1)[0] + " ..."
+            lines.append(f"- Q: {' '.join(question.split())[:200]}\n  A: {answer}")
+        return "\n".join(lines)
+
+    def _prepare_ragflow_turn(self, user_id: str, user_chat: UserChat, message: str) -> str:
+        """
+        Apply the rollover policy before a turn and account for it
+
+        Runs under the user's lock, so two turns in the same chat cannot both roll
+        it over, and a rollover is saved before the turn starts streaming.
+
+        Returns:
+            The text to send to RAGFlow: the message itself, or the message prefixed
+            with a summary of the chat when a fresh RAGFlow session was started.
+        """
+        outgoing = message
+        with self._user_lock(user_id):
+            rolled_over = self.rollover_policy.should_roll_over(user_chat)
+            if rolled_over:
+                summary = self._build_rollover_summary(user_chat)
+                ragflow_session_name = f"{user_id}_{user_chat.title}_{int(time.time())}"
+                new_session_id = self.assistant_manager.create_session(self.assistant_id, ragflow_session_name)
+
+                self.assistant_manager.unbind_session(user_chat.ragflow_session_id)
+                user_chat.previous_ragflow_session_ids.append(user_chat.ragflow_session_id)
+                user_chat.ragflow_session_id = new_session_id
+                user_chat.ragflow_backend = self.assistant_manager.backend_for_session(new_session_id)
+                user_chat.ragflow_turns = 0
+                user_chat.ragflow_tokens = 0
+
+                if summary:
+                    outgoing = (
+                        "Context from earlier in this conversation:\n"
+                        f"{summary}\n\n"
+                        f"Current question: {message}"
+                    )
+
+            user_chat.ragflow_turns += 1
+            user_chat.ragflow_tokens += estimate_tokens(outgoing)
+            if rolled_over:
+                self._save_user_sessions(self.get_user_session(user_id))
+
+        if rolled_over:
+            metrics.increment("chatbot_chat_rollovers_total")
+            log.info("chat_rolled_over", user_id=user_id, chat_id=user_chat.chat_id,
+                     ragflow_session_id=user_chat.ragflow_session_id,
+                     retired_sessions=len(user_chat.previous_ragflow_session_ids))
+        return outgoing
+
+    def send_message_to_chat(self, user_id: str, chat_id: str, message: str,
+                             should_cancel: Optional[Callable[[], bool]] = None):
         """
         Send a message to a specific user chat
         
+        Generation stops cooperatively when should_cancel() returns True or when the
+        consumer closes this generator (e.g. the Streamlit run was interrupted). The
+        upstream RAGFlow stream is closed right away and the partial answer is stored
+        with truncated=True.
+        
         Args:
             user_id: User identifier
             chat_id: Chat identifier
             message: Message content
+            should_cancel: Optional callable polled before each chunk is forwarded
             
         Yields:
             ChatMessage objects from RAGFlow response
         """
-        # Get the user's chat
-        user_chat = self.get_user_chat(user_id, chat_id)
+        # Sampled 1-in-PROFILING_SAMPLE_RATE when PROFILING_ENABLED=true
+        with profiling.profile_request("send_message_to_chat"), \
+                tracing.span("send_message_to_chat", user_id=user_id, chat_id=chat_id):
+            answer = self.start_turn(user_id, chat_id, message)
+            yield from self.stream_turn(user_id, chat_id, message, answer, should_cancel)
+
+    def start_turn(self, user_id: str, chat_id: str, message: str) -> StoredMessage:
+        """
+        Store a question and the empty assistant message its answer will fill
+
+        The assistant message has generating=True until stream_turn finishes, so a
+        reloaded page or another tab can see (and follow) the turn in progress.
+
+        Returns:
+            The assistant message to pass to stream_turn
+        """
+        with metrics.timed("session_lookup"), tracing.span("session_lookup", user_id=user_id, chat_id=chat_id):
+            user_chat = self.get_user_chat(user_id, chat_id)
         if not user_chat:
             raise ValueError(f"Chat {chat_id} not found for user {user_id}")
-        
-        try:
-            # Store the user message first
-            user_message = StoredMessage(
-                role="user",
-                content=message,
-                timestamp=datetime.now(),
+
+        now = datetime.now()
+        question = StoredMessage(
+            role="user",
+            content=message,
+            timestamp=now,
+            message_id=str(uuid.uuid4()),
+            references=None
+        )
+        with self._user_lock(user_id):
+            user_chat.messages.append(question)
+            answer = StoredMessage(
+                role="assistant",
+                content="",
+                timestamp=now,
                 message_id=str(uuid.uuid4()),
-                references=None
+                generating=True
             )
-            user_chat.messages.append(user_message)
-            
-            # Send message to the underlying RAGFlow session and collect full response
-            full_response = ""
-            final_references = None
-
-            # Generate UUID for assistant message once
-            assistant_message_id = str(uuid.uuid4())
-            message_timestamp = datetime.now()
-
-            for response_chunk in self.assistant_manager.send_message(
-                user_chat.ragflow_session_id,
-                message,
-                stream=True
-            ):
-                full_response = response_chunk.content
-                final_references = response_chunk.references
-
-                # Convert StreamingResponse to ChatMessage for compatibility
-                chat_message = ChatMessage(
-                    role="assistant",
-                    content=response_chunk.content,
-                    timestamp=message_timestamp,
-                    message_id=assistant_message_id,
-                    references=response_chunk.references
-                )
-                yield chat_message
-
-            # Store the assistant's response
-            if full_response:
-                assistant_message = StoredMessage(
-                    role="assistant",
-                    content=full_response,
-                    timestamp=message_timestamp,
-                    message_id=assistant_message_id,
-                    references=final_references
+            user_chat.messages.append(answer)
+            user_chat.updated_at = now
+            user_chat.message_count = len(user_chat.messages)
+
+            user_session = self.get_user_session(user_id)
+            self._record_usage(user_session, user_chat, UsageCounters(questions=1))
+            self._save_user_sessions(user_session)
+        self._index_message(user_id, chat_id, question)
+        return answer
+
+    def stream_turn(self, user_id: str, chat_id: str, message: str, answer: StoredMessage,
+                    should_cancel: Optional[Callable[[], bool]] = None):
+        """
+        Generate the answer for a turn opened with start_turn
+
+        The answer message is filled in place as chunks arrive and the partial
+        answer is checkpointed to disk every GENERATION_CHECKPOINT_SECONDS, so it
+        survives the consumer going away. Cancellation works as in send_message_to_chat.
+
+        Yields:
+            ChatMessage objects from RAGFlow response
+        """
+        turn_started = time.perf_counter()
+        user_chat = self.get_user_chat(user_id, chat_id)
+        if not user_chat:
+            raise ValueError(f"Chat {chat_id} not found for user {user_id}")
+        
+        with tracing.span("chat_turn.stream", user_id=user_id, chat_id=chat_id,
+                          message_id=answer.message_id) as turn_span:
+            try:
+                generation_started = time.perf_counter()
+                last_checkpoint = generation_started
+                chunk_count = 0
+                cancel_reason = None
+
+                # Start a fresh RAGFlow session first if this chat's history has grown too long
+                outgoing_message = self._prepare_ragflow_turn(user_id, user_chat, message)
+                turn_index = user_chat.ragflow_turns
+                turn_span.set_attribute("turn_index", turn_index)
+
+                upstream = self.assistant_manager.send_message(
+                    user_chat.ragflow_session_id,
+                    outgoing_message,
+                    stream=True
                 )
-                user_chat.messages.append(assistant_message)
+                ttft = None
+                try:
+                    for response_chunk in upstream:
+                        if should_cancel is not None and should_cancel():
+                            cancel_reason = "cancelled"
+                            break
+                        now = time.perf_counter()
+                        if chunk_count == 0:
+                            ttft = now - generation_started
+                            metrics.observe_stage("ttft", ttft)
+                            turn_span.add_event("first_token", ttft_ms=round(ttft * 1000, 2))
+                        chunk_count += 1
+                        answer.content = response_chunk.content
+                        answer.references = response_chunk.references
+
+                        if now - last_checkpoint >= self.checkpoint_interval:
+                            last_checkpoint = now
+                            self._save_user_sessions(self.get_user_session(user_id))
+
+                        # Convert StreamingResponse to ChatMessage for compatibility
+                        chat_message = ChatMessage(
+                            role="assistant",
+                            content=response_chunk.content,
+                            timestamp=answer.timestamp,
+                            message_id=answer.message_id,
+                            references=response_chunk.references
+                        )
+                        yield chat_message
+                except GeneratorExit:
+                    # Consumer went away mid-answer: keep what we have, then let the close proceed
+                    cancel_reason = "abandoned"
+                    upstream.close()
+                    self._finish_cancelled_turn(user_id, user_chat, answer, generation_started, cancel_reason)
+                    raise
+                finally:
+                    # Closing the upstream generator releases the RAGFlow HTTP stream promptly
+                    upstream.close()
+
+                turn_span.set_attribute("chunks", chunk_count)
+                turn_span.set_attribute("chars", len(answer.content))
+                if cancel_reason:
+                    turn_span.set_attribute("cancel_reason", cancel_reason)
+                    self._finish_cancelled_turn(user_id, user_chat, answer, generation_started, cancel_reason)
+                    return
+
+                generation_seconds = time.perf_counter() - generation_started
+                metrics.observe_stage("generation", generation_seconds)
+                metrics.observe_stream(chunk_count, len(answer.content), generation_seconds)
+
+                # Store the assistant's response
+                persistence_started = time.perf_counter()
+                with metrics.timed("persistence"), tracing.span("persistence"):
+                    self._store_assistant_response(user_id, user_chat, answer)
+
+                turn_seconds = time.perf_counter() - turn_started
+                metrics.observe_stage("chat_turn", turn_seconds)
+                metrics.observe("chatbot_turn_latency_seconds", turn_seconds,
+                                turn_index=turn_index_bucket(turn_index))
+                log.info("chat_turn_completed", user_id=user_id, chat_id=chat_id, message_id=answer.message_id,
+                         turn_index=turn_index, chunks=chunk_count, chars=len(answer.content),
+                         references=len(answer.references or []),
+                         ttft_ms=round(ttft * 1000, 2) if ttft is not None else None,
+                         generation_ms=round(generation_seconds * 1000, 2),
+                         persistence_ms=event_log.elapsed_ms(persistence_started),
+                         duration_ms=round(turn_seconds * 1000, 2))
             
+            except Exception as e:
+                log.error("chat_turn_failed", user_id=user_id, chat_id=chat_id, error=str(e),
+                          duration_ms=event_log.elapsed_ms(turn_started))
+                if answer.generating:
+                    # Keep any partial answer, drop an empty one
+                    self._store_assistant_response(user_id, user_chat, answer, truncated=True)
+                raise
+
+    def _store_assistant_response(self, user_id: str, user_chat: UserChat, answer: StoredMessage,
+                                  truncated: bool = False):
+        """Finish the assistant's answer (dropped if empty), update chat metadata and save"""
+        with self._user_lock(user_id):
+            user_chat.ragflow_tokens += estimate_tokens(answer.content)
+            answer.generating = False
+            answer.truncated = truncated
+            if not answer.content:
+                user_chat.messages[:] = [msg for msg in user_chat.messages if msg is not answer]
+        
             # Update chat metadata
             user_chat.updated_at = datetime.now()
             user_chat.message_count = len(user_chat.messages)
-            
+        
             # Save updated user session
             user_session = self.get_user_session(user_id)
+            if answer.content:
+                delta = UsageCounters()
+                delta.count_message(answer.role, answer.content, answer.references, truncated=truncated)
+                self._record_usage(user_session, user_chat, delta)
             self._save_user_sessions(user_session)
-            
+        if answer.content:
+            self._index_message(user_id, user_chat.chat_id, answer)
+
+    def _index_message(self, user_id: str, chat_id: str, message: StoredMessage):
+        """Add a stored message to the search index; indexing problems never fail a turn"""
+        if self.search_index is None:
+            return
+        try:
+            self.search_index.index_message(user_id, chat_id, message.message_id, message.role, message.content,
+                                            message.timestamp.isoformat())
         except Exception as e:
-            print(f"❌ Failed to send message to chat {chat_id}: {e}")
-            raise
+            log.warning("search_index_failed", user_id=user_id, chat_id=chat_id, operation="index", error=str(e))
+
+    def _unindex(self, user_id: str, chat_id: Optional[str] = None):
+        """Drop a chat's (or, without chat_id, a user's) messages from the search index"""
+        if self.search_index is None:
+            return
+        try:
+            if chat_id:
+                self.search_index.delete_chat(chat_id)
+            else:
+                self.search_index.delete_user(user_id)
+        except Exception as e:
+            log.warning("search_index_failed", user_id=user_id, chat_id=chat_id, operation="delete", error=str(e))
+
+    def _record_usage(self, user_session: UserSession, user_chat: Optional[UserChat], delta: UsageCounters,
+                      sign: int = 1):
+        """Apply a counter change to a chat, its user and the global totals (the caller saves the user file)"""
+        if user_chat is not None:
+            user_chat.usage.add(delta, sign)
+        user_session.usage.add(delta, sign)
+        self.usage_totals.add(delta, sign)
+
+    def _finish_cancelled_turn(self, user_id: str, user_chat: UserChat, answer: StoredMessage,
+                               generation_started: float, reason: str):
+        """Persist a partial answer as truncated and record the wasted generation time"""
+        wasted_seconds = time.perf_counter() - generation_started
+        metrics.increment("chatbot_generation_cancelled_total", reason=reason)
+        metrics.observe("chatbot_generation_wasted_seconds", wasted_seconds, reason=reason)
+
+        self._store_assistant_response(user_id, user_chat, answer, truncated=True)
+        log.info("generation_cancelled", user_id=user_id, chat_id=user_chat.chat_id,
+                 message_id=answer.message_id, reason=reason, chars_kept=len(answer.content),
+                 duration_ms=round(wasted_seconds * 1000, 2))
     
     def delete_user_chat(self, user_id: str, chat_id: str) -> bool:
         """Delete a user's chat"""
@@ -379,30 +898,35 @@ class UserSessionManager:
         for i, chat in enumerate(user_session.chats):
             if chat.chat_id == chat_id:
                 try:
-                    # Note: RAGFlow SDK doesn't provide direct session deletion
-                    # We'll just remove from our local session management
+                    # Only local data is removed; session_reaper deletes the
+                    # orphaned RAGFlow session later
                     
                     # Remove from user session
-                    user_session.chats.pop(i)
-                    user_session.total_chats -= 1
+                    with self._user_lock(user_id):
+                        user_session.chats.pop(i)
+                        user_session.total_chats -= 1
+                        self._record_usage(user_session, None, chat.usage, sign=-1)
                     
-                    # Save updated session
-                    self._save_user_sessions(user_session)
+                        # Save updated session
+                        self._save_user_sessions(user_session)
+                    self._unindex(user_id, chat_id)
+                    self.assistant_manager.unbind_session(chat.ragflow_session_id)
                     
-                    print(f"✅ Deleted chat '{chat.title}' for user {user_id}")
-                    print(f"ℹ️  Note: RAGFlow session {chat.ragflow_session_id} remains on server")
+                    log.info("chat_deleted", user_id=user_id, chat_id=chat_id,
+                             ragflow_session_id=chat.ragflow_session_id)
                     return True
                     
                 except Exception as e:
-                    print(f"❌ Failed to delete chat {chat_id}: {e}")
+                    log.error("chat_delete_failed", user_id=user_id, chat_id=chat_id, error=str(e))
                     return False
         
-        print(f"⚠️ Chat {chat_id} not found for user {user_id}")
+        log.warning("chat_not_found", user_id=user_id, chat_id=chat_id, operation="delete")
         return False
     
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get statistics for a user"""
         user_session = self.get_user_session(user_id)
+        usage = user_session.usage
         
         total_messages = sum(chat.message_count for chat in user_session.chats)
         
@@ -410,6 +934,9 @@ class UserSessionManager:
             'user_id': user_id,
             'total_chats': user_session.total_chats,
             'total_messages': total_messages,
+            'questions': usage.questions,
+            'answers': usage.answers,
+            'messages_with_feedback': usage.feedback,
             'session_created': user_session.created_at.isoformat(),
             'most_recent_chat': max(
                 (chat.updated_at for chat in user_session.chats), 
@@ -434,25 +961,81 @@ class UserSessionManager:
         try:
             user_session = self.get_user_session(user_id)
             
-            # Note: RAGFlow SDK doesn't provide session deletion
-            # Sessions remain on server but are removed from local management
+            # Sessions remain on the server until session_reaper deletes them
             
             # Delete user data file
-            data_file = self._get_user_data_file(user_id)
-            if data_file.exists():
-                data_file.unlink()
+            with self._user_lock(user_id):
+                data_file = self._get_user_data_file(user_id)
+                if data_file.exists():
+                    data_file.unlink()
+                    self.usage_totals.add(user_session.usage, sign=-1)
+                self._unindex(user_id)
             
-            # Remove from memory cache
-            if user_id in self.user_sessions:
-                del self.user_sessions[user_id]
+                # Remove from memory cache
+                self._evict_user(user_id)
             
-            print(f"✅ Cleaned up all data for user {user_id}")
+            log.info("user_data_deleted", user_id=user_id, chats=len(user_session.chats))
             return True
             
         except Exception as e:
-            print(f"❌ Failed to cleanup data for user {user_id}: {e}")
+            log.error("user_data_delete_failed", user_id=user_id, error=str(e))
             return False
     
+    def _evict_user(self, user_id: str):
+        """Drop a user's cached session, message indexes and session bindings (their file is gone)"""
+        with self._user_lock(user_id):
+            user_session = self.user_sessions.pop(user_id, None)
+            self._disk_usage.pop(user_id, None)
+            for chat in user_session.chats if user_session else []:
+                self._message_index.pop(chat.chat_id, None)
+                self.assistant_manager.unbind_session(chat.ragflow_session_id)
+
+    def collect_garbage(self, time_budget: float = USER_GC_SLICE_SECONDS, dry_run: bool = False) -> GCReport:
+        """
+        Run one slice of user garbage collection on this manager's data directory
+
+        Removed users are also evicted from this manager's caches, so they are
+        not written back from memory.
+        """
+        collector = UserGarbageCollector(self.data_dir, on_remove=self._evict_user)
+        return collector.run_slice(time_budget, dry_run=dry_run)
+    
+    # ================= USAGE COUNTERS =================
+
+    def get_chat_usage(self, user_id: str, chat_id: str) -> Dict[str, Any]:
+        """Message, rating, category and reference counts of one chat ({} if not found)"""
+        user_chat = self.get_user_chat(user_id, chat_id)
+        return asdict(user_chat.usage) if user_chat else {}
+
+    def get_user_usage(self, user_id: str) -> Dict[str, Any]:
+        """Usage counts summed over a user's chats"""
+        return asdict(self.get_user_session(user_id).usage)
+
+    def get_global_usage(self) -> Dict[str, Any]:
+        """Usage counts over every user in the data directory (as last rebuilt and updated since)"""
+        return asdict(self.usage_totals.read())
+
+    # ================= SEARCH =================
+
+    def search_conversations(self, query: str, limit: int = 20, user_id: Optional[str] = None,
+                             role: Optional[str] = None) -> SearchResults:
+        """
+        Questions and answers matching a query, best match first (truncated if
+        only the newest matches were ranked)
+
+        Args:
+            query: Words that must all occur in the message
+            limit: Maximum number of hits
+            user_id: Only this user's conversations
+            role: Only "user" (questions) or "assistant" (answers)
+
+        Raises:
+            RuntimeError: The search index is disabled
+        """
+        if self.search_index is None:
+            raise RuntimeError("Search index disabled (SEARCH_INDEX_ENABLED=false)")
+        return self.search_index.search(query, limit=limit, user_id=user_id, role=role)
+
     # ================= FEEDBACK MANAGEMENT METHODS =================
     
     def add_message_feedback(self, user_id: str, chat_id: str, message_id: str, feedback_data: Dict[str, Any]) -> bool:
@@ -471,41 +1054,60 @@ class UserSessionManager:
         try:
             user_chat = self.get_user_chat(user_id, chat_id)
             if not user_chat:
-                print(f"❌ Chat {chat_id} not found for user {user_id}")
+                log.warning("chat_not_found", user_id=user_id, chat_id=chat_id, operation="feedback")
                 return False
             
             # Find the message by UUID
-            target_message = None
-            for message in user_chat.messages:
-                if message.message_id == message_id:
-                    target_message = message
-                    break
+            target_message = self._find_message(user_chat, message_id)
 
             if not target_message:
-                print(f"❌ Message with ID {message_id} not found")
+                log.warning("message_not_found", user_id=user_id, chat_id=chat_id, message_id=message_id)
                 return False
             
             # Add current timestamp if not provided
             if "feedback_timestamp" not in feedback_data:
                 feedback_data["feedback_timestamp"] = datetime.now().isoformat()
             
-            # Store feedback
-            target_message.feedback = feedback_data
+            # Replacing a rating moves it between histogram buckets
+            with self._user_lock(user_id):
+                delta = UsageCounters()
+                delta.count_feedback(target_message.feedback, sign=-1)
+                delta.count_feedback(feedback_data)
+
+                # Store feedback
+                target_message.feedback = feedback_data
             
-            # Update chat timestamp
-            user_chat.updated_at = datetime.now()
+                # Update chat timestamp
+                user_chat.updated_at = datetime.now()
             
-            # Save updated user session
-            user_session = self.get_user_session(user_id)
-            self._save_user_sessions(user_session)
+                # Save updated user session
+                user_session = self.get_user_session(user_id)
+                self._record_usage(user_session, user_chat, delta)
+                self._save_user_sessions(user_session)
             
-            print(f"✅ Added feedback to message {message_id}")
+            log.info("feedback_saved", user_id=user_id, chat_id=chat_id, message_id=message_id,
+                     star_rating=feedback_data.get("star_rating"))
             return True
             
         except Exception as e:
-            print(f"❌ Failed to add feedback: {e}")
+            log.error("feedback_failed", user_id=user_id, chat_id=chat_id, message_id=message_id,
+                      operation="add", error=str(e))
             return False
     
+    def _find_message(self, user_chat: UserChat, message_id: str) -> Optional[StoredMessage]:
+        """
+        Look up a message by UUID in O(1)
+
+        The per-chat index is rebuilt only when the chat's message list has changed,
+        so rendering a rating widget per message no longer scans the whole chat each time.
+        """
+        cached = self._message_index.get(user_chat.chat_id)
+        if cached is None or cached[0] is not user_chat.messages or cached[1] != len(user_chat.messages):
+            index = {msg.message_id: msg for msg in user_chat.messages}
+            cached = (user_chat.messages, len(user_chat.messages), index)
+            self._message_index[user_chat.chat_id] = cached
+        return cached[2].get(message_id)
+    
     def get_message_feedback(self, user_id: str, chat_id: str, message_id: str) -> Optional[Dict[str, Any]]:
         """
         Get feedback for a specific message
@@ -524,14 +1126,12 @@ class UserSessionManager:
                 return None
             
             # Find the message by UUID
-            for message in user_chat.messages:
-                if message.message_id == message_id:
-                    return message.feedback
-            
-            return None
+            message = self._find_message(user_chat, message_id)
+            return message.feedback if message else None
             
         except Exception as e:
-            print(f"❌ Failed to get feedback: {e}")
+            log.error("feedback_failed", user_id=user_id, chat_id=chat_id, message_id=message_id,
+                      operation="get", error=str(e))
             return None
     
     def update_message_feedback(self, user_id: str, chat_id: str, message_id: str, feedback_data: Dict[str, Any]) -> bool:
@@ -552,7 +1152,8 @@ class UserSessionManager:
             return self.add_message_feedback(user_id, chat_id, message_id, feedback_data)
             
         except Exception as e:
-            print(f"❌ Failed to update feedback: {e}")
+            log.error("feedback_failed", user_id=user_id, chat_id=chat_id, message_id=message_id,
+                      operation="update", error=str(e))
             return False
     
     def get_chat_feedback_summary(self, user_id: str, chat_id: str) -> Dict[str, Any]:
@@ -571,42 +1172,25 @@ class UserSessionManager:
             if not user_chat:
                 return {}
             
-            total_messages = len([msg for msg in user_chat.messages if msg.role == "assistant"])
-            feedback_count = len([msg for msg in user_chat.messages if msg.feedback is not None])
-            
-            positive_feedback = len([
-                msg for msg in user_chat.messages 
-                if msg.feedback and msg.feedback.get("rating") == "thumbs-up"
-            ])
-            
-            negative_feedback = len([
-                msg for msg in user_chat.messages 
-                if msg.feedback and msg.feedback.get("rating") == "thumbs-down"
-            ])
-            
-            # Collect all categories
-            all_categories = []
-            for msg in user_chat.messages:
-                if msg.feedback and msg.feedback.get("categories"):
-                    all_categories.extend(msg.feedback["categories"])
-            
-            # Count category occurrences
-            category_counts = {}
-            for category in all_categories:
-                category_counts[category] = category_counts.get(category, 0) + 1
+            # Counters are kept current as messages and feedback are stored
+            usage = user_chat.usage
+            total_messages = usage.answers
+            feedback_count = usage.feedback
+            category_counts = dict(usage.categories)
             
             return {
                 "total_assistant_messages": total_messages,
                 "messages_with_feedback": feedback_count,
                 "feedback_rate": feedback_count / total_messages if total_messages > 0 else 0,
-                "positive_feedback": positive_feedback,
-                "negative_feedback": negative_feedback,
+                "positive_feedback": usage.thumbs_up,
+                "negative_feedback": usage.thumbs_down,
+                "rating_counts": dict(usage.ratings),
                 "category_counts": category_counts,
                 "most_common_categories": sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:5]
             }
             
         except Exception as e:
-            print(f"❌ Failed to get feedback summary: {e}")
+            log.error("feedback_failed", user_id=user_id, chat_id=chat_id, operation="summary", error=str(e))
             return {}
     
     def export_chat_with_feedback(self, user_id: str, chat_id: str) -> Dict[str, Any]:
@@ -652,7 +1236,7 @@ class UserSessionManager:
             return chat_data
             
         except Exception as e:
-            print(f"❌ Failed to export chat with feedback: {e}")
+            log.error("feedback_failed", user_id=user_id, chat_id=chat_id, operation="export", error=str(e))
             return {}
 
 
@@ -660,7 +1244,8 @@ def create_manager() -> UserSessionManager:
     """Create a UserSessionManager with environment-based configuration"""
     # Load configuration from environment variables with fallback defaults
     API_KEY = os.getenv("RAGFLOW_API_KEY")
-    BASE_URL = os.getenv("RAGFLOW_BASE_URL", "http://127.0.0.1:9380")
+    # RAGFLOW_BASE_URLS (comma-separated) load-balances across several servers
+    BASE_URL = os.getenv("RAGFLOW_BASE_URLS") or os.getenv("RAGFLOW_BASE_URL", "http://127.0.0.1:9380")
     DATA_DIR = os.getenv("USER_DATA_DIR", "user_data")
     
     if not API_KEY or API_KEY == "your-ragflow-api-key-here":
@@ -10,12 +10,21 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
-try:
-    from crewai import Agent, Task, Crew, Process
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    print("Warning: CrewAI or LangChain not installed. Run: pip install crewai langchain-openai")
-    
+# CrewAI and LangChain take seconds to import; _load_crewai() binds these on first use
+Agent = Task = Crew = Process = ChatOpenAI = None
+
+
+def _load_crewai():
+    """Import CrewAI and LangChain the first time an evaluation crew is built"""
+    global Agent, Task, Crew, Process, ChatOpenAI
+    if Agent is not None:
+        return
+    try:
+        from crewai import Agent, Task, Crew, Process
+        from langchain_openai import ChatOpenAI
+    except ImportError as e:
+        raise ImportError("CrewAI or LangChain not installed. Run: pip install crewai langchain-openai") from e
+
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -48,6 +57,7 @@ class ChatBotEvaluationCrew:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable required")
         
+        _load_crewai()
         self.llm = ChatOpenAI(
             api_key=self.openai_api_key,
             model="gpt-4.1",
@@ -56,7 +66,7 @@ class ChatBotEvaluationCrew:
         
         self.agents = self._create_agents()
     
-    def _create_agents(self) -> Dict[str, Agent]:
+    def _create_agents(self) -> Dict[str, 'Agent']:
         """Create specialized evaluation agents"""
         
         # BiocuratorLanguageDetector Agent
@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+"""
+Mock RAGFlow Server
+Local stand-in for the RAGFlow HTTP API (/api/v1) so the chat path, the knowledge
+base scripts and load tests can run without a RAGFlow server or OpenAI key.
+
+It speaks the same JSON envelopes the ragflow-sdk expects and keeps chats,
+sessions, datasets and documents in memory. Answers stream as cumulative SSE
+chunks with fake references, paced by a latency profile:
+
+    instant   no delays, for unit tests
+    typical   ~1s time to first token, 40 tokens/s, six ~2 KB reference chunks
+    slow      a loaded production server: long and jittery first token, 12 tokens/s
+    flaky     typical, plus injected request and mid-stream failures
+
+Usage:
+    python testing/mock_ragflow_server.py --port 9380 --profile typical
+    RAGFLOW_BASE_URL=http://127.0.0.1:9380 RAGFLOW_API_KEY=mock-key streamlit run src/rcsb_pdb_chatbot.py
+
+In tests:
+    with MockRAGFlowServer(PROFILES["instant"]) as server:
+        manager = RAGFlowAssistantManager(server.api_key, server.url)
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_API_KEY = "mock-key"
+
+# RAGFlow error codes the SDK surfaces as exception messages
+CODE_DATA_ERROR = 102
+CODE_AUTHENTICATION_ERROR = 109
+CODE_SERVER_ERROR = 500
+
+ANSWER_VOCABULARY = (
+    "The wwPDB deposition system validates coordinates and structure factors before "
+    "annotation. Depositors upload PDBx/mmCIF files, review the validation report and "
+    "respond to annotator questions. Geometry, fit to experimental data and clashscore "
+    "are summarised as percentile sliders relative to the archive."
+).split()
+
+REFERENCE_SENTENCE = (
+    "Annotators check ligand chemistry, polymer sequence alignment and assembly "
+    "information against the deposited coordinates and experimental data. "
+)
+
+
+@dataclass
+class MockProfile:
+    """Latency, payload and failure behaviour of the mock server"""
+    admin_latency: float = 0.0  # Seconds added to every list/create/update call
+    ttft: float = 0.0  # Seconds before the first answer chunk
+    ttft_jitter: float = 0.0  # Extra uniform random delay on top of ttft
+    tokens_per_second: float = 0.0  # Answer token rate (0 = as fast as possible)
+    answer_tokens: int = 40  # Words per answer
+    reference_count: int = 3  # Reference chunks attached to each answer
+    reference_chars: int = 2000  # Characters per reference chunk (~512 tokens)
+    error_rate: float = 0.0  # Fraction of requests failing with HTTP 500
+    stream_error_rate: float = 0.0  # Fraction of answers failing halfway through the stream
+    parse_seconds: float = 0.0  # Time a document takes to go from RUNNING to DONE
+
+
+PROFILES: Dict[str, MockProfile] = {
+    "instant": MockProfile(),
+    "typical": MockProfile(admin_latency=0.02, ttft=1.0, ttft_jitter=0.5, tokens_per_second=40,
+                           answer_tokens=250, reference_count=6, parse_seconds=2.0),
+    "slow": MockProfile(admin_latency=0.2, ttft=4.0, ttft_jitter=3.0, tokens_per_second=12,
+                        answer_tokens=250, reference_count=8, parse_seconds=10.0),
+    "flaky": MockProfile(admin_latency=0.02, ttft=1.0, ttft_jitter=0.5, tokens_per_second=40,
+                         answer_tokens=250, reference_count=6, error_rate=0.05,
+                         stream_error_rate=0.05, parse_seconds=2.0),
+}
+
+
+class MockRAGFlowError(Exception):
+    """A request the real server would reject: becomes a {"code", "message"} response"""
+
+    def __init__(self, message: str, code: int = CODE_DATA_ERROR, status: int = 200):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _merge(target: Dict[str, Any], update: Dict[str, Any]):
+    """Recursive dict update, like RAGFlow's partial config updates"""
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+class MockRAGFlowState:
+    """In-memory chats, sessions, datasets and documents"""
+
+    def __init__(self, profile: MockProfile, seed: Optional[int] = None):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.chats: Dict[str, Dict[str, Any]] = {}
+        self.sessions: Dict[str, Dict[str, Any]] = {}  # session_id -> session (with chat_id)
+        self.datasets: Dict[str, Dict[str, Any]] = {}
+        self.documents: Dict[str, Dict[str, Any]] = {}  # document_id -> document (with dataset_id)
+        self.requests: Counter = Counter()  # Route name (e.g. "list_chats") -> count
+        self.active_streams = 0
+        self.peak_streams = 0
+
+    def chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def uniform(self, upper: float) -> float:
+        if upper <= 0:
+            return 0.0
+        with self.lock:
+            return self.rng.uniform(0, upper)
+
+    # === Listing ===
+
+    @staticmethod
+    def select(items: List[Dict[str, Any]], params: Dict[str, str], kind: str,
+               missing_is_error: bool = True) -> List[Dict[str, Any]]:
+        """Filter by id/name, order and paginate like RAGFlow's list endpoints"""
+        for key in ("id", "name"):
+            if params.get(key):
+                items = [item for item in items if item.get(key) == params[key]]
+                if not items and missing_is_error:
+                    raise MockRAGFlowError(f"The {kind} doesn't exist")
+        orderby = params.get("orderby") or "create_time"
+        descending = params.get("desc", "True").lower() != "false"
+        items = sorted(items, key=lambda item: item.get(orderby) or 0, reverse=descending)
+        page = max(int(params.get("page") or 1), 1)
+        page_size = max(int(params.get("page_size") or 30), 1)
+        return items[(page - 1) * page_size:page * page_size]
+
+    # === Datasets and documents ===
+
+    def create_dataset(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        name = (body.get("name") or "").strip()
+        if not name:
+            raise MockRAGFlowError("`name` is required")
+        with self.lock:
+            if any(d["name"] == name for d in self.datasets.values()):
+                raise MockRAGFlowError(f"Dataset name '{name}' already exists")
+            dataset = {
+                "id": _new_id(),
+                "name": name,
+                "avatar": body.get("avatar") or "",
+                "tenant_id": "mock-tenant",
+                "description": body.get("description") or "",
+                "embedding_model": body.get("embedding_model") or "text-embedding-3-large@OpenAI",
+                "permission": body.get("permission") or "me",
+                "document_count": 0,
+                "chunk_count": 0,
+                "chunk_method": body.get("chunk_method") or "naive",
+                "parser_config": body.get("parser_config") or {"chunk_token_num": 512},
+                "pagerank": 0,
+                "create_time": _now_ms(),
+            }
+            self.datasets[dataset["id"]] = dataset
+            return dict(dataset)
+
+    def dataset(self, dataset_id: str) -> Dict[str, Any]:
+        dataset = self.datasets.get(dataset_id)
+        if dataset is None:
+            raise MockRAGFlowError(f"You don't own the dataset {dataset_id}.")
+        return dataset
+
+    def upload_documents(self, dataset_id: str, files: List[Tuple[str, bytes]]) -> List[Dict[str, Any]]:
+        if not files:
+            raise MockRAGFlowError("No file part!")
+        with self.lock:
+            dataset = self.dataset(dataset_id)
+            uploaded = []
+            for name, blob in files:
+                document = {
+                    "id": _new_id(),
+                    "name": name,
+                    "dataset_id": dataset_id,
+                    "chunk_method": dataset["chunk_method"],
+                    "parser_config": dict(dataset["parser_config"]),
+                    "source_type": "local",
+                    "type": name.rsplit(".", 1)[-1].lower() if "." in name else "",
+                    "created_by": "mock-tenant",
+                    "size": len(blob),
+                    "token_count": 0,
+                    "chunk_count": 0,
+                    "progress": 0.0,
+                    "progress_msg": "",
+                    "process_begin_at": None,
+                    "process_duration": 0.0,
+                    "run": "UNSTART",
+                    "status": "1",
+                    "create_time": _now_ms(),
+                }
+                self.documents[document["id"]] = document
+                uploaded.append(dict(document))
+            dataset["document_count"] += len(uploaded)
+            return uploaded
+
+    def _advance_parsing(self, document: Dict[str, Any]):
+        """Move a RUNNING document towards DONE according to parse_seconds"""
+        if document["run"] != "RUNNING":
+            return
+        elapsed = time.monotonic() - document["_parse_started"]
+        if elapsed >= self.profile.parse_seconds:
+            chunk_count = max(1, document["size"] // max(self.profile.reference_chars, 1))
+            document.update(run="DONE", progress=1.0, progress_msg="Done",
+                            chunk_count=chunk_count, token_count=document["size"] // 4,
+                            process_duration=round(elapsed, 3))
+            dataset = self.datasets.get(document["dataset_id"])
+            if dataset is not None:
+                dataset["chunk_count"] += chunk_count
+        else:
+            document["progress"] = round(elapsed / self.profile.parse_seconds, 3)
+
+    def list_documents(self, dataset_id: str, params: Dict[str, str]) -> Dict[str, Any]:
+        with self.lock:
+            self.dataset(dataset_id)
+            documents = [d for d in self.documents.values() if d["dataset_id"] == dataset_id]
+            for document in documents:
+                self._advance_parsing(document)
+            if params.get("keywords"):
+                documents = [d for d in documents if params["keywords"].lower() in d["name"].lower()]
+            total = len(documents)
+            selected = self.select(documents, params, "document", missing_is_error=False)
+            return {"docs": [{k: v for k, v in d.items() if not k.startswith("_")} for d in selected],
+                    "total": total}
+
+    def parse_documents(self, dataset_id: str, document_ids: List[str]):
+        if not document_ids:
+            raise MockRAGFlowError("`document_ids` is required")
+        with self.lock:
+            self.dataset(dataset_id)
+            for document_id in document_ids:
+                document = self.documents.get(document_id)
+                if document is None or document["dataset_id"] != dataset_id:
+                    raise MockRAGFlowError(f"You don't own the document {document_id}.")
+                document.update(run="RUNNING", progress=0.0, chunk_count=0,
+                                process_begin_at=datetime.now().isoformat(),
+                                _parse_started=time.monotonic())
+                self._advance_parsing(document)
+
+    def cancel_parsing(self, dataset_id: str, document_ids: List[str]):
+        with self.lock:
+            for document_id in document_ids or []:
+                document = self.documents.get(document_id)
+                if document is not None and document["dataset_id"] == dataset_id \
+                        and document["run"] == "RUNNING":
+                    document.update(run="CANCEL", progress=0.0)
+
+    def update_document(self, dataset_id: str, document_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            document = self.documents.get(document_id)
+            if document is None or document["dataset_id"] != dataset_id:
+                raise MockRAGFlowError(f"The dataset doesn't own the document {document_id}.")
+            _merge(document, {k: v for k, v in body.items() if k not in ("id", "dataset_id")})
+            return {k: v for k, v in document.items() if not k.startswith("_")}
+
+    def delete_documents(self, dataset_id: str, ids: Optional[List[str]]):
+        with self.lock:
+            dataset = self.dataset(dataset_id)
+            owned = [d for d in self.documents.values() if d["dataset_id"] == dataset_id]
+            targets = owned if ids is None else [d for d in owned if d["id"] in set(ids)]
+            if ids is not None and len(targets) != len(set(ids)):
+                raise MockRAGFlowError("Documents not found in dataset")
+            for document in targets:
+                del self.documents[document["id"]]
+                dataset["chunk_count"] -= document["chunk_count"]
+            dataset["document_count"] -= len(targets)
+
+    def delete_datasets(self, ids: Optional[List[str]]):
+        with self.lock:
+            targets = list(self.datasets) if ids is None else ids
+            for dataset_id in targets:
+                self.dataset(dataset_id)
+            for dataset_id in targets:
+                del self.datasets[dataset_id]
+                for document_id in [d["id"] for d in self.documents.values() if d["dataset_id"] == dataset_id]:
+                    del self.documents[document_id]
+
+    # === Chats and sessions ===
+
+    def create_chat(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        name = (body.get("name") or "").strip()
+        if not name:
+            raise MockRAGFlowError("`name` is required.")
+        with self.lock:
+            if any(c["name"] == name for c in self.chats.values()):
+                raise MockRAGFlowError("Duplicated chat name in creating chat.")
+            for dataset_id in body.get("dataset_ids") or []:
+                self.dataset(dataset_id)
+            chat = {
+                "id": _new_id(),
+                "name": name,
+                "avatar": body.get("avatar") or "",
+                "dataset_ids": list(body.get("dataset_ids") or []),
+                "llm": body.get("llm") or {"model_name": "gpt-4-turbo"},
+                "prompt": body.get("prompt") or {},
+                "create_time": _now_ms(),
+            }
+            self.chats[chat["id"]] = chat
+            return json.loads(json.dumps(chat))
+
+    def chat(self, chat_id: str) -> Dict[str, Any]:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            raise MockRAGFlowError(f"You don't own the chat {chat_id}")
+        return chat
+
+    def update_chat(self, chat_id: str, body: Dict[str, Any]):
+        with self.lock:
+            chat = self.chat(chat_id)
+            for dataset_id in body.get("dataset_ids") or []:
+                self.dataset(dataset_id)
+            _merge(chat, {k: v for k, v in body.items() if k != "id"})
+
+    def delete_chats(self, ids: Optional[List[str]]):
+        with self.lock:
+            targets = list(self.chats) if ids is None else ids
+            for chat_id in targets:
+                self.chat(chat_id)
+            for chat_id in targets:
+                del self.chats[chat_id]
+                for session_id in [s["id"] for s in self.sessions.values() if s["chat_id"] == chat_id]:
+                    del self.sessions[session_id]
+
+    def create_session(self, chat_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            chat = self.chat(chat_id)
+            opener = chat.get("prompt", {}).get("opener") or "Hi! I'm your assistant. What can I do for you?"
+            session = {
+                "id": _new_id(),
+                "name": body.get("name") or "New session",
+                "chat_id": chat_id,
+                "messages": [{"role": "assistant", "content": opener}],
+                "create_time": _now_ms(),
+            }
+            self.sessions[session["id"]] = session
+            return json.loads(json.dumps(session))
+
+    def list_sessions(self, chat_id: str, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        with self.lock:
+            self.chat(chat_id)
+            sessions = [s for s in self.sessions.values() if s["chat_id"] == chat_id]
+            return json.loads(json.dumps(self.select(sessions, params, "session", missing_is_error=False)))
+
+    def delete_sessions(self, chat_id: str, ids: Optional[List[str]]):
+        with self.lock:
+            self.chat(chat_id)
+            owned = {s["id"] for s in self.sessions.values() if s["chat_id"] == chat_id}
+            targets = owned if ids is None else set(ids)
+            missing = targets - owned
+            if missing:
+                raise MockRAGFlowError(f"The chat doesn't own the session {sorted(missing)[0]}")
+            for session_id in targets:
+                del self.sessions[session_id]
+
+    def session_for_completion(self, chat_id: str, session_id: Optional[str]) -> Dict[str, Any]:
+        with self.lock:
+            self.chat(chat_id)
+            session = self.sessions.get(session_id or "")
+            if session is None or session["chat_id"] != chat_id:
+                raise MockRAGFlowError("Session does not exist")
+            return session
+
+    # === Generated content ===
+
+    def answer_words(self, question: str) -> List[str]:
+        """Deterministic answer for a question, answer_tokens words long"""
+        rng = random.Random(question)
+        words = [w.strip("?.,!") for w in question.split()[:6] if w.strip("?.,!")]
+        words += [rng.choice(ANSWER_VOCABULARY) for _ in range(max(self.profile.answer_tokens - len(words), 0))]
+        return words[:max(self.profile.answer_tokens, 1)]
+
+    def references(self, chat_id: str, question: str) -> Dict[str, Any]:
+        """RAGFlow-shaped reference block with reference_count chunks of reference_chars"""
+        with self.lock:
+            chat = self.chats.get(chat_id) or {}
+            dataset_ids = chat.get("dataset_ids") or ["mock-dataset"]
+            documents = [d for d in self.documents.values() if d["dataset_id"] in dataset_ids] \
+                or [{"id": "mock-document", "name": "wwPDB-deposition-guide.pdf"}]
+        rng = random.Random(f"refs:{question}")
+        sentence_count = self.profile.reference_chars // len(REFERENCE_SENTENCE) + 1
+        content_body = (REFERENCE_SENTENCE * sentence_count)[:self.profile.reference_chars]
+        chunks = []
+        for i in range(self.profile.reference_count):
+            document = documents[i % len(documents)]
+            similarity = round(0.9 - i * 0.05 - rng.random() * 0.02, 4)
+            chunks.append({
+                "id": _new_id(),
+                "content": content_body,
+                "document_id": document["id"],
+                "document_name": document["name"],
+                "dataset_id": dataset_ids[0],
+                "image_id": "",
+                "positions": [[1 + i, 80, 520, 100, 700]],
+                "similarity": similarity,
+                "vector_similarity": round(similarity + 0.02, 4),
+                "term_similarity": round(similarity - 0.05, 4),
+            })
+        doc_aggs = Counter(chunk["document_name"] for chunk in chunks)
+        return {
+            "total": len(chunks),
+            "chunks": chunks,
+            "doc_aggs": [{"doc_name": name, "doc_id": next(c["document_id"] for c in chunks
+                                                           if c["document_name"] == name), "count": count}
+                         for name, count in doc_aggs.items()],
+        }
+
+
+class MockRAGFlowHandler(BaseHTTPRequestHandler):
+    """Routes /api/v1 requests to MockRAGFlowState"""
+
+    server_version = "MockRAGFlow/1.0"
+    # HTTP/1.0: every response closes its connection, so streams need no chunked encoding
+    protocol_version = "HTTP/1.0"
+
+    ROUTES = [
+        ("GET", r"/datasets", "list_datasets"),
+        ("POST", r"/datasets", "create_dataset"),
+        ("DELETE", r"/datasets", "delete_datasets"),
+        ("PUT", r"/datasets/(?P<dataset_id>[^/]+)", "update_dataset"),
+        ("GET", r"/datasets/(?P<dataset_id>[^/]+)/documents", "list_documents"),
+        ("POST", r"/datasets/(?P<dataset_id>[^/]+)/documents", "upload_documents"),
+        ("DELETE", r"/datasets/(?P<dataset_id>[^/]+)/documents", "delete_documents"),
+        ("PUT", r"/datasets/(?P<dataset_id>[^/]+)/documents/(?P<document_id>[^/]+)", "update_document"),
+        ("POST", r"/datasets/(?P<dataset_id>[^/]+)/chunks", "parse_documents"),
+        ("DELETE", r"/datasets/(?P<dataset_id>[^/]+)/chunks", "cancel_parsing"),
+        ("POST", r"/retrieval", "retrieval"),
+        ("GET", r"/chats", "list_chats"),
+        ("POST", r"/chats", "create_chat"),
+        ("DELETE", r"/chats", "delete_chats"),
+        ("PUT", r"/chats/(?P<chat_id>[^/]+)", "update_chat"),
+        ("GET", r"/chats/(?P<chat_id>[^/]+)/sessions", "list_sessions"),
+        ("POST", r"/chats/(?P<chat_id>[^/]+)/sessions", "create_session"),
+        ("DELETE", r"/chats/(?P<chat_id>[^/]+)/sessions", "delete_sessions"),
+        ("POST", r"/chats/(?P<chat_id>[^/]+)/completions", "completions"),
+    ]
+    COMPILED = [(method, re.compile(f"^/api/v1{pattern}/?$"), name) for method, pattern, name in ROUTES]
+
+    @property
+    def state(self) -> MockRAGFlowState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    # === Plumbing ===
+
+    def send_json(self, payload: Dict[str, Any], status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def json_body(self) -> Dict[str, Any]:
+        raw = self.read_body()
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except json.JSONDecodeError:
+            raise MockRAGFlowError("Request body is not valid JSON", code=CODE_DATA_ERROR, status=400)
+        return body if isinstance(body, dict) else {}
+
+    def multipart_files(self) -> List[Tuple[str, bytes]]:
+        content_type = self.headers.get("Content-Type", "")
+        if not content_type.startswith("multipart/form-data"):
+            raise MockRAGFlowError("No file part!")
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + self.read_body())
+        return [(part.get_filename(), part.get_payload(decode=True) or b"")
+                for part in message.iter_parts() if part.get_filename()]
+
+    def dispatch(self, method: str):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        for route_method, pattern, name in self.COMPILED:
+            match = pattern.match(url.path)
+            if match and route_method == method:
+                break
+        else:
+            self.send_json({"code": 404, "message": f"Not found: {method} {url.path}"}, status=404)
+            return
+
+        self.state.requests[name] += 1
+        try:
+            if self.headers.get("Authorization") != f"Bearer {self.server.api_key}":
+                raise MockRAGFlowError("Authentication error: API key is invalid!",
+                                       code=CODE_AUTHENTICATION_ERROR)
+            if self.state.chance(self.state.profile.error_rate):
+                raise MockRAGFlowError("Injected mock RAGFlow failure", code=CODE_SERVER_ERROR, status=500)
+            if name != "completions" and self.state.profile.admin_latency > 0:
+                time.sleep(self.state.profile.admin_latency)
+            result = getattr(self, f"handle_{name}")(params, **match.groupdict())
+        except MockRAGFlowError as e:
+            self.send_json({"code": e.code, "message": str(e)}, status=e.status)
+            return
+        if result is not self.STREAMED:
+            self.send_json({"code": 0, "data": result} if result is not None else {"code": 0})
+
+    STREAMED = object()
+
+    # === Datasets and documents ===
+
+    def handle_list_datasets(self, params):
+        return self.state.select(list(self.state.datasets.values()), params, "dataset")
+
+    def handle_create_dataset(self, params):
+        return self.state.create_dataset(self.json_body())
+
+    def handle_delete_datasets(self, params):
+        self.state.delete_datasets(self.json_body().get("ids"))
+
+    def handle_update_dataset(self, params, dataset_id):
+        body = self.json_body()
+        with self.state.lock:
+            dataset = self.state.dataset(dataset_id)
+            _merge(dataset, {k: v for k, v in body.items() if k != "id"})
+            return dict(dataset)
+
+    def handle_list_documents(self, params, dataset_id):
+        return self.state.list_documents(dataset_id, params)
+
+    def handle_upload_documents(self, params, dataset_id):
+        return self.state.upload_documents(dataset_id, self.multipart_files())
+
+    def handle_delete_documents(self, params, dataset_id):
+        self.state.delete_documents(dataset_id, self.json_body().get("ids"))
+
+    def handle_update_document(self, params, dataset_id, document_id):
+        return self.state.update_document(dataset_id, document_id, self.json_body())
+
+    def handle_parse_documents(self, params, dataset_id):
+        self.state.parse_documents(dataset_id, self.json_body().get("document_ids"))
+
+    def handle_cancel_parsing(self, params, dataset_id):
+        self.state.cancel_parsing(dataset_id, self.json_body().get("document_ids"))
+
+    def handle_retrieval(self, params):
+        body = self.json_body()
+        if not body.get("dataset_ids"):
+            raise MockRAGFlowError("`dataset_ids` is required.")
+        chunks = self.state.references("", body.get("question") or "")["chunks"]
+        for chunk in chunks:
+            chunk["dataset_id"] = body["dataset_ids"][0]
+        return {"chunks": chunks, "total": len(chunks), "doc_aggs": []}
+
+    # === Chats and sessions ===
+
+    def handle_list_chats(self, params):
+        return self.state.select(json.loads(json.dumps(list(self.state.chats.values()))), params, "chat")
+
+    def handle_create_chat(self, params):
+        return self.state.create_chat(self.json_body())
+
+    def handle_delete_chats(self, params):
+        self.state.delete_chats(self.json_body().get("ids"))
+
+    def handle_update_chat(self, params, chat_id):
+        self.state.update_chat(chat_id, self.json_body())
+
+    def handle_list_sessions(self, params, chat_id):
+        return self.state.list_sessions(chat_id, params)
+
+    def handle_create_session(self, params, chat_id):
+        return self.state.create_session(chat_id, self.json_body())
+
+    def handle_delete_sessions(self, params, chat_id):
+        self.state.delete_sessions(chat_id, self.json_body().get("ids"))
+
+    def handle_completions(self, params, chat_id):
+        body = self.json_body()
+        question = body.get("question") or ""
+        session = self.state.session_for_completion(chat_id, body.get("session_id"))
+        profile = self.state.profile
+
+        words = self.state.answer_words(question)
+        reference = self.state.references(chat_id, question)
+        fail_at = len(words) // 2 if self.state.chance(profile.stream_error_rate) else None
+        ttft = profile.ttft + self.state.uniform(profile.ttft_jitter)
+
+        def record(answer: str):
+            with self.state.lock:
+                session["messages"].append({"role": "user", "content": question})
+                session["messages"].append({"role": "assistant", "content": answer})
+
+        if not body.get("stream", True):
+            time.sleep(ttft + (len(words) / profile.tokens_per_second if profile.tokens_per_second else 0))
+            answer = " ".join(words)
+            record(answer)
+            return {"answer": answer, "reference": reference, "session_id": session["id"],
+                    "id": _new_id(), "prompt": ""}
+
+        with self.state.lock:
+            self.state.active_streams += 1
+            self.state.peak_streams = max(self.state.peak_streams, self.state.active_streams)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.stream_answer(words, reference, session["id"], ttft, fail_at)
+            record(" ".join(words if fail_at is None else words[:fail_at]))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client abandoned the stream
+        finally:
+            with self.state.lock:
+                self.state.active_streams -= 1
+        return self.STREAMED
+
+    def stream_answer(self, words: List[str], reference: Dict[str, Any], session_id: str,
+                      ttft: float, fail_at: Optional[int]):
+        """Cumulative answer chunks, then the terminating data:true event"""
+        profile = self.state.profile
+        message_id = _new_id()
+        token_interval = 1.0 / profile.tokens_per_second if profile.tokens_per_second else 0.0
+
+        def send(payload: Dict[str, Any]):
+            self.wfile.write(f"data:{json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(ttft)
+        for i in range(len(words)):
+            if fail_at is not None and i == fail_at:
+                error = "Injected mock stream failure"
+                send({"code": CODE_SERVER_ERROR, "message": error,
+                      "data": {"answer": f"**ERROR**: {error}", "reference": []}})
+                break
+            # RAGFlow sends the references with every chunk once retrieval is done
+            send({"code": 0, "message": "", "data": {
+                "answer": " ".join(words[:i + 1]), "reference": reference,
+                "id": message_id, "session_id": session_id}})
+            if token_interval:
+                time.sleep(token_interval)
+        send({"code": 0, "message": "", "data": True})
+
+
+class MockRAGFlowServer:
+    """Threaded mock RAGFlow HTTP server, started in the background"""
+
+    def __init__(self, profile: Optional[MockProfile] = None, api_key: str = DEFAULT_API_KEY,
+                 host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None, verbose: bool = False):
+        """
+        Args:
+            profile: Latency and failure behaviour (PROFILES["instant"] by default)
+            api_key: Bearer token clients must send
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            seed: Seed for injected failures and latency jitter
+            verbose: Log every request to stderr
+        """
+        self.api_key = api_key
+        self.state = MockRAGFlowState(profile or PROFILES["instant"], seed=seed)
+        self.httpd = ThreadingHTTPServer((host, port), MockRAGFlowHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.httpd.state = self.state
+        self.httpd.api_key = api_key
+        self.httpd.verbose = verbose
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as RAGFLOW_BASE_URL"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def profile(self) -> MockProfile:
+        return self.state.profile
+
+    @profile.setter
+    def profile(self, profile: MockProfile):
+        """Switch latency and failure behaviour while running"""
+        self.state.profile = profile
+
+    def start(self) -> "MockRAGFlowServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-ragflow", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockRAGFlowServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a mock RAGFlow API server")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=9380, help="Port to bind")
+    parser.add_argument("--api-key", default=DEFAULT_API_KEY, help="Bearer token clients must send")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="typical", help="Latency profile")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and injected failures")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    # Per-field overrides of the chosen profile, e.g. --ttft 0.5 --error-rate 0.1
+    for field in fields(MockProfile):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=None)
+    args = parser.parse_args(argv)
+
+    overrides = {f.name: getattr(args, f.name) for f in fields(MockProfile) if getattr(args, f.name) is not None}
+    profile = replace(PROFILES[args.profile], **overrides)
+    server = MockRAGFlowServer(profile, api_key=args.api_key, host=args.host, port=args.port,
+                               seed=args.seed, verbose=args.verbose)
+    print(f"🧪 Mock RAGFlow on {server.url} (profile {args.profile}, API key {args.api_key})")
+    print(f"   {profile}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping mock RAGFlow")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -55,7 +55,7 @@ class RichTestFramework:
     def __init__(self):
         self.console = Console()
         self.test_suite = UserFeedbackTestSuite()
-        self.evaluator = create_evaluator()
+        self._evaluator = None  # Built on first evaluation (imports CrewAI)
         self.session_manager = None
         self.test_user_id = "test_user_automated"
         self.test_chat_id = None
@@ -70,6 +70,13 @@ class RichTestFramework:
         self.current_test_results = []
         self.execution_start_time = None
         
+    @property
+    def evaluator(self):
+        """CrewAI evaluation crew, created the first time a response is evaluated"""
+        if self._evaluator is None:
+            self._evaluator = create_evaluator()
+        return self._evaluator
+
     def initialize_chatbot_connection(self) -> bool:
         """Initialize connection to the RAGFlow chatbot system"""
         
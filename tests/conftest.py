@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Shared test doubles for tests that drive a UserSessionManager without RAGFlow
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+# Write events on the thread that logs them, so they land in the output pytest
+# captures for the running test instead of reaching the terminal between tests
+os.environ.setdefault("LOG_ASYNC", "false")
+
+try:
+    from user_session_manager import UserSessionManager
+    from ragflow_assistant_manager import StreamingResponse
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+
+def cumulative(text: str) -> List[str]:
+    """Word-by-word chunks of a text, each holding everything so far (as RAGFlow streams)"""
+    words = text.split()
+    return [" ".join(words[:i]) for i in range(1, len(words) + 1)]
+
+
+class FakeAssistantManager:
+    """
+    RAGFlow client stand-in: one healthy backend that streams a fixed answer
+
+    Records every (session_id, message) sent, how many chunks were generated and
+    whether the stream was closed. Subclasses override respond() for answers that
+    depend on the question, or before_chunk() to pace the stream.
+    """
+
+    chunks = ["Deposit via OneDep."]
+    references: Optional[List[dict]] = None  # Sent with the last chunk
+
+    def __init__(self, chunks: Optional[List[str]] = None, references: Optional[List[dict]] = None):
+        if chunks is not None:
+            self.chunks = chunks
+        if references is not None:
+            self.references = references
+        self.sessions_created = 0
+        self.sent = []  # (session_id, message)
+        self.chunks_generated = 0
+        self.closed = False
+
+    def get_or_create_assistant(self, config):
+        return "assistant-1"
+
+    def create_session(self, assistant_id, session_name="New Session"):
+        self.sessions_created += 1
+        return f"session-{self.sessions_created}"
+
+    def bind_session(self, session_id, base_url):
+        pass
+
+    def unbind_session(self, session_id):
+        pass
+
+    def backend_for_session(self, session_id):
+        return "http://localhost:9380"
+
+    def health_check(self):
+        return {"ragflow_connection": True, "dataset_access": True, "assistant_access": True}
+
+    def respond(self, message: str) -> List[str]:
+        """Cumulative chunks of the answer to a message"""
+        return list(self.chunks)
+
+    def before_chunk(self):
+        """Called before each chunk is generated"""
+
+    def send_message(self, session_id, message, stream=True):
+        self.sent.append((session_id, message))
+        chunks = self.respond(message)
+        try:
+            for i, content in enumerate(chunks):
+                self.before_chunk()
+                self.chunks_generated += 1
+                last = i == len(chunks) - 1
+                yield StreamingResponse(content=content, references=self.references if last else None,
+                                        is_complete=last)
+        finally:
+            self.closed = True
+
+
+def make_session_manager(data_dir: str, assistant_manager: Optional[FakeAssistantManager] = None,
+                         **kwargs) -> "UserSessionManager":
+    """UserSessionManager on a data directory, talking to a fake RAGFlow client"""
+    with patch("user_session_manager.create_backend_manager",
+               return_value=assistant_manager or FakeAssistantManager()):
+        return UserSessionManager("test_key", data_dir=data_dir, **kwargs)
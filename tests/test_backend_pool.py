@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Tests for health-weighted load balancing across RAGFlow backends
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+try:
+    from ragflow_backend_pool import RAGFlowBackendPool, create_backend_manager, parse_base_urls
+    from ragflow_assistant_manager import RAGFlowAssistantManager, StreamingResponse, create_default_assistant_config
+    from health_monitor import HealthMonitor
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import backend pool: {e}")
+    RAGFlowBackendPool = None
+
+
+class FakeBackendManager:
+    """Minimal RAGFlowAssistantManager stand-in for one backend"""
+
+    circuit_state = "closed"
+
+    def __init__(self, name):
+        self.name = name
+        self.sessions_created = 0
+        self.messages = []
+        self.healthy = True
+        self.assistant_fails = False
+        self.session_assistants = []
+
+    def create_session(self, assistant_id, session_name="New Session"):
+        self.sessions_created += 1
+        self.session_assistants.append(assistant_id)
+        return f"{self.name}-session-{self.sessions_created}"
+
+    def delete_sessions(self, assistant_id, session_ids):
+        self.deleted = getattr(self, "deleted", []) + [(assistant_id, list(session_ids))]
+
+    def send_message(self, session_id, message, stream=True):
+        self.messages.append(session_id)
+        yield StreamingResponse(content=f"{self.name} answer", is_complete=True)
+
+    def get_or_create_assistant(self, config):
+        if self.assistant_fails:
+            raise ConnectionError(f"{self.name} unreachable")
+        return f"{self.name}-assistant"
+
+    def health_check(self):
+        self.probes = getattr(self, "probes", 0) + 1
+        return {"ragflow_connection": self.healthy, "dataset_access": self.healthy, "assistant_access": self.healthy}
+
+
+@unittest.skipIf(RAGFlowBackendPool is None, "ragflow-sdk not installed")
+class TestBackendPool(unittest.TestCase):
+    """Routing, stickiness and health weighting"""
+
+    def setUp(self):
+        self.pool = RAGFlowBackendPool("key", ["http://a:9380", "http://b:9380"], health_interval=0)
+        self.fakes = {}
+        for url, backend in self.pool.backends.items():
+            self.fakes[url] = FakeBackendManager(url[7])
+            backend.manager = self.fakes[url]
+            backend.assistant_id = f"{url[7]}-assistant"
+
+    def test_parse_base_urls(self):
+        """Comma-separated settings are split and normalised"""
+        self.assertEqual(parse_base_urls("http://a:1/, http://b:2 ,"), ["http://a:1", "http://b:2"])
+
+    def test_single_url_returns_plain_manager(self):
+        """One URL keeps the existing single-backend manager"""
+        self.assertIsInstance(create_backend_manager("key", "http://a:9380"), RAGFlowAssistantManager)
+
+    def test_least_outstanding_routing(self):
+        """New sessions go to the backend with fewer in-flight requests"""
+        self.pool.backends["http://a:9380"].outstanding = 3
+        session_id = self.pool.create_session("a-assistant", "chat")
+        self.assertEqual(self.pool.backend_for_session(session_id), "http://b:9380")
+
+    def test_latency_weighting(self):
+        """With equal load, the faster backend wins"""
+        self.pool.backends["http://a:9380"].latency_ewma = 2.0
+        self.pool.backends["http://b:9380"].latency_ewma = 0.5
+        self.pool.backends["http://b:9380"].outstanding = 2
+        # a: (0+1)/0.5 = 2.0, b: (2+1)/2.0 = 1.5
+        session_id = self.pool.create_session("a-assistant", "chat")
+        self.assertEqual(self.pool.backend_for_session(session_id), "http://b:9380")
+
+    def test_unhealthy_backend_skipped(self):
+        """A failed health probe removes the backend from rotation"""
+        self.fakes["http://b:9380"].healthy = False
+        self.pool._probe(self.pool.backends["http://b:9380"])
+        for _ in range(3):
+            session_id = self.pool.create_session("a-assistant", "chat")
+            self.assertEqual(self.pool.backend_for_session(session_id), "http://a:9380")
+
+    def test_sessions_stick_to_their_backend(self):
+        """Messages for a session always go to the backend holding it"""
+        self.pool.bind_session("persisted-session", "http://b:9380")
+        self.pool.backends["http://b:9380"].outstanding = 10
+
+        responses = list(self.pool.send_message("persisted-session", "hello"))
+
+        self.assertEqual(responses[-1].content, "b answer")
+        self.assertEqual(self.fakes["http://b:9380"].messages, ["persisted-session"])
+        self.assertEqual(self.pool.backends["http://b:9380"].outstanding, 10)
+
+    def test_outstanding_released_when_stream_abandoned(self):
+        """Closing a stream early still decrements the in-flight count"""
+        self.pool.bind_session("s1", "http://a:9380")
+        stream = self.pool.send_message("s1", "hello")
+        next(stream)
+        self.assertEqual(self.pool.backends["http://a:9380"].outstanding, 1)
+        stream.close()
+        self.assertEqual(self.pool.backends["http://a:9380"].outstanding, 0)
+
+    def test_unbound_session_goes_to_the_first_backend(self):
+        """A session nobody bound can only be on the server used before the pool"""
+        self.pool.backends["http://a:9380"].outstanding = 10
+        responses = list(self.pool.send_message("old-session", "hello"))
+        self.assertEqual(responses[-1].content, "a answer")
+        self.assertEqual(self.pool.backend_for_session("old-session"), "http://a:9380")
+
+    def test_legacy_chat_record_stays_on_the_original_server(self):
+        """Chats saved without ragflow_backend are routed to the first URL and saved with it"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        data_file = Path(temp_dir) / "user_alice_sessions.json"
+        data_file.write_text(json.dumps({
+            "user_id": "alice", "session_name": "alice_main_session", "created_at": "2025-06-01T10:00:00",
+            "total_chats": 1,
+            "chats": [{"chat_id": "chat-1", "title": "Before the pool", "created_at": "2025-06-01T10:00:00",
+                       "updated_at": "2025-06-01T10:05:00", "message_count": 0,
+                       "ragflow_session_id": "legacy-session", "messages": []}],
+        }))
+        self.pool.backends["http://a:9380"].outstanding = 10  # Load-based routing would pick b
+
+        with patch("user_session_manager.create_backend_manager", return_value=self.pool):
+            manager = UserSessionManager("key", data_dir=temp_dir)
+        self.addCleanup(manager.search_index.close)
+        list(manager.send_message_to_chat("alice", "chat-1", "Still there?"))
+
+        self.assertEqual(self.fakes["http://a:9380"].messages, ["legacy-session"])
+        self.assertEqual(self.fakes["http://b:9380"].messages, [])
+        saved = json.loads(data_file.read_text())["chats"][0]
+        self.assertEqual(saved["ragflow_backend"], "http://a:9380")
+
+    def test_backend_without_assistant_gets_no_sessions_until_resolved(self):
+        """A backend that missed assistant resolution stays out of routing; the health probe retries it"""
+        self.fakes["http://b:9380"].assistant_fails = True
+        self.pool.backends["http://b:9380"].assistant_id = None
+        self.pool.get_or_create_assistant(create_default_assistant_config())
+        self.pool.backends["http://a:9380"].outstanding = 10
+
+        self.pool._probe(self.pool.backends["http://b:9380"])  # Server is up, assistant still missing
+        self.assertFalse(self.pool.backends["http://b:9380"].available)
+        session_id = self.pool.create_session("a-assistant", "chat")
+        self.assertEqual(self.pool.backend_for_session(session_id), "http://a:9380")
+
+        self.fakes["http://b:9380"].assistant_fails = False
+        self.pool._probe(self.pool.backends["http://b:9380"])
+        self.assertTrue(self.pool.backends["http://b:9380"].available)
+        session_id = self.pool.create_session("a-assistant", "chat")
+        self.assertEqual(self.pool.backend_for_session(session_id), "http://b:9380")
+        # Each server gets its own assistant id, never the first backend's
+        self.assertEqual(self.fakes["http://b:9380"].session_assistants, ["b-assistant"])
+
+    def test_sessions_are_deleted_where_they_live(self):
+        """delete_sessions goes to each session's backend with that backend's assistant id"""
+        self.pool.bind_session("on-a", "http://a:9380")
+        self.pool.bind_session("on-b", "http://b:9380")
+
+        self.pool.delete_sessions("a-assistant", ["on-a", "on-b"])
+
+        self.assertEqual(self.fakes["http://a:9380"].deleted, [("a-assistant", ["on-a"])])
+        self.assertEqual(self.fakes["http://b:9380"].deleted, [("b-assistant", ["on-b"])])
+        self.assertEqual(self.pool._sessions, {})
+
+    def test_deleted_and_evicted_chats_release_their_sessions(self):
+        """Session pins are dropped when a chat is deleted or its user leaves the cache"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        with patch("user_session_manager.create_backend_manager", return_value=self.pool):
+            manager = UserSessionManager("key", data_dir=temp_dir)
+        self.addCleanup(manager.search_index.close)
+
+        deleted = manager.create_user_chat("alice", "Deleted")
+        kept = manager.create_user_chat("alice", "Kept")
+        manager.delete_user_chat("alice", deleted.chat_id)
+        self.assertIsNone(self.pool.backend_for_session(deleted.ragflow_session_id))
+        self.assertIsNotNone(self.pool.backend_for_session(kept.ragflow_session_id))
+
+        manager._evict_user("alice")
+        self.assertEqual(self.pool._sessions, {})
+
+    def test_health_monitor_follows_the_pool_loop(self):
+        """One probe per backend per round; routing and readiness see the same results"""
+        monitor = HealthMonitor(probe=self.pool.health_check, warm_up=lambda: True, source=self.pool)
+        self.pool.health_interval = monitor.interval = 0.05
+        self.addCleanup(self.pool.stop_health_monitor)
+        monitor.start()
+        self.assertTrue(monitor.warm)
+
+        self.fakes["http://a:9380"].healthy = False
+        self.fakes["http://b:9380"].healthy = False
+        deadline = time.monotonic() + 5
+        while monitor.readiness()[0] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(monitor.readiness()[1]["status"], "ragflow_unhealthy")
+        self.assertFalse(any(b.available for b in self.pool.backends.values()))
+        self.assertTrue(monitor.running)
+
+        self.pool.stop_health_monitor()
+        self.pool._health_thread.join(timeout=5)
+        self.assertEqual(self.fakes["http://a:9380"].probes, self.fakes["http://b:9380"].probes)
+        self.assertEqual(len(monitor.latency_history()), self.fakes["http://a:9380"].probes)
+
+        monitor.stop()
+        self.assertEqual(self.pool._health_listeners, [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent batch-answer CLI
+"""
+
+import json
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+try:
+    import batch_answer
+    from batch_answer import BatchAnswerer, item_id_for, read_checkpoint, read_questions
+    from ragflow_assistant_manager import StreamingResponse
+except ImportError as e:
+    print(f"Warning: Could not import batch answer: {e}")
+    BatchAnswerer = None
+
+
+class FakeRAGFlow:
+    """Answers by echoing the question; fails the first attempt for questions containing 'flaky'"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sessions = {}
+        self.deleted = []
+        self.failed_once = set()
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get_or_create_assistant(self, config):
+        return "assistant-1"
+
+    def create_session(self, assistant_id, session_name="New Session"):
+        with self._lock:
+            session_id = f"s{len(self.sessions)}"
+            self.sessions[session_id] = session_name
+        return session_id
+
+    def delete_sessions(self, assistant_id, session_ids):
+        self.deleted.extend(session_ids)
+
+    def send_message(self, session_id, message, stream=True):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            threading.Event().wait(self.delay)  # Not time.sleep, which the tests patch out
+            if "flaky" in message and message not in self.failed_once:
+                self.failed_once.add(message)
+                yield StreamingResponse(content="Error: upstream timeout", is_complete=True)
+                return
+            yield StreamingResponse(content="Answer:", is_complete=False)
+            yield StreamingResponse(content=f"Answer: {message}", is_complete=False)
+            yield StreamingResponse(content=f"Answer: {message}",
+                                    references=[{"document_name": "faq.pdf"}], is_complete=True)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@unittest.skipIf(BatchAnswerer is None, "ragflow-sdk not installed")
+class TestBatchAnswer(unittest.TestCase):
+    """Questions are answered concurrently, retried and checkpointed in the output"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.input = self.temp_dir / "questions.jsonl"
+        self.output = self.temp_dir / "answers.jsonl"
+
+    def write_questions(self, records):
+        self.input.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    def read_output(self):
+        return [json.loads(line) for line in self.output.read_text().splitlines()]
+
+    def run_batch(self, ragflow, concurrency=4, retries=1):
+        answerer = BatchAnswerer(ragflow, "assistant-1", concurrency=concurrency, retries=retries)
+        with patch("circuit_breaker.time.sleep"):
+            return answerer.run(read_questions(self.input), self.output, read_checkpoint(self.output))
+
+    def test_answers_with_metadata_and_bounded_concurrency(self):
+        self.write_questions([{"id": f"q{i}", "question": f"Question {i}", "topic": "faq"} for i in range(12)])
+        ragflow = FakeRAGFlow(delay=0.02)
+
+        summary = self.run_batch(ragflow, concurrency=3)
+
+        self.assertEqual((summary.answered, summary.failed, summary.skipped), (12, 0, 0))
+        self.assertLessEqual(ragflow.peak, 3)
+        self.assertGreater(ragflow.peak, 1)
+        records = {r["id"]: r for r in self.read_output()}
+        self.assertEqual(records["q5"]["answer"], "Answer: Question 5")
+        self.assertEqual(records["q5"]["references"], [{"document_name": "faq.pdf"}])
+        self.assertEqual(records["q5"]["topic"], "faq")
+        self.assertLessEqual(records["q5"]["ttft_seconds"], records["q5"]["latency_seconds"])
+        # One throwaway session per question, cleaned up afterwards
+        self.assertEqual(sorted(ragflow.deleted), sorted(ragflow.sessions))
+
+    def test_failed_attempt_is_retried(self):
+        self.write_questions([{"id": "a", "question": "flaky question"}])
+        summary = self.run_batch(FakeRAGFlow(), retries=1)
+        self.assertEqual(summary.answered, 1)
+        record = self.read_output()[0]
+        self.assertEqual(record["attempts"], 2)
+        self.assertNotIn("error", record)
+
+    def test_resume_skips_answered_and_retries_failed(self):
+        self.write_questions([{"id": "ok", "question": "Stable"}, {"id": "bad", "question": "flaky again"}])
+        first = self.run_batch(FakeRAGFlow(), retries=0)
+        self.assertEqual((first.answered, first.failed), (1, 1))
+
+        ragflow = FakeRAGFlow()
+        ragflow.failed_once.add("flaky again")
+        second = self.run_batch(ragflow, retries=0)
+        self.assertEqual((second.answered, second.failed, second.skipped), (1, 0, 1))
+        self.assertEqual(read_checkpoint(self.output), {"ok", "bad"})
+
+    def test_cli_uses_the_app_client_and_reports_events(self):
+        """main() builds the client like the app (all servers, id cache) and logs instead of printing"""
+        self.write_questions([{"id": "ok", "question": "Stable"}, {"id": "bad", "question": "flaky"}])
+        env = {"RAGFLOW_API_KEY": "key", "RAGFLOW_BASE_URLS": "http://a:9380,http://b:9380",
+               "RAGFLOW_ID_CACHE_ENABLED": "true", "RAGFLOW_ID_CACHE_FILE": ""}
+        with patch.dict("os.environ", env), patch("circuit_breaker.time.sleep"), patch("builtins.print") as printed, \
+                patch("batch_answer.log") as log, \
+                patch("batch_answer.create_backend_manager", return_value=FakeRAGFlow()) as create_client:
+            status = batch_answer.main([str(self.input), "-o", str(self.output), "--retries", "0",
+                                        "--data-dir", str(self.temp_dir)])
+
+        self.assertEqual(status, 1)
+        (api_key, base_url), kwargs = create_client.call_args
+        self.assertEqual((api_key, base_url), ("key", "http://a:9380,http://b:9380"))
+        self.assertEqual(kwargs["id_cache"].path, self.temp_dir / "ragflow_ids.json")
+        printed.assert_not_called()
+        log.warning.assert_called_once_with("batch_question_failed", item_id="bad", attempts=1,
+                                            error="upstream timeout")
+        self.assertEqual([c.args[0] for c in log.info.call_args_list], ["batch_started", "batch_completed"])
+
+    def test_question_without_id_gets_stable_id(self):
+        self.write_questions([{"question": "What is mmCIF?"}])
+        items = list(read_questions(self.input))
+        self.assertEqual(items[0].item_id, item_id_for("What is mmCIF?"))
+
+
+if __name__ == "__main__":
+    unittest.main()
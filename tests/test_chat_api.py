@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless chat API (FastAPI + server-sent events)
+"""
+
+import json
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from fastapi.testclient import TestClient
+    from chat_api import create_app
+    from generation_worker import get_generation_worker
+except ImportError as e:
+    print(f"Warning: Could not import chat API: {e}")
+    create_app = None
+
+
+PDB_ANSWER = ["The PDB ", "The PDB archives ", "The PDB archives structures."]
+PDB_REFERENCES = [{"document_name": "pdb.pdf", "content": "chunk"}]
+
+
+def parse_events(body: str):
+    """(event, data) pairs from a server-sent event stream"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@unittest.skipIf(create_app is None, "fastapi or ragflow-sdk not installed")
+class TestChatAPI(unittest.TestCase):
+    """Endpoints are thin wrappers over UserSessionManager"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(PDB_ANSWER, PDB_REFERENCES))
+        self.client = TestClient(create_app(self.manager))
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def create_chat(self, user_id="visitor-1"):
+        response = self.client.post(f"/users/{user_id}/chats", json={"title": "API chat"})
+        self.assertEqual(response.status_code, 201)
+        return response.json()["chat_id"]
+
+    def test_create_and_list_chats(self):
+        chat_id = self.create_chat()
+        chats = self.client.get("/users/visitor-1/chats").json()["chats"]
+        self.assertEqual([c["chat_id"] for c in chats], [chat_id])
+        self.assertEqual(chats[0]["title"], "API chat")
+
+    def test_send_message_streams_deltas_and_stores_turn(self):
+        chat_id = self.create_chat()
+        response = self.client.post(f"/users/visitor-1/chats/{chat_id}/messages",
+                                    json={"message": "What is the PDB?"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+
+        events = parse_events(response.text)
+        self.assertEqual(events[0][0], "start")
+        text = "".join(data["text"] for event, data in events if event == "delta")
+        self.assertEqual(text, "The PDB archives structures.")
+        self.assertEqual(events[-1][0], "done")
+        self.assertEqual(events[-1][1]["references"][0]["document_name"], "pdb.pdf")
+
+        stored = self.manager.get_chat_messages("visitor-1", chat_id)
+        self.assertEqual([m.role for m in stored], ["user", "assistant"])
+        self.assertEqual(stored[1].message_id, events[0][1]["message_id"])
+
+    def test_messages_are_paged(self):
+        chat_id = self.create_chat()
+        for i in range(3):
+            self.client.post(f"/users/visitor-1/chats/{chat_id}/messages", json={"message": f"Q{i}"})
+
+        page = self.client.get(f"/users/visitor-1/chats/{chat_id}/messages",
+                               params={"offset": 2, "limit": 2}).json()
+        self.assertEqual(page["total"], 6)
+        self.assertEqual([m["content"] for m in page["messages"]],
+                         ["Q1", "The PDB archives structures."])
+
+    def test_feedback(self):
+        chat_id = self.create_chat()
+        events = parse_events(self.client.post(f"/users/visitor-1/chats/{chat_id}/messages",
+                                               json={"message": "Q"}).text)
+        message_id = events[0][1]["message_id"]
+
+        response = self.client.post(f"/users/visitor-1/chats/{chat_id}/messages/{message_id}/feedback",
+                                    json={"star_rating": 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.manager.get_message_feedback("visitor-1", chat_id, message_id)["star_rating"], 4)
+
+        bad = self.client.post(f"/users/visitor-1/chats/{chat_id}/messages/{message_id}/feedback",
+                               json={"star_rating": 9})
+        self.assertEqual(bad.status_code, 422)
+        missing = self.client.post(f"/users/visitor-1/chats/{chat_id}/messages/nope/feedback",
+                                   json={"star_rating": 3})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_full_generation_queue_is_503(self):
+        """With every worker busy and the queue full the question is refused, not stored"""
+        chat_id = self.create_chat()
+        with patch.object(get_generation_worker(self.manager), "capacity", 0):
+            response = self.client.post(f"/users/visitor-1/chats/{chat_id}/messages",
+                                        json={"message": "What is the PDB?"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        self.assertEqual(self.manager.get_chat_messages("visitor-1", chat_id), [])
+
+    def test_unknown_chat_and_invalid_user(self):
+        self.assertEqual(self.client.get("/users/visitor-1/chats/missing/messages").status_code, 404)
+        self.assertEqual(self.client.post("/users/visitor-1/chats/missing/messages",
+                                          json={"message": "Q"}).status_code, 404)
+        self.assertEqual(self.client.get("/users/bad.user/chats").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the read-only chat history view the UI renders from
+"""
+
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager, ChatHistoryView
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+
+class EchoAssistantManager(FakeAssistantManager):
+    """Answers every question with a fixed reply"""
+
+    def respond(self, message):
+        return [f"Echo: {message}"]
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestChatHistoryView(unittest.TestCase):
+    """The view shares the manager's cached messages instead of copying them"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.manager = make_session_manager(self.temp_dir, EchoAssistantManager())
+        self.chat = self.manager.create_user_chat("user-1", "History")
+
+    def ask(self, question):
+        list(self.manager.send_message_to_chat("user-1", self.chat.chat_id, question))
+
+    def test_view_reflects_new_turns_without_copying(self):
+        history = self.manager.get_chat_history("user-1", self.chat.chat_id)
+        self.assertEqual(len(history), 0)
+
+        self.ask("first")
+        self.assertEqual([m.role for m in history], ["user", "assistant"])
+        self.assertIs(history[1], self.chat.messages[1])
+        self.assertEqual(history[-1].content, "Echo: first")
+
+    def test_view_is_read_only(self):
+        self.ask("first")
+        history = self.manager.get_chat_history("user-1", self.chat.chat_id)
+
+        self.assertFalse(hasattr(history, "append"))
+        with self.assertRaises(TypeError):
+            history[0] = None
+        # Slices are detached tuples, not the underlying list
+        self.assertIsInstance(history[:1], tuple)
+
+    def test_unknown_chat_gives_empty_view(self):
+        history = self.manager.get_chat_history("user-1", "missing")
+        self.assertIsInstance(history, ChatHistoryView)
+        self.assertEqual(list(history), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
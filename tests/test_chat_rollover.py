@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for automatic chat rollover to a fresh RAGFlow session
+"""
+
+import json
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager, ChatRolloverPolicy, turn_index_bucket
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+
+class NumberingAssistantManager(FakeAssistantManager):
+    """Numbers its answers, so summaries show which turn they came from"""
+
+    def respond(self, message):
+        return [f"Answer number {len(self.sent)}"]
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestChatRollover(unittest.TestCase):
+    """Long chats move to a new RAGFlow session seeded with a summary"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.manager = make_session_manager(self.temp_dir, NumberingAssistantManager())
+        self.manager.rollover_policy = ChatRolloverPolicy(max_turns=3, max_tokens=0, summary_turns=2)
+
+        self.chat = self.manager.create_user_chat("alice", "Help Session")
+
+    def _ask(self, question):
+        list(self.manager.send_message_to_chat("alice", self.chat.chat_id, question))
+
+    def test_rolls_over_after_max_turns(self):
+        """The fourth question goes to a new session carrying a summary"""
+        for i in range(1, 4):
+            self._ask(f"Question {i}")
+        self.assertEqual({sid for sid, _ in self.manager.assistant_manager.sent}, {"session-1"})
+
+        self._ask("Question 4")
+        session_id, sent_text = self.manager.assistant_manager.sent[-1]
+
+        self.assertEqual(session_id, "session-2")
+        self.assertIn("Context from earlier in this conversation", sent_text)
+        self.assertIn("Q: Question 3", sent_text)
+        self.assertIn("A: Answer number 3", sent_text)
+        self.assertNotIn("Question 1", sent_text)  # only summary_turns pairs are kept
+        self.assertTrue(sent_text.endswith("Current question: Question 4"))
+
+    def test_user_sees_one_continuous_chat(self):
+        """Stored history keeps the original questions in a single chat"""
+        for i in range(1, 5):
+            self._ask(f"Question {i}")
+
+        self.manager.user_sessions.clear()
+        chat = self.manager.get_user_chat("alice", self.chat.chat_id)
+        questions = [m.content for m in chat.messages if m.role == "user"]
+
+        self.assertEqual(questions, ["Question 1", "Question 2", "Question 3", "Question 4"])
+        self.assertEqual(chat.ragflow_session_id, "session-2")
+        self.assertEqual(chat.previous_ragflow_session_ids, ["session-1"])
+        self.assertEqual(chat.ragflow_turns, 1)
+
+    def test_rollover_is_saved_under_the_user_lock(self):
+        """The session swap holds the user's lock and reaches disk before the new session is asked"""
+        for i in range(1, 4):
+            self._ask(f"Question {i}")
+        seen = {}
+        assistant_manager = self.manager.assistant_manager
+        create_session = assistant_manager.create_session
+        send_message = assistant_manager.send_message
+
+        def create_session_while_locked(assistant_id, session_name="New Session"):
+            # Another thread cannot take the lock while the rollover holds it
+            def try_lock():
+                lock = self.manager._user_lock("alice")
+                seen["free"] = lock.acquire(timeout=0)
+                if seen["free"]:
+                    lock.release()
+
+            probe = threading.Thread(target=try_lock)
+            probe.start()
+            probe.join()
+            return create_session(assistant_id, session_name)
+
+        def send_message_after_save(session_id, message, stream=True):
+            saved = json.loads(self.manager._get_user_data_file("alice").read_text())
+            seen["saved_session"] = saved["chats"][0]["ragflow_session_id"]
+            yield from send_message(session_id, message, stream)
+
+        with patch.object(assistant_manager, "create_session", create_session_while_locked), \
+                patch.object(assistant_manager, "send_message", send_message_after_save):
+            self._ask("Question 4")
+
+        self.assertEqual(seen, {"free": False, "saved_session": "session-2"})
+
+    def test_token_limit_triggers_rollover(self):
+        """The token budget also triggers a rollover"""
+        self.manager.rollover_policy = ChatRolloverPolicy(max_turns=0, max_tokens=50)
+        self._ask("x" * 400)
+        self._ask("Next question")
+        self.assertEqual(self.manager.assistant_manager.sent[-1][0], "session-2")
+
+    def test_disabled_policy_never_rolls_over(self):
+        """Zero limits keep every turn on the original session"""
+        self.manager.rollover_policy = ChatRolloverPolicy(max_turns=0, max_tokens=0)
+        for i in range(10):
+            self._ask(f"Question {i}")
+        self.assertEqual(self.manager.assistant_manager.sessions_created, 1)
+
+    def test_turn_index_bucket(self):
+        """Turn indexes map to coarse histogram labels"""
+        self.assertEqual(turn_index_bucket(1), "1")
+        self.assertEqual(turn_index_bucket(5), "2-5")
+        self.assertEqual(turn_index_bucket(25), "21+")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Tests for the RAGFlow circuit breaker and jittered retries
+
+A fake RAGFlow server (an in-process object whose calls succeed, fail or hang)
+drives the breaker through its closed, open and half-open states.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, retry_with_jitter
+
+try:
+    import ragflow_assistant_manager
+    from ragflow_assistant_manager import RAGFlowAssistantManager, RAGFlowNotFoundError, RAGFLOW_UNAVAILABLE_MESSAGE
+except ImportError as e:
+    print(f"Warning: Could not import assistant manager: {e}")
+    ragflow_assistant_manager = None
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeRAGFlowServer:
+    """Stand-in for a RAGFlow server that can be switched between healthy and degraded"""
+
+    def __init__(self):
+        self.healthy = True
+        self.calls = 0
+
+    def request(self):
+        self.calls += 1
+        if not self.healthy:
+            raise ConnectionError("RAGFlow timed out")
+        return "ok"
+
+
+class TestCircuitBreakerStates(unittest.TestCase):
+    """Drive the breaker through every state with a fake server"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.server = FakeRAGFlowServer()
+        self.breaker = CircuitBreaker(
+            failure_rate_threshold=0.5,
+            window_seconds=30,
+            minimum_calls=4,
+            reset_timeout=10,
+            clock=self.clock
+        )
+
+    def _call(self):
+        return self.breaker.call(self.server.request)
+
+    def test_closed_passes_calls_through(self):
+        """Healthy calls keep the circuit closed"""
+        for _ in range(10):
+            self.assertEqual(self._call(), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_minimum_calls_before_opening(self):
+        """A few failures below minimum_calls do not open the circuit"""
+        self.server.healthy = False
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                self._call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_opens_on_failure_rate(self):
+        """Failure rate above threshold opens the circuit and rejects without calling the server"""
+        self._call()
+        self._call()
+        self.server.healthy = False
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self._call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        calls_before = self.server.calls
+        with self.assertRaises(CircuitOpenError) as ctx:
+            self._call()
+        self.assertEqual(self.server.calls, calls_before)
+        self.assertAlmostEqual(ctx.exception.retry_after, 10.0)
+
+    def test_old_failures_leave_the_window(self):
+        """Failures older than the window do not count towards the rate"""
+        self.server.healthy = False
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                self._call()
+        self.clock.advance(31)
+        self.server.healthy = True
+        self._call()
+        self.server.healthy = False
+        with self.assertRaises(ConnectionError):
+            self._call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def _open_circuit(self):
+        self.server.healthy = False
+        for _ in range(4):
+            with self.assertRaises(ConnectionError):
+                self._call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_after_reset_timeout(self):
+        """The circuit moves to half-open once the reset timeout has elapsed"""
+        self._open_circuit()
+        self.clock.advance(10)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_half_open_success_closes(self):
+        """A successful trial call closes the circuit"""
+        self._open_circuit()
+        self.clock.advance(10)
+        self.server.healthy = True
+        self.assertEqual(self._call(), "ok")
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_failure_reopens(self):
+        """A failed trial call re-opens the circuit for another reset timeout"""
+        self._open_circuit()
+        self.clock.advance(10)
+        with self.assertRaises(ConnectionError):
+            self._call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertAlmostEqual(self.breaker.retry_after(), 10.0)
+
+    def test_half_open_limits_trial_calls(self):
+        """Only half_open_max_calls trial calls are admitted concurrently"""
+        self._open_circuit()
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow_request())
+
+
+class TestRetryWithJitter(unittest.TestCase):
+    """Test bounded retries with jittered backoff"""
+
+    def test_retries_until_success(self):
+        """Transient failures are retried"""
+        outcomes = [ConnectionError("reset"), ConnectionError("reset"), "ok"]
+
+        def flaky():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        sleeps = []
+        self.assertEqual(retry_with_jitter(flaky, attempts=3, sleep=sleeps.append), "ok")
+        self.assertEqual(len(sleeps), 2)
+
+    def test_backoff_is_bounded(self):
+        """Sleeps stay within [0, min(max_delay, base * 2**attempt)]"""
+        sleeps = []
+
+        def always_fails():
+            raise ConnectionError("down")
+
+        with self.assertRaises(ConnectionError):
+            retry_with_jitter(always_fails, attempts=5, base_delay=0.5, max_delay=1.0, sleep=sleeps.append)
+
+        self.assertEqual(len(sleeps), 4)
+        for attempt, delay in enumerate(sleeps):
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(1.0, 0.5 * (2 ** attempt)))
+
+    def test_open_circuit_is_not_retried(self):
+        """CircuitOpenError is re-raised immediately"""
+        calls = []
+
+        def rejected():
+            calls.append(1)
+            raise CircuitOpenError("ragflow", 5.0)
+
+        with self.assertRaises(CircuitOpenError):
+            retry_with_jitter(rejected, attempts=3, sleep=lambda _: None)
+        self.assertEqual(len(calls), 1)
+
+
+class FakeSession:
+    """Fake RAGFlow session served by FakeRAGFlowServer"""
+
+    def __init__(self, server: FakeRAGFlowServer):
+        self.server = server
+
+    def ask(self, question, stream=True):
+        self.server.request()
+
+        class Chunk:
+            content = f"Answer to: {question}"
+            reference = []
+
+        yield Chunk()
+
+
+class FakeAssistant:
+    """Fake RAGFlow chat assistant served by FakeRAGFlowServer"""
+
+    id = "assistant-1"
+
+    def __init__(self, server: FakeRAGFlowServer):
+        self.server = server
+
+    def list_sessions(self, id=None):
+        self.server.request()
+        return [FakeSession(self.server)]
+
+    def create_session(self, name="New Session"):
+        self.server.request()
+
+        class Session:
+            id = "session-1"
+
+        return Session()
+
+
+@unittest.skipIf(ragflow_assistant_manager is None, "ragflow-sdk not installed")
+class TestAssistantManagerCircuit(unittest.TestCase):
+    """Test circuit breaker integration in RAGFlowAssistantManager"""
+
+    def setUp(self):
+        self.server = FakeRAGFlowServer()
+        self.clock = FakeClock()
+        self.manager = RAGFlowAssistantManager("test_key", "http://localhost:9380")
+        self.manager._circuit = CircuitBreaker(minimum_calls=2, reset_timeout=10, clock=self.clock)
+        self.manager._current_assistant = FakeAssistant(self.server)
+
+    def _answer(self) -> str:
+        responses = list(self.manager.send_message("session-1", "What is PDBx/mmCIF?"))
+        return responses[-1].content
+
+    @patch("circuit_breaker.time.sleep", lambda _: None)
+    def test_fast_fail_while_open(self):
+        """Once open, send_message answers immediately without contacting RAGFlow"""
+        self.server.healthy = False
+        self.assertTrue(self._answer().startswith("Error:"))
+        self.assertTrue(self._answer().startswith("Error:"))
+        self.assertEqual(self.manager.circuit_state, CircuitBreaker.OPEN)
+
+        calls_before = self.server.calls
+        self.assertEqual(self._answer(), f"Error: {RAGFLOW_UNAVAILABLE_MESSAGE}")
+        self.assertEqual(self.server.calls, calls_before)
+
+    @patch("circuit_breaker.time.sleep", lambda _: None)
+    def test_recovers_through_half_open(self):
+        """A successful trial after the reset timeout closes the circuit"""
+        self.server.healthy = False
+        self._answer()
+        self._answer()
+        self.clock.advance(10)
+        self.server.healthy = True
+        self.assertEqual(self._answer(), "Answer to: What is PDBx/mmCIF?")
+        self.assertEqual(self.manager.circuit_state, CircuitBreaker.CLOSED)
+
+    def test_create_session_retries_transient_failures(self):
+        """create_session retries with jitter and succeeds once RAGFlow recovers"""
+        outcomes = iter([False, True])
+        original_request = self.server.request
+
+        def flaky_request():
+            self.server.healthy = next(outcomes, True)
+            return original_request()
+
+        self.server.request = flaky_request
+        with patch("circuit_breaker.time.sleep", lambda _: None):
+            session_id = self.manager.create_session("assistant-1", "Retry Session")
+        self.assertEqual(session_id, "session-1")
+
+    def test_not_found_does_not_open_the_circuit(self):
+        """Stale ids get a fast RAGFlowNotFoundError, and RAGFlow still counts as healthy"""
+        calls = []
+
+        def missing():
+            calls.append(1)
+            raise Exception("You don't own the assistant stale-id")
+
+        for _ in range(5):
+            with self.assertRaises(RAGFlowNotFoundError):
+                self.manager._call_with_retry(missing)
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(self.manager.circuit_state, CircuitBreaker.CLOSED)
+
+    def test_missing_session_fails_fast(self):
+        """send_message does not retry the lookup of a session RAGFlow no longer has"""
+        lookups = []
+
+        def list_sessions(id=None):
+            lookups.append(id)
+            raise Exception("You don't own the session stale-session")
+
+        self.manager._current_assistant.list_sessions = list_sessions
+        for _ in range(3):
+            self.assertTrue(self._answer().startswith("Error:"))
+        self.assertEqual(len(lookups), 3)
+        self.assertEqual(self.manager.circuit_state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests that heavy dependencies stay out of module import and load on first use
+"""
+
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SRC_DIR = PROJECT_ROOT / "src"
+
+
+def imported_modules(module: str, cwd: Path):
+    """sys.modules after importing a module in a fresh interpreter, or None if it cannot be imported"""
+    code = f"import sys, json; import {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        return None
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+class TestLazyImports(unittest.TestCase):
+    """Entry points import without ragflow_sdk or the Google client libraries"""
+
+    def assertNotImported(self, module: str, cwd: Path, *deferred: str):
+        modules = imported_modules(module, cwd)
+        if modules is None:
+            self.skipTest(f"{module} dependencies not installed")
+        for name in deferred:
+            self.assertNotIn(name, modules, f"importing {module} loaded {name}")
+
+    def test_session_manager(self):
+        """The RAGFlow SDK is loaded by the first client call, not by the import"""
+        self.assertNotImported("user_session_manager", SRC_DIR, "ragflow_sdk")
+
+    def test_chat_api(self):
+        self.assertNotImported("chat_api", SRC_DIR, "ragflow_sdk")
+
+    def test_cron_jobs(self):
+        """The Google clients are loaded when a job authenticates"""
+        for module in ("src.feedback_export.export_manager", "src.google_drive_sync.sync_manager"):
+            with self.subTest(module=module):
+                self.assertNotImported(module, PROJECT_ROOT, "googleapiclient", "google.auth",
+                                       "google_auth_oauthlib")
+
+    def test_http_errors_can_be_caught_before_loading(self):
+        """`except HttpError` works in the cron jobs' clients before the Google clients are imported"""
+        for module in ("src.feedback_export.csv_exporter", "src.google_drive_sync.drive_client"):
+            with self.subTest(module=module):
+                code = (f"import {module} as client\n"
+                        "try:\n    raise ValueError()\n"
+                        "except client.HttpError:\n    print('caught')\n"
+                        "except ValueError:\n    print('passed through')")
+                result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True,
+                                        text=True, timeout=120)
+                if "ModuleNotFoundError" in result.stderr:
+                    self.skipTest(f"{module} dependencies not installed")
+                self.assertEqual(result.stdout.strip(), "passed through", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Tests for structured event logging
+"""
+
+import io
+import json
+import logging
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+src_dir = Path(__file__).parent.parent / "src"
+sys.path.append(str(src_dir))
+
+import event_log
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+
+class EventCapture:
+    """Points event_log at an in-memory stream for one test"""
+
+    def __init__(self, test: unittest.TestCase, **settings):
+        self.stream = io.StringIO()
+        settings.setdefault("_sample_rates", {})
+        for name, value in settings.items():
+            patcher = patch.object(event_log, name, value)
+            patcher.start()
+            test.addCleanup(patcher.stop)
+        event_log.configure(self.stream)
+        # Cleanups run last-in first-out: reattach stdout once the patches are undone
+        test.addCleanup(event_log.configure)
+
+    def events(self):
+        event_log.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+
+class TestEventLog(unittest.TestCase):
+    """Formatting, level gating, sampling and the async queue"""
+
+    def setUp(self):
+        self.log = event_log.get_logger("tests")
+
+    def test_json_line_with_fields(self):
+        """Each event is one JSON object with stable keys and flat fields"""
+        capture = EventCapture(self)
+        self.log.info("chat_created", user_id="alice", chat_id="c1", duration_ms=12.5)
+
+        [event] = capture.events()
+        self.assertEqual(event["event"], "chat_created")
+        self.assertEqual(event["component"], "tests")
+        self.assertEqual(event["level"], "info")
+        self.assertEqual((event["user_id"], event["chat_id"], event["duration_ms"]), ("alice", "c1", 12.5))
+        self.assertIn("ts", event)
+
+    def test_level_gating(self):
+        """Events below LOG_LEVEL are dropped before any work is done"""
+        capture = EventCapture(self, _level=logging.WARNING)
+        self.log.info("chat_created", user_id="alice")
+        self.log.warning("chat_not_found", user_id="alice")
+
+        self.assertEqual([e["event"] for e in capture.events()], ["chat_not_found"])
+
+    def test_sampling_applies_to_info_only(self):
+        """A 0 rate drops info events; warnings and errors are always written"""
+        capture = EventCapture(self, _sample_rates={"sessions_saved": 0.0})
+        for _ in range(20):
+            self.log.info("sessions_saved", user_id="alice")
+        self.log.error("sessions_saved", user_id="alice", error="disk full")
+
+        self.assertEqual([e["level"] for e in capture.events()], ["error"])
+
+    def test_sampled_events_carry_their_rate(self):
+        """Sampled events record the rate so counts can be scaled back up"""
+        capture = EventCapture(self, _sample_rates={"sessions_loaded": 0.5})
+        with patch("event_log.random.random", return_value=0.1):
+            self.log.info("sessions_loaded", user_id="alice")
+
+        [event] = capture.events()
+        self.assertEqual(event["sample_rate"], 0.5)
+
+    def test_timed_adds_duration(self):
+        """timed() emits the event with duration_ms when the block exits"""
+        capture = EventCapture(self)
+        with self.log.timed("sessions_saved", user_id="alice"):
+            pass
+
+        [event] = capture.events()
+        self.assertEqual(event["user_id"], "alice")
+        self.assertGreaterEqual(event["duration_ms"], 0)
+
+    def test_timed_unsampled_returns_shared_null_context(self):
+        """Unsampled timers allocate nothing per call"""
+        EventCapture(self, _sample_rates={"sessions_saved": 0.0})
+        self.assertIs(self.log.timed("sessions_saved"), self.log.timed("sessions_saved"))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """A stalled writer never blocks the request path"""
+        capture = EventCapture(self, _async=True, _queue_size=2)
+        event_log._listener.stop()  # Nothing drains the queue
+        dropped = event_log.dropped_events()
+        for i in range(5):
+            self.log.info("chat_created", index=i)
+        self.assertEqual(event_log.dropped_events() - dropped, 3)
+
+        event_log._listener.start()
+        self.assertEqual(len(capture.events()), 2)
+
+    def test_exception_is_included(self):
+        """exc_info tracebacks survive the hop to the writer thread"""
+        capture = EventCapture(self)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            self.log.error("chat_turn_failed", exc_info=True, chat_id="c1")
+
+        [event] = capture.events()
+        self.assertIn("RuntimeError: boom", event["exception"])
+
+    def test_text_format(self):
+        """LOG_FORMAT=text writes one readable line per event"""
+        stream = io.StringIO()
+        with patch.object(event_log, "_format", "text"), patch.object(event_log, "_sample_rates", {}):
+            event_log.configure(stream)
+            self.addCleanup(event_log.configure)
+            self.log.info("chat_created", user_id="alice")
+            event_log.flush()
+        self.assertRegex(stream.getvalue(), r"INFO +tests chat_created user_id=alice")
+
+    def test_info_enabled_before_first_event(self):
+        """The lazily attached handler does not hide INFO events behind the root WARNING level"""
+        self.assertTrue(self.log.enabled_for("chat_created", logging.INFO))
+
+    def test_parse_sample_rates(self):
+        """LOG_SAMPLE_RATES entries are clamped to [0, 1]; malformed ones are ignored"""
+        self.assertEqual(event_log._parse_sample_rates("a=0.5, b=2,c=x,,d"), {"a": 0.5, "b": 1.0})
+
+    def test_emitted_events_are_registered(self):
+        """Every event name used in src/ is listed in EVENTS"""
+        pattern = re.compile(r"""\blog\.(?:debug|info|warning|error|timed)\(\s*["'](\w+)["']""")
+        used = set()
+        for path in src_dir.glob("*.py"):
+            used.update(pattern.findall(path.read_text()))
+        self.assertTrue(used)
+        self.assertEqual(used - set(event_log.EVENTS), set())
+
+
+TWO_CHUNKS = ["Deposit", "Deposit via OneDep."]
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestSessionManagerEvents(unittest.TestCase):
+    """UserSessionManager reports its work as events instead of print()"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.capture = EventCapture(self)
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(TWO_CHUNKS, references=[{"content": "x"}]))
+
+    def test_chat_turn_and_feedback_events(self):
+        """A chat, a turn and a rating produce their events with durations"""
+        chat = self.manager.create_user_chat("alice", "Help Session")
+        list(self.manager.send_message_to_chat("alice", chat.chat_id, "How do I deposit?"))
+        answer = self.manager.get_chat_messages("alice", chat.chat_id)[-1]
+        self.manager.add_message_feedback("alice", chat.chat_id, answer.message_id, {"star_rating": 4})
+
+        events = {e["event"]: e for e in self.capture.events()}
+        self.assertIn("assistant_ready", events)
+        self.assertEqual(events["chat_created"]["chat_id"], chat.chat_id)
+
+        turn = events["chat_turn_completed"]
+        self.assertEqual((turn["chunks"], turn["chars"], turn["references"]), (2, 19, 1))
+        for field in ("ttft_ms", "generation_ms", "persistence_ms", "duration_ms"):
+            self.assertGreaterEqual(turn[field], 0)
+
+        self.assertEqual(events["feedback_saved"]["star_rating"], 4)
+        self.assertGreaterEqual(events["sessions_saved"]["duration_ms"], 0)
+
+    def test_missing_chat_is_a_warning(self):
+        """Lookups of unknown ids are reported as warnings, not printed"""
+        with patch("builtins.print") as printed:
+            self.assertFalse(self.manager.add_message_feedback("alice", "missing", "m1", {"star_rating": 1}))
+        printed.assert_not_called()
+
+        [event] = [e for e in self.capture.events() if e["event"] == "chat_not_found"]
+        self.assertEqual(event["level"], "warning")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for cooperative cancellation of abandoned generations
+"""
+
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from tests.conftest import FakeAssistantManager, cumulative, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestGenerationCancellation(unittest.TestCase):
+    """Partial answers are persisted as truncated and the upstream stream is closed"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.manager = make_session_manager(self.temp_dir,
+                                            FakeAssistantManager(cumulative("one two three four five")))
+
+        self.chat = self.manager.create_user_chat("alice", "Help Session")
+
+    def _stored_answer(self):
+        self.manager.user_sessions.clear()
+        messages = self.manager.get_chat_messages("alice", self.chat.chat_id)
+        return [m for m in messages if m.role == "assistant"]
+
+    def test_completed_answer_not_truncated(self):
+        """A fully consumed stream stores a normal answer"""
+        list(self.manager.send_message_to_chat("alice", self.chat.chat_id, "Hi"))
+        answers = self._stored_answer()
+        self.assertEqual(len(answers), 1)
+        self.assertEqual(answers[0].content, "one two three four five")
+        self.assertFalse(answers[0].truncated)
+
+    def test_should_cancel_stops_generation(self):
+        """should_cancel stops forwarding, closes upstream and persists the partial answer"""
+        seen = []
+
+        def should_cancel():
+            return len(seen) >= 2
+
+        for chunk in self.manager.send_message_to_chat("alice", self.chat.chat_id, "Hi",
+                                                       should_cancel=should_cancel):
+            seen.append(chunk.content)
+
+        upstream = self.manager.assistant_manager
+        self.assertTrue(upstream.closed)
+        self.assertLess(upstream.chunks_generated, 5)
+
+        answers = self._stored_answer()
+        self.assertEqual(answers[0].content, "one two")
+        self.assertTrue(answers[0].truncated)
+
+    def test_abandoned_generator_persists_partial(self):
+        """Closing the generator mid-answer (interrupted Streamlit run) keeps the partial answer"""
+        stream = self.manager.send_message_to_chat("alice", self.chat.chat_id, "Hi")
+        next(stream)
+        next(stream)
+        stream.close()
+
+        self.assertTrue(self.manager.assistant_manager.closed)
+        answers = self._stored_answer()
+        self.assertEqual(answers[0].content, "one two")
+        self.assertTrue(answers[0].truncated)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
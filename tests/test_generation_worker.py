@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Tests for background generation with resumable, checkpointed answers
+"""
+
+import json
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+from tests.conftest import FakeAssistantManager, cumulative, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+    from generation_worker import GenerationQueueFull, GenerationWorker
+except ImportError as e:
+    print(f"Warning: Could not import generation worker: {e}")
+    UserSessionManager = None
+
+try:
+    import rcsb_pdb_chatbot
+except ImportError:
+    rcsb_pdb_chatbot = None
+
+
+class GatedAssistantManager(FakeAssistantManager):
+    """Streams word by word, pausing before each chunk until the test releases it"""
+
+    def __init__(self, text):
+        super().__init__(cumulative(text))
+        self.gate = threading.Semaphore(0)
+
+    def before_chunk(self):
+        self.gate.acquire()
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestGenerationWorker(unittest.TestCase):
+    """Answers are generated off the request thread and can be followed by message_id"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.ragflow = GatedAssistantManager("one two three")
+        self.manager = make_session_manager(self.temp_dir, self.ragflow)
+        self.manager.checkpoint_interval = 0  # Checkpoint every chunk
+        self.chat = self.manager.create_user_chat("alice", "Help Session")
+
+        self.worker = GenerationWorker(self.manager, max_workers=2)
+        self.addCleanup(self.worker.shutdown)
+
+    def release(self, chunks=1):
+        for _ in range(chunks):
+            self.ragflow.gate.release()
+
+    def test_question_and_placeholder_stored_immediately(self):
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi")
+        messages = self.chat.messages
+        self.assertEqual([m.role for m in messages], ["user", "assistant"])
+        self.assertIs(messages[1], job.answer)
+        self.assertTrue(messages[1].generating)
+
+        self.release(3)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(messages[1].content, "one two three")
+        self.assertFalse(messages[1].generating)
+        self.assertFalse(messages[1].truncated)
+        self.assertIsNone(self.worker.get_job(job.message_id))
+
+    def test_follower_can_attach_late_and_sees_final_answer(self):
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi")
+        self.release(2)
+
+        # A reloaded page looks the job up by message_id while it is still running
+        resumed = self.worker.get_job(job.message_id)
+        self.assertIs(resumed, job)
+        follower = resumed.follow(poll_seconds=0.05)
+        self.release(1)
+        seen = list(follower)
+        self.assertEqual(seen[-1], "one two three")
+
+    def test_partial_answer_checkpointed_and_reloaded_as_interrupted(self):
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi")
+        self.release(1)
+        for content in job.follow(poll_seconds=0.05):
+            if content:
+                break
+
+        # A fresh process reading the checkpoint sees the partial answer as interrupted
+        restarted = make_session_manager(self.temp_dir, self.ragflow)
+        answer = restarted.get_chat_messages("alice", self.chat.chat_id)[1]
+        self.assertEqual(answer.content, "one")
+        self.assertTrue(answer.truncated)
+        self.assertFalse(answer.generating)
+
+        self.release(2)
+        job.wait(5)
+
+    def test_cancel_keeps_partial_answer(self):
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi")
+        self.release(1)
+        for content in job.follow(poll_seconds=0.05):
+            if content:
+                break
+        self.assertTrue(self.worker.cancel(job.message_id))
+        self.release(2)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.answer.content, "one")
+        self.assertTrue(job.answer.truncated)
+
+    def test_turns_in_one_chat_run_in_order(self):
+        first = self.worker.submit("alice", self.chat.chat_id, "First")
+        second = self.worker.submit("alice", self.chat.chat_id, "Second")
+        self.release(6)
+        self.assertTrue(second.wait(5))
+        self.assertTrue(first.done)
+        self.assertEqual([message for _, message in self.ragflow.sent], ["First", "Second"])
+        self.assertEqual([m.content for m in self.chat.messages],
+                         ["First", "one two three", "Second", "one two three"])
+
+    def test_full_queue_refuses_new_questions(self):
+        """Beyond the workers plus queue limit a question is refused before it is stored"""
+        worker = GenerationWorker(self.manager, max_workers=1, queue_limit=1)
+        self.addCleanup(worker.shutdown)
+        running = worker.submit("alice", self.chat.chat_id, "First")
+        queued = worker.submit("alice", self.chat.chat_id, "Second")
+        with self.assertRaises(GenerationQueueFull):
+            worker.submit("alice", self.chat.chat_id, "Third")
+        self.assertEqual([m.content for m in self.chat.messages if m.role == "user"], ["First", "Second"])
+
+        self.release(6)
+        self.assertTrue(queued.wait(5))
+        self.assertTrue(running.done)
+        self.assertEqual(worker.active_count(), 0)
+        worker.submit("alice", self.chat.chat_id, "Third")
+        self.release(3)
+
+    def wait_for_content(self, job):
+        for content in job.follow(poll_seconds=0.05):
+            if content:
+                return
+
+    def test_answer_abandoned_by_its_session_is_cancelled(self):
+        """Once the asking session is gone and nobody follows the answer, generation stops"""
+        gone = threading.Event()
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi", should_cancel=gone.is_set)
+        job.abandon_seconds = 0
+        self.release(1)
+        self.wait_for_content(job)
+        gone.set()
+        self.release(2)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.answer.content, "one")
+        self.assertTrue(job.answer.truncated)
+
+    def test_reattached_answer_is_not_abandoned(self):
+        """A reloaded page following the answer keeps it generating after the old session is gone"""
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi", should_cancel=lambda: True)
+        job.abandon_seconds = 0
+        follower = job.follow(poll_seconds=0.05)
+        next(follower)
+        self.release(3)
+        self.assertEqual(list(follower)[-1], "one two three")
+        self.assertFalse(job.answer.truncated)
+
+    def test_leaving_a_chat_cancels_its_answers(self):
+        """Running and queued answers of the chat left are cancelled; other chats' are not"""
+        other = self.manager.create_user_chat("alice", "Other")
+        running = self.worker.submit("alice", self.chat.chat_id, "First")
+        elsewhere = self.worker.submit("alice", other.chat_id, "Elsewhere")
+        queued = self.worker.submit("alice", self.chat.chat_id, "Second")
+        self.release(1)
+        self.wait_for_content(running)
+
+        self.assertEqual(self.worker.cancel_chat("alice", self.chat.chat_id), 2)
+        self.release(10)
+        for job in (running, elsewhere, queued):
+            self.assertTrue(job.wait(5))
+        self.assertTrue(running.answer.truncated and queued.answer.truncated)
+        self.assertEqual((elsewhere.answer.content, elsewhere.answer.truncated), ("one two three", False))
+
+    @unittest.skipIf(rcsb_pdb_chatbot is None, "streamlit not installed")
+    def test_new_chat_cancels_the_answer_in_progress(self):
+        job = self.worker.submit("alice", self.chat.chat_id, "Hi")
+        self.release(1)
+        self.wait_for_content(job)
+        state = SimpleNamespace(session_manager=self.manager, browser_session_id="alice",
+                                current_chat_id=self.chat.chat_id)
+        with patch("rcsb_pdb_chatbot.st", SimpleNamespace(session_state=state)), \
+                patch("rcsb_pdb_chatbot.get_generation_worker", return_value=self.worker):
+            rcsb_pdb_chatbot.start_new_chat()
+        self.assertNotEqual(state.current_chat_id, self.chat.chat_id)
+        self.release(2)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.answer.content, "one")
+        self.assertTrue(job.answer.truncated)
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestConcurrentSaves(unittest.TestCase):
+    """Worker checkpoints and API threads change and save the same user at once"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(["answer"]))
+        self.manager.checkpoint_interval = 0
+        self.data_file = Path(self.temp_dir) / "user_alice_sessions.json"
+
+    def reload(self):
+        return make_session_manager(self.temp_dir).get_user_session("alice")
+
+    def run_threads(self, target, count):
+        errors = []
+
+        def run(i):
+            try:
+                target(i)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_cache_misses_load_one_copy(self):
+        barrier = threading.Barrier(8)
+        sessions = []
+
+        def load(i):
+            barrier.wait()
+            sessions.append(self.manager.get_user_session("alice"))
+
+        self.run_threads(load, 8)
+        self.assertTrue(all(session is sessions[0] for session in sessions))
+
+    def test_concurrent_turns_and_feedback_are_all_saved(self):
+        """No update is lost and the file on disk always parses"""
+        chat = self.manager.create_user_chat("alice", "Busy")
+        list(self.manager.send_message_to_chat("alice", chat.chat_id, "first"))
+        rated = chat.messages[1].message_id
+
+        def work(i):
+            if i % 2:
+                list(self.manager.send_message_to_chat("alice", chat.chat_id, f"question {i}"))
+            else:
+                self.manager.add_message_feedback("alice", chat.chat_id, rated, {"star_rating": 1 + i % 5})
+            json.loads(self.data_file.read_text())
+
+        self.run_threads(work, 20)
+        saved = self.reload()
+        self.assertEqual(len(saved.chats[0].messages), 2 + 2 * 10)
+        self.assertEqual(saved.usage.questions, 11)
+        self.assertEqual(saved.usage.feedback, 1)
+        self.assertEqual(list(Path(self.temp_dir).glob(".*.tmp")), [])
+
+    def test_failed_write_keeps_the_previous_file(self):
+        self.manager.create_user_chat("alice", "Kept")
+        before = self.data_file.read_text()
+        with patch("user_session_manager.json.dump", side_effect=OSError("disk full")):
+            self.manager.create_user_chat("alice", "Lost")
+        self.assertEqual(self.data_file.read_text(), before)
+
+    def test_unparseable_file_is_set_aside_not_overwritten(self):
+        self.data_file.write_text('{"user_id": "alice", "chats": [')
+        self.assertEqual(self.manager.get_user_session("alice").chats, [])
+        self.manager.create_user_chat("alice", "After")
+
+        set_aside = list(Path(self.temp_dir).glob("user_alice_sessions.json.corrupt-*"))
+        self.assertEqual(len(set_aside), 1)
+        self.assertEqual(set_aside[0].read_text(), '{"user_id": "alice", "chats": [')
+        self.assertEqual([chat.title for chat in self.reload().chats], ["After"])
+
+    def test_unreadable_file_is_not_cached(self):
+        self.manager.create_user_chat("alice", "Kept")
+        self.manager.user_sessions.clear()
+        with patch("builtins.open", side_effect=PermissionError("denied")):
+            with self.assertRaises(OSError):
+                self.manager.get_user_session("alice")
+        self.assertNotIn("alice", self.manager.user_sessions)
+        self.assertEqual([chat.title for chat in self.manager.get_user_session("alice").chats], ["Kept"])
+
+
+if __name__ == "__main__":
+    unittest.main()
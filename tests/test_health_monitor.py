@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Tests for the background health monitor and readiness gating
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from health_monitor import HealthMonitor, create_health_server
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from fastapi.testclient import TestClient
+    from chat_api import create_app
+except ImportError as e:
+    print(f"Warning: Could not import chat API: {e}")
+    create_app = None
+
+
+class FakeRAGFlow:
+    """Probe and warm-up targets that can be switched between up and down"""
+
+    def __init__(self):
+        self.up = True
+        self.probes = 0
+
+    def health_check(self):
+        self.probes += 1
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return {"ragflow_connection": True, "dataset_access": True, "assistant_access": True}
+
+    def resolve(self):
+        return self.up
+
+
+class TestHealthMonitor(unittest.TestCase):
+    """Cached snapshots, warm-up and readiness"""
+
+    def setUp(self):
+        self.ragflow = FakeRAGFlow()
+        self.monitor = HealthMonitor(self.ragflow.health_check, self.ragflow.resolve, interval=0)
+
+    def test_readiness_reads_the_cache(self):
+        """Liveness and readiness never call RAGFlow themselves"""
+        self.monitor.start()
+        probes = self.ragflow.probes
+        for _ in range(10):
+            self.monitor.readiness()
+            self.monitor.liveness()
+        self.assertEqual(self.ragflow.probes, probes)
+
+    def test_not_ready_until_warm(self):
+        """Startup with RAGFlow down: not warm; warm-up is retried on the next probe"""
+        self.ragflow.up = False
+        self.monitor.start()
+        ready, details = self.monitor.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(details["status"], "warming_up")
+        self.assertFalse(self.monitor.warm)
+
+        self.ragflow.up = True
+        self.monitor.check()
+        self.assertTrue(self.monitor.warm)
+        self.assertTrue(self.monitor.readiness()[0])
+
+    def test_failures_make_unready_but_stay_warm(self):
+        """Once warm, an outage only flips readiness and counts consecutive failures"""
+        self.monitor.start()
+        self.ragflow.up = False
+        self.monitor.check()
+        snapshot = self.monitor.check()
+
+        self.assertEqual((snapshot.healthy, snapshot.consecutive_failures), (False, 2))
+        self.assertEqual(snapshot.error, "connection refused")
+        self.assertTrue(self.monitor.warm)
+        ready, details = self.monitor.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(details["status"], "ragflow_unhealthy")
+
+    def test_stale_snapshot_is_unready(self):
+        """A probe that stopped reporting (hung or dead thread) does not keep the instance ready"""
+        self.monitor.stale_after = 0.01
+        self.monitor.start()
+        time.sleep(0.02)
+        self.assertEqual(self.monitor.readiness()[1]["status"], "health_stale")
+
+    def test_latency_history(self):
+        """Each probe is recorded; the summary reports failures and percentiles"""
+        monitor = HealthMonitor(self.ragflow.health_check, self.ragflow.resolve, interval=0, history_size=3)
+        for up in (True, False, True, True):
+            self.ragflow.up = up
+            monitor.check()
+
+        history = monitor.latency_history()
+        self.assertEqual([entry["healthy"] for entry in history], [False, True, True])
+        summary = monitor.latency_summary()
+        self.assertEqual((summary["probes"], summary["failures"]), (3, 1))
+        self.assertLessEqual(summary["p50_ms"], summary["max_ms"])
+
+    def test_background_loop(self):
+        """The monitor keeps probing on its interval until stopped"""
+        monitor = HealthMonitor(self.ragflow.health_check, self.ragflow.resolve, interval=0.01)
+        monitor.start()
+        self.addCleanup(monitor.stop)
+        deadline = time.time() + 2
+        while self.ragflow.probes < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(self.ragflow.probes, 3)
+        self.assertTrue(monitor.liveness()[0])
+
+    def test_probe_endpoints(self):
+        """/livez and /readyz answer 200 or 503 with JSON details"""
+        self.ragflow.up = False
+        self.monitor.start()
+        server = create_health_server(self.monitor, 0, host="127.0.0.1")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        with urllib.request.urlopen(f"{base}/livez") as response:
+            self.assertEqual(response.status, 200)
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(f"{base}/readyz")
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(json.loads(raised.exception.read())["status"], "warming_up")
+
+
+class SwitchableAssistantManager(FakeAssistantManager):
+    """Assistant and health follow the shared FakeRAGFlow"""
+
+    def __init__(self, ragflow: FakeRAGFlow):
+        super().__init__()
+        self.ragflow = ragflow
+
+    def get_or_create_assistant(self, config):
+        if not self.ragflow.up:
+            raise ConnectionError("connection refused")
+        return super().get_or_create_assistant(config)
+
+    def health_check(self):
+        return self.ragflow.health_check()
+
+
+@unittest.skipIf(create_app is None, "fastapi or ragflow-sdk not installed")
+class TestChatAPIGating(unittest.TestCase):
+    """The chat API refuses new traffic until the assistant is warm"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.ragflow = FakeRAGFlow()
+        self.ragflow.up = False
+        self.manager = make_session_manager(self.temp_dir, SwitchableAssistantManager(self.ragflow))
+        self.client = TestClient(create_app(self.manager))
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def test_warming_up_returns_503(self):
+        """RAGFlow down at startup: chats are refused until a probe resolves the assistant"""
+        self.assertIsNone(self.manager.assistant_id)
+        response = self.client.post("/users/visitor-1/chats", json={"title": "API chat"})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        self.assertEqual(self.client.get("/health/ready").status_code, 503)
+        self.assertEqual(self.client.get("/health/live").status_code, 200)
+
+        self.ragflow.up = True
+        self.manager.health_monitor.check()
+        self.assertEqual(self.manager.assistant_id, "assistant-1")
+        self.assertEqual(self.client.get("/health/ready").json()["status"], "ready")
+        self.assertEqual(self.client.post("/users/visitor-1/chats", json={"title": "API chat"}).status_code, 201)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental markdown fence stripping and memoised rendering
+"""
+
+import re
+import sys
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from markdown_processing import (
+    StreamingMarkdownProcessor,
+    clear_render_memo,
+    process_markdown_response,
+    render_stored_answer,
+)
+
+
+def regex_process_markdown_response(content: str) -> str:
+    """The original regex implementation, kept as the reference behaviour"""
+    if not content:
+        return content
+    match = re.match(r'^```markdown\s*\n(.*?)\n```$', content.strip(), re.DOTALL)
+    return match.group(1) if match else content
+
+
+CASES = [
+    "",
+    "Plain answer with no wrapper",
+    "```markdown\n# Title\n\nBody text\n```",
+    "  ```markdown  \n\n# Title\n```  \n",
+    "```markdown\n\n```",
+    "```markdown\n```",
+    "```markdown # not a wrapper\nBody\n```",
+    "```markdownish\nBody\n```",
+    "```markdown\nBody with inner fence\n```python\nprint(1)\n```\nmore\n```",
+    "```markdown\nUnclosed wrapper",
+    "```python\ncode\n```",
+    "Text then\n```markdown\nfenced\n```",
+]
+
+
+class TestProcessMarkdownResponse(unittest.TestCase):
+    """The string-based implementation matches the original regex"""
+
+    def test_matches_regex_reference(self):
+        for case in CASES:
+            with self.subTest(case=case):
+                self.assertEqual(process_markdown_response(case), regex_process_markdown_response(case))
+
+
+class TestStreamingMarkdownProcessor(unittest.TestCase):
+    """Incremental stripping over cumulative chunks"""
+
+    def _stream(self, text, step=3):
+        processor = StreamingMarkdownProcessor()
+        shown = [processor.feed(text[:end]) for end in range(step, len(text) + step, step)]
+        return processor, shown
+
+    def test_wrapper_never_shown(self):
+        """No prefix of the wrapped answer displays the fence"""
+        text = "```markdown\n## Deposition\n\nUpload your **mmCIF** file.\n```"
+        processor, shown = self._stream(text, step=1)
+        for partial in shown:
+            self.assertNotIn("```", partial)
+        self.assertEqual(shown[-1], "## Deposition\n\nUpload your **mmCIF** file.")
+        self.assertEqual(processor.state, StreamingMarkdownProcessor.WRAPPED)
+
+    def test_plain_answer_passes_through(self):
+        """Unwrapped answers are shown unchanged once the first characters rule out a fence"""
+        text = "The PDB archive contains structures."
+        processor, shown = self._stream(text)
+        self.assertEqual(shown[-1], text)
+        self.assertEqual(processor.state, StreamingMarkdownProcessor.PLAIN)
+
+    def test_finish_matches_stored_rendering(self):
+        """The final display equals what history rendering will show"""
+        for case in CASES:
+            with self.subTest(case=case):
+                processor, _ = self._stream(case)
+                self.assertEqual(processor.finish(case), process_markdown_response(case))
+
+
+class TestRenderMemo(unittest.TestCase):
+    """Stored answers are processed once per message_id"""
+
+    def setUp(self):
+        clear_render_memo()
+
+    def test_memo_by_message_id(self):
+        first = render_stored_answer("msg-1", "```markdown\nBody\n```")
+        # The same id returns the memoised render without reprocessing
+        second = render_stored_answer("msg-1", "ignored on a memo hit")
+        self.assertEqual(first, "Body")
+        self.assertEqual(second, "Body")
+
+    def test_no_message_id_is_not_memoised(self):
+        self.assertEqual(render_stored_answer(None, "```markdown\nA\n```"), "A")
+        self.assertEqual(render_stored_answer(None, "plain"), "plain")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
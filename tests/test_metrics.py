@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for Prometheus metrics instrumentation
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import metrics
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class TestMetricsDisabled(unittest.TestCase):
+    """Metrics must cost nothing when disabled"""
+
+    def setUp(self):
+        patcher = patch.object(metrics, "_enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timed_returns_shared_null_context(self):
+        """Disabled timers allocate nothing per call"""
+        self.assertIs(metrics.timed("generation"), metrics.timed("persistence"))
+        with metrics.timed("generation"):
+            pass
+
+    def test_helpers_do_not_build_collectors(self):
+        """Observations are dropped without touching prometheus_client"""
+        with patch.object(metrics, "_build_metrics") as build:
+            metrics.observe_stage("ttft", 0.2)
+            metrics.increment("chatbot_stream_chunks_total", 3)
+            metrics.observe_stream(10, 500, 1.0)
+            build.assert_not_called()
+
+    def test_server_not_started(self):
+        """No side port is opened when disabled"""
+        self.assertFalse(metrics.start_metrics_server())
+
+
+@unittest.skipIf(prometheus_client is None, "prometheus-client not installed")
+class TestMetricsEnabled(unittest.TestCase):
+    """Observations reach the Prometheus registry when enabled"""
+
+    def setUp(self):
+        patcher = patch.object(metrics, "_enabled", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _sample(self, name, labels=None):
+        return prometheus_client.REGISTRY.get_sample_value(name, labels or {}) or 0
+
+    def test_stage_histogram(self):
+        """Stage timers record into the labelled histogram"""
+        before = self._sample("chatbot_stage_duration_seconds_count", {"stage": "persistence"})
+        with metrics.timed("persistence"):
+            pass
+        after = self._sample("chatbot_stage_duration_seconds_count", {"stage": "persistence"})
+        self.assertEqual(after, before + 1)
+
+    def test_stream_counters(self):
+        """Chunk and character counters accumulate per answer"""
+        chunks_before = self._sample("chatbot_stream_chunks_total")
+        chars_before = self._sample("chatbot_stream_characters_total")
+        metrics.observe_stream(chunks=12, characters=600, seconds=2.0)
+        self.assertEqual(self._sample("chatbot_stream_chunks_total"), chunks_before + 12)
+        self.assertEqual(self._sample("chatbot_stream_characters_total"), chars_before + 600)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests running the real RAGFlow clients against the mock RAGFlow server
+"""
+
+import logging
+import shutil
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src, knowledge_base and the project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "src"))
+sys.path.append(str(project_root / "knowledge_base"))
+sys.path.append(str(project_root))
+
+try:
+    from testing.mock_ragflow_server import MockRAGFlowServer, PROFILES
+    from ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import mock RAGFlow server: {e}")
+    MockRAGFlowServer = None
+
+try:
+    from initialize_dataset import KnowledgeBaseInitializer
+except (ImportError, SystemExit) as e:
+    print(f"Warning: Could not import initialize_dataset: {e}")
+    KnowledgeBaseInitializer = None
+
+
+@unittest.skipIf(MockRAGFlowServer is None, "ragflow-sdk not installed")
+class TestMockRAGFlowChat(unittest.TestCase):
+    """Assistant discovery, sessions and streamed answers through ragflow-sdk"""
+
+    def setUp(self):
+        self.server = MockRAGFlowServer(replace(PROFILES["instant"], answer_tokens=12, reference_count=2)).start()
+        self.addCleanup(self.server.stop)
+        self.manager = RAGFlowAssistantManager(self.server.api_key, self.server.url)
+        self.config = create_default_assistant_config()
+
+    def test_assistant_is_created_once_then_reused(self):
+        """First start creates dataset and chat; later managers find them by name"""
+        assistant_id = self.manager.get_or_create_assistant(self.config)
+        self.assertEqual(len(self.server.state.datasets), 1)
+        self.assertEqual(self.server.state.chats[assistant_id]["prompt"]["top_n"], self.config.top_n)
+
+        other = RAGFlowAssistantManager(self.server.api_key, self.server.url)
+        self.assertEqual(other.get_or_create_assistant(self.config), assistant_id)
+        self.assertEqual(len(self.server.state.chats), 1)
+
+    def test_streamed_answer_with_references(self):
+        """Answers arrive as cumulative chunks; the final one carries the references"""
+        assistant_id = self.manager.get_or_create_assistant(self.config)
+        session_id = self.manager.create_session(assistant_id, "test")
+
+        responses = list(self.manager.send_message(session_id, "How do I deposit a structure?"))
+        self.assertGreater(len(responses), 2)
+        self.assertTrue(responses[-1].is_complete)
+        self.assertEqual(len(responses[-1].content.split()), 12)
+        self.assertTrue(responses[1].content.startswith(responses[0].content))
+        self.assertEqual(len(responses[-1].references), 2)
+        self.assertEqual(len(responses[-1].references[0]["content"]), 2000)
+
+        self.manager.delete_sessions(assistant_id, [session_id])
+        self.assertNotIn(session_id, self.server.state.sessions)
+
+    def test_injected_stream_failure_surfaces_as_error_answer(self):
+        """A mid-stream failure ends the answer with RAGFlow's **ERROR** text"""
+        assistant_id = self.manager.get_or_create_assistant(self.config)
+        session_id = self.manager.create_session(assistant_id, "test")
+        self.server.profile = replace(self.server.profile, stream_error_rate=1.0)
+
+        final = list(self.manager.send_message(session_id, "Question"))[-1]
+        self.assertTrue(final.content.startswith("**ERROR**"))
+
+    def test_injected_request_failures_are_retried_then_raised(self):
+        """HTTP 500s go through the retry path before reaching the caller"""
+        assistant_id = self.manager.get_or_create_assistant(self.config)
+        self.manager._current_assistant = None
+        self.server.profile = replace(self.server.profile, error_rate=1.0)
+
+        with patch("circuit_breaker.time.sleep"):
+            with self.assertRaises(Exception):
+                self.manager.create_session(assistant_id, "test")
+        self.assertEqual(self.server.state.requests["list_chats"], 1 + 3)
+
+    def test_wrong_api_key_is_rejected(self):
+        """Requests without the server's key fail like RAGFlow's auth check"""
+        manager = RAGFlowAssistantManager("wrong-key", self.server.url)
+        self.assertEqual(manager.list_assistants(), [])
+
+    def test_user_session_manager_turn(self):
+        """A full chat turn is stored with the mock's answer and references"""
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        session_manager = UserSessionManager(self.server.api_key, base_url=self.server.url, data_dir=data_dir)
+
+        chat = session_manager.create_user_chat("mock-user", "Mock chat")
+        list(session_manager.send_message_to_chat("mock-user", chat.chat_id, "What is a validation report?"))
+
+        history = session_manager.get_chat_history("mock-user", chat.chat_id)
+        self.assertEqual([m.role for m in history], ["user", "assistant"])
+        self.assertEqual(len(history[1].content.split()), 12)
+        self.assertEqual(len(history[1].references), 2)
+
+
+@unittest.skipIf(KnowledgeBaseInitializer is None or MockRAGFlowServer is None,
+                 "ragflow-sdk or python-dotenv not installed")
+class TestMockRAGFlowKnowledgeBase(unittest.TestCase):
+    """initialize_dataset.py creating and syncing a dataset"""
+
+    def setUp(self):
+        self.server = MockRAGFlowServer(PROFILES["instant"]).start()
+        self.addCleanup(self.server.stop)
+        self.kb_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.kb_dir)
+        (self.kb_dir / "deposition_faq.txt").write_text("Deposition questions. " * 500)
+        (self.kb_dir / "README.md").write_text("not uploaded")
+
+        self.initializer = KnowledgeBaseInitializer(self.server.api_key, self.server.url, "mock-openai-key")
+        self.initializer.knowledge_base_dir = self.kb_dir
+        self.initializer.logger.setLevel(logging.WARNING)
+
+    def test_initialize_then_sync(self):
+        """Initial upload and parse, then an incremental sync picks up a new file"""
+        results = self.initializer.initialize_knowledge_base()
+        self.assertEqual(results.status, "completed", results.errors)
+        self.assertEqual(results.document_count, 1)
+        self.assertGreater(results.chunk_count, 0)
+
+        (self.kb_dir / "annotation_guide.txt").write_text("Annotation steps. " * 200)
+        sync = self.initializer.sync_knowledge_base()
+        self.assertEqual(sync.status, "completed", sync.errors)
+        self.assertEqual((sync.new_documents, sync.unchanged_documents), (1, 1))
+
+        dataset = self.server.state.datasets[results.dataset_id]
+        self.assertEqual(dataset["document_count"], 2)
+        self.assertTrue(all(d["run"] == "DONE" for d in self.server.state.documents.values()))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for on-demand profiling hooks
+"""
+
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import profiling
+
+
+def busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+class TestProfiling(unittest.TestCase):
+    """Sampling, forcing and output files"""
+
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        for name, value in (("_output_dir", self.output_dir), ("_counters", {}),
+                            ("_enabled", True), ("_sample_rate", 1), ("_interval", 0.001)):
+            patcher = patch.object(profiling, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def profiles(self, suffix="*"):
+        return sorted(self.output_dir.glob(f"*.{suffix}"))
+
+    def test_disabled_returns_shared_null_context(self):
+        """Unsampled requests cost a flag check and write nothing"""
+        with patch.object(profiling, "_enabled", False):
+            self.assertIs(profiling.profile_request("a"), profiling.profile_request("b"))
+            with profiling.profile_request("script_run"):
+                pass
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampling_writes_collapsed_stacks(self):
+        """Sampling mode writes 'frame;frame count' lines including the busy function"""
+        with patch.object(profiling, "_mode", "sampling"):
+            with profiling.profile_request("script_run"):
+                busy_work(0.2)
+
+        [path] = self.profiles("folded")
+        self.assertTrue(path.name.startswith("script_run-"))
+        lines = path.read_text().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertIn("busy_work (test_profiling.py:", path.read_text())
+
+    def test_deterministic_writes_pstats(self):
+        """Deterministic mode writes a cProfile dump readable by pstats"""
+        with patch.object(profiling, "_mode", "deterministic"):
+            with profiling.profile_request("chat_turn"):
+                busy_work(0.01)
+
+        [path] = self.profiles("prof")
+        functions = {func[2] for func in pstats.Stats(str(path)).stats}
+        self.assertIn("busy_work", functions)
+
+    def test_one_in_n_sampling(self):
+        """Only every Nth request of a kind is profiled"""
+        with patch.object(profiling, "_sample_rate", 3):
+            for _ in range(6):
+                with profiling.profile_request("script_run"):
+                    pass
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_force_profiles_when_disabled(self):
+        """?profile=<secret> profiles a run even with sampling off"""
+        with patch.object(profiling, "_enabled", False), \
+                patch.object(profiling, "_query_secret", "s3cret"):
+            self.assertFalse(profiling.query_requests_profile("wrong"))
+            self.assertFalse(profiling.query_requests_profile(None))
+            force = profiling.query_requests_profile("s3cret")
+            with profiling.profile_request("script_run", force=force):
+                pass
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_no_secret_never_forces(self):
+        """An unset secret cannot be matched by an empty query value"""
+        with patch.object(profiling, "_query_secret", ""):
+            self.assertFalse(profiling.query_requests_profile(""))
+            self.assertFalse(profiling.query_requests_profile("anything"))
+
+    def test_old_profiles_are_pruned(self):
+        """At most PROFILING_MAX_FILES profiles are kept"""
+        with patch.object(profiling, "_max_files", 2):
+            for _ in range(4):
+                with profiling.profile_request("script_run"):
+                    pass
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_profiled_generator_covers_the_whole_stream(self):
+        """A profile opened inside a generator is written when the stream ends"""
+        def stream():
+            with profiling.profile_request("send_message_to_chat"):
+                for i in range(3):
+                    yield i
+
+        chunks = stream()
+        next(chunks)
+        self.assertEqual(self.profiles(), [])
+        list(chunks)
+        self.assertEqual(len(self.profiles()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
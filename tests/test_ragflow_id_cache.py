@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the persisted RAGFlow assistant/dataset id cache
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src and the project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "src"))
+sys.path.append(str(project_root))
+
+from ragflow_id_cache import RAGFlowIdCache, config_fingerprint, create_id_cache
+
+try:
+    from ragflow_assistant_manager import RAGFlowAssistantManager, create_default_assistant_config
+    from testing.mock_ragflow_server import MockRAGFlowServer, PROFILES
+except ImportError as e:
+    print(f"Warning: Could not import RAGFlow assistant manager: {e}")
+    RAGFlowAssistantManager = None
+
+
+class TestIdCacheFile(unittest.TestCase):
+    """Persistence, scoping and fallbacks of the cache file"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = self.temp_dir / "ragflow_ids.json"
+
+    def test_round_trip(self):
+        """Entries written by one instance are read by the next"""
+        scope = RAGFlowIdCache.scope("http://ragflow:9380/", "key")
+        RAGFlowIdCache(self.path).put(scope, "assistant", "RCSB", id="a1", fingerprint="f")
+
+        entry = RAGFlowIdCache(self.path).get(scope, "assistant", "RCSB")
+        self.assertEqual((entry["id"], entry["fingerprint"]), ("a1", "f"))
+        self.assertIn("resolved_at", entry)
+
+    def test_scopes_are_per_server_and_key(self):
+        """The same name on another server or API key is a separate entry"""
+        cache = RAGFlowIdCache(self.path)
+        cache.put(RAGFlowIdCache.scope("http://a", "ragflow-secret"), "dataset", "kb", id="d1")
+        self.assertIsNone(cache.get(RAGFlowIdCache.scope("http://b", "ragflow-secret"), "dataset", "kb"))
+        self.assertIsNone(cache.get(RAGFlowIdCache.scope("http://a", "other"), "dataset", "kb"))
+        self.assertNotIn("ragflow-secret", self.path.read_text())
+
+    def test_invalidate(self):
+        cache = RAGFlowIdCache(self.path)
+        cache.put("s", "assistant", "RCSB", id="a1")
+        cache.invalidate("s", "assistant", "RCSB")
+        self.assertIsNone(RAGFlowIdCache(self.path).get("s", "assistant", "RCSB"))
+
+    def test_corrupt_or_old_file_is_empty(self):
+        """Unreadable files and other layouts mean an empty cache, not an error"""
+        self.path.write_text("{not json")
+        self.assertIsNone(RAGFlowIdCache(self.path).get("s", "assistant", "RCSB"))
+        self.path.write_text(json.dumps({"version": 0, "entries": {"s": {"assistant:RCSB": {"id": "a1"}}}}))
+        self.assertIsNone(RAGFlowIdCache(self.path).get("s", "assistant", "RCSB"))
+
+    @unittest.skipIf(RAGFlowAssistantManager is None, "ragflow-sdk not installed")
+    def test_fingerprint_tracks_settings(self):
+        config = create_default_assistant_config()
+        changed = replace(config, top_n=config.top_n + 1)
+        self.assertEqual(config_fingerprint(config), config_fingerprint(replace(config)))
+        self.assertNotEqual(config_fingerprint(config), config_fingerprint(changed))
+
+    def test_create_id_cache_env(self):
+        """Enabled by default under the data dir; RAGFLOW_ID_CACHE_ENABLED=false disables it"""
+        with patch.dict(os.environ, {"RAGFLOW_ID_CACHE_ENABLED": "true", "RAGFLOW_ID_CACHE_FILE": ""}):
+            self.assertEqual(create_id_cache(self.temp_dir).path, self.path)
+        with patch.dict(os.environ, {"RAGFLOW_ID_CACHE_ENABLED": "false"}):
+            self.assertIsNone(create_id_cache(self.temp_dir))
+
+
+@unittest.skipIf(RAGFlowAssistantManager is None, "ragflow-sdk not installed")
+class TestCachedDiscovery(unittest.TestCase):
+    """A restarted manager reuses cached ids instead of listing chats and datasets"""
+
+    def setUp(self):
+        self.server = MockRAGFlowServer(PROFILES["instant"]).start()
+        self.addCleanup(self.server.stop)
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.cache_path = temp_dir / "ragflow_ids.json"
+        self.config = create_default_assistant_config()
+
+    def new_manager(self) -> RAGFlowAssistantManager:
+        return RAGFlowAssistantManager(self.server.api_key, self.server.url,
+                                       id_cache=RAGFlowIdCache(self.cache_path))
+
+    def warm_start(self):
+        """Resolve once, then reset the request counts as a restarted process would see them"""
+        assistant_id = self.new_manager().get_or_create_assistant(self.config)
+        self.server.state.requests.clear()
+        return assistant_id
+
+    def test_restart_makes_no_discovery_calls(self):
+        """Unchanged settings: the cached id is used with zero RAGFlow calls"""
+        assistant_id = self.warm_start()
+        manager = self.new_manager()
+
+        self.assertEqual(manager.get_or_create_assistant(self.config), assistant_id)
+        self.assertEqual(sum(self.server.state.requests.values()), 0)
+
+        session_id = manager.create_session(assistant_id)
+        self.assertEqual(self.server.state.requests["create_session"], 1)
+        self.assertEqual(self.server.state.requests["list_chats"], 0)
+        self.assertIn(session_id, self.server.state.sessions)
+
+    def test_changed_settings_push_once(self):
+        """A new fingerprint sends one update; the following restart sends none"""
+        self.warm_start()
+        changed = replace(self.config, top_n=self.config.top_n + 1)
+
+        self.new_manager().get_or_create_assistant(changed)
+        self.assertEqual(self.server.state.requests["update_chat"], 1)
+        self.assertEqual(self.server.state.requests["list_chats"], 0)
+
+        self.server.state.requests.clear()
+        self.new_manager().get_or_create_assistant(changed)
+        self.assertEqual(sum(self.server.state.requests.values()), 0)
+
+    def test_deleted_assistant_is_rediscovered(self):
+        """A cached id RAGFlow no longer knows is dropped and the assistant recreated"""
+        assistant_id = self.warm_start()
+        self.server.state.delete_chats([assistant_id])
+        manager = self.new_manager()
+
+        self.assertEqual(manager.get_or_create_assistant(self.config), assistant_id)
+        session_id = manager.create_session(assistant_id)
+
+        [new_assistant_id] = list(self.server.state.chats)
+        self.assertNotEqual(new_assistant_id, assistant_id)
+        self.assertEqual(self.server.state.sessions[session_id]["chat_id"], new_assistant_id)
+        self.assertEqual(RAGFlowIdCache(self.cache_path).get(manager._cache_scope, "assistant",
+                                                             self.config.name)["id"], new_assistant_id)
+
+    def test_deleted_assistant_on_config_push(self):
+        """A failed push for a missing id falls back to discovery instead of keeping the id"""
+        assistant_id = self.warm_start()
+        self.server.state.delete_chats([assistant_id])
+
+        changed = replace(self.config, top_n=self.config.top_n + 1)
+        new_assistant_id = self.new_manager().get_or_create_assistant(changed)
+        self.assertNotEqual(new_assistant_id, assistant_id)
+        self.assertIn(new_assistant_id, self.server.state.chats)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
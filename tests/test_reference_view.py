@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for reference previews, full-chunk expansion and the per-message byte cap
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from reference_view import build_reference_view
+
+
+def make_refs(count, content):
+    return [{"document_name": f"doc-{i}.pdf", "similarity": 0.5, "content": content} for i in range(count)]
+
+
+class TestReferenceView(unittest.TestCase):
+    """Test what text each reference renders with"""
+
+    def test_short_chunks_are_shown_whole(self):
+        items = build_reference_view(make_refs(2, "short chunk"), preview_chars=100)
+        self.assertEqual([item.text for item in items], ["short chunk", "short chunk"])
+        self.assertFalse(any(item.is_truncated or item.can_expand for item in items))
+
+    def test_long_chunks_get_word_boundary_preview(self):
+        content = "word " * 100
+        item = build_reference_view(make_refs(1, content), preview_chars=52)[0]
+        self.assertTrue(content.startswith(item.text))
+        self.assertLessEqual(len(item.text), 52)
+        self.assertFalse(item.text.endswith(" "))
+        self.assertTrue(item.is_truncated)
+        self.assertTrue(item.can_expand)
+
+    def test_full_index_shows_whole_chunk(self):
+        content = "x" * 1000
+        items = build_reference_view(make_refs(2, content), full_indexes={2}, preview_chars=50)
+        self.assertEqual(len(items[0].text), 50)
+        self.assertEqual(items[1].text, content)
+        self.assertFalse(items[1].can_expand)
+
+    def test_byte_cap_limits_message_total(self):
+        items = build_reference_view(make_refs(5, "é" * 500), full_indexes=range(1, 6), max_bytes=1500)
+        total = sum(len(item.text.encode("utf-8")) for item in items)
+        self.assertLessEqual(total, 1500)
+        # No split characters and later references are emptied, not dropped
+        self.assertEqual(len(items), 5)
+        self.assertEqual(items[-1].text, "")
+        self.assertTrue(items[-1].is_truncated)
+        self.assertFalse(items[-1].can_expand)
+
+    def test_missing_fields_and_no_references(self):
+        self.assertEqual(build_reference_view(None), [])
+        item = build_reference_view([{"content": None, "similarity": None}])[0]
+        self.assertEqual(item.document_name, "Unknown")
+        self.assertEqual(item.similarity, 0)
+        self.assertEqual(item.text, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
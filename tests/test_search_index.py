@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Tests for the full-text conversation search index
+"""
+
+import json
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from search_index import SearchIndex, to_fts_query
+
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import UserSessionManager: {e}")
+    UserSessionManager = None
+
+try:
+    from fastapi.testclient import TestClient
+    from chat_api import create_app
+except ImportError as e:
+    print(f"Warning: Could not import chat API: {e}")
+    create_app = None
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Indexing, ranking, filters and deletes"""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.index = SearchIndex(self.temp_dir / "search.sqlite3")
+        self.addCleanup(self.index.close)
+
+    def add(self, user_id, chat_id, role, content):
+        message_id = str(uuid.uuid4())
+        self.index.index_message(user_id, chat_id, message_id, role, content, "2025-09-25T10:00:00")
+        return message_id
+
+    def test_query_with_punctuation(self):
+        """Slashes and hyphens in the query are word separators, not FTS5 syntax errors"""
+        self.assertEqual(to_fts_query("PDBx/mmCIF validation-report"), '"PDBx" "mmCIF" "validation" "report"')
+        self.add("alice", "c1", "user", "Where do I find the PDBx/mmCIF validation report?")
+        self.add("bob", "c2", "user", "How do I upload a PDB format file?")
+        hits = self.index.search("PDBx/mmCIF validation report")
+        self.assertEqual([(h.user_id, h.chat_id, h.role) for h in hits], [("alice", "c1", "user")])
+        self.assertIn("[validation]", hits[0].snippet)
+
+    def test_ranking_and_stemming(self):
+        """All words must match; denser matches rank first; plural forms match"""
+        self.add("alice", "c1", "assistant", "The validation report lists geometry outliers.")
+        self.add("bob", "c2", "assistant", "Validation reports: each validation report covers the validation "
+                                            "of geometry and fit.")
+        self.add("carol", "c3", "assistant", "Ligand geometry only.")
+        hits = self.index.search("validation reports")
+        self.assertEqual([h.chat_id for h in hits], ["c2", "c1"])
+        self.assertLess(hits[0].score, hits[1].score)
+
+    def test_filters(self):
+        self.add("alice", "c1", "user", "ligand restraints")
+        self.add("alice", "c1", "assistant", "Ligand restraints come from the CCD.")
+        self.add("bob", "c2", "user", "ligand restraints please")
+        self.assertEqual(len(self.index.search("ligand restraints")), 3)
+        self.assertEqual({h.user_id for h in self.index.search("ligand restraints", user_id="alice")}, {"alice"})
+        self.assertEqual([h.role for h in self.index.search("ligand", role="assistant")], ["assistant"])
+        self.assertEqual(len(self.index.search("ligand", limit=2)), 2)
+        self.assertEqual(self.index.search("alice"), [])  # User ids are indexed for filtering, not matched
+
+    def test_ranking_is_capped_to_recent_matches(self):
+        """With max_candidates, an older better match loses to the newest matches; filters apply first"""
+        self.add("alice", "c1", "assistant", "density density density map")
+        for i in range(3):
+            self.add("bob", f"c{i + 2}", "assistant", f"density fit number {i}")
+        self.index.max_candidates = 2
+        hits = self.index.search("density")
+        self.assertEqual(({h.chat_id for h in hits}, hits.truncated), ({"c3", "c4"}, True))
+        hits = self.index.search("density", user_id="alice")
+        self.assertEqual(([h.chat_id for h in hits], hits.truncated), (["c1"], False))
+        self.index.max_candidates = 4
+        self.assertFalse(self.index.search("density").truncated)
+        self.index.max_candidates = 0
+        hits = self.index.search("density")
+        self.assertEqual((hits[0].chat_id, hits.truncated), ("c1", False))
+
+    def test_reindex_replaces_text(self):
+        message_id = self.add("alice", "c1", "assistant", "partial answer about maps")
+        self.index.index_message("alice", "c1", message_id, "assistant", "final answer about density")
+        self.assertEqual(self.index.search("maps"), [])
+        self.assertEqual(len(self.index.search("density")), 1)
+        self.assertEqual(self.index.count(), 1)
+
+    def test_delete_chat_and_user(self):
+        self.add("alice", "c1", "user", "sequence alignment")
+        self.add("alice", "c2", "user", "sequence alignment again")
+        self.add("bob", "c3", "user", "sequence alignment too")
+        self.assertEqual(self.index.delete_chat("c1"), 1)
+        self.assertEqual(self.index.delete_user("bob"), 1)
+        self.assertEqual([h.chat_id for h in self.index.search("sequence")], ["c2"])
+
+    def test_raw_queries(self):
+        self.add("alice", "c1", "user", "twinning in crystals")
+        self.assertEqual(len(self.index.search("twin*", raw=True)), 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.index.search('"unbalanced', raw=True)
+        self.assertEqual(self.index.search("?!"), [])
+
+    def test_rebuild_from_user_files(self):
+        """Rebuild indexes every stored message with content and skips unreadable files"""
+        self.add("stale", "c0", "user", "not in the files")
+        messages = [{"role": "user", "content": "cryo-EM map deposition", "message_id": "m1",
+                     "timestamp": "2025-09-25T10:00:00"},
+                    {"role": "assistant", "content": "", "message_id": "m2", "timestamp": "2025-09-25T10:00:01"}]
+        (self.temp_dir / "user_alice_sessions.json").write_text(json.dumps(
+            {"user_id": "alice", "chats": [{"chat_id": "c1", "messages": messages}]}))
+        (self.temp_dir / "user_broken_sessions.json").write_text("{not json")
+
+        self.assertEqual(self.index.rebuild(self.temp_dir), (1, 1))
+        self.assertEqual([h.message_id for h in self.index.search("cryo-EM deposition")], ["m1"])
+        self.assertEqual(self.index.search("files"), [])
+
+
+VALIDATION_ANSWER = ["Download the validation report from the deposition system."]
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestManagerSearch(unittest.TestCase):
+    """send_message_to_chat keeps the index current; deletes remove rows"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(VALIDATION_ANSWER))
+        self.addCleanup(self.manager.search_index.close)
+
+    def test_questions_and_answers_are_indexed(self):
+        chat = self.manager.create_user_chat("alice", "Validation")
+        list(self.manager.send_message_to_chat("alice", chat.chat_id, "Where is my PDBx/mmCIF file checked?"))
+
+        self.assertEqual([h.role for h in self.manager.search_conversations("PDBx/mmCIF")], ["user"])
+        hits = self.manager.search_conversations("validation report", role="assistant")
+        self.assertEqual([(h.chat_id, h.message_id) for h in hits],
+                         [(chat.chat_id, self.manager.get_chat_messages("alice", chat.chat_id)[-1].message_id)])
+
+        self.manager.delete_user_chat("alice", chat.chat_id)
+        self.assertEqual(self.manager.search_conversations("validation"), [])
+
+    def test_disabled_index(self):
+        with patch.dict("os.environ", {"SEARCH_INDEX_ENABLED": "false"}):
+            manager = make_session_manager(self.temp_dir, FakeAssistantManager(VALIDATION_ANSWER))
+        chat = manager.create_user_chat("alice", "Validation")
+        list(manager.send_message_to_chat("alice", chat.chat_id, "question"))
+        with self.assertRaises(RuntimeError):
+            manager.search_conversations("question")
+
+
+@unittest.skipIf(create_app is None or UserSessionManager is None, "fastapi or ragflow-sdk not installed")
+class TestSearchAPI(unittest.TestCase):
+    """Per-user search is open like the rest of a user's data; search across users needs the admin token"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(VALIDATION_ANSWER))
+        self.addCleanup(self.manager.search_index.close)
+        for user_id in ("alice", "bob"):
+            chat = self.manager.create_user_chat(user_id, "Validation")
+            list(self.manager.send_message_to_chat(user_id, chat.chat_id, f"{user_id} asks about validation"))
+        self.client = TestClient(create_app(self.manager))
+
+    def test_user_search(self):
+        response = self.client.get("/users/alice/search", params={"q": "validation"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({r["user_id"] for r in response.json()["results"]}, {"alice"})
+        self.assertFalse(response.json()["truncated"])
+
+    def test_partial_results_are_flagged(self):
+        self.manager.search_index.max_candidates = 1
+        with patch("chat_api.CHAT_API_ADMIN_TOKEN", "secret"):
+            response = self.client.get("/search", params={"q": "validation"},
+                                       headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["truncated"])
+
+    def test_admin_search(self):
+        with patch("chat_api.CHAT_API_ADMIN_TOKEN", ""):
+            self.assertEqual(self.client.get("/search", params={"q": "validation"}).status_code, 403)
+        with patch("chat_api.CHAT_API_ADMIN_TOKEN", "secret"):
+            self.assertEqual(self.client.get("/search", params={"q": "validation"},
+                                             headers={"Authorization": "Bearer wrong"}).status_code, 401)
+            response = self.client.get("/search", params={"q": "asks validation", "role": "user"},
+                                       headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({r["user_id"] for r in response.json()["results"]}, {"alice", "bob"})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
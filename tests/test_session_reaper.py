@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the orphaned RAGFlow session reaper
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from dataclasses import asdict
+from pathlib import Path
+
+# Add src and the project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "src"))
+sys.path.append(str(project_root))
+
+try:
+    from testing.mock_ragflow_server import MockRAGFlowServer, PROFILES
+    from session_reaper import RateLimiter, SessionReaper, ReapReport, referenced_session_ids
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import session reaper: {e}")
+    MockRAGFlowServer = None
+
+
+class FakeClock:
+    """Monotonic clock whose sleep just advances time"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@unittest.skipIf(MockRAGFlowServer is None, "ragflow-sdk not installed")
+class TestSessionReaper(unittest.TestCase):
+    """Orphans are found by diffing user files against the server's session list"""
+
+    def setUp(self):
+        self.server = MockRAGFlowServer(PROFILES["instant"]).start()
+        self.addCleanup(self.server.stop)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.sessions = UserSessionManager(self.server.api_key, base_url=self.server.url, data_dir=self.temp_dir)
+        self.kept = [self.sessions.create_user_chat("alice", f"Chat {i}") for i in range(3)]
+        deleted_chat = self.sessions.create_user_chat("alice", "Deleted")
+        self.sessions.delete_user_chat("alice", deleted_chat.chat_id)
+        for i in range(2):
+            self.sessions.create_user_chat("bob", f"Chat {i}")
+        self.sessions.cleanup_user_data("bob")
+
+        self.manager = self.sessions.assistant_manager
+        self.assistant_id = self.sessions.assistant_id
+        self.clock = FakeClock()
+
+    def reaper(self, **kwargs):
+        kwargs.setdefault("min_age", 0)
+        return SessionReaper(self.manager, self.assistant_id, page_size=2, batch_size=2,
+                             clock=lambda: time.time() + 1,
+                             limiter=RateLimiter(10, clock=self.clock, sleep=self.clock.sleep), **kwargs)
+
+    def server_session_ids(self):
+        return {s["id"] for s in self.server.state.sessions.values() if s["chat_id"] == self.assistant_id}
+
+    def test_referenced_session_ids(self):
+        in_use, retired = referenced_session_ids(Path(self.temp_dir))
+        self.assertEqual(in_use, {chat.ragflow_session_id for chat in self.kept})
+        self.assertEqual(retired, set())
+
+    def test_deletes_orphans_in_paced_batches(self):
+        """Deleted chats and users leave three orphans; they go in two paced delete calls"""
+        in_use, retired = referenced_session_ids(Path(self.temp_dir))
+        report = self.reaper().run(in_use, retired)
+
+        self.assertEqual((report.server_sessions, report.in_use, report.orphaned, report.deleted), (6, 3, 3, 3))
+        self.assertEqual(self.server_session_ids(), in_use)
+        # 4 list pages (the last one empty) + 2 delete batches, spaced 0.1 s apart
+        self.assertEqual(len(self.clock.sleeps), 5)
+        self.assertAlmostEqual(self.clock.now, 0.5)
+
+    def test_dry_run_deletes_nothing(self):
+        in_use, retired = referenced_session_ids(Path(self.temp_dir))
+        report = self.reaper().run(in_use, retired, dry_run=True)
+        self.assertEqual(len(report.orphan_ids), 3)
+        self.assertEqual(report.deleted, 0)
+        self.assertEqual(len(self.server_session_ids()), 6)
+
+    def test_recent_sessions_are_kept(self):
+        """A session created moments ago may belong to a chat whose file is not saved yet"""
+        report = self.reaper(min_age=3600).run(set(), set())
+        self.assertEqual((report.too_recent, report.orphaned), (6, 0))
+        self.assertEqual(len(self.server_session_ids()), 6)
+
+    def test_retired_sessions_are_orphans(self):
+        """Sessions left behind by chat rollover are reported as retired and deleted"""
+        chat = self.kept[0]
+        chat.previous_ragflow_session_ids.append(chat.ragflow_session_id)
+        chat.ragflow_session_id = self.manager.create_session(self.assistant_id, "rolled over")
+        self.sessions._save_user_sessions(self.sessions.get_user_session("alice"))
+
+        in_use, retired = referenced_session_ids(Path(self.temp_dir))
+        report = self.reaper().run(in_use, retired)
+        self.assertEqual((report.orphaned, report.retired), (4, 1))
+        self.assertEqual(self.server_session_ids(), in_use)
+
+    def test_failed_batch_is_counted(self):
+        """A batch RAGFlow rejects is skipped; the others still go through"""
+        report = ReapReport(backend=self.server.url, assistant_id=self.assistant_id, dry_run=False,
+                            orphan_ids=["missing-session", self.kept[0].ragflow_session_id,
+                                        self.kept[1].ragflow_session_id])
+        self.reaper().delete(report)
+        self.assertEqual((report.deleted, report.failed), (1, 2))
+
+    def test_unreadable_user_file_stops_the_run(self):
+        """Sessions of a user whose file cannot be read must not look orphaned"""
+        (Path(self.temp_dir) / "user_carol_sessions.json").write_text("{not json")
+        with self.assertRaises(ValueError):
+            referenced_session_ids(Path(self.temp_dir))
+
+    def test_report_is_json_serializable(self):
+        report = self.reaper().run(set(), set(), dry_run=True)
+        self.assertEqual(json.loads(json.dumps(asdict(report)))["server_sessions"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Tests for chat-turn tracing spans
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src and the project root to path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root / "src"))
+sys.path.append(str(project_root))
+
+import tracing
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+    from generation_worker import GenerationWorker, get_generation_worker
+except ImportError as e:
+    print(f"Warning: Could not import session manager: {e}")
+    UserSessionManager = None
+
+try:
+    from fastapi.testclient import TestClient
+    from chat_api import create_app
+except ImportError as e:
+    print(f"Warning: Could not import chat API: {e}")
+    create_app = None
+
+try:
+    from testing.mock_ragflow_server import MockRAGFlowServer, PROFILES
+except ImportError as e:
+    print(f"Warning: Could not import mock RAGFlow server: {e}")
+    MockRAGFlowServer = None
+
+
+class RecordingExporter:
+    """Keeps finished spans in memory"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def by_name(self):
+        return {span["name"]: span for span in self.spans}
+
+
+def enable_tracing(test: unittest.TestCase, sample_rate: float = 1.0) -> RecordingExporter:
+    exporter = RecordingExporter()
+    for name, value in (("_enabled", True), ("_sample_rate", sample_rate), ("_exporter", exporter)):
+        patcher = patch.object(tracing, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return exporter
+
+
+TWO_CHUNKS = ["Deposit", "Deposit via OneDep."]
+
+
+class TestSpans(unittest.TestCase):
+    """Span nesting, sampling and export"""
+
+    def test_disabled_returns_shared_null_span(self):
+        """Disabled tracing allocates nothing per span and exports nothing"""
+        exporter = RecordingExporter()
+        with patch.object(tracing, "_enabled", False), patch.object(tracing, "_exporter", exporter):
+            self.assertIs(tracing.span("a"), tracing.span("b", user_id="x"))
+            with tracing.span("a") as span:
+                span.add_event("first_token")
+                span.set_attribute("chunks", 3)
+            self.assertIsNone(tracing.current_context())
+        self.assertEqual(exporter.spans, [])
+
+    def test_children_share_the_trace(self):
+        """Nested spans link to their parent; explicit parents work across threads"""
+        exporter = enable_tracing(self)
+        with tracing.span("root") as root:
+            with tracing.span("child", chat_id="c1"):
+                pass
+            handed_off = tracing.current_context()
+        with tracing.span("in_worker", parent=handed_off):
+            pass
+
+        spans = exporter.by_name()
+        self.assertEqual({s["trace_id"] for s in exporter.spans}, {root.context.trace_id})
+        self.assertIsNone(spans["root"]["parent_span_id"])
+        self.assertEqual(spans["child"]["parent_span_id"], root.context.span_id)
+        self.assertEqual(spans["in_worker"]["parent_span_id"], root.context.span_id)
+        self.assertEqual(spans["child"]["attributes"], {"chat_id": "c1"})
+
+    def test_unsampled_trace_exports_nothing(self):
+        """A trace not sampled at the root drops its children too"""
+        exporter = enable_tracing(self, sample_rate=0.0)
+        with tracing.span("root"):
+            with tracing.span("child"):
+                pass
+        self.assertEqual(exporter.spans, [])
+
+    def test_errors_set_status(self):
+        """Exceptions mark the span as failed and still propagate"""
+        exporter = enable_tracing(self)
+        with self.assertRaises(RuntimeError):
+            with tracing.span("root"):
+                raise RuntimeError("upstream reset")
+        [span] = exporter.spans
+        self.assertEqual((span["status"], span["status_message"]), ("error", "RuntimeError: upstream reset"))
+
+    def test_traceparent_round_trip(self):
+        """W3C traceparent headers are parsed; malformed ones are ignored"""
+        enable_tracing(self)
+        header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        context = tracing.extract(header)
+        self.assertEqual(context.traceparent(), header)
+        self.assertFalse(tracing.extract(header[:-1] + "0").sampled)
+        self.assertIsNone(tracing.extract("not-a-traceparent"))
+        self.assertIsNone(tracing.extract(None))
+
+    def test_file_exporter_writes_json_lines(self):
+        """The file exporter appends one JSON object per span"""
+        temp_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, temp_dir)
+        exporter = tracing.FileSpanExporter(temp_dir / "traces" / "spans.jsonl")
+        enable_tracing(self)
+        tracing.set_exporter(exporter)
+        with tracing.span("root"):
+            with tracing.span("child"):
+                pass
+
+        lines = (temp_dir / "traces" / "spans.jsonl").read_text().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["child", "root"])
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestChatTurnSpans(unittest.TestCase):
+    """One chat turn produces the spans needed to explain its latency"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manager = make_session_manager(self.temp_dir, FakeAssistantManager(TWO_CHUNKS))
+        self.chat = self.manager.create_user_chat("alice", "Help Session")
+        self.exporter = enable_tracing(self)
+
+    def test_send_message_to_chat_spans(self):
+        """Session lookup, stream (with first_token) and persistence nest under the turn"""
+        list(self.manager.send_message_to_chat("alice", self.chat.chat_id, "How do I deposit?"))
+
+        spans = self.exporter.by_name()
+        root = spans["send_message_to_chat"]
+        self.assertIsNone(root["parent_span_id"])
+        self.assertEqual(spans["session_lookup"]["parent_span_id"], root["span_id"])
+        stream = spans["chat_turn.stream"]
+        self.assertEqual(stream["parent_span_id"], root["span_id"])
+        self.assertEqual(spans["persistence"]["parent_span_id"], stream["span_id"])
+        self.assertEqual((stream["attributes"]["chunks"], stream["attributes"]["chars"]), (2, 19))
+        self.assertEqual([e["name"] for e in stream["events"]], ["first_token"])
+        self.assertEqual({s["trace_id"] for s in self.exporter.spans}, {root["trace_id"]})
+        self.assertIn("storage.save", {s["name"] for s in self.exporter.spans})
+
+    def test_background_job_joins_the_submitting_trace(self):
+        """A turn generated on the worker thread is a child of the span that submitted it"""
+        worker = GenerationWorker(self.manager, max_workers=1)
+        self.addCleanup(worker.shutdown)
+        with tracing.span("ui.chat_input") as handler:
+            job = worker.submit("alice", self.chat.chat_id, "How do I deposit?")
+        job.wait()
+
+        spans = self.exporter.by_name()
+        self.assertEqual(spans["generation.job"]["parent_span_id"], handler.context.span_id)
+        self.assertEqual(spans["chat_turn.stream"]["parent_span_id"], spans["generation.job"]["span_id"])
+        self.assertEqual({s["trace_id"] for s in self.exporter.spans}, {handler.context.trace_id})
+
+    @unittest.skipIf(create_app is None, "fastapi not installed")
+    def test_chat_api_continues_caller_trace(self):
+        """The chat API parents its spans on the caller's traceparent"""
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        with TestClient(create_app(self.manager)) as client:
+            response = client.post(f"/users/alice/chats/{self.chat.chat_id}/messages",
+                                   json={"message": "How do I deposit?"},
+                                   headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+        self.assertEqual(response.status_code, 200)
+        # The job's span closes just after the stream's last event
+        get_generation_worker(self.manager).shutdown()
+
+        spans = self.exporter.by_name()
+        self.assertEqual(spans["api.send_message"]["parent_span_id"], "00f067aa0ba902b7")
+        self.assertEqual(spans["generation.job"]["parent_span_id"], spans["api.send_message"]["span_id"])
+        self.assertEqual(spans["chat_turn.stream"]["trace_id"], trace_id)
+
+
+@unittest.skipIf(MockRAGFlowServer is None or UserSessionManager is None, "ragflow-sdk not installed")
+class TestRAGFlowSpans(unittest.TestCase):
+    """The RAGFlow client's stream span carries the upstream TTFT"""
+
+    def test_ragflow_stream_span(self):
+        server = MockRAGFlowServer(PROFILES["instant"]).start()
+        self.addCleanup(server.stop)
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        manager = UserSessionManager(server.api_key, base_url=server.url, data_dir=data_dir)
+        chat = manager.create_user_chat("alice", "Help Session")
+        exporter = enable_tracing(self)
+
+        list(manager.send_message_to_chat("alice", chat.chat_id, "What is a validation report?"))
+
+        spans = exporter.by_name()
+        upstream = spans["ragflow.stream"]
+        self.assertEqual(upstream["parent_span_id"], spans["chat_turn.stream"]["span_id"])
+        self.assertEqual(spans["ragflow.session_lookup"]["parent_span_id"], upstream["span_id"])
+        self.assertEqual(upstream["events"][0]["name"], "first_token")
+        self.assertGreater(upstream["attributes"]["chars"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
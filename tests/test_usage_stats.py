@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained usage and feedback counters
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from usage_stats import UsageCounters, UsageTotals, rebuild
+
+from tests.conftest import FakeAssistantManager, make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+    from user_gc import UserGarbageCollector
+except ImportError as e:
+    print(f"Warning: Could not import UserSessionManager: {e}")
+    UserSessionManager = None
+
+
+class TestUsageCounters(unittest.TestCase):
+
+    def test_count_and_remove(self):
+        """Removing what was added leaves no zero-valued keys behind"""
+        counters = UsageCounters()
+        counters.count_message("user", "How do I deposit?")
+        counters.count_message("assistant", "Use OneDep.", references=[{"document_name": "a.pdf"}] * 2,
+                               feedback={"star_rating": 5, "categories": ["accurate"]}, truncated=True)
+        self.assertEqual((counters.questions, counters.answers, counters.truncated_answers), (1, 1, 1))
+        self.assertEqual((counters.ratings, counters.references), ({"5": 1}, {"a.pdf": 2}))
+
+        counters.add(counters.copy(), sign=-1)
+        self.assertEqual(counters, UsageCounters())
+
+    def test_thumbs_are_counted_next_to_stars(self):
+        """Feedback with both a star rating and thumbs counts in the star histogram and as thumbs"""
+        counters = UsageCounters()
+        counters.count_feedback({"star_rating": 4, "rating": "thumbs-up"})
+        counters.count_feedback({"rating": "thumbs-down"})
+        self.assertEqual((counters.thumbs_up, counters.thumbs_down, counters.ratings), (1, 1, {"4": 1}))
+        counters.count_feedback({"star_rating": 4, "rating": "thumbs-up"}, sign=-1)
+        self.assertEqual((counters.thumbs_up, counters.ratings), (0, {}))
+
+    def test_empty_answers_are_not_counted(self):
+        counters = UsageCounters()
+        counters.count_message("assistant", "")
+        self.assertEqual(counters.answers, 0)
+
+    def test_totals_are_shared_through_the_file(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        UsageTotals(temp_dir, buffered=False).add(UsageCounters(questions=2, ratings={"5": 1}))
+        UsageTotals(temp_dir, buffered=False).add(UsageCounters(questions=1))
+        self.assertEqual(UsageTotals(temp_dir).read(), UsageCounters(questions=3, ratings={"5": 1}))
+
+    def test_changes_are_merged_by_flush(self):
+        """Adding only touches memory; the file is updated when the changes are flushed"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        totals = UsageTotals(temp_dir, buffered=True)
+        totals.add(UsageCounters(questions=2))
+        totals.add(UsageCounters(questions=1), sign=-1)
+        self.assertFalse((Path(temp_dir) / "usage_totals.json").exists())
+        self.assertEqual(totals.read(), UsageCounters(questions=1))
+
+        totals.flush()
+        self.assertEqual(UsageTotals(temp_dir).read(), UsageCounters(questions=1))
+        self.assertEqual(totals.read(), UsageCounters(questions=1))
+
+    def test_totals_never_go_negative(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        totals = UsageTotals(temp_dir, buffered=False)
+        totals.add(UsageCounters(questions=1, references={"a.pdf": 1}))
+        totals.add(UsageCounters(questions=3, references={"a.pdf": 2, "b.pdf": 1}), sign=-1)
+        self.assertEqual(UsageTotals(temp_dir).read(), UsageCounters())
+
+
+class ReferencingAssistantManager(FakeAssistantManager):
+    """Answers every question with two references"""
+
+    references = [{"document_name": "deposition.pdf"}, {"document_name": "validation.pdf"}]
+
+    def respond(self, message):
+        return [f"Answer to {message}"]
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestManagerUsage(unittest.TestCase):
+    """Counters follow every write and always match a rebuild from the raw messages"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.manager = make_session_manager(self.temp_dir, ReferencingAssistantManager())
+
+    def ask(self, user_id, chat_id, question):
+        list(self.manager.send_message_to_chat(user_id, chat_id, question))
+        return self.manager.get_chat_messages(user_id, chat_id)[-1]
+
+    def assertMatchesRebuild(self):
+        live = self.manager.get_global_usage()
+        # As when the app stops: its changes are in the file before a rebuild
+        self.manager.usage_totals.flush()
+        rebuild(Path(self.temp_dir))
+        self.assertEqual(live, self.manager.get_global_usage())
+
+    def test_counters_follow_writes(self):
+        chat = self.manager.create_user_chat("alice", "Deposition")
+        first = self.ask("alice", chat.chat_id, "How do I deposit?")
+        self.ask("alice", chat.chat_id, "And validate?")
+        self.manager.add_message_feedback("alice", chat.chat_id, first.message_id,
+                                          {"star_rating": 4, "categories": ["accurate"]})
+        # A changed rating moves between buckets
+        self.manager.add_message_feedback("alice", chat.chat_id, first.message_id, {"star_rating": 2})
+
+        usage = self.manager.get_chat_usage("alice", chat.chat_id)
+        self.assertEqual((usage["questions"], usage["answers"], usage["feedback"]), (2, 2, 1))
+        self.assertEqual(usage["ratings"], {"2": 1})
+        self.assertEqual(usage["categories"], {})
+        self.assertEqual(usage["references"], {"deposition.pdf": 2, "validation.pdf": 2})
+
+        other = self.manager.create_user_chat("alice", "Ligands")
+        self.ask("alice", other.chat_id, "Ligand codes?")
+        self.assertEqual(self.manager.get_user_usage("alice")["questions"], 3)
+        self.assertEqual(self.manager.get_user_stats("alice")["total_messages"], 6)
+        self.assertEqual(self.manager.get_global_usage()["answers"], 3)
+
+        summary = self.manager.get_chat_feedback_summary("alice", chat.chat_id)
+        self.assertEqual((summary["total_assistant_messages"], summary["messages_with_feedback"]), (2, 1))
+        self.assertEqual(summary["rating_counts"], {"2": 1})
+        self.assertMatchesRebuild()
+
+    def test_feedback_summary_counts_thumbs_with_stars(self):
+        chat = self.manager.create_user_chat("alice", "Deposition")
+        first = self.ask("alice", chat.chat_id, "How do I deposit?")
+        second = self.ask("alice", chat.chat_id, "And validate?")
+        self.manager.add_message_feedback("alice", chat.chat_id, first.message_id,
+                                          {"star_rating": 5, "rating": "thumbs-up"})
+        self.manager.add_message_feedback("alice", chat.chat_id, second.message_id, {"rating": "thumbs-down"})
+
+        summary = self.manager.get_chat_feedback_summary("alice", chat.chat_id)
+        self.assertEqual((summary["positive_feedback"], summary["negative_feedback"]), (1, 1))
+        self.assertEqual(summary["rating_counts"], {"5": 1})
+        self.assertMatchesRebuild()
+
+    def test_user_stats_count_stored_messages(self):
+        """total_messages counts every stored message, including an answer still being generated"""
+        chat = self.manager.create_user_chat("alice", "Deposition")
+        self.ask("alice", chat.chat_id, "How do I deposit?")
+        self.manager.start_turn("alice", chat.chat_id, "And validate?")
+        stats = self.manager.get_user_stats("alice")
+        self.assertEqual((stats["total_messages"], stats["questions"], stats["answers"]), (4, 2, 1))
+
+    def test_deletes_are_subtracted(self):
+        kept = self.manager.create_user_chat("alice", "Kept")
+        self.ask("alice", kept.chat_id, "Kept question")
+        cleared = self.manager.create_user_chat("alice", "Cleared")
+        self.ask("alice", cleared.chat_id, "Cleared question")
+        deleted = self.manager.create_user_chat("alice", "Deleted")
+        self.ask("alice", deleted.chat_id, "Deleted question")
+        bob = self.manager.create_user_chat("bob", "Bob")
+        self.ask("bob", bob.chat_id, "Bob's question")
+
+        self.manager.clear_chat_messages("alice", cleared.chat_id)
+        self.manager.delete_user_chat("alice", deleted.chat_id)
+        self.manager.cleanup_user_data("bob")
+
+        self.assertEqual(self.manager.get_chat_usage("alice", cleared.chat_id)["questions"], 0)
+        self.assertEqual(self.manager.get_user_usage("alice")["questions"], 1)
+        self.assertEqual(self.manager.get_global_usage()["questions"], 1)
+        self.assertMatchesRebuild()
+
+    def test_files_without_counters_are_counted_on_load(self):
+        """User files written before the counters existed get them from their messages"""
+        chat = self.manager.create_user_chat("alice", "Old")
+        self.ask("alice", chat.chat_id, "Old question")
+        path = Path(self.temp_dir) / "user_alice_sessions.json"
+        data = json.loads(path.read_text())
+        del data["usage"]
+        del data["chats"][0]["usage"]
+        path.write_text(json.dumps(data))
+
+        # As if the file predated the counters: the totals never saw it
+        self.manager.usage_totals.replace(UsageCounters())
+
+        self.manager.user_sessions.clear()
+        self.assertEqual(self.manager.get_user_usage("alice")["references"],
+                         {"deposition.pdf": 1, "validation.pdf": 1})
+        self.assertEqual(self.manager.get_global_usage()["questions"], 1)
+        self.assertIn("usage", json.loads(path.read_text()))
+
+        # Counted once, not on every load
+        self.manager.user_sessions.clear()
+        self.manager.get_user_session("alice")
+        self.assertMatchesRebuild()
+
+    def test_interrupted_answers_are_counted_on_load(self):
+        """An answer cut off by a crash was never counted as finished; the next load counts it"""
+        chat = self.manager.create_user_chat("alice", "Crash")
+        self.manager.start_turn("alice", chat.chat_id, "Question before the crash")
+        path = Path(self.temp_dir) / "user_alice_sessions.json"
+        data = json.loads(path.read_text())
+        data["chats"][0]["messages"][-1]["content"] = "Partial answer"
+        path.write_text(json.dumps(data))
+        self.assertEqual(self.manager.get_global_usage()["answers"], 0)
+
+        self.manager.user_sessions.clear()
+        usage = self.manager.get_user_usage("alice")
+        self.assertEqual((usage["answers"], usage["truncated_answers"]), (1, 1))
+        self.assertEqual(self.manager.get_global_usage()["truncated_answers"], 1)
+
+        self.manager.user_sessions.clear()
+        self.manager.get_user_session("alice")
+        self.assertMatchesRebuild()
+
+    def test_garbage_collection_is_subtracted(self):
+        user_id = "0b9a3c4e-5f60-4a7b-8c9d-0e1f2a3b4c5d"
+        chat = self.manager.create_user_chat(user_id, "Idle")
+        self.ask(user_id, chat.chat_id, "Question")
+
+        collector = UserGarbageCollector(Path(self.temp_dir), retention_days=30,
+                                         on_remove=self.manager._evict_user,
+                                         clock=lambda: time.time() + 400 * 86400)
+        self.assertEqual(collector.run_slice().idle_removed, 1)
+        self.assertEqual(self.manager.get_global_usage()["questions"], 0)
+
+    def test_revived_users_are_counted_again(self):
+        """A user removed by a collector in another process, then active here again, is counted and indexed"""
+        user_id = "0b9a3c4e-5f60-4a7b-8c9d-0e1f2a3b4c5d"
+        chat = self.manager.create_user_chat(user_id, "Idle")
+        self.ask(user_id, chat.chat_id, "Question about deposition")
+        collector = UserGarbageCollector(Path(self.temp_dir), retention_days=30,
+                                         clock=lambda: time.time() + 400 * 86400)
+        self.assertEqual(collector.run_slice().idle_removed, 1)
+        self.assertEqual(self.manager.search_conversations("deposition", user_id=user_id), [])
+
+        self.ask(user_id, chat.chat_id, "Second question")
+        self.assertEqual(self.manager.get_global_usage()["questions"], 2)
+        self.assertEqual(len(self.manager.search_conversations("deposition", user_id=user_id, role="user")), 1)
+        self.assertMatchesRebuild()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
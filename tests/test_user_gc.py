@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for garbage collection of empty and idle anonymous users
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from user_gc import STATE_FILE, RemovalLock, UserGarbageCollector
+from tests.conftest import make_session_manager
+
+try:
+    from user_session_manager import UserSessionManager
+except ImportError as e:
+    print(f"Warning: Could not import UserSessionManager: {e}")
+    UserSessionManager = None
+
+DAY = 86400
+
+
+class TestUserGarbageCollector(unittest.TestCase):
+    """Empty users expire after the grace period, idle ones after the retention window"""
+
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir)
+        self.now = time.time()
+
+    def write_user(self, age_days: float, messages: int = 0, user_id: str = None) -> str:
+        """A user file last active age_days ago with one chat holding `messages` messages"""
+        user_id = user_id or str(uuid.uuid4())
+        stamp = (datetime.fromtimestamp(self.now) - timedelta(days=age_days)).isoformat()
+        chat = {"chat_id": str(uuid.uuid4()), "title": "Help Session", "created_at": stamp, "updated_at": stamp,
+                "message_count": messages, "ragflow_session_id": "s1",
+                "messages": [{"role": "user", "content": "q", "timestamp": stamp}] * messages}
+        path = self.data_dir / f"user_{user_id}_sessions.json"
+        path.write_text(json.dumps({"user_id": user_id, "session_name": "main", "created_at": stamp,
+                                    "chats": [chat], "total_chats": 1}))
+        os.utime(path, (self.now - age_days * DAY, self.now - age_days * DAY))
+        return user_id
+
+    def collector(self, **kwargs):
+        kwargs.setdefault("empty_grace_hours", 24)
+        kwargs.setdefault("retention_days", 30)
+        return UserGarbageCollector(self.data_dir, clock=lambda: self.now, **kwargs)
+
+    def remaining(self):
+        return sorted(p.name[5:-14] for p in self.data_dir.glob("user_*_sessions.json"))
+
+    def test_removes_empty_and_idle_users(self):
+        empty_old = self.write_user(2)
+        empty_new = self.write_user(0.5)
+        active = self.write_user(10, messages=4)
+        idle = self.write_user(40, messages=2)
+        size = sum((self.data_dir / f"user_{u}_sessions.json").stat().st_size for u in (empty_old, idle))
+
+        report = self.collector().run_slice()
+        self.assertEqual((report.empty_removed, report.idle_removed, report.kept, report.recent), (1, 1, 1, 1))
+        self.assertEqual(report.bytes_reclaimed, size)
+        self.assertTrue(report.pass_complete)
+        self.assertEqual(self.remaining(), sorted([empty_new, active]))
+
+    def test_named_users_are_kept(self):
+        """Only UUID ids generated by the app count as anonymous unless include_named is set"""
+        self.write_user(2, user_id="test_user_automated")
+        self.assertEqual(self.collector().run_slice().named, 1)
+        self.assertEqual(self.collector(include_named=True).run_slice().empty_removed, 1)
+
+    def test_retention_zero_keeps_idle_users(self):
+        self.write_user(400, messages=2)
+        report = self.collector(retention_days=0).run_slice()
+        self.assertEqual((report.idle_removed, report.kept), (0, 1))
+
+    def test_dry_run_removes_nothing(self):
+        self.write_user(2)
+        report = self.collector().run_slice(dry_run=True)
+        self.assertEqual(report.empty_removed, 1)
+        self.assertGreater(report.bytes_reclaimed, 0)
+        self.assertEqual(len(self.remaining()), 1)
+
+    def test_slices_resume_from_the_cursor(self):
+        """A slice out of time saves its cursor; the next one continues, and a finished pass starts over"""
+        users = sorted(self.write_user(2) for _ in range(5))
+        collector = self.collector()
+        ticks = iter([0, 0, 0, 0, 10] + [0] * 20)
+        with patch("user_gc.time.perf_counter", lambda: next(ticks)):
+            first = collector.run_slice(time_budget=5)
+        self.assertEqual((first.scanned, first.pass_complete), (3, False))
+        self.assertEqual(json.loads((self.data_dir / STATE_FILE).read_text())["cursor"],
+                         f"user_{users[2]}_sessions.json")
+        self.assertEqual(self.remaining(), users[3:])
+
+        second = collector.run_slice()
+        self.assertEqual((second.scanned, second.pass_complete), (2, True))
+        self.assertEqual(json.loads((self.data_dir / STATE_FILE).read_text())["cursor"], "")
+
+    def test_removal_waits_for_saves_in_progress(self):
+        """A save holding the removal lock delays the removal until it is done"""
+        self.write_user(2)
+        reports = []
+        with RemovalLock(self.data_dir).shared():
+            collector = threading.Thread(target=lambda: reports.append(self.collector().run_slice()))
+            collector.start()
+            collector.join(0.2)
+            self.assertTrue(collector.is_alive())
+            self.assertEqual(len(self.remaining()), 1)
+        collector.join(5)
+        self.assertEqual(reports[0].empty_removed, 1)
+        self.assertEqual(self.remaining(), [])
+
+    def test_unreadable_file_is_kept(self):
+        (self.data_dir / f"user_{uuid.uuid4()}_sessions.json").write_text("{not json")
+        for path in self.data_dir.glob("user_*"):
+            os.utime(path, (self.now - 2 * DAY, self.now - 2 * DAY))
+        report = self.collector().run_slice()
+        self.assertEqual(report.errors, 1)
+        self.assertEqual(len(self.remaining()), 1)
+
+
+@unittest.skipIf(UserSessionManager is None, "ragflow-sdk not installed")
+class TestManagerGarbageCollection(unittest.TestCase):
+    """collect_garbage keeps the manager's cache consistent with the data directory"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def create_manager(self):
+        return make_session_manager(self.temp_dir)
+
+    def create_expired_user(self, manager) -> str:
+        user_id = str(uuid.uuid4())
+        chat = manager.create_user_chat(user_id, "Help Session")
+        user_session = manager.get_user_session(user_id)
+        user_session.created_at = chat.updated_at = datetime.now() - timedelta(days=2)
+        manager._save_user_sessions(user_session)
+        path = Path(self.temp_dir) / f"user_{user_id}_sessions.json"
+        os.utime(path, (time.time() - 2 * DAY, time.time() - 2 * DAY))
+        return user_id
+
+    def test_removed_users_are_evicted(self):
+        manager = self.create_manager()
+        user_id = self.create_expired_user(manager)
+
+        report = manager.collect_garbage()
+        self.assertEqual(report.empty_removed, 1)
+        self.assertFalse((Path(self.temp_dir) / f"user_{user_id}_sessions.json").exists())
+        self.assertNotIn(user_id, manager.user_sessions)
+
+    def test_user_cached_elsewhere_is_revived_on_save(self):
+        """A collector in another process removes a user this manager still holds; its next save revives it"""
+        manager = self.create_manager()
+        user_id = self.create_expired_user(manager)
+
+        self.assertEqual(UserGarbageCollector(Path(self.temp_dir)).run_slice().empty_removed, 1)
+        path = Path(self.temp_dir) / f"user_{user_id}_sessions.json"
+        self.assertFalse(path.exists())
+
+        manager.create_user_chat(user_id, "Back again")
+        self.assertEqual(len(json.loads(path.read_text())["chats"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)